@@ -1,14 +1,43 @@
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import pandas as pd
 from datetime import date, datetime, timedelta
 import json
-import base64
-import requests
 from pathlib import Path
-from itertools import combinations
 import hashlib
 import re
-from typing import Dict, Any, List, Tuple, Optional
+import time
+from functools import wraps
+import zipfile
+from typing import Dict, Any, Hashable, List, Tuple, Optional
+
+from bloodbank.antibody import (
+    AGS, IGNORED_AGS, INSIGNIFICANT_AGS,
+    normalize_grade, rule_out_cells, CompiledCells, compile_antigram,
+    roman, panel_spec, standard_panels, build_panel_cells, compile_panels, all_reactive,
+    suggest_selected_cells as _suggest_selected_cells, phenotype_conflict_notes, analyze_specificity,
+    selected_cell, specificity_changes,
+)
+from bloodbank.abo import (
+    is_pos_any as _is_pos_any, age_is_neonate as _age_is_neonate,
+    build_abo_guidance, ABO_GRADES,
+)
+from bloodbank.abo_table import interpret_abo_rhd_lookup
+from bloodbank.github import GitHubClient, GITHUB_API
+from bloodbank.spool import SaveSpool, SpoolWorker, DEFAULT_SPOOL_PATH
+from bloodbank.history_cache import HistoryIndexCache
+from bloodbank.search_index import HistorySearchIndex, DEFAULT_SEARCH_DB_PATH, is_index_file
+from bloodbank.export import export_cases, HAS_PARQUET
+from bloodbank.result_cache import ResultCache, analysis_key
+from bloodbank.cell_plan import plan_for_analysis
+from bloodbank.scoring import rank_explanations
+from bloodbank.confirm_stats import confirmation_stats, STAT_ALPHA
+from bloodbank.cell_catalog import CellCatalog, catalog_frame
+from bloodbank.replay import archive_path
+from bloodbank.reports import (
+    how_to_report, patient_antigen_negative_reminder, anti_g_alert_html, history_report_html, render_cache_info,
+)
+from bloodbank.profiling import RerunProfile, ProfileRing, RERUN_TOTAL
 
 # =============================================================================
 # 0) GitHub Engine (uses Streamlit Secrets)
@@ -19,80 +48,32 @@ def _gh_get_cfg():
     branch = st.secrets.get("GITHUB_BRANCH", "main")
     return token, repo, branch
 
-def _gh_headers(token: str):
-    return {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github+json"
-    }
+@st.cache_resource(show_spinner=False)
+def _gh_client_for(token: str, repo: str, branch: str, api_base: str) -> GitHubClient:
+    # one pooled client per process (keep-alive session + ETag cache), shared by all sessions
+    return GitHubClient(token, repo, branch, api_base=api_base)
 
-def github_get_file(path_in_repo: str) -> Tuple[Optional[str], Optional[str]]:
-    """
-    Returns (content_text, sha) or (None, None) if not found.
-    """
+def _gh_key() -> Tuple[str, str, str, str]:
     token, repo, branch = _gh_get_cfg()
     if not token or not repo:
         raise RuntimeError("Missing Streamlit Secrets: GITHUB_TOKEN / GITHUB_REPO")
+    api_base = st.secrets.get("GITHUB_API_URL", GITHUB_API)  # override only for a local fake server
+    return token, repo, branch, api_base
 
-    api = f"https://api.github.com/repos/{repo}/contents/{path_in_repo}"
-    r = requests.get(api, headers=_gh_headers(token), params={"ref": branch}, timeout=30)
-    if r.status_code == 404:
-        return None, None
-    if r.status_code != 200:
-        raise RuntimeError(f"GitHub GET error {r.status_code}: {r.text}")
+def _gh_client() -> GitHubClient:
+    return _gh_client_for(*_gh_key())
 
-    j = r.json()
-    sha = j.get("sha")
-    enc = j.get("content", "")
-    if not enc:
-        return "", sha
-    txt = base64.b64decode(enc).decode("utf-8", errors="replace")
-    return txt, sha
+def github_get_file(path_in_repo: str, ref: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns (content_text, sha) or (None, None) if not found.
+    """
+    return _gh_client().get_file(path_in_repo, ref=ref)
 
 def github_list_dir(path_in_repo: str) -> List[Dict[str, Any]]:
-    token, repo, branch = _gh_get_cfg()
-    if not token or not repo:
-        raise RuntimeError("Missing Streamlit Secrets: GITHUB_TOKEN / GITHUB_REPO")
-
-    api = f"https://api.github.com/repos/{repo}/contents/{path_in_repo}"
-    r = requests.get(api, headers=_gh_headers(token), params={"ref": branch}, timeout=30)
-    if r.status_code == 404:
-        return []
-    if r.status_code != 200:
-        raise RuntimeError(f"GitHub LIST error {r.status_code}: {r.text}")
-
-    j = r.json()
-    if isinstance(j, dict) and j.get("type") == "file":
-        return [j]
-    if isinstance(j, list):
-        return j
-    return []
+    return _gh_client().list_dir(path_in_repo)
 
 def github_upsert_file(path_in_repo: str, content_text: str, commit_message: str):
-    token, repo, branch = _gh_get_cfg()
-    if not token or not repo:
-        raise RuntimeError("Missing Streamlit Secrets: GITHUB_TOKEN / GITHUB_REPO")
-
-    api = f"https://api.github.com/repos/{repo}/contents/{path_in_repo}"
-    headers = _gh_headers(token)
-
-    sha = None
-    r = requests.get(api, headers=headers, params={"ref": branch}, timeout=30)
-    if r.status_code == 200:
-        sha = r.json().get("sha")
-    elif r.status_code != 404:
-        raise RuntimeError(f"GitHub GET error {r.status_code}: {r.text}")
-
-    payload = {
-        "message": commit_message,
-        "content": base64.b64encode(content_text.encode("utf-8")).decode("utf-8"),
-        "branch": branch,
-    }
-    if sha:
-        payload["sha"] = sha
-
-    w = requests.put(api, headers=headers, json=payload, timeout=30)
-    if w.status_code not in (200, 201):
-        raise RuntimeError(f"GitHub PUT error {w.status_code}: {w.text}")
+    _gh_client().upsert_file(path_in_repo, content_text, commit_message)
 
 # =============================================================================
 # 0.1) Local config files (panel/screen/lots) - still local + publish to GitHub
@@ -120,7 +101,16 @@ def load_json_if_exists(local_path: str, default_obj: dict) -> dict:
 # =============================================================================
 HISTORY_ROOT = "data/history"     # repo path
 HISTORY_DUP_WINDOW_MIN = 10       # ignore exact duplicates within this window
-HISTORY_MAX_PER_PATIENT_INDEX = 5000  # safety cap (per MRN index file)
+HISTORY_CACHE_TTL_SEC = 30        # reuse a parsed index this long without asking GitHub
+HISTORY_PAGE_ROWS = 25            # history expander loads older months in pages of ~this many rows
+HISTORY_LEGACY_SHARD = "legacy"   # pre-sharding index.jsonl, read-only
+HISTORY_SEARCH_SYNC_SEC = 120     # local search index re-syncs from GitHub when older than this
+HISTORY_EXPORT_DIR = "data/local/export"  # bulk export chunks + checkpoint (resumable)
+PROFILE_QUERY_PARAM = "profile"   # ?profile=1 profiles this session's reruns (sidebar waterfall)
+
+EXPLAIN_MAX_SIZE = 3              # same ceiling as the clinical best-combo search
+EXPLAIN_TIME_BUDGET_SEC = 0.5     # minimal-explanation enumeration stops here (marked incomplete)
+ANALYSIS_CACHE_ENTRIES = 256      # whole-analysis results shared across sessions (LRU)
 
 def _safe_str(x):
     return "" if x is None else str(x).strip()
@@ -143,37 +133,34 @@ def _mrn_dir(mrn: str) -> str:
     return f"{HISTORY_ROOT}/{mrn}"
 
 def _index_path(mrn: str) -> str:
+    # single-file index written before monthly shards (read-only now)
     return f"{_mrn_dir(mrn)}/index.jsonl"
 
+def _manifest_path(mrn: str) -> str:
+    return f"{_mrn_dir(mrn)}/index/manifest.json"
+
+def _shard_path(mrn: str, shard: str) -> str:
+    if shard == HISTORY_LEGACY_SHARD:
+        return _index_path(mrn)
+    return f"{_mrn_dir(mrn)}/index/{shard}.jsonl"
+
+def _shard_name(saved_at: str) -> str:
+    dt = _parse_dt(saved_at) or datetime.now()
+    return dt.strftime("%Y-%m")
+
 def _case_path(mrn: str, case_id: str) -> str:
     return f"{_mrn_dir(mrn)}/{case_id}.json"
 
-def _read_patient_index(mrn: str) -> List[dict]:
-    txt, _ = github_get_file(_index_path(mrn))
-    if not txt:
-        return []
-    rows = []
+def _iter_index_lines(txt: str):
+    # Older saves joined rows with a literal backslash-n ("\\n"); accept both separators.
     for line in txt.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        try:
-            rows.append(json.loads(line))
-        except Exception:
-            continue
-    # sort newest first if saved_at exists
-    rows2 = []
-    for r in rows:
-        dt = _parse_dt(r.get("saved_at", ""))
-        r["_dt"] = dt
-        rows2.append(r)
-    rows2.sort(key=lambda r: (r["_dt"] is None, r["_dt"]), reverse=True)
-    for r in rows2:
-        r.pop("_dt", None)
-    return rows2
+        for part in re.split(r"(?<=\})\\n", line):
+            part = part.strip()
+            if part:
+                yield part
 
-def _write_patient_index(mrn: str, rows: List[dict]):
-    # keep only most recent N
+def _sort_index_rows(rows: List[dict]) -> List[dict]:
+    # newest first if saved_at exists
     rows2 = []
     for r in rows:
         dt = _parse_dt(r.get("saved_at", ""))
@@ -181,56 +168,109 @@ def _write_patient_index(mrn: str, rows: List[dict]):
         r2["_dt"] = dt
         rows2.append(r2)
     rows2.sort(key=lambda r: (r["_dt"] is None, r["_dt"]), reverse=True)
-    rows2 = rows2[:HISTORY_MAX_PER_PATIENT_INDEX]
     for r in rows2:
         r.pop("_dt", None)
+    return rows2
 
-    content = "\\n".join([json.dumps(r, ensure_ascii=False) for r in rows2]) + ("\\n" if rows2 else "")
-    github_upsert_file(_index_path(mrn), content, f"Update history index for {mrn}")
+def _parse_index_text(txt: Optional[str]) -> List[dict]:
+    if not txt:
+        return []
+    rows = []
+    for line in _iter_index_lines(txt):
+        try:
+            rows.append(json.loads(line))
+        except Exception:
+            continue
+    return _sort_index_rows(rows)
 
-def save_case_to_github(record: dict) -> Tuple[bool, str]:
+# Per-MRN index = monthly append-only shards + a small manifest:
+#   data/history/<mrn>/index/2026-10.jsonl   (rows in save order)
+#   data/history/<mrn>/index/manifest.json   {"total", "last_saved_at", "last_conclusion", "shards": [{"name", "count"}]}
+# A save rewrites only the current month's shard and the manifest.
+def _empty_manifest(mrn: str) -> dict:
+    return {"mrn": mrn, "total": 0, "last_saved_at": "", "last_conclusion": "", "shards": []}
+
+def _parse_manifest(txt: Optional[str]) -> dict:
+    try:
+        man = json.loads(txt) if txt else {}
+    except Exception:
+        man = {}
+    out = _empty_manifest(_safe_str(man.get("mrn", "")))
+    out.update({k: v for k, v in man.items() if k in out})
+    return out
+
+def _fetch_manifest(client: GitHubClient, mrn: str, ref: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns (manifest json text, blob sha). Patients saved before sharding get a
+    manifest synthesized over their old index.jsonl (one legacy shard).
+    """
+    txt, sha = client.get_file(_manifest_path(mrn), ref=ref)
+    if txt is not None:
+        return txt, sha
+    legacy, sha = client.get_file(_index_path(mrn), ref=ref)
+    rows = _parse_index_text(legacy)
+    if not rows:
+        return None, None
+    man = _empty_manifest(mrn)
+    man.update({"total": len(rows), "last_saved_at": _safe_str(rows[0].get("saved_at", "")),
+                "last_conclusion": _safe_str(rows[0].get("conclusion_short", "")),
+                "shards": [{"name": HISTORY_LEGACY_SHARD, "count": len(rows)}]})
+    return json.dumps(man, ensure_ascii=False), sha
+
+def _manifest_add(man: dict, shard: str, row: dict) -> dict:
+    man = json.loads(json.dumps(man))
+    for s in man["shards"]:
+        if s["name"] == shard:
+            s["count"] = int(s.get("count", 0)) + 1
+            break
+    else:
+        man["shards"].append({"name": shard, "count": 1})
+    man["shards"].sort(key=lambda s: (s["name"] != HISTORY_LEGACY_SHARD, s["name"]))  # oldest first
+    man["total"] = int(man.get("total", 0)) + 1
+    if _safe_str(row.get("saved_at", "")) >= _safe_str(man.get("last_saved_at", "")):
+        man["last_saved_at"] = _safe_str(row.get("saved_at", ""))
+        man["last_conclusion"] = _safe_str(row.get("conclusion_short", ""))
+    return man
+
+def _shard_append(txt: Optional[str], row: dict) -> str:
+    txt = (txt or "").rstrip("\n")
+    return (txt + "\n" if txt else "") + json.dumps(row, ensure_ascii=False) + "\n"
+
+def _find_duplicate(idx: List[dict], fp: str) -> Optional[str]:
+    if not fp or not idx:
+        return None
+    # find any matching fp; if found within window, do not save
+    for r in idx[:30]:  # recent check only
+        if _safe_str(r.get("fingerprint","")) == fp:
+            last_dt = _parse_dt(r.get("saved_at",""))
+            if last_dt and (datetime.now() - last_dt) <= timedelta(minutes=HISTORY_DUP_WINDOW_MIN):
+                return f"Duplicate detected: identical record already saved within last {HISTORY_DUP_WINDOW_MIN} minutes."
+    return None
+
+class _DuplicateCase(Exception):
+    pass
+
+def _commit_case(record: dict, client: GitHubClient):
     """
     record: full record dict with keys:
       - mrn, case_id, saved_at, fingerprint, summary_json, etc
-    Saves:
+    Saves, in ONE commit (Git Data API: tree -> commit -> ref):
       - case JSON file under data/history/<mrn>/<case_id>.json
-      - updates per-patient index.jsonl
+      - index row appended to this month's shard + updated manifest
+    If the branch moved meanwhile, the index row is re-applied on the new tip.
+    Returns (index row, shard path). Raises _DuplicateCase / RuntimeError.
     """
     mrn = _safe_str(record.get("mrn", "")) or "NO_MRN"
     case_id = _safe_str(record.get("case_id", "")) or f"{mrn}_{_now_ts()}".replace(" ", "_").replace(":", "-")
-
-    # Duplicate check: load patient index, compare fingerprint within time window
-    try:
-        idx = _read_patient_index(mrn)
-    except Exception as e:
-        return (False, f"History read failed: {e}")
-
     fp = _safe_str(record.get("fingerprint", ""))
-    if fp and idx:
-        # find any matching fp; if found within window, do not save
-        for r in idx[:30]:  # recent check only
-            if _safe_str(r.get("fingerprint","")) == fp:
-                last_dt = _parse_dt(r.get("saved_at",""))
-                if last_dt and (datetime.now() - last_dt) <= timedelta(minutes=HISTORY_DUP_WINDOW_MIN):
-                    return (False, f"Duplicate detected: identical record already saved within last {HISTORY_DUP_WINDOW_MIN} minutes.")
-
-    # Save full case file
+
     payload = None
     try:
         payload = json.loads(record.get("summary_json","{}"))
     except Exception:
         payload = {"_corrupt_summary_json": True}
 
-    try:
-        github_upsert_file(
-            _case_path(mrn, case_id),
-            json.dumps(payload, ensure_ascii=False, indent=2),
-            f"Add case {case_id} for {mrn}"
-        )
-    except Exception as e:
-        return (False, f"Case save failed: {e}")
-
-    # Update index row (small)
+    # Index row (small)
     index_row = {
         "case_id": case_id,
         "saved_at": _safe_str(record.get("saved_at","")),
@@ -249,19 +289,103 @@ def save_case_to_github(record: dict) -> Tuple[bool, str]:
         "ac_res": _safe_str(record.get("ac_res","")),
         "recent_tx": bool(record.get("recent_tx", False)),
         "all_rx": bool(record.get("all_rx", False)),
-        "fingerprint": _safe_str(record.get("fingerprint","")),
+        "fingerprint": fp,
     }
-    idx.insert(0, index_row)
+    case_txt = json.dumps(payload, ensure_ascii=False, indent=2)
+
+    shard = _shard_name(index_row["saved_at"])
+
+    def build_files(head_sha: str) -> Dict[str, str]:
+        # Duplicate check + index update against the exact commit we build on
+        man = _parse_manifest(_fetch_manifest(client, mrn, ref=head_sha)[0])
+        cur_txt, _ = client.get_file(_shard_path(mrn, shard), ref=head_sha)
+        recent = _parse_index_text(cur_txt)
+        newest = man["shards"][-1]["name"] if man["shards"] else shard
+        if newest != shard:  # first save of a month: duplicates live in the previous shard
+            recent += _parse_index_text(client.get_file(_shard_path(mrn, newest), ref=head_sha)[0])
+        dup = _find_duplicate(_sort_index_rows(recent), fp)
+        if dup:
+            raise _DuplicateCase(dup)
+        return {
+            _case_path(mrn, case_id): case_txt,
+            _shard_path(mrn, shard): _shard_append(cur_txt, index_row),
+            _manifest_path(mrn): json.dumps(_manifest_add(man, shard, index_row), ensure_ascii=False, indent=2),
+        }
+
+    client.commit_files(build_files, f"Add case {case_id} for {mrn}")
+    return index_row, _shard_path(mrn, shard)
 
+def save_case_to_github(record: dict) -> Tuple[bool, str]:
+    # synchronous save (the workstation goes through the save queue below)
     try:
-        _write_patient_index(mrn, idx)
+        row, source = _commit_case(record, _gh_client())
+    except _DuplicateCase as e:
+        return (False, str(e))
     except Exception as e:
-        return (False, f"Index update failed (case saved): {e}")
+        return (False, f"Case save failed: {e}")
 
+    _invalidate_history(_history_cache(), record)
+    _search_index().upsert_rows([row], source)
     return (True, "Saved")
 
-def load_history_index_as_df(mrn: str) -> pd.DataFrame:
-    rows = _read_patient_index(mrn)
+# -----------------------------------------------------------------------------
+# Save queue (write-behind): Save returns at once, a background worker commits.
+# The spool is a local SQLite file, so queued cases survive an app restart.
+# -----------------------------------------------------------------------------
+def _spool_save_fn(client: GitHubClient, hist_cache: Dict[str, HistoryIndexCache], search: HistorySearchIndex):
+    def _save(record: dict) -> Optional[str]:
+        try:
+            row, source = _commit_case(record, client)
+        except _DuplicateCase as e:
+            return str(e)  # final: nothing to retry
+        _invalidate_history(hist_cache, record)
+        search.upsert_rows([row], source)
+        return None
+    return _save
+
+@st.cache_resource(show_spinner=False)
+def _save_spool_for(path: str, search_path: str, token: str, repo: str, branch: str, api_base: str) -> SaveSpool:
+    # one spool + one worker thread per process; the worker gets its client up front
+    # (no Streamlit calls from the worker thread)
+    spool = SaveSpool(path)
+    save_fn = _spool_save_fn(_gh_client_for(token, repo, branch, api_base),
+                             _history_cache_for(token, repo, branch, api_base),
+                             _search_index_for(search_path))
+    SpoolWorker(spool, save_fn).start()
+    return spool
+
+def _save_spool() -> SaveSpool:
+    return _save_spool_for(st.secrets.get("SAVE_SPOOL_PATH", DEFAULT_SPOOL_PATH),
+                           st.secrets.get("SEARCH_DB_PATH", DEFAULT_SEARCH_DB_PATH), *_gh_key())
+
+def queue_case_save(record: dict) -> Tuple[bool, str, Optional[int]]:
+    """
+    Returns (queued, message, spool item id). Identical records queued or synced
+    within the duplicate window are refused here (the worker re-checks GitHub).
+    """
+    try:
+        spool = _save_spool()
+        dup = spool.find_duplicate(_safe_str(record.get("fingerprint", "")), HISTORY_DUP_WINDOW_MIN * 60)
+        if dup:
+            return (False, f"Duplicate detected: identical record already saved within last {HISTORY_DUP_WINDOW_MIN} minutes.", dup["id"])
+        return (True, "Queued", spool.enqueue(record))
+    except Exception as e:
+        return (False, f"Case save failed: {e}", None)
+
+def _zip_dir(src_dir: str, zip_path: str, pattern: str = "*"):
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for f in sorted(Path(src_dir).glob(pattern)):
+            zf.write(f, f.name)
+
+def _fmt_age(sec: float) -> str:
+    sec = int(sec)
+    if sec < 60:
+        return f"{sec}s"
+    if sec < 3600:
+        return f"{sec // 60}m"
+    return f"{sec // 3600}h {sec % 3600 // 60}m"
+
+def _index_df(rows: List[dict]) -> pd.DataFrame:
     if not rows:
         return pd.DataFrame(columns=[
             "saved_at","run_dt","tech","sex","age_y","age_m","age_d",
@@ -285,6 +409,99 @@ def load_history_index_as_df(mrn: str) -> pd.DataFrame:
         pass
     return df
 
+@st.cache_resource(show_spinner=False)
+def _history_cache_for(token: str, repo: str, branch: str, api_base: str) -> Dict[str, HistoryIndexCache]:
+    # parsed manifests / shards shared by all sessions; validated against the branch head
+    client = _gh_client_for(token, repo, branch, api_base)
+    head = lambda: client.get_head()[0]
+    return {
+        "manifest": HistoryIndexCache(head, lambda mrn: _fetch_manifest(client, mrn), _parse_manifest,
+                                      ttl_sec=HISTORY_CACHE_TTL_SEC),
+        "shards": HistoryIndexCache(head, lambda key: client.get_file(_shard_path(*key.rsplit("/", 1))),
+                                    _parse_index_text, ttl_sec=HISTORY_CACHE_TTL_SEC, max_entries=2048),
+    }
+
+def _history_cache() -> Dict[str, HistoryIndexCache]:
+    return _history_cache_for(*_gh_key())
+
+def _invalidate_history(hist_cache: Dict[str, HistoryIndexCache], record: dict):
+    mrn = _safe_str(record.get("mrn", "")) or "NO_MRN"
+    hist_cache["manifest"].invalidate(mrn)
+    hist_cache["shards"].invalidate(f"{mrn}/{_shard_name(_safe_str(record.get('saved_at', '')))}")
+
+# Workstation sections that only read their own widgets run as st.fragment
+# (experimental_fragment on 1.33-1.36, a plain call before that): a widget change
+# inside one reruns that section, not the whole page. Inputs come in as arguments
+# from the full run; results go out through st.session_state, which the full run
+# reads (st.rerun() from a fragment still reruns the whole page).
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda fn: fn)
+
+
+def _rerun_section():
+    """Rerun only the calling fragment (the whole page outside a fragment rerun)."""
+    try:
+        st.rerun(scope="fragment")
+    except (TypeError, StreamlitAPIException):
+        st.rerun()
+
+
+def _lazy_expander(label: str, key: str):
+    """
+    (expander, is_open). Content is only worth building while open: stateful
+    expanders (on_change="rerun") report that directly; on older Streamlit a
+    Load button inside the expander stands in for it.
+    """
+    try:
+        exp = st.expander(label, key=key, on_change="rerun")
+        return exp, bool(exp.open)
+    except TypeError:
+        exp = st.expander(label)
+        with exp:
+            if not st.session_state.get(f"{key}_loaded") and st.button("Load", key=f"{key}_load"):
+                st.session_state[f"{key}_loaded"] = True
+        return exp, bool(st.session_state.get(f"{key}_loaded"))
+
+def load_history_manifest(mrn: str) -> dict:
+    return _history_cache()["manifest"].get(mrn)
+
+def load_history_page(mrn: str, min_rows: int = HISTORY_PAGE_ROWS) -> Tuple[pd.DataFrame, bool]:
+    """
+    Newest shards first until at least min_rows rows are loaded.
+    Returns (index df, older shards remain).
+    """
+    shards = [s["name"] for s in load_history_manifest(mrn)["shards"]][::-1]
+    rows, used = [], 0
+    for name in shards:
+        if len(rows) >= min_rows:
+            break
+        rows += _history_cache()["shards"].get(f"{mrn}/{name}")
+        used += 1
+    return _index_df(rows), used < len(shards)
+
+def load_history_index_as_df(mrn: str) -> pd.DataFrame:
+    return load_history_page(mrn, min_rows=10**9)[0]
+
+# -----------------------------------------------------------------------------
+# Local search index (SQLite mirror of all index rows, cross-patient queries)
+# -----------------------------------------------------------------------------
+@st.cache_resource(show_spinner=False)
+def _search_index_for(path: str) -> HistorySearchIndex:
+    return HistorySearchIndex(path)
+
+def _search_index() -> HistorySearchIndex:
+    return _search_index_for(st.secrets.get("SEARCH_DB_PATH", DEFAULT_SEARCH_DB_PATH))
+
+def sync_search_index() -> dict:
+    """
+    One recursive tree listing, then only index files whose blob sha changed.
+    """
+    client = _gh_client()
+    entries, truncated = client.list_tree()
+    listing = [(e["path"], e["sha"]) for e in entries if is_index_file(e["path"], HISTORY_ROOT)]
+    res = _search_index().sync(listing, lambda path, sha: client.get_blob(sha))
+    res["truncated"] = truncated
+    return res
+
 def load_case_payload(mrn: str, case_id: str) -> Optional[dict]:
     txt, _ = github_get_file(_case_path(mrn, case_id))
     if not txt:
@@ -299,6 +516,93 @@ def load_case_payload(mrn: str, case_id: str) -> Optional[dict]:
 # =============================================================================
 st.set_page_config(page_title="MCH Tabuk - Serology Expert", layout="wide", page_icon="🩸")
 
+# ------------------------------
+# Rerun profiling (opt-in: ?profile=1 for one session, Supervisor → Diagnostics for all)
+# ------------------------------
+@st.cache_resource(show_spinner=False)
+def _profile_ring() -> ProfileRing:
+    # last reruns of every profiled session in this process: p50 / p95 + JSONL export in Diagnostics
+    return ProfileRing()
+
+def _profile_requested() -> bool:
+    qp = getattr(st, "query_params", None)
+    try:
+        v = qp.get(PROFILE_QUERY_PARAM) if qp is not None else None
+    except Exception:
+        v = None
+    return _safe_str(v).lower() in ("1", "true", "yes", "on") or _profile_ring().profile_all
+
+def _profile_stats_df(pct: Dict[str, Dict[str, float]]) -> pd.DataFrame:
+    rows = [{"section": name, "reruns": p["reruns"], "p50 ms": round(p["p50_ms"], 1), "p95 ms": round(p["p95_ms"], 1),
+             "p50 GitHub calls": p["p50_gh_calls"], "p95 GitHub calls": p["p95_gh_calls"],
+             "p95 GitHub KiB": round(p["p95_gh_bytes"] / 1024, 1)}
+            for name, p in pct.items()]
+    return pd.DataFrame(sorted(rows, key=lambda r: (not r["section"].startswith(RERUN_TOTAL), -r["p95 ms"])))
+
+def _profile_waterfall_html(rec: dict, pct: Dict[str, Dict[str, float]]) -> str:
+    """One bar per span, offset by its start in the rerun; blue = it talked to GitHub."""
+    total = max(rec["total_ms"], 1e-3)
+    rows = []
+    for sp in rec["spans"]:
+        left = min(99.0, 100 * sp["start_ms"] / total)
+        width = min(100 - left, 100 * sp["ms"] / total)
+        gh = f" · GitHub {sp['gh_calls']} / {sp['gh_bytes'] / 1024:.1f} KiB" if sp["gh_calls"] else ""
+        p = pct.get(sp["name"])
+        roll = f" · p50 {p['p50_ms']:.0f} / p95 {p['p95_ms']:.0f}" if p else ""
+        rows.append(
+            f"<div class='prof-row'>{'&nbsp;' * 3 * sp['depth']}<b>{sp['name']}</b> {sp['ms']:.1f} ms{gh}{roll}"
+            f"<div class='prof-track'><div class='prof-bar{' gh' if sp['gh_calls'] else ''}' "
+            f"style='margin-left:{left:.1f}%;width:{width:.1f}%'></div></div></div>"
+        )
+    return "".join(rows)
+
+def _render_profile(rec: dict):
+    ring = _profile_ring()
+    st.markdown(_profile_waterfall_html(rec, ring.percentiles()), unsafe_allow_html=True)
+    st.caption(f"{rec['label']} rerun {rec['total_ms']:.0f} ms · outside sections {rec['unprofiled_ms']:.0f} ms "
+               f"· GitHub {rec['gh_calls']} call(s), {rec['gh_bytes'] / 1024:.1f} KiB · p50 / p95 over the last "
+               f"{len(ring)} profiled reruns (all sessions)")
+
+# The profile of the run in progress lives in st.session_state.rerun_profile; sections wrap
+# their work in `with _prof_section(name):` (a no-op unless profiling is on). A full run
+# opens it here and closes it in section 8; a fragment rerun does not run this code and
+# opens its own (_profiled_fragment).
+PROF = RerunProfile(enabled=_profile_requested())
+st.session_state.rerun_profile = PROF
+
+def _prof_section(name: str):
+    return st.session_state.rerun_profile.section(name)
+
+def _profiled_fragment(section: Optional[str] = None):
+    """_fragment whose own reruns are profiled: when the full run's profile is already closed,
+    the call is a fragment rerun and gets a RerunProfile labelled with the fragment name, added to
+    the ring and drawn at the end of the fragment (a fragment cannot write to the sidebar).
+    `section` wraps the whole body in that section, in full and fragment reruns alike."""
+    def wrap(fn):
+        @wraps(fn)
+        def run(*args, **kwargs):
+            outer = st.session_state.get("rerun_profile")
+            if outer is None or not outer.enabled or not outer.closed:
+                if section is None:
+                    return fn(*args, **kwargs)
+                with _prof_section(section):
+                    return fn(*args, **kwargs)
+            prof = st.session_state.rerun_profile = RerunProfile(label=f"fragment {fn.__name__}")
+            try:
+                if section is None:
+                    out = fn(*args, **kwargs)
+                else:
+                    with prof.section(section):
+                        out = fn(*args, **kwargs)
+            finally:  # st.rerun() leaves through here: record the fragment's time anyway
+                rec = prof.close()
+                _profile_ring().add(rec)
+            st.markdown("**⏱️ This fragment rerun**")
+            _render_profile(rec)
+            return out
+        return _fragment(run)
+    return wrap
+
 # ------------------------------
 # UI Theme (expander headers)
 # ------------------------------
@@ -412,6 +716,12 @@ st.markdown("""
     .chip-neutral { background: #e2e3e5; }
     .chip-label { opacity: 0.75; font-weight: 900; letter-spacing: 0.2px; }
 
+    /* Rerun profiling waterfall (sidebar) */
+    .prof-row { margin: 2px 0 5px 0; font-size: 11px; line-height: 1.25; }
+    .prof-track { background: #eceff1; border-radius: 3px; height: 7px; }
+    .prof-bar { background: #8B0000; border-radius: 3px; height: 7px; min-width: 2px; }
+    .prof-bar.gh { background: #0d6efd; }
+
 </style>
 """, unsafe_allow_html=True)
 
@@ -569,18 +879,11 @@ st.markdown("""
 # =============================================================================
 # 2) CONSTANTS
 # =============================================================================
-AGS = ["D","C","E","c","e","Cw","K","k","Kpa","Kpb","Jsa","Jsb","Fya","Fyb","Jka","Jkb","Lea","Leb","P1","M","N","S","s","Lua","Lub","Xga"]
-DOSAGE = ["C","c","E","e","Fya","Fyb","Jka","Jkb","M","N","S","s"]
-PAIRS = {'C':'c','c':'C','E':'e','e':'E','Fya':'Fyb','Fyb':'Fya','Jka':'Jkb','Jkb':'Jka','M':'N','N':'M','S':'s','s':'S'}
-
-IGNORED_AGS = ["Kpa", "Kpb", "Jsa", "Jsb", "Lub", "Cw"]
-INSIGNIFICANT_AGS = ["Lea", "Lua", "Leb", "P1"]
-ENZYME_DESTROYED = ["Fya","Fyb","M","N","S","s"]
+# Antigen constants (AGS, DOSAGE, PAIRS, IGNORED_AGS, ...) live in bloodbank.antibody.
 
 GRADES = ["0", "+1", "+2", "+3", "+4", "Hemolysis"]  # antibody ID grades
 YN3 = ["Not Done", "Negative", "Positive"]
-
-ABO_GRADES = ["Not Done", "0", "+1", "+2", "+3", "+4", "Mixed-field", "Hemolysis"]
+# ABO_GRADES (ABO / RhD well choices) comes from bloodbank.abo: the decision table is built over it
 
 
 def _render_abo_label_html(text: str, cls: str, ctl_badge: bool = False) -> str:
@@ -612,8 +915,29 @@ if "lot_p" not in st.session_state:
 if "lot_s" not in st.session_state:
     st.session_state.lot_s = lots_obj.get("lot_s", "")
 
+def _panel_df_from_rows(rows: list) -> pd.DataFrame:
+    df = pd.DataFrame(rows or [], columns=["ID"] + AGS)
+    return df.fillna(0).astype({ag: int for ag in AGS})
+
+# additional panels (second lot / 16-cell panel ...): [{"key","name","lot","df"}]
+if "extra_panels" not in st.session_state:
+    st.session_state.extra_panels = [
+        {"key": xp.get("key") or f"x{i+1}", "name": xp.get("name", f"Panel {i+2}"),
+         "lot": xp.get("lot", ""), "df": _panel_df_from_rows(xp.get("rows"))}
+        for i, xp in enumerate(load_json_if_exists("data/panels.json", {"panels": []}).get("panels", []))
+    ]
+
+# in-house selected / rare cells by lot (ID, Lot, Expiry + 26 antigens): suggestions + test planner
+if "cell_catalog_df" not in st.session_state:
+    st.session_state.cell_catalog_df = catalog_frame(load_csv_if_exists("data/selected_cells.csv", catalog_frame()))
+
 if "ext" not in st.session_state:
     st.session_state.ext = []
+# compiled engine + last result for incremental selected-cell updates (see analyze_workup)
+if "workup_state" not in st.session_state:
+    st.session_state.workup_state = None
+if "cell_delta" not in st.session_state:
+    st.session_state.cell_delta = None
 
 if "analysis_ready" not in st.session_state:
     st.session_state.analysis_ready = False
@@ -623,848 +947,134 @@ if "analysis_payload" not in st.session_state:
 # =============================================================================
 # 4) HELPERS / ENGINE
 # =============================================================================
-def normalize_grade(val) -> int:
-    s = str(val).lower().strip()
-    if s in ["0", "neg", "negative", "none", "not done", "nd", "n/d"]:
-        return 0
-    return 1
-
-def _grade_num(g: str) -> int:
-    g = _safe_str(g)
-    if g in ("", "Not Done"):
-        return -1
-    if g == "0":
-        return 0
-    if g == "+1":
-        return 1
-    if g == "+2":
-        return 2
-    if g == "+3":
-        return 3
-    if g == "+4":
-        return 4
-    if g == "Mixed-field":
-        return 2
-    if g == "Hemolysis":
-        return 5
-    return -1
-
-def _is_pos_any(g: str) -> bool:
-    return _grade_num(g) >= 1  # includes weak +1
-
-def _is_pos_strong_abo_forward(g: str) -> bool:
-    # expected >=3+ in your policy for adults/children >4 months
-    return g in ("+3", "+4", "Hemolysis")
-
-def _is_pos_ok_reverse(g: str) -> bool:
-    # expected >=2+ in adults/children >4 months
-    return g in ("+2", "+3", "+4", "Hemolysis", "Mixed-field")
-
-def is_homozygous(ph, ag: str) -> bool:
-    if ag not in DOSAGE:
-        return True
-    pair = PAIRS.get(ag)
-    if not pair:
-        return True
-    return (ph.get(ag,0)==1 and ph.get(pair,0)==0)
-
-def ph_has(ph, ag: str) -> bool:
-    try:
-        return int(ph.get(ag,0)) == 1
-    except Exception:
-        try:
-            return int(ph[ag]) == 1
-        except Exception:
-            return False
-
-def get_cells(in_p: dict, in_s: dict, extras: list):
-    cells = []
-    for i in range(1,12):
-        cells.append({
-            "label": f"Panel #{i}",
-            "react": normalize_grade(in_p[i]),
-            "ph": st.session_state.panel11_df.iloc[i-1]
-        })
-    sc_lbls = ["I","II","III"]
-    for idx,k in enumerate(sc_lbls):
-        cells.append({
-            "label": f"Screen {k}",
-            "react": normalize_grade(in_s[k]),
-            "ph": st.session_state.screen3_df.iloc[idx]
-        })
-    for ex in extras:
-        cells.append({
-            "label": f"Selected: {ex.get('id','(no-id)')}",
-            "react": int(ex.get("res",0)),
-            "ph": ex.get("ph",{})
-        })
-    return cells
-
-def rule_out(in_p: dict, in_s: dict, extras: list):
-    ruled_out = set()
-    for c in get_cells(in_p, in_s, extras):
-        if c["react"] == 0:
-            ph = c["ph"]
-            for ag in AGS:
-                if ag in IGNORED_AGS:
-                    continue
-                if ph_has(ph, ag) and is_homozygous(ph, ag):
-                    ruled_out.add(ag)
-    return ruled_out
-
-def all_reactive_pattern(in_p: dict, in_s: dict):
-    all_panel = all(normalize_grade(in_p[i])==1 for i in range(1,12))
-    all_screen = all(normalize_grade(in_s[k])==1 for k in ["I","II","III"])
-    return all_panel and all_screen
-
-def combo_valid_against_negatives(combo: tuple, cells: list):
-    for c in cells:
-        if c["react"] == 0:
-            ph = c["ph"]
-            for ag in combo:
-                if ph_has(ph, ag) and is_homozygous(ph, ag):
-                    return False
-    return True
-
-def combo_covers_all_positives(combo: tuple, cells: list):
-    for c in cells:
-        if c["react"] == 1:
-            ph = c["ph"]
-            if not any(ph_has(ph, ag) for ag in combo):
-                return False
-    return True
-
-def find_best_combo(candidates: list, cells: list, max_size: int = 3):
-    cand_sig = [c for c in candidates if c not in INSIGNIFICANT_AGS]
-    cand_cold = [c for c in candidates if c in INSIGNIFICANT_AGS]
-    ordered = cand_sig + cand_cold
-    for r in range(1, max_size+1):
-        for combo in combinations(ordered, r):
-            if not combo_valid_against_negatives(combo, cells):
-                continue
-            if not combo_covers_all_positives(combo, cells):
-                continue
-            return combo
-    return None
-
-def separability_map(combo: tuple, cells: list):
-    sep = {}
-    for ag in combo:
-        other = [x for x in combo if x != ag]
-        found_unique = False
-        for c in cells:
-            if c["react"] == 1:
-                ph = c["ph"]
-                if ph_has(ph, ag) and all(not ph_has(ph, o) for o in other):
-                    found_unique = True
-                    break
-        sep[ag] = found_unique
-    return sep
-
-def check_rule_three_only_on_discriminating(ag: str, combo: tuple, cells: list):
-    other = [x for x in combo if x != ag]
-    p = 0
-    n = 0
-    for c in cells:
-        ph = c["ph"]
-        ag_pos = ph_has(ph, ag)
-        if c["react"] == 1:
-            if ag_pos and all(not ph_has(ph, o) for o in other):
-                p += 1
-        else:
-            if not ag_pos:
-                n += 1
-    full = (p >= 3 and n >= 3)
-    mod  = (p >= 2 and n >= 3)
-    return full, mod, p, n
-
-def suggest_selected_cells(target: str, other_set: list):
-    others = [x for x in other_set if x != target]
-    out = []
-    def ok(ph):
-        if not ph_has(ph, target):
-            return False
-        for o in others:
-            if ph_has(ph, o):
-                return False
-        return True
-
-    for i in range(11):
-        ph = st.session_state.panel11_df.iloc[i]
-        if ok(ph):
-            note = "OK"
-            if target in DOSAGE:
-                note = "Homozygous preferred" if is_homozygous(ph, target) else "Heterozygous (dosage caution)"
-            out.append((f"Panel #{i+1}", note))
-
-    sc_lbls = ["I","II","III"]
-    for i in range(3):
-        ph = st.session_state.screen3_df.iloc[i]
-        if ok(ph):
-            note = "OK"
-            if target in DOSAGE:
-                note = "Homozygous preferred" if is_homozygous(ph, target) else "Heterozygous (dosage caution)"
-            out.append((f"Screen {sc_lbls[i]}", note))
-    return out
-
-def enzyme_hint_if_needed(targets_needing_help: list):
-    hits = [x for x in targets_needing_help if x in ENZYME_DESTROYED]
-    if hits:
-        return f"Enzyme option may help (destroys/weakens: {', '.join(hits)}). Use only per SOP and interpret carefully."
-    return None
-
-def discriminating_cells_for(target: str, active_not_excluded: set, cells: list):
-    others = [x for x in active_not_excluded if x != target]
-    disc = []
-    for c in cells:
-        ph = c["ph"]
-        if not ph_has(ph, target):
-            continue
-        if any(ph_has(ph, o) for o in others):
-            continue
-        disc.append(c)
-    return disc
-
-def background_auto_resolution(background_list: list, active_not_excluded: set, cells: list):
-    auto_ruled_out = {}
-    supported = {}
-    inconclusive = {}
-    no_disc = []
-
-    for ag in background_list:
-        disc = discriminating_cells_for(ag, active_not_excluded, cells)
-        if not disc:
-            no_disc.append(ag)
-            continue
-
-        pos = [c for c in disc if c["react"] == 1]
-        neg = [c for c in disc if c["react"] == 0]
-
-        if pos and neg:
-            inconclusive[ag] = [c["label"] for c in disc]
-        elif pos:
-            supported[ag] = [c["label"] for c in pos]
-        else:
-            auto_ruled_out[ag] = [c["label"] for c in neg]
-
-    return auto_ruled_out, supported, inconclusive, no_disc
-
-def patient_antigen_negative_reminder(antibodies: list, strong: bool = True) -> str:
-    if not antibodies:
-        return ""
-    uniq = []
-    for a in antibodies:
-        if a and a not in uniq:
-            uniq.append(a)
-    uniq = [a for a in uniq if a not in IGNORED_AGS]
-    if not uniq:
-        return ""
-    title = "✅ Final confirmation step (Patient antigen check)" if strong else "⚠️ Before final reporting (Patient antigen check)"
-    box_class = "clinical-danger" if strong else "clinical-alert"
-    intro = ("Confirm the patient is <b>ANTIGEN-NEGATIVE</b> for the corresponding antigen(s) to support the antibody identification."
-             if strong else
-             "Before you finalize/report, confirm the patient is <b>ANTIGEN-NEGATIVE</b> for the corresponding antigen(s).")
-    bullets = "".join([f"<li>Anti-{ag} → verify patient is <b>{ag}-negative</b> (phenotype/genotype; pre-transfusion sample preferred).</li>" for ag in uniq])
-    return f"""
-    <div class='{box_class}'>
-      <b>{title}</b><br>
-      {intro}
-      <ul style="margin-top:6px;">
-        {bullets}
-      </ul>
-    </div>
-    """
-
-def anti_g_alert_html(strong: bool = False) -> str:
-    box = "clinical-danger" if strong else "clinical-alert"
-    return f"""
-    <div class='{box}'>
-      ⚠️ <b>Consider Anti-G (D + C pattern)</b><br>
-      Anti-G may mimic <b>Anti-D + Anti-C</b>. If clinically relevant (especially pregnancy / RhIG decision), do not label as true Anti-D until Anti-G is excluded.<br>
-      <b>Suggested next steps (per SOP/reference lab):</b>
-      <ol style="margin-top:6px;">
-        <li>Assess if this impacts management (e.g., RhIG eligibility).</li>
-        <li>Perform differential workup using appropriate adsorption/elution strategy (D+ C− and D− C+ cells) if available, or refer to reference lab.</li>
-        <li>Use pre-transfusion sample when possible.</li>
-      </ol>
-    </div>
-    """
-
-# =============================================================================
-# 4.1) ABO/RhD/DAT logic + discrepancy guidance
-# =============================================================================
-def _age_is_neonate(age_y: int, age_m: int, age_d: int) -> bool:
-    # Neonate definition for this tool: < 4 months
-    total_days = max(0, int(age_y or 0))*365 + max(0, int(age_m or 0))*30 + max(0, int(age_d or 0))
-    return total_days < (4*30)
-
-def _abo_from_forward_only(a: str, b: str) -> str:
-    a_pos = _is_pos_any(a)
-    b_pos = _is_pos_any(b)
-    if a_pos and not b_pos:
-        return "A"
-    if b_pos and not a_pos:
-        return "B"
-    if a_pos and b_pos:
-        return "AB"
-    if (not a_pos) and (not b_pos):
-        return "O"
-    return "Unknown"
-
-def _abo_mapping_consistent(forward_abo: str, rev_a1: str, rev_b: str) -> bool:
-    """
-    Checks if reverse matches the expected pattern for the ABO.
-    Uses 'any positive' in reverse to evaluate.
-    """
-    a1_pos = _is_pos_any(rev_a1)
-    b_pos  = _is_pos_any(rev_b)
-    if forward_abo == "A":
-        return (not a1_pos) and b_pos
-    if forward_abo == "B":
-        return a1_pos and (not b_pos)
-    if forward_abo == "AB":
-        return (not a1_pos) and (not b_pos)
-    if forward_abo == "O":
-        return a1_pos and b_pos
-    return False
-
-def interpret_abo_rhd(
-    is_neonate: bool,
-    purpose: str,
-    raw: Dict[str, str],
-    screen_any_positive: bool
-) -> Dict[str, Any]:
-    """
-    raw keys:
-      Adult: antiA, antiB, antiD, ctl, a1cells, bcells
-      Neonate: antiA, antiB, antiAB, antiD, ctl, dat
-    Returns:
-      {abo_final, rhd_final, discrepancy(bool), invalid(bool), notes(list[str])}
-    """
-    notes = []
-    discrepancy = False
-    invalid = False
-
-    ctl = _safe_str(raw.get("ctl","Not Done"))
-    if ctl in ("+1","+2","+3","+4","Mixed-field","Hemolysis"):
-        invalid = True
-        discrepancy = True
-        notes.append("Control is POSITIVE → test is INVALID. Repeat ABO/Rh typing with proper technique.")
-
-    # RhD
-    antiD = _safe_str(raw.get("antiD","Not Done"))
-    if antiD in ("Not Done", ""):
-        rhd_final = "Unknown"
-    elif antiD == "0":
-        rhd_final = "RhD Negative"
-    elif antiD == "+4":
-        rhd_final = "RhD Positive"
-    else:
-        rhd_final = "RhD Inconclusive / Weak D suspected"
-        discrepancy = True
-        notes.append("Anti-D is weaker than expected or shows mixed-field/hemolysis → treat as RhD NEGATIVE for transfusion and RhIG eligibility per policy; consider molecular testing if available.")
-
-    # ABO
-    if is_neonate:
-        antiA = _safe_str(raw.get("antiA","Not Done"))
-        antiB = _safe_str(raw.get("antiB","Not Done"))
-        abo_guess = _abo_from_forward_only(antiA, antiB)
-
-        # Flag mixed-field forward as discrepancy but still provide most probable ABO
-        if antiA == "Mixed-field" or antiB == "Mixed-field":
-            discrepancy = True
-            notes.append("Mixed-field forward reactions detected. Correlate with clinical history (e.g., transfusion, sample issues) and repeat testing per policy.")
-
-        # Flag weak forward as discrepancy but still provide most probable ABO
-        if antiA in ("+1","+2") or antiB in ("+1","+2"):
-            discrepancy = True
-            notes.append("Weak/mixed-field A/B reactions can occur in neonates; report as 'most probable' and plan confirmation at 6 months (or per local policy).")
-        if antiA == "Not Done" or antiB == "Not Done":
-            discrepancy = True
-            notes.append("Forward ABO not fully performed (Not Done). Complete testing if required.")
-        abo_final = f"Most probable: {abo_guess}" if abo_guess != "Unknown" else "Most probable: Unknown"
-
-        # DAT note (neonate)
-        dat = _safe_str(raw.get("dat","Not Done"))
-        if dat in ("+1","+2","+3","+4","Mixed-field","Hemolysis"):
-            notes.append("DAT is POSITIVE. In neonates, consider maternal IgG coating; interpret ABO cautiously and ensure proper specimen handling.")
-        if dat in ("Not Done",""):
-            # allowed
-            pass
-
-        if purpose == "RhIG":
-            notes.append("Purpose: RhIG eligibility (DVI+ card per your policy).")
-        else:
-            notes.append("Purpose: Transfusion (DVI− card per your policy).")
-
-    else:
-        antiA = _safe_str(raw.get("antiA","Not Done"))
-        antiB = _safe_str(raw.get("antiB","Not Done"))
-        rev_a1 = _safe_str(raw.get("a1cells","Not Done"))
-        rev_b  = _safe_str(raw.get("bcells","Not Done"))
-
-        # Determine forward ABO (any positive)
-        fwd_abo = _abo_from_forward_only(antiA, antiB)
-
-        # Discrepancy thresholds
-        # Forward expected >=3+ (policy). If positive but <3+, flag.
-        if antiA in ("+1","+2") or antiB in ("+1","+2"):
-            discrepancy = True
-            notes.append("Forward grouping shows weak/mixed-field reactions (<3+). Initiate ABO discrepancy workup per policy.")
-        # Reverse expected >=2+ if positive. If 0/+1 where expected pos, flag.
-        # We first compute expected pattern, then check if reverse is weak.
-        if fwd_abo in ("A","B","O") or fwd_abo == "AB":
-            # If reverse results are not done, discrepancy
-            if rev_a1 in ("Not Done","") or rev_b in ("Not Done",""):
-                discrepancy = True
-                notes.append("Reverse grouping not fully performed. For patients >4 months, reverse grouping is required per policy.")
-            else:
-                # If pattern mismatch
-                if not _abo_mapping_consistent(fwd_abo, rev_a1, rev_b):
-                    discrepancy = True
-                    notes.append("Forward and reverse grouping are inconsistent → ABO DISCREPANCY.")
-                else:
-                    # Even if consistent, ensure reverse strength meets expectation (>=2+ when positive expected)
-                    # Determine which reverse should be positive
-                    a1_should_pos = (fwd_abo in ("B","O"))
-                    b_should_pos  = (fwd_abo in ("A","O"))
-                    if a1_should_pos and (rev_a1 in ("0","+1")):
-                        discrepancy = True
-                        notes.append("Reverse grouping is weaker than expected (<2+). Consider hypogammaglobulinemia, age-related low isoagglutinins, recent transfusion, or plasma abnormalities; follow policy.")
-                    if b_should_pos and (rev_b in ("0","+1")):
-                        discrepancy = True
-                        notes.append("Reverse grouping is weaker than expected (<2+). Consider hypogammaglobulinemia, age-related low isoagglutinins, recent transfusion, or plasma abnormalities; follow policy.")
-
-        # Link to antibody screen if reverse extra reactions and screen is positive
-        if discrepancy and screen_any_positive:
-            notes.append("Antibody screen is POSITIVE. If reverse grouping shows unexpected reactivity, consider alloantibody/cold interference; review antibody ID history and use appropriate antigen-negative reagent cells per SOP.")
-
-        # Mixed-field -> transfusion / transplant
-        if antiA == "Mixed-field" or antiB == "Mixed-field" or rev_a1 == "Mixed-field" or rev_b == "Mixed-field":
-            discrepancy = True
-            notes.append("Mixed-field pattern: consider recent transfusion, stem cell transplant/chimerism, or sample issue. For transfused patients, confirm ABO ≥3 months after last transfusion (or per policy).")
-
-        abo_final = fwd_abo if fwd_abo else "Unknown"
-        if discrepancy and not invalid:
-            # still show best estimate to help paperwork, but label discrepancy
-            abo_final = f"{abo_final} (Discrepancy)"
-
-    # Rouleaux/cold auto suspicion in ABO: everything positive including control
-    if not is_neonate:
-        all_pos_keys = ["antiA","antiB","antiD","ctl","a1cells","bcells"]
-    else:
-        all_pos_keys = ["antiA","antiB","antiAB","antiD","ctl"]
-    all_pos = True
-    for k in all_pos_keys:
-        if not _is_pos_any(_safe_str(raw.get(k,"0"))):
-            all_pos = False
-            break
-    if all_pos and _is_pos_any(ctl):
-        discrepancy = True
-        notes.append("All wells including control are reactive → consider rouleaux or cold autoantibody interference. Repeat with saline replacement / prewarm as appropriate per SOP.")
-
-    return {
-        "abo_final": abo_final,
-        "rhd_final": rhd_final,
-        "discrepancy": bool(discrepancy),
-        "invalid": bool(invalid),
-        "notes": notes
-    }
-
-# =============================================================================
-# 4.2) Phenotype helpers + conflict alert
-# =============================================================================
-
-# =============================================================================
-# 4.2) ABO discrepancy engine (general + specific guidance)
-# =============================================================================
-def _grade_rank(g: str) -> int:
-    g = _safe_str(g)
-    if g in ("Not Done","",None):
-        return -1
-    if g == "0":
-        return 0
-    if g == "Hemolysis":
-        return 99
-    if g == "Mixed-field":
-        return 50
-    m = re.match(r"\+(\d)", g)
-    if m:
-        return int(m.group(1))
-    return -1
-
-def _is_expected_pos_weak(g: str) -> bool:
-    # Reverse expected positives should be ≥2+
-    return _safe_str(g) in ("0","+1","Not Done","")
-
-def _all_entered(grades: list) -> bool:
-    return all(_safe_str(x) not in ("Not Done","",None) for x in grades)
-
-def build_abo_guidance(
-    is_neonate: bool,
-    purpose: str,
-    raw: Dict[str, str],
-    screen_grades: Dict[str, str],
-    dat_inputs: Dict[str, str]
-) -> Dict[str, Any]:
-    """
-    Returns:
-      {
-        general: [..],
-        specific: [{title, bullets}]
-      }
-    All guidance text is English.
-    """
-    general = [
-        "Clerical check: confirm patient identity, specimen labels/barcodes, request details, and historical ABO/RhD (if available).",
-        "Technical check: verify reagent/lot/expiry/storage, QC/control results, specimen quality, and repeat testing (or recollect) as needed.",
-        "Clinical history: review recent transfusion, hematopoietic stem cell/BM transplant, neonatal/cord sample details, and relevant diagnoses."
-    ]
-    specific = []
-
-    def add(title: str, bullets: list):
-        bullets = [b for b in bullets if _safe_str(b)]
-        if bullets:
-            specific.append({"title": title, "bullets": bullets})
-
-    # Screen status
-    sc_I   = _safe_str(screen_grades.get("I","Not Done"))
-    sc_II  = _safe_str(screen_grades.get("II","Not Done"))
-    sc_III = _safe_str(screen_grades.get("III","Not Done"))
-    sc_list = [sc_I, sc_II, sc_III]
-    screen_complete = _all_entered(sc_list)
-    screen_any_pos  = any(_is_pos_any(g) for g in sc_list if _safe_str(g) not in ("Not Done",""))
-    screen_all_pos  = screen_complete and all(_is_pos_any(g) for g in sc_list)
-
-    # Determine forward ABO guess
-    antiA = _safe_str(raw.get("antiA","Not Done"))
-    antiB = _safe_str(raw.get("antiB","Not Done"))
-    fwd_abo = _abo_from_forward_only(antiA, antiB)
-
-    # Grab reverse (adult)
-    rev_a1 = _safe_str(raw.get("a1cells","Not Done"))
-    rev_b  = _safe_str(raw.get("bcells","Not Done"))
-    ctl    = _safe_str(raw.get("ctl","Not Done"))
-
-    # 0) Control / spontaneous agglutination / combined discrepancies
-    # If the group/control is positive, the entire ABO interpretation is INVALID until resolved.
-    # In this situation, do not show other discrepancy branches (weak antigens/weak antibodies/etc.),
-    # because they assume a valid test environment.
-    if _is_pos_any(ctl):
-        add(
-            "Control is POSITIVE / panagglutination suspected (ABO test is INVALID)",
-            [
-                "Do NOT interpret ABO until the cause is resolved (repeat testing is required).",
-                "Common causes: cold autoantibody (often anti-I/anti-IH), rouleaux/high-protein interference, or spontaneous agglutination from specimen issues.",
-                "Immediate actions: repeat ABO on a freshly prepared sample (or recollect if indicated) and review QC/reagent integrity.",
-                "Forward (cell-side) resolution: wash patient RBCs multiple times with 37°C warm saline and repeat forward typing at 37°C (prewarmed reagents if available).",
-                "Reverse (serum-side) resolution for cold antibody: prewarm technique (warm plasma/serum and reagent cells separately to 37°C before mixing; keep at 37°C during reading).",
-                "Reverse (serum-side) resolution for rouleaux/high protein: use saline replacement technique (remove patient plasma after spin and replace with saline, then read again).",
-                "If still unresolved: perform/confirm auto-control and DAT; consider cold screen, adsorption (auto- or alloadsorption) or reference lab workup per SOP."
-            ]
-        )
-        return {"general": general, "specific": specific}
-
-    # 1) Forward weak/missing antigens
-    if antiA in ("+1","+2") or antiB in ("+1","+2"):
-        bullets = [
-            "Incubate at room temperature (RT) for 15–30 minutes, then repeat forward grouping.",
-            "If still weak, consider enzyme-treated cells (if available) per SOP.",
-            "If needed, perform adsorption/elution or refer to a reference lab per SOP."
-        ]
-        add("Weak/Missing Antigens (Forward grouping is weak)", bullets)
-
-    # 2) Mixed-field emphasis (history-driven)
-    if "Mixed-field" in (antiA, antiB, rev_a1, rev_b):
-        add(
-            "Mixed-field pattern detected — correlate with history",
-            [
-                "Most common: recent Group O RBC transfusion to a non-O patient (A/B/AB).",
-                "Early after hematopoietic stem cell / bone marrow transplant (e.g., O donor → A recipient).",
-                "A3 subgroup.",
-                "Chimerism (twin / dispermic).",
-                "Document the suspected cause in the technologist comment and confirm manually once history is verified."
-            ]
-        )
+def workup_panels() -> List[Dict[str, Any]]:
+    """ID panel + screen + any additional panels, in evaluation (cell) order."""
+    panels = standard_panels(st.session_state.panel11_df, st.session_state.screen3_df,
+                             st.session_state.lot_p, st.session_state.lot_s)
+    for xp in st.session_state.extra_panels:
+        panels.append(panel_spec(xp["key"], xp["name"], xp["df"], xp.get("lot", "")))
+    return panels
 
-    # 3) Reverse weak/missing antibodies (adult/child)
-    if not is_neonate and fwd_abo in ("A","B","O") and _safe_str(rev_a1) not in ("Not Done","") and _safe_str(rev_b) not in ("Not Done",""):
-        a1_should_pos = (fwd_abo in ("B","O"))
-        b_should_pos  = (fwd_abo in ("A","O"))
-        weak_hit = (a1_should_pos and _safe_str(rev_a1) in ("0","+1")) or (b_should_pos and _safe_str(rev_b) in ("0","+1"))
-        if weak_hit:
-            need_cells = []
-            if a1_should_pos and _safe_str(rev_a1) in ("0","+1"):
-                need_cells.append("A1 cells")
-            if b_should_pos and _safe_str(rev_b) in ("0","+1"):
-                need_cells.append("B cells")
-            add(
-                "Weak/Missing Antibodies (Reverse grouping is weak/negative)",
-                [
-                    f"Forward suggests Group {fwd_abo}; reverse reactivity is weak/absent in expected cell(s): {', '.join(need_cells)}.",
-                    "1) Incubate at RT for 15 minutes, then repeat reverse grouping.",
-                    "2) If still negative/weak: use double-dose plasma, then repeat reverse grouping.",
-                    "3) If still negative/weak: incubate at 4°C for 15 minutes and repeat reverse grouping. ⚠️ Must run Auto-Control."
-                ]
-            )
+def _reactions(in_p: dict, in_s: dict, in_x: Optional[dict] = None) -> Dict[str, dict]:
+    return {"panel": in_p, "screen": in_s, **(in_x or {})}
 
-    # 3b) Less likely: weak/missing antigen in forward (apparent Group O)
-    if not is_neonate and fwd_abo == "O":
-        suspected = None
-        weak_antigen = None
-        # If reverse suggests a non-O group (one expected antibody present, the other absent),
-        # consider a weak/missing A or B antigen causing a falsely O forward type.
-        if _is_pos_any(rev_a1) and not _is_pos_any(rev_b):
-            suspected = "Group B (Anti-A present; B cells NEG)"
-            weak_antigen = "weak/missing B antigen in forward (Anti-B may be weak/negative)"
-        elif _is_pos_any(rev_b) and not _is_pos_any(rev_a1):
-            suspected = "Group A (Anti-B present; A1 cells NEG)"
-            weak_antigen = "weak/missing A antigen in forward (Anti-A may be weak/negative)"
-        if suspected:
-            add(
-                "Less likely — Weak/Missing Antigens (Forward typing may be falsely O)",
-                [
-                    f"Reverse pattern suggests {suspected}; consider {weak_antigen}.",
-                    "Repeat forward typing on washed patient cells (and a fresh specimen if available); verify reagents/QC and repeat testing.",
-                    "Use an alternative anti-A/anti-B clone and/or anti-A,B; extend incubation per manufacturer; review history (recent transfusion/HSCT, hematologic malignancy, suspected subgroup).",
-                    "If still unresolved: proceed with subgroup workup per your policy and consult transfusion medicine.",
-                ]
-            )
-
-
-    # 4) Unexpected reverse reaction with A1 cells (Forward A or AB)
-    if not is_neonate and fwd_abo in ("A","AB") and _is_pos_any(rev_a1):
-        if not screen_complete:
-            add(
-                "Unexpected reverse reaction (A1 cells POSITIVE) — antibody screen needed",
-                [
-                    "Repeat reverse grouping to exclude technical/clerical error.",
-                    "Run Auto-Control with reverse grouping.",
-                    "Perform antibody screen and enter the result to refine the interpretation."
-                ]
-            )
-        elif screen_any_pos:
-            # Priority: address reverse interference when the antibody screen is positive.
-            add(
-                "Extra (Unexpected) — Screen POSITIVE (priority)",
-                [
-                    "Antibody screen is POSITIVE — an antibody may be responsible for the unexpected reverse reaction (e.g., cold-reactive allo/autoantibody) and/or rouleaux.",
-                    "1) Rouleaux: perform saline replacement (reverse grouping).",
-                    "2) Cold antibody (e.g., M, P1): perform pre-warming technique (37°C).",
-                    "Proceed with antibody investigation/identification as indicated, then re-interpret ABO after interference is addressed.",
-                ],
-            )
-            # Still consider Anti-A1 when the pattern fits (may coexist with other antibodies).
-            add(
-                "Also consider: Anti-A1 in an A subgroup (pattern-based)",
-                [
-                    "Because A1 cells are reactive with an A (or AB) forward type, Anti-A1 in an A2/A2B subgroup remains a possible contributor (may coexist with other antibodies).",
-                    "👉 Test patient red cells with Anti-A1 lectin (Dolichos biflorus).",
-                    "👉 Test patient serum with A2 reagent cells.",
-                ],
-            )
+def get_cells(in_p: dict, in_s: dict, extras: list, in_x: Optional[dict] = None):
+    return build_panel_cells(workup_panels(), _reactions(in_p, in_s, in_x), extras)
 
-        else:
-            add(
-                "Extra (Unexpected) — Screen NEGATIVE",
-                [
-                    "Suspect Anti-A1 in an A2 subgroup (or A2B if AB forward).",
-                    "Test patient RBCs with Anti-A1 lectin (Dolichos biflorus).",
-                    "Test patient serum with A2 cells."
-                ]
-            )
+def rule_out(in_p: dict, in_s: dict, extras: list, in_x: Optional[dict] = None):
+    return rule_out_cells(get_cells(in_p, in_s, extras, in_x))
 
-    # 5) Bombay (Oh) suspicion
-    if not is_neonate and fwd_abo == "O" and screen_all_pos:
-        add(
-            "All screening cells POSITIVE with Forward Group O — suspect Bombay (Oh)",
-            [
-                "Pan-reactivity on group O reagent cells suggests anti-H.",
-                "Test patient RBCs with Anti-H lectin.",
-                "Negative reaction with Anti-H lectin supports Bombay (Oh)."
-            ]
-        )
+@st.cache_data(show_spinner=False, max_entries=16)
+def _compiled_antigram(df: pd.DataFrame):
+    # antigram bitmasks change only when the supervisor edits the grid
+    return compile_antigram(df)
 
-    # 6) Extra unexpected antigens: Acquired B
-    if not is_neonate:
-        # Pattern: forward looks AB but reverse looks A (strong anti-B present)
-        if _is_pos_any(antiA) and _is_pos_any(antiB) and (not _is_pos_any(rev_a1)) and (_grade_rank(rev_b) >= 2):
-            add(
-                "Extra Unexpected Antigen — Acquired B phenotype (suspected)",
-                [
-                    "Clinical context: typically Group A patient with lower GI disease (e.g., colon cancer/bowel obstruction) or Gram-negative sepsis (e.g., E. coli).",
-                    "Pattern: forward appears AB, while reverse appears A (strong anti-B in serum).",
-                    "Investigations:",
-                    "• Reagent verification: check Anti-B product insert; some monoclonal clones react with Acquired B. Retest using a different Anti-B clone if available.",
-                    "• Auto-control: test patient serum against autologous RBCs.",
-                    "• Acidified Anti-B test: test patient RBCs using human Anti-B serum acidified to pH 6.0 (if available).",
-                    "Interpretation:",
-                    "• If the Anti-B reaction disappears with a different monoclonal clone → consistent with Acquired B (patient is Group A).",
-                    "• Auto-control is typically NEGATIVE in Acquired B.",
-                    "• Acidified Anti-B: true B reacts strongly at pH 6.0; Acquired B does NOT react at pH 6.0."
-                ]
-            )
+def get_compiled_cells(in_p: dict, in_s: dict, extras: list, in_x: Optional[dict] = None) -> CompiledCells:
+    panels = workup_panels()
+    cells = build_panel_cells(panels, _reactions(in_p, in_s, in_x), extras)
+    return CompiledCells(cells, compile_panels(panels, extras, _compiled_antigram))
 
-        # B(A) / A(B) phenotype (trace antigen with highly sensitive monoclonals)
-        if fwd_abo in ("A","B"):
-            # A(B): A forward with weak anti-B; B(A): B forward with weak anti-A
-            weak_extra = False
-            if fwd_abo == "A" and _safe_str(antiB) in ("+1","+2"):
-                weak_extra = True
-            if fwd_abo == "B" and _safe_str(antiA) in ("+1","+2"):
-                weak_extra = True
-            if weak_extra:
-                add(
-                    "Extra Unexpected Antigen — B(A) or A(B) phenotype (consider)",
-                    [
-                        "An autosomal dominant phenotype with trace antigen expression detected by highly sensitive monoclonal reagents (e.g., certain clones).",
-                        "Resolution: retest using a different manufacturer’s reagent or polyclonal antisera (if available)."
-                    ]
-                )
+def all_reactive_pattern(in_p: dict, in_s: dict, in_x: Optional[dict] = None):
+    return all_reactive(workup_panels(), _reactions(in_p, in_s, in_x))
 
-    # 7) Wharton’s jelly (cord blood)
-    cord_flag = bool(raw.get("cord_sample", False))
-    if is_neonate and cord_flag:
-        add(
-            "Neonate cord sample — Wharton’s jelly contamination (consider)",
-            [
-                "Cord blood contaminated with hyaluronic acid-rich Wharton’s jelly may cause spontaneous agglutination.",
-                "Resolution: wash cord RBCs 4–6 times with warm saline, then repeat forward grouping."
-            ]
-        )
+def suggest_selected_cells(target: str, other_set: list):
+    return _suggest_selected_cells(target, other_set, workup_panels())
 
-    # 8) Strong DAT C3 (cold agglutinin supporting)
-    dat_c3 = _safe_str(dat_inputs.get("c3d","Not Done"))
-    if dat_c3 in ("+3","+4"):
-        add(
-            "DAT (C3) strongly POSITIVE — cold agglutinin interference (supporting)",
-            [
-                "Resolution: wash RBCs several times with warm saline and retest washed cells at 37°C."
-            ]
-        )
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _cell_catalog(df: pd.DataFrame) -> CellCatalog:
+    # inverted index rebuilt only when the catalog content changes
+    return CellCatalog(df)
 
-    return {"general": general, "specific": specific}
-
-
-
-def build_how_to_report(
-    is_neonate: bool,
-    abo_interp: Dict[str, Any],
-    raw: Dict[str, str],
-    screen_any_positive: bool,
-    mixed_field_history: Dict[str, bool] | None = None
-) -> str:
-    """Return an English copy/paste comment for the HIS/EMR based on the current pattern."""
-    lines: list[str] = []
-    mixed_field_history = mixed_field_history or {}
-    recent_tx = bool(mixed_field_history.get("recent_tx"))
-    hsct_bm = bool(mixed_field_history.get("hsct_bm"))
-
-    # RhD inconclusive / weak D suspected
-    rhd_final = _safe_str(abo_interp.get("rhd_final",""))
-    if rhd_final.startswith("RhD Inconclusive"):
-        lines.append("RhD typing is INCONCLUSIVE / weak D suspected.")
-        lines.append("Interpretation note: a partial D phenotype cannot be excluded. Definitive classification requires RHD genotyping, which is not available at our facility.")
-        lines.append("Transfusion safety: manage as RhD NEGATIVE (issue D− RBCs) until confirmed.")
-        lines.append("RhIG note: when RhIG eligibility is clinically relevant (pregnancy, postpartum, newborn), manage as RhD NEGATIVE per local policy unless confirmatory testing is available.")
-        lines.append("")
-
-    # Weak forward antigens (any age): provide a reporting comment. In neonates, include an
-    # administrative "most probable" statement with strict transfusion safety guidance.
-    antiA_wf = _safe_str(raw.get("antiA","Not Done"))
-    antiB_wf = _safe_str(raw.get("antiB","Not Done"))
-    antiAB_wf = _safe_str(raw.get("antiAB","Not Done"))
-    weak_forward = (antiA_wf in ("+1","+2")) or (antiB_wf in ("+1","+2")) or (antiAB_wf in ("+1","+2"))
-
-    if weak_forward:
-        abo_guess = _safe_str(abo_interp.get("abo_final",""))
-        # Normalize strings like: "Most probable: A", "ABO: A", "A (Discrepancy)"
-        abo_guess_clean = re.sub(r"\(.*?\)", "", abo_guess).strip()
-        abo_guess_clean = re.sub(r"^(ABO\s*:\s*)", "", abo_guess_clean, flags=re.IGNORECASE).strip()
-        abo_guess_clean = re.sub(r"^(Most\s+probable\s*:\s*)", "", abo_guess_clean, flags=re.IGNORECASE).strip()
-        abo_guess_clean = abo_guess_clean or "Unknown"
-
-        if is_neonate:
-            lines.append("Forward grouping shows a WEAK reaction in a neonate (≤3–4 months) / cord sample pattern.")
-            lines.append(f"ABO group: MOST PROBABLE {abo_guess_clean} based on current testing (administrative only).")
-            lines.append("Action: repeat testing / recollect if indicated and CONFIRM ABO at ≥6 months of age (or per local policy).")
-            lines.append("Transfusion until confirmed: issue Group O RBCs and AB plasma/platelets (or per local policy).")
-            lines.append("")
-        else:
-            lines.append(
-                f"ABO grouping is inconclusive due to weak forward antigen reactions. Forward typing suggests {abo_guess_clean}, "
-                "however the ABO group cannot be confirmed at this stage. Repeat testing and resolve per SOP. "
-                "Until confirmed, manage as ABO unknown for transfusion purposes (issue Group O RBCs and Group AB plasma/platelets per policy)."
-            )
+def cell_catalog() -> CellCatalog:
+    return _cell_catalog(st.session_state.cell_catalog_df)
 
-    # Mixed-field reporting (adult/child or neonate)
-    antiA = _safe_str(raw.get("antiA","Not Done"))
-    antiB = _safe_str(raw.get("antiB","Not Done"))
-    rev_a1 = _safe_str(raw.get("a1cells","Not Done"))
-    rev_b  = _safe_str(raw.get("bcells","Not Done"))
-    mixed_field_present = "Mixed-field" in (antiA, antiB, _safe_str(raw.get("antiAB","")), rev_a1, rev_b, _safe_str(raw.get("ctl","")))
-
-    if mixed_field_present:
-        if recent_tx:
-            lines.append(
-                "Mixed-field pattern detected on ABO grouping. This is most consistent with recent transfusion, "
-                "particularly Group O RBC transfusion to a non-O patient, resulting in mixed red cell populations. "
-                "Correlate with transfusion history and prior documented blood group. Do not finalize ABO as confirmed based on the current specimen alone; "
-                "repeat grouping on a new specimen as clinically appropriate and follow facility policy for interim transfusion management."
-            )
-        elif hsct_bm:
-            lines.append(
-                "Mixed-field pattern detected on ABO grouping. In the context of hematopoietic stem cell / bone marrow transplantation, "
-                "this may represent post-transplant chimerism (donor/recipient mixed populations). "
-                "Correlate with transplant timeline and historical ABO records (pre- and post-transplant). "
-                "Do not finalize ABO as confirmed based on this specimen alone; manage per transplant transfusion policy and specialist guidance."
-            )
-        else:
-            lines.append(
-                "Mixed-field pattern detected on ABO grouping. Correlate with clinical history (recent transfusion, hematopoietic stem cell/BM transplant, "
-                "A3 subgroup, or chimerism) and prior records. Do not finalize ABO as confirmed based on this specimen alone; repeat testing per policy."
-            )
+@st.cache_resource(show_spinner=False)
+def _analysis_cache() -> ResultCache:
+    # one per process: every session / technician shares it
+    return ResultCache(ANALYSIS_CACHE_ENTRIES)
 
-    # Reverse weak/missing antibodies (adult/child)
-    if (not is_neonate) and "ABO DISCREPANCY" in " ".join([_safe_str(x) for x in abo_interp.get("notes", [])]):
-        # Only add if not already covered by mixed-field / RhD comment
-        if any("Reverse grouping is weaker" in _safe_str(n) for n in abo_interp.get("notes", [])):
-            lines.append(
-                "ABO discrepancy (reverse grouping): weak/missing expected antibodies. Forward grouping suggests the listed ABO type, "
-                "however reverse reactions are weaker than expected/absent and the ABO group cannot be confirmed at this stage. "
-                "Perform discrepancy resolution per protocol and do not finalize ABO as confirmed until resolved."
-            )
+def _ext_step(prev: Optional[dict], base: Hashable, extras: list) -> Optional[Tuple[str, int]]:
+    """How extras differ from the previous run on the same inputs: ("same"|"add"|"remove", index) or None."""
+    if not prev or prev["base"] != base:
+        return None
+    old = prev["ext"]
+    if extras == old:
+        return ("same", -1)
+    if len(extras) == len(old) + 1 and extras[:-1] == old:
+        return ("add", len(old))
+    if len(extras) == len(old) - 1:
+        for j in range(len(old)):
+            if old[:j] + old[j+1:] == extras:
+                return ("remove", j)
+    return None
 
-    # Unexpected reverse with A1 cells + screen linkage
-    if (not is_neonate) and any("Anti-A1" in _safe_str(n) or "unexpected reverse" in _safe_str(n).lower() for n in abo_interp.get("notes", [])):
-        if screen_any_positive:
-            lines.append(
-                "Unexpected reverse reaction noted (A1 cells reactive). Antibody screen is POSITIVE, which may account for the unexpected reverse reactivity "
-                "(e.g., cold-reactive allo/autoantibody and/or rouleaux). Proceed with interference resolution per SOP (e.g., saline replacement and/or pre-warming technique), "
-                "and proceed with antibody investigation/identification as indicated. Because the pattern includes A1-cell reactivity, Anti-A1 in an A subgroup (A2/A2B) "
-                "should still be considered as a possible contributor; confirm with Anti-A1 lectin and serum testing with A2 cells per SOP. Interpret/finalize ABO only after resolution/confirmation."
-            )
+def analyze_workup(in_p: dict, in_s: dict, extras: list, in_x: Optional[dict], ac_res: str, recent_tx: bool) -> Dict[str, Any]:
+    """Whole specificity analysis (+ catalog matches and selected-cell test plan), memoized by antigram /
+    usable catalog content, reactions, AC / tx and selected cells.
+
+    A result whose minimal-explanation search ran out of EXPLAIN_TIME_BUDGET_SEC depends on
+    server load, not only on the key: it is not shared, only reused by this session while its
+    inputs stay the same.
+
+    The compiled engine and last result stay in st.session_state.workup_state: adding or
+    removing one selected cell derives the engine in O(antigens) (with_cell / without_cell)
+    and, for an added cell, reuses the previous best combo when it still holds.
+    st.session_state.cell_delta records what that cell changed."""
+    panels = workup_panels()
+    cat = cell_catalog()
+    usable = cat.valid_on(date.today())
+    # frame digests are computed once per frame object (antigrams / catalog are replaced on edit)
+    base = analysis_key(
+        [p["df"] for p in panels] + [cat.df], usable=usable,
+        labels=[p["labels"] for p in panels], reactions=_reactions(in_p, in_s, in_x),
+        ac=ac_res, recent_tx=bool(recent_tx), explain=[EXPLAIN_MAX_SIZE, EXPLAIN_TIME_BUDGET_SEC],
+    )
+    key = analysis_key([], base=base, ext=extras)
+
+    prev = st.session_state.get("workup_state")
+    step = _ext_step(prev, base, extras)
+    eng = None
+    if step and prev["eng"] is not None:
+        kind, j = step
+        if kind == "add":
+            eng = prev["eng"].with_cell(selected_cell(extras[j]))
+        elif kind == "remove":
+            eng = prev["eng"].without_cell(prev["eng"].n - len(prev["ext"]) + j)
         else:
-            lines.append(
-                "Unexpected reverse reaction noted (A1 cells reactive) with NEGATIVE antibody screen. This pattern may suggest Anti-A1 in an A subgroup (e.g., A2/A2B). "
-                "Recommend confirmatory testing (Anti-A1 lectin and serum testing with A2 cells) per SOP."
-            )
-
-    return "\n\n".join([l for l in lines if l]).strip()
-def _phenotype_get_antigen_state(ph: Dict[str, str], ag: str) -> str:
-    return _safe_str(ph.get(ag, "Not Done"))
-
-def _phenotype_is_detected(ph: Dict[str, str], ag: str) -> bool:
-    return _phenotype_get_antigen_state(ph, ag) == "Detected"
-
-def phenotype_conflict_notes(suspected_antibodies: List[str], phenotype: Dict[str, str]) -> List[str]:
-    notes = []
-    for ag in suspected_antibodies:
-        if ag in IGNORED_AGS:
-            continue
-        if _phenotype_is_detected(phenotype, ag):
-            notes.append(f"Conflict: Anti-{ag} suggested/confirmed but patient phenotype shows {ag} = Detected. Verify phenotype was done on PRE-transfusion sample and review antibody identification.")
-    return notes
+            eng = prev["eng"]
+
+    def compute() -> Dict[str, Any]:
+        nonlocal eng
+        if eng is None:
+            eng = get_compiled_cells(in_p, in_s, extras, in_x)
+        hint = prev["res"] if step and step[0] == "add" else None
+        res = analyze_specificity(eng, panels, EXPLAIN_MAX_SIZE, EXPLAIN_TIME_BUDGET_SEC, prior=hint)
+        catalog, plan, ranking, stats = {}, None, None, {}
+        if res["best"]:
+            ranking = rank_explanations(eng, res)
+            stats = confirmation_stats(eng, res)
+            active = set(res["resolved"] + res["needs_work"] + res["other_sig_final"] + list(res["supported_bg"].keys()))
+            catalog = {a: cat.matching_for(a, active)[:12] for a in res["targets_needing_selected"]}
+            inv_df = cat.frame_for(usable)
+            if len(inv_df):
+                plan = plan_for_analysis(eng, res, _compiled_antigram(inv_df), cat.labels_for(usable))
+        return {**res, "catalog": catalog, "plan": plan, "ranking": ranking, "confirmation_stats": stats}
+
+    cache = _analysis_cache()
+    res = prev["res"] if step and step[0] == "same" else cache.get(key)
+    if res is None:
+        res = compute()
+        if not res["best"] or res["explanations"]["complete"]:
+            cache.put(key, res)
+    if step is None:
+        st.session_state.cell_delta = None
+    elif step[0] != "same":
+        cell = extras[step[1]] if step[0] == "add" else prev["ext"][step[1]]
+        st.session_state.cell_delta = {"action": "Added" if step[0] == "add" else "Removed",
+                                       "cell": cell.get("id") or "(no-id)", "res": cell.get("res", 0),
+                                       "changes": specificity_changes(prev["res"], res)}
+    st.session_state.workup_state = {"base": base, "ext": list(extras), "eng": eng, "res": res}
+    return res
 
 # =============================================================================
 # 4.3) HISTORY REPORT (Professional view)
@@ -1479,85 +1089,21 @@ def _fmt_antibody_list(lst):
     return ", ".join([f"Anti-{a}" for a in lst])
 
 def render_history_report(payload: dict):
-    patient = payload.get("patient", {}) or {}
-    lots = payload.get("lots", {}) or {}
     inputs = payload.get("inputs", {}) or {}
-    dat = payload.get("dat", {}) or {}
     interp = payload.get("interpretation", {}) or {}
     selected = payload.get("selected_cells", []) or []
-
-    demo = payload.get("demographics", {}) or {}
     abo = payload.get("abo", {}) or {}
     pheno = payload.get("phenotype", {}) or {}
+    html = history_report_html(payload)  # HTML blocks, memoized per saved case (MRN + saved_at)
 
-    name = _safe_str(patient.get("name",""))
-    mrn  = _safe_str(patient.get("mrn",""))
-    tech = _safe_str(payload.get("tech",""))
-    run_dt = _safe_str(payload.get("run_dt",""))
-    saved_at = _safe_str(payload.get("saved_at",""))
-
-    sex = _safe_str(demo.get("sex",""))
-    age_y = _safe_str(demo.get("age_y",""))
-    age_m = _safe_str(demo.get("age_m",""))
-    age_d = _safe_str(demo.get("age_d",""))
-
-    ac = _safe_str(inputs.get("AC",""))
-    recent_tx = bool(inputs.get("recent_tx", False))
-    all_rx = bool(payload.get("all_rx", False))
-
-    lot_p = _safe_str(lots.get("panel",""))
-    lot_s = _safe_str(lots.get("screen",""))
-
-    abo_final = _safe_str(abo.get("abo_final",""))
-    rhd_final = _safe_str(abo.get("rhd_final",""))
-    abo_disc = bool(abo.get("discrepancy", False))
-
-    chips = []
-    if abo_final:
-        chips.append(f"<span class='chip {'chip-warn' if abo_disc else 'chip-ok'}'>ABO: {abo_final}</span>")
-    if rhd_final:
-        chips.append(f"<span class='chip {'chip-warn' if 'Inconclusive' in rhd_final else 'chip-ok'}'>RhD: {rhd_final}</span>")
-    chips.append(f"<span class='chip chip-ok'>AC: {ac or '—'}</span>")
-    chips.append(f"<span class='chip {'chip-danger' if all_rx else 'chip-ok'}'>Pattern: {'PAN-reactive' if all_rx else 'Non-pan'}</span>")
-    if recent_tx:
-        chips.append("<span class='chip chip-danger'>Recent transfusion ≤ 4 weeks</span>")
-    else:
-        chips.append("<span class='chip chip-ok'>No recent transfusion flag</span>")
-
-    dat_igg = _safe_str(dat.get("igg",""))
-    dat_c3d = _safe_str(dat.get("c3d",""))
-    dat_ctl = _safe_str(dat.get("control",""))
-    if dat_igg or dat_c3d or dat_ctl:
-        chips.append(f"<span class='chip chip-warn'>DAT IgG: {dat_igg or '—'}</span>")
-        chips.append(f"<span class='chip chip-warn'>DAT C3d: {dat_c3d or '—'}</span>")
-        chips.append(f"<span class='chip chip-warn'>DAT Control: {dat_ctl or '—'}</span>")
-
-    st.markdown(f"""
-    <div class="report-card">
-        <div class="report-title">Case History Report</div>
-        <div class="report-sub">Saved at: <b>{saved_at or '—'}</b> &nbsp;|&nbsp; Run Date: <b>{run_dt or '—'}</b></div>
-        <div>{''.join(chips)}</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-    c1, c2, c3, c4 = st.columns(4)
-    with c1:
-        st.markdown(f"<div class='kv'><b>Patient Name</b><br>{name or '—'}</div>", unsafe_allow_html=True)
-    with c2:
-        st.markdown(f"<div class='kv'><b>MRN</b><br>{mrn or '—'}</div>", unsafe_allow_html=True)
-    with c3:
-        st.markdown(f"<div class='kv'><b>Sex</b><br>{sex or '—'}</div>", unsafe_allow_html=True)
-    with c4:
-        st.markdown(f"<div class='kv'><b>Age (Y/M/D)</b><br>{age_y or '—'} / {age_m or '—'} / {age_d or '—'}</div>", unsafe_allow_html=True)
-
+    st.markdown(html["card"], unsafe_allow_html=True)
+    for col, label in zip(st.columns(4), ("Patient Name", "MRN", "Sex", "Age (Y/M/D)")):
+        with col:
+            st.markdown(html["kv"][label], unsafe_allow_html=True)
     st.write("")
-    a1, a2, a3 = st.columns(3)
-    with a1:
-        st.markdown(f"<div class='kv'><b>Tech / Operator</b><br>{tech or '—'}</div>", unsafe_allow_html=True)
-    with a2:
-        st.markdown(f"<div class='kv'><b>ID Panel Lot</b><br>{lot_p or '—'}</div>", unsafe_allow_html=True)
-    with a3:
-        st.markdown(f"<div class='kv'><b>Screen Lot</b><br>{lot_s or '—'}</div>", unsafe_allow_html=True)
+    for col, label in zip(st.columns(3), ("Tech / Operator", "ID Panel Lot", "Screen Lot")):
+        with col:
+            st.markdown(html["kv"][label], unsafe_allow_html=True)
 
     # ABO raw
     st.write("")
@@ -1566,14 +1112,8 @@ def render_history_report(payload: dict):
     if abo_raw:
         st.json(abo_raw, expanded=False)
 
-    notes = abo.get("notes", []) or []
-    if notes:
-        st.markdown(
-            "<div class='clinical-alert'><b>ABO Discrepancy Notes</b><ul style='margin-top:6px;'>" +
-            "".join([f"<li>{_safe_str(n)}</li>" for n in notes]) +
-            "</ul></div>",
-            unsafe_allow_html=True
-        )
+    if html["notes"]:
+        st.markdown(html["notes"], unsafe_allow_html=True)
 
     # Phenotype
     st.write("")
@@ -1595,21 +1135,25 @@ def render_history_report(payload: dict):
     screen_rx = inputs.get("screen_reactions", {}) or {}
     panel_rx  = inputs.get("panel_reactions", {}) or {}
 
-    sr_df = pd.DataFrame([{
-        "Screen I": screen_rx.get("I",""),
-        "Screen II": screen_rx.get("II",""),
-        "Screen III": screen_rx.get("III",""),
-    }])
+    sr_df = pd.DataFrame([{f"Screen {k}": v for k, v in screen_rx.items()} or
+                          {"Screen I": "", "Screen II": "", "Screen III": ""}])
     st.markdown("**Screening Cells**")
     st.dataframe(sr_df, use_container_width=True, hide_index=True)
 
+    n_panel = max([int(k) for k in panel_rx if str(k).isdigit()] or [11])
     pr_rows = []
-    for i in range(1, 12):
+    for i in range(1, n_panel + 1):
         pr_rows.append({"Cell": f"Panel #{i}", "Reaction": panel_rx.get(str(i), panel_rx.get(i, ""))})
     pr_df = pd.DataFrame(pr_rows)
-    st.markdown("**Panel Cells (1–11)**")
+    st.markdown(f"**Panel Cells (1–{n_panel})**")
     st.dataframe(pr_df, use_container_width=True, hide_index=True)
 
+    for xp in inputs.get("extra_panels", []) or []:
+        rx = xp.get("reactions", {}) or {}
+        st.markdown(f"**{_safe_str(xp.get('name'))}** (Lot {_safe_str(xp.get('lot')) or '—'})")
+        st.dataframe(pd.DataFrame([{"Cell": f"{_safe_str(xp.get('name'))} #{k}", "Reaction": v} for k, v in rx.items()]),
+                     use_container_width=True, hide_index=True)
+
     # Interpretation
     st.write("")
     st.subheader("Antibody ID — Interpretation / Results")
@@ -1621,6 +1165,11 @@ def render_history_report(payload: dict):
     if best_combo is not None:
         st.markdown("**Primary Suggested Combination (best fit)**")
         st.write(_fmt_antibody_list(best_combo))
+    alt = interp.get("alternative_combos", []) or []
+    if len(alt) > 1:
+        st.markdown(f"**Equally minimal explanations ({len(alt)})**")
+        for combo in alt:
+            st.write("- " + _fmt_antibody_list(combo))
 
     confirmed = interp.get("confirmed", [])
     resolved  = interp.get("resolved", [])
@@ -1752,11 +1301,30 @@ with st.sidebar:
 
     if st.button("RESET DATA", key="btn_reset"):
         st.session_state.ext = []
+        st.session_state.workup_state = None
+        st.session_state.cell_delta = None
         for k in RESET_KEYS:
             if k in st.session_state:
                 del st.session_state[k]
+        for k in [k for k in st.session_state if str(k).startswith("rx_")]:
+            del st.session_state[k]  # per-cell reactions (panel size / extra panels vary)
         st.rerun()
 
+    try:
+        _sq = _save_spool().stats()
+    except Exception:
+        _sq = None
+    if _sq is not None:
+        if _sq["pending"]:
+            st.caption(f"💾 Save queue: {_sq['pending']} pending · oldest {_fmt_age(_sq['oldest_age_sec'])}"
+                       + (f" · {_sq['failing']} retrying" if _sq["failing"] else ""))
+        else:
+            st.caption("💾 Save queue: all synced")
+
+    # filled at the end of the run (section 8) with this rerun's waterfall
+    prof_box = st.empty() if PROF.enabled else None
+PROF.label = nav
+
 # =============================================================================
 # 6) SUPERVISOR PAGE
 # =============================================================================
@@ -1786,27 +1354,32 @@ if nav == "Supervisor":
             cA, cB = st.columns(2)
 
             with cA:
-                st.markdown("### Panel 11 (Paste)")
-                p_txt = st.text_area("Paste 11 rows (tab-separated; 26 columns in AGS order)", height=170, key="p11_paste")
-                if st.button("✅ Update Panel 11 from Paste", key="upd_p11_paste"):
-                    df_new, msg = parse_paste_table(p_txt, expected_rows=11, id_prefix="C")
-                    df_new["ID"] = [f"C{i+1}" for i in range(11)]
+                st.markdown("### ID Panel (Paste)")
+                n_p = st.number_input("Panel cells", min_value=8, max_value=20, step=1,
+                                      value=len(st.session_state.panel11_df), key="p11_rows")
+                p_txt = st.text_area(f"Paste {n_p} rows (tab-separated; 26 columns in AGS order)", height=170, key="p11_paste")
+                if st.button("✅ Update ID Panel from Paste", key="upd_p11_paste"):
+                    df_new, msg = parse_paste_table(p_txt, expected_rows=int(n_p), id_prefix="C")
+                    df_new["ID"] = [f"C{i+1}" for i in range(int(n_p))]
                     st.session_state.panel11_df = df_new.copy()
-                    st.success(msg + " Panel 11 updated locally.")
+                    st.success(msg + " ID panel updated locally.")
 
-                st.caption("Preview (Panel 11)")
+                st.caption("Preview (ID Panel)")
                 st.dataframe(st.session_state.panel11_df.iloc[:, :15], use_container_width=True, hide_index=True)
 
             with cB:
-                st.markdown("### Screen 3 (Paste)")
-                s_txt = st.text_area("Paste 3 rows (tab-separated; 26 columns in AGS order)", height=170, key="p3_paste")
-                if st.button("✅ Update Screen 3 from Paste", key="upd_p3_paste"):
-                    df_new, msg = parse_paste_table(s_txt, expected_rows=3, id_prefix="S", id_list=["SI", "SII", "SIII"])
-                    df_new["ID"] = ["SI", "SII", "SIII"]
+                st.markdown("### Screen (Paste)")
+                n_s = st.number_input("Screen cells", min_value=2, max_value=4, step=1,
+                                      value=len(st.session_state.screen3_df), key="p3_rows")
+                s_txt = st.text_area(f"Paste {n_s} rows (tab-separated; 26 columns in AGS order)", height=170, key="p3_paste")
+                if st.button("✅ Update Screen from Paste", key="upd_p3_paste"):
+                    s_ids = [f"S{roman(i+1)}" for i in range(int(n_s))]
+                    df_new, msg = parse_paste_table(s_txt, expected_rows=int(n_s), id_prefix="S", id_list=s_ids)
+                    df_new["ID"] = s_ids
                     st.session_state.screen3_df = df_new.copy()
-                    st.success(msg + " Screen 3 updated locally.")
+                    st.success(msg + " Screen updated locally.")
 
-                st.caption("Preview (Screen 3)")
+                st.caption("Preview (Screen)")
                 st.dataframe(st.session_state.screen3_df.iloc[:, :15], use_container_width=True, hide_index=True)
 
             st.markdown("""
@@ -1825,7 +1398,7 @@ if nav == "Supervisor":
             </div>
             """, unsafe_allow_html=True)
 
-            t1, t2 = st.tabs(["Panel 11 (Edit)", "Screen 3 (Edit)"])
+            t1, t2 = st.tabs(["ID Panel (Edit)", "Screen (Edit)"])
 
             with t1:
                 edited_p11 = st.data_editor(
@@ -1838,9 +1411,9 @@ if nav == "Supervisor":
                 )
                 colx1, colx2 = st.columns([1, 2])
                 with colx1:
-                    if st.button("⚠️ Apply Manual Changes (Panel 11)", type="primary", key="apply_p11"):
+                    if st.button("⚠️ Apply Manual Changes (ID Panel)", type="primary", key="apply_p11"):
                         st.session_state.panel11_df = edited_p11.copy()
-                        st.success("Panel 11 updated safely (local).")
+                        st.success("ID panel updated safely (local).")
                 with colx2:
                     st.caption("Applies only when you click Apply (prevents accidental changes).")
 
@@ -1855,12 +1428,70 @@ if nav == "Supervisor":
                 )
                 coly1, coly2 = st.columns([1, 2])
                 with coly1:
-                    if st.button("⚠️ Apply Manual Changes (Screen 3)", type="primary", key="apply_p3"):
+                    if st.button("⚠️ Apply Manual Changes (Screen)", type="primary", key="apply_p3"):
                         st.session_state.screen3_df = edited_p3.copy()
-                        st.success("Screen 3 updated safely (local).")
+                        st.success("Screen updated safely (local).")
                 with coly2:
                     st.caption("Applies only when you click Apply (prevents accidental changes).")
 
+        st.markdown("### Additional panels (second lot / extra panel)")
+        st.caption("Evaluated together with the ID panel and screen in one pass. Each has its own antigram and lot.")
+        for j, xp in enumerate(list(st.session_state.extra_panels)):
+            cx1, cx2 = st.columns([4, 1])
+            cx1.write(f"**{xp['name']}** — Lot {xp.get('lot') or '—'} — {len(xp['df'])} cells")
+            if cx2.button("Remove", key=f"rm_xp_{xp['key']}"):
+                st.session_state.extra_panels.pop(j)
+                st.rerun()
+        with st.form("add_extra_panel", clear_on_submit=True):
+            ca, cb, cc = st.columns([2, 2, 1])
+            xp_name = ca.text_input("Panel name", placeholder="e.g. Panel B / Lot 2")
+            xp_lot = cb.text_input("Lot#")
+            xp_n = cc.number_input("Cells", min_value=1, max_value=20, value=11, step=1)
+            xp_txt = st.text_area("Paste rows (tab-separated; 26 columns in AGS order)", height=150)
+            if st.form_submit_button("➕ Add panel"):
+                if not xp_name.strip() or not xp_lot.strip():
+                    st.error("Panel name and lot are required.")
+                else:
+                    used = {xp["key"] for xp in st.session_state.extra_panels}
+                    key = next(f"x{i}" for i in range(1, len(used) + 2) if f"x{i}" not in used)
+                    df_new, msg = parse_paste_table(xp_txt, expected_rows=int(xp_n), id_prefix=key.upper() + "-")
+                    st.session_state.extra_panels.append(
+                        {"key": key, "name": xp_name.strip(), "lot": xp_lot.strip(), "df": df_new})
+                    st.success(msg + f" {xp_name.strip()} added locally.")
+
+        st.markdown("### Selected-cell catalog (in-house selected / rare cells, by lot)")
+        st.caption("Matching unexpired cells are offered in Antibody ID next to the panel suggestions, and the "
+                   "workstation plans the fewest of them that complete the rule of three.")
+        cat = cell_catalog()
+        for j, row in enumerate(cat.lot_summary()):
+            cl1, cl2 = st.columns([4, 1])
+            cl1.write(f"**Lot {row['Lot'] or '—'}** — {row['Cells']} cell(s), {row['Usable']} usable"
+                      + (f" — expires {row['Expiry']}" if row["Expiry"] else ""))
+            if cl2.button("Remove", key=f"rm_cat_lot_{j}"):
+                df_cat = st.session_state.cell_catalog_df
+                st.session_state.cell_catalog_df = df_cat[df_cat["Lot"] != row["Lot"]].reset_index(drop=True)
+                st.rerun()
+        with st.form("cell_catalog_form", clear_on_submit=True):
+            cc1, cc2, cc3 = st.columns([2, 2, 1])
+            cat_lot = cc1.text_input("Lot#")
+            cat_exp = cc2.date_input("Expiry", value=date.today() + timedelta(days=30))
+            cat_n = cc3.number_input("Cells", min_value=1, max_value=200, value=10, step=1)
+            cat_txt = st.text_area("Paste rows (tab-separated; optional cell ID, then 26 columns in AGS order)", height=150)
+            if st.form_submit_button("➕ Add / replace lot"):
+                if not cat_lot.strip():
+                    st.error("Lot is required.")
+                else:
+                    cat_rows = [r.split("\t") for r in cat_txt.strip().splitlines() if r.strip()]
+                    cat_ids = [(r[0].strip() if len(r) > len(AGS) else "") or f"SC{i+1}" for i, r in enumerate(cat_rows)]
+                    cat_ids += [f"SC{i+1}" for i in range(len(cat_ids), int(cat_n))]
+                    df_new, msg = parse_paste_table(cat_txt, expected_rows=int(cat_n), id_prefix="SC", id_list=cat_ids)
+                    df_new["Lot"] = cat_lot.strip()
+                    df_new["Expiry"] = cat_exp.isoformat()
+                    df_cat = st.session_state.cell_catalog_df
+                    st.session_state.cell_catalog_df = catalog_frame(
+                        pd.concat([df_cat[df_cat["Lot"] != cat_lot.strip()], df_new], ignore_index=True))
+                    st.success(msg + f" Lot {cat_lot.strip()} saved locally.")
+
         st.write("---")
         st.subheader("3) Publish to ALL devices (Save to GitHub)")
         st.warning("Before publishing: review lots and panel/screen grids quickly.")
@@ -1877,10 +1508,89 @@ if nav == "Supervisor":
                     github_upsert_file("data/p11.csv", st.session_state.panel11_df.to_csv(index=False), "Update monthly p11 panel")
                     github_upsert_file("data/p3.csv",  st.session_state.screen3_df.to_csv(index=False), "Update monthly p3 screen")
                     github_upsert_file("data/lots.json", lots_json, "Update monthly lots")
+                    panels_json = json.dumps({"panels": [
+                        {"key": xp["key"], "name": xp["name"], "lot": xp.get("lot", ""),
+                         "rows": xp["df"].to_dict("records")}
+                        for xp in st.session_state.extra_panels
+                    ]}, ensure_ascii=False, indent=2)
+                    github_upsert_file("data/panels.json", panels_json, "Update additional panels")
+                    github_upsert_file("data/selected_cells.csv", st.session_state.cell_catalog_df.to_csv(index=False),
+                                       "Update selected-cell catalog")
+                    # antigram archive by lot: saved cases reference lots only (replay / drift checks)
+                    archive = [("panel", st.session_state.lot_p, st.session_state.panel11_df),
+                               ("screen", st.session_state.lot_s, st.session_state.screen3_df)]
+                    archive += [("panel", xp.get("lot", ""), xp["df"]) for xp in st.session_state.extra_panels]
+                    for kind, lot, df in archive:
+                        if str(lot).strip():
+                            github_upsert_file(archive_path(kind, lot), df.to_csv(index=False),
+                                               f"Archive {kind} antigram lot {lot}")
                     st.success("✅ Published to GitHub successfully.")
                 except Exception as e:
                     st.error(f"❌ Save failed: {e}")
 
+        st.write("---")
+        st.subheader("4) Export Case History (audit / statistics)")
+        st.caption("All saved cases, one row each (patient, ABO, phenotype, inputs, interpretation). "
+                   "An interrupted export resumes where it stopped.")
+        exp_formats = ["parquet", "csv"] if HAS_PARQUET else ["csv"]
+        exp_fmt = st.radio("Format", exp_formats, horizontal=True, key="export_fmt")
+        if st.button("📦 Export all saved cases", key="btn_export"):
+            bar = st.progress(0.0, text="Listing history tree…")
+            try:
+                res = export_cases(
+                    _gh_client(), HISTORY_EXPORT_DIR, fmt=exp_fmt,
+                    progress=lambda d, n: bar.progress(d / max(n, 1), text=f"{d}/{n} cases"),
+                )
+                _zip_dir(HISTORY_EXPORT_DIR, HISTORY_EXPORT_DIR + ".zip", f"*.{res['format']}")
+                st.session_state.export_result = res
+            except Exception as e:
+                st.error(f"❌ Export failed (press again to resume): {e}")
+        exp_res = st.session_state.get("export_result")
+        if exp_res and Path(HISTORY_EXPORT_DIR + ".zip").exists():
+            st.success(f"✅ {exp_res['cases']} case(s) in {exp_res['chunks']} {exp_res['format']} chunk(s), "
+                       f"{exp_res['sec']:.1f}s" + (f" — {exp_res['failed']} unreadable" if exp_res["failed"] else ""))
+            with open(HISTORY_EXPORT_DIR + ".zip", "rb") as fh:
+                st.download_button("⬇️ Download export (.zip)", fh, file_name="case_history_export.zip",
+                                   mime="application/zip", key="dl_export")
+
+        st.write("---")
+        st.subheader("5) Diagnostics")
+        _ac = _analysis_cache().info()
+        st.caption(f"Analysis result cache (all sessions): {_ac['entries']}/{_ac['max_entries']} entr(ies) "
+                   f"· hits {_ac['hits']} · misses {_ac['misses']} · hit ratio {_ac['hit_ratio']:.0%} "
+                   f"· evictions {_ac['evictions']}")
+        for _name, _rc in render_cache_info().items():
+            st.caption(f"Render cache {_name}: {_rc['entries']}/{_rc['max_entries']} entr(ies) · hits {_rc['hits']} "
+                       f"· misses {_rc['misses']} · hit ratio {_rc['hit_ratio']:.0%} · evictions {_rc['evictions']}")
+        try:
+            _gs = _gh_client().stats
+            for _name, _hc in _history_cache().items():
+                st.caption(
+                    f"History {_name} cache: {len(_hc)} entr(ies) · hits {_hc.stats['hits']} · misses {_hc.stats['misses']} "
+                    f"· hit ratio {_hc.hit_ratio():.0%} · head checks {_hc.stats['head_checks']} "
+                    f"· unchanged file reused {_hc.stats['blob_reuse']} · invalidations {_hc.stats['invalidations']}"
+                )
+            st.caption(f"GitHub client: requests {_gs['requests']} · 304 not-modified {_gs['not_modified']} "
+                       f"· retries {_gs['retries']} · {_gs['bytes'] / 1024:.0f} KiB transferred")
+        except Exception as e:
+            st.caption(f"Diagnostics unavailable: {e}")
+
+        st.markdown("**Rerun profiling**")
+        _ring = _profile_ring()
+        st.checkbox("Profile every session (sidebar waterfall on each rerun)", value=_ring.profile_all,
+                    key="prof_all", on_change=lambda: setattr(_ring, "profile_all", bool(st.session_state.prof_all)))
+        st.caption(f"Or add ?{PROFILE_QUERY_PARAM}=1 to the URL to profile one session. "
+                   f"{len(_ring)} rerun(s) buffered (last {_ring.size}, all sessions).")
+        _pct = _ring.percentiles()
+        if _pct:
+            st.dataframe(_profile_stats_df(_pct), use_container_width=True, hide_index=True)
+            pc1, pc2, _ = st.columns([1.4, 1, 3])
+            pc1.download_button("⬇️ Profile log (.jsonl)", _ring.to_jsonl(), file_name="rerun_profile.jsonl",
+                                mime="application/x-ndjson", key="dl_profile")
+            if pc2.button("Clear", key="btn_profile_clear"):
+                _ring.clear()
+                st.rerun()
+
 # =============================================================================
 # 7) WORKSTATION PAGE
 # =============================================================================
@@ -1896,7 +1606,8 @@ else:
 
     lp_txt = st.session_state.lot_p if st.session_state.lot_p else "⚠️ REQUIRED"
     ls_txt = st.session_state.lot_s if st.session_state.lot_s else "⚠️ REQUIRED"
-    st.markdown(f"<div class='lot-bar'><span>ID Panel Lot: {lp_txt}</span> | <span>Screen Lot: {ls_txt}</span></div>",
+    xp_txt = "".join(f" | <span>{xp['name']} Lot: {xp.get('lot') or '—'}</span>" for xp in st.session_state.extra_panels)
+    st.markdown(f"<div class='lot-bar'><span>ID Panel Lot: {lp_txt}</span> | <span>Screen Lot: {ls_txt}</span>{xp_txt}</div>",
                 unsafe_allow_html=True)
 
     # ----------------------------------------------------------------------
@@ -1921,38 +1632,118 @@ else:
     # HISTORY LOOKUP (GitHub; MRN-based)
     # ----------------------------------------------------------------------
     mrn_now = _safe_str(st.session_state.get("pt_mrn",""))
-    if mrn_now:
+
+    @_profiled_fragment()
+    def history_section(mrn_now: str):
+        # stage 1 (every rerun): count / last-run badge from the small cached manifest
+        hist_key = f"hist_rows_{mrn_now}"
         try:
-            hist_df = load_history_index_as_df(mrn_now)
+            with _prof_section("history lookup"):
+                hist_man = load_history_manifest(mrn_now)
         except Exception as e:
-            hist_df = pd.DataFrame()
+            hist_man = _empty_manifest(mrn_now)
             st.error(f"History lookup failed: {e}")
+        hist_total = int(hist_man.get("total", 0) or 0)
 
-        if len(hist_df) > 0:
+        try:
+            _pend = _save_spool().pending(mrn_now)
+        except Exception:
+            _pend = []
+        if _pend:
+            st.caption(f"⏳ {len(_pend)} saved case(s) for this MRN still queued (not yet in GitHub history).")
+
+        if hist_total > 0:
+            last_run = _safe_str(hist_man.get("last_saved_at", ""))
+            last_concl = _safe_str(hist_man.get("last_conclusion", ""))
+            last_line = ""
+            if last_run:
+                last_line = f"Last run: <b>{last_run}</b>" + (f" — {last_concl}" if last_concl else "") + "<br>"
             st.markdown(f"""
             <div class='clinical-alert'>
-            🧾 <b>History Found</b> — This patient has <b>{len(hist_df)}</b> previous record(s).  
+            🧾 <b>History Found</b> — This patient has <b>{hist_total}</b> previous record(s).  
+            {last_line}
             Please review before interpretation.
             </div>
             """, unsafe_allow_html=True)
 
-            with st.expander("📚 Open Patient History"):
-                show_cols = ["saved_at","run_dt","tech","sex","age_y","age_m","age_d","abo_final","rhd_final","abo_discrepancy","conclusion_short","ac_res","recent_tx","all_rx","case_id"]
-                st.dataframe(hist_df[show_cols], use_container_width=True, hide_index=True)
+            # stage 2 (only while the expander is open): table, paging, run picker, case payload
+            hist_exp, hist_open = _lazy_expander("📚 Open Patient History", key=f"hist_exp_{mrn_now}")
+            with hist_exp:
+                if hist_open:
+                    try:
+                        with _prof_section("history lookup"):
+                            hist_df, hist_more = load_history_page(mrn_now, st.session_state.get(hist_key, HISTORY_PAGE_ROWS))
+                    except Exception as e:
+                        hist_df, hist_more = _index_df([]), False
+                        st.error(f"History lookup failed: {e}")
+
+                    show_cols = ["saved_at","run_dt","tech","sex","age_y","age_m","age_d","abo_final","rhd_final","abo_discrepancy","conclusion_short","ac_res","recent_tx","all_rx","case_id"]
+                    st.dataframe(hist_df[show_cols], use_container_width=True, hide_index=True)
+                    if hist_more:
+                        st.caption(f"Showing the latest {len(hist_df)} of {hist_total} record(s).")
+                        if st.button("⬅️ Load older months", key="btn_hist_older"):
+                            st.session_state[hist_key] = len(hist_df) + HISTORY_PAGE_ROWS
+                            _rerun_section()
+
+                    idx_list = list(range(len(hist_df)))
+                    pick = st.selectbox(
+                        "Select a previous run",
+                        idx_list,
+                        key=f"hist_pick_{mrn_now}",
+                        format_func=lambda i: f"{hist_df.iloc[i]['saved_at']} | {hist_df.iloc[i]['conclusion_short']}"
+                    )
+                    if st.button("Open selected run (Report)", key="btn_open_hist_report") and idx_list:
+                        case_id = _safe_str(hist_df.iloc[pick]["case_id"])
+                        with _prof_section("history lookup"):
+                            payload = load_case_payload(mrn_now, case_id)
+                        if not payload:
+                            st.error("Could not open this record (missing/corrupted).")
+                        else:
+                            with _prof_section("report render"):
+                                render_history_report(payload)
 
-                idx_list = list(range(len(hist_df)))
-                pick = st.selectbox(
-                    "Select a previous run",
-                    idx_list,
-                    format_func=lambda i: f"{hist_df.iloc[i]['saved_at']} | {hist_df.iloc[i]['conclusion_short']}"
+    if mrn_now:
+        history_section(mrn_now)
+
+    # ----------------------------------------------------------------------
+    # SEARCH HISTORY (all patients; local SQLite index synced from GitHub)
+    # ----------------------------------------------------------------------
+    with st.expander("🔎 Search history (all patients)"):
+        hs = st.columns([3, 1.4, 1.4, 1.2, 1.2])
+        hs_text = hs[0].text_input("Name / conclusion / antibody", key="hs_text", placeholder="e.g. Anti-E  or  patient name")
+        hs_mrn = hs[1].text_input("MRN", key="hs_mrn")
+        hs_tech = hs[2].text_input("Tech", key="hs_tech")
+        hs_from = hs[3].date_input("From", value=None, key="hs_from")
+        hs_to = hs[4].date_input("To", value=None, key="hs_to")
+
+        hb1, hb2, _ = st.columns([1, 1, 4])
+        do_search = hb1.button("Search", key="btn_hs_search", type="primary")
+        do_sync = hb2.button("Sync now", key="btn_hs_sync")
+        if do_search or do_sync:
+            try:
+                sidx = _search_index()
+                if do_sync or (time.time() - sidx.last_sync()) > HISTORY_SEARCH_SYNC_SEC:
+                    with st.spinner("Syncing history index from GitHub…"):
+                        res = sync_search_index()
+                    st.caption(f"Synced: {res['fetched']} changed of {res['files']} index file(s), "
+                               f"{res['rows']} row(s) in {res['sec']:.1f}s"
+                               + (" — tree listing truncated by GitHub" if res["truncated"] else ""))
+                t0 = time.perf_counter()
+                st.session_state.hs_results = sidx.search(
+                    text=hs_text, mrn=hs_mrn, tech=hs_tech,
+                    date_from=str(hs_from) if hs_from else "", date_to=str(hs_to) if hs_to else "",
                 )
-                if st.button("Open selected run (Report)", key="btn_open_hist_report"):
-                    case_id = _safe_str(hist_df.iloc[pick]["case_id"])
-                    payload = load_case_payload(mrn_now, case_id)
-                    if not payload:
-                        st.error("Could not open this record (missing/corrupted).")
-                    else:
-                        render_history_report(payload)
+                st.session_state.hs_ms = (time.perf_counter() - t0) * 1000
+            except Exception as e:
+                st.error(f"History search failed: {e}")
+
+        if st.session_state.get("hs_results") is not None:
+            res_rows = st.session_state.hs_results
+            st.caption(f"{len(res_rows)} result(s) in {st.session_state.get('hs_ms', 0):.1f} ms (newest first, max 200)")
+            if res_rows:
+                st.dataframe(pd.DataFrame(res_rows)[["saved_at","mrn","name","tech","abo_final","rhd_final",
+                                                     "conclusion_short","ac_res","case_id"]],
+                             use_container_width=True, hide_index=True)
 
     # ----------------------------------------------------------------------
     # ABO / RhD / DAT section (collapsed, opens when discrepancy)
@@ -1961,316 +1752,324 @@ else:
     # ----------------------------------------------------------------------
     # ABO / RhD / DAT section (collapsible; interpretation only after confirmation)
     # ----------------------------------------------------------------------
-    with st.expander("🧾 ABO / RhD / DAT (Enter by grade)", expanded=False):
-
-        # Let user choose workflow card (do NOT assume neonate when age is not entered)
-        age_entered = (age_y + age_m + age_d) > 0
-        if "abo_card_mode" not in st.session_state:
-            st.session_state.abo_card_mode = "Adult/Child (≥ 4 months)"
-            if age_entered and is_neonate:
-                st.session_state.abo_card_mode = "Newborn/Neonate (< 4 months)"
-
-        card_mode = st.radio(
-            "ABO workflow card",
-            ["Adult/Child (≥ 4 months)", "Newborn/Neonate (< 4 months)"],
-            horizontal=True,
-            key="abo_card_mode"
-        )
-        abo_is_neonate = card_mode.startswith("Newborn")
-
-        # Build ABO raw input (current)
-        if abo_is_neonate:
-            st.markdown("""
-            <div class='clinical-info'>
-            👶 <b>Newborn/Neonate mode</b>: reverse grouping is typically unreliable and may be omitted per policy.<br>
-            </div>
-            """, unsafe_allow_html=True)
-
-            purpose = st.radio("Purpose", ["Transfusion", "RhIG"], horizontal=True, key="abo_purpose")
-            cord_sample = st.checkbox("Cord blood sample?", value=False, key="abo_cord_sample")
-
-            c1, c2, c3, c4, c5, c6 = st.columns(6)
-            with c1:
-                st.markdown(_render_abo_label_html('Anti-A', 'abo-a'), unsafe_allow_html=True)
-                antiA = st.selectbox('Anti-A', ABO_GRADES, key='abo_neonate_antiA', label_visibility='collapsed')
-            with c2:
-                st.markdown(_render_abo_label_html('Anti-B', 'abo-b'), unsafe_allow_html=True)
-                antiB = st.selectbox('Anti-B', ABO_GRADES, key='abo_neonate_antiB', label_visibility='collapsed')
-            with c3:
-                st.markdown(_render_abo_label_html('Anti-AB', 'neo-ab'), unsafe_allow_html=True)
-                antiAB = st.selectbox('Anti-AB', ABO_GRADES, key='abo_neonate_antiAB', label_visibility='collapsed')
-            with c4:
-                st.markdown(_render_abo_label_html('Anti-D (DVI+)', 'neo-d'), unsafe_allow_html=True)
-                antiD = st.selectbox('Anti-D', ABO_GRADES, key='abo_neonate_antiD', label_visibility='collapsed')
-            with c5:
-                st.markdown(_render_abo_label_html('Control', 'neo-ctl', ctl_badge=True), unsafe_allow_html=True)
-                ctl = st.selectbox('Control', ABO_GRADES, key='abo_neonate_ctl', label_visibility='collapsed')
-            with c6:
-                st.markdown(_render_abo_label_html('DAT', 'neo-dat'), unsafe_allow_html=True)
-                datg = st.selectbox('DAT (grade or Not Done)', ABO_GRADES, key='abo_neonate_dat', label_visibility='collapsed')
-
-            abo_raw_current = {
-                "mode": "neonate",
-                "purpose": "RhIG" if purpose == "RhIG" else "Transfusion",
-                "antiA": antiA,
-                "antiB": antiB,
-                "antiAB": antiAB,
-                "antiD": antiD,
-                "ctl": ctl,
-                "dat": datg,
-                "cord_sample": bool(cord_sample),
-            }
-        else:
-            st.markdown("""
-            <div class='clinical-info'>
-            👤 <b>Adult/Child mode</b>: forward + reverse grouping are required (per policy).
-            </div>
-            """, unsafe_allow_html=True)
-
-            c1, c2, c3, c4, c5, c6 = st.columns(6)
-            with c1:
-                st.markdown(_render_abo_label_html('Anti-A', 'abo-a'), unsafe_allow_html=True)
-                antiA = st.selectbox('Anti-A', ABO_GRADES, key='abo_adult_antiA', label_visibility='collapsed')
-            with c2:
-                st.markdown(_render_abo_label_html('Anti-B', 'abo-b'), unsafe_allow_html=True)
-                antiB = st.selectbox('Anti-B', ABO_GRADES, key='abo_adult_antiB', label_visibility='collapsed')
-            with c3:
-                st.markdown(_render_abo_label_html('Anti-D (DVI−)', 'abo-d'), unsafe_allow_html=True)
-                antiD = st.selectbox('Anti-D', ABO_GRADES, key='abo_adult_antiD', label_visibility='collapsed')
-            with c4:
-                st.markdown(_render_abo_label_html('Control', 'abo-ctl'), unsafe_allow_html=True)
-                ctl  = st.selectbox('Control', ABO_GRADES, key='abo_adult_ctl', label_visibility='collapsed')
-            with c5:
-                st.markdown(_render_abo_label_html('A1 cells', 'abo-a1'), unsafe_allow_html=True)
-                a1cells = st.selectbox('A1 cells', ABO_GRADES, key='abo_adult_a1', label_visibility='collapsed')
-            with c6:
-                st.markdown(_render_abo_label_html('B cells', 'abo-bcells'), unsafe_allow_html=True)
-                bcells  = st.selectbox('B cells', ABO_GRADES, key='abo_adult_b', label_visibility='collapsed')
-
-
-
-            abo_raw_current = {
-                "mode": "adult",
-                "antiA": antiA,
-                "antiB": antiB,
-                "antiD": antiD,
-                "ctl": ctl,
-                "a1cells": a1cells,
-                "bcells": bcells
-            }
+    @_profiled_fragment()
+    def abo_section(is_neonate: bool, age_entered: bool):
+        with st.expander("🧾 ABO / RhD / DAT (Enter by grade)", expanded=False):
+
+            # Let user choose workflow card (do NOT assume neonate when age is not entered)
+            if "abo_card_mode" not in st.session_state:
+                st.session_state.abo_card_mode = "Adult/Child (≥ 4 months)"
+                if age_entered and is_neonate:
+                    st.session_state.abo_card_mode = "Newborn/Neonate (< 4 months)"
+
+            card_mode = st.radio(
+                "ABO workflow card",
+                ["Adult/Child (≥ 4 months)", "Newborn/Neonate (< 4 months)"],
+                horizontal=True,
+                key="abo_card_mode"
+            )
+            abo_is_neonate = card_mode.startswith("Newborn")
 
-        # Confirmation gate (prevents early 'discrepancy' before entries are complete)
-        colb1, colb2 = st.columns([1, 1])
-        confirm_abo = colb1.button("✅ Confirm ABO entry", type="primary", use_container_width=True, key="abo_confirm_btn")
-        reset_abo   = colb2.button("✏️ Edit / Reset confirmation", use_container_width=True, key="abo_reset_btn")
-
-        if reset_abo:
-            st.session_state.abo_confirmed = False
-            st.session_state.abo_raw_confirmed = None
-            st.session_state.abo_interp_confirmed = None
-            st.session_state.abo_guidance_confirmed = None
-            st.session_state.abo_screen_any_positive = False
-
-        if confirm_abo:
-            # Basic completeness checks
-            missing = []
+            # Build ABO raw input (current)
             if abo_is_neonate:
-                for k, lbl in [("antiA","Anti-A"),("antiB","Anti-B"),("antiD","Anti-D"),("ctl","Control")]:
-                    if _safe_str(abo_raw_current.get(k,"Not Done")) in ("Not Done",""):
-                        missing.append(lbl)
-            else:
-                for k, lbl in [("antiA","Anti-A"),("antiB","Anti-B"),("antiD","Anti-D"),("ctl","Control"),("a1cells","A1 cells"),("bcells","B cells")]:
-                    if _safe_str(abo_raw_current.get(k,"Not Done")) in ("Not Done",""):
-                        missing.append(lbl)
+                st.markdown("""
+                <div class='clinical-info'>
+                👶 <b>Newborn/Neonate mode</b>: reverse grouping is typically unreliable and may be omitted per policy.<br>
+                </div>
+                """, unsafe_allow_html=True)
 
-            if missing:
-                st.error("Please complete the following fields before confirmation: " + ", ".join(missing))
-            else:
-                # Link inputs (screen + DAT)
-                screen_grades = {
-                    "I": _safe_str(st.session_state.get("rx_sI","Not Done")),
-                    "II": _safe_str(st.session_state.get("rx_sII","Not Done")),
-                    "III": _safe_str(st.session_state.get("rx_sIII","Not Done")),
+                purpose = st.radio("Purpose", ["Transfusion", "RhIG"], horizontal=True, key="abo_purpose")
+                cord_sample = st.checkbox("Cord blood sample?", value=False, key="abo_cord_sample")
+
+                c1, c2, c3, c4, c5, c6 = st.columns(6)
+                with c1:
+                    st.markdown(_render_abo_label_html('Anti-A', 'abo-a'), unsafe_allow_html=True)
+                    antiA = st.selectbox('Anti-A', ABO_GRADES, key='abo_neonate_antiA', label_visibility='collapsed')
+                with c2:
+                    st.markdown(_render_abo_label_html('Anti-B', 'abo-b'), unsafe_allow_html=True)
+                    antiB = st.selectbox('Anti-B', ABO_GRADES, key='abo_neonate_antiB', label_visibility='collapsed')
+                with c3:
+                    st.markdown(_render_abo_label_html('Anti-AB', 'neo-ab'), unsafe_allow_html=True)
+                    antiAB = st.selectbox('Anti-AB', ABO_GRADES, key='abo_neonate_antiAB', label_visibility='collapsed')
+                with c4:
+                    st.markdown(_render_abo_label_html('Anti-D (DVI+)', 'neo-d'), unsafe_allow_html=True)
+                    antiD = st.selectbox('Anti-D', ABO_GRADES, key='abo_neonate_antiD', label_visibility='collapsed')
+                with c5:
+                    st.markdown(_render_abo_label_html('Control', 'neo-ctl', ctl_badge=True), unsafe_allow_html=True)
+                    ctl = st.selectbox('Control', ABO_GRADES, key='abo_neonate_ctl', label_visibility='collapsed')
+                with c6:
+                    st.markdown(_render_abo_label_html('DAT', 'neo-dat'), unsafe_allow_html=True)
+                    datg = st.selectbox('DAT (grade or Not Done)', ABO_GRADES, key='abo_neonate_dat', label_visibility='collapsed')
+
+                abo_raw_current = {
+                    "mode": "neonate",
+                    "purpose": "RhIG" if purpose == "RhIG" else "Transfusion",
+                    "antiA": antiA,
+                    "antiB": antiB,
+                    "antiAB": antiAB,
+                    "antiD": antiD,
+                    "ctl": ctl,
+                    "dat": datg,
+                    "cord_sample": bool(cord_sample),
                 }
-                dat_inputs = {
-                    "igg": _safe_str(st.session_state.get("dat_igg","Not Done")),
-                    "c3d": _safe_str(st.session_state.get("dat_c3d","Not Done")),
-                    "ctl": _safe_str(st.session_state.get("dat_ctl","Not Done")),
-                }
-
-                screen_any_pos = any(_is_pos_any(g) for g in screen_grades.values() if _safe_str(g) not in ("Not Done",""))
-                st.session_state.abo_screen_any_positive = bool(screen_any_pos)
-
-                # Interpret (ABO/RhD)
-                abo_interp_tmp = interpret_abo_rhd(
-                    is_neonate=abo_is_neonate,
-                    purpose=("RhIG" if _safe_str(abo_raw_current.get("purpose","Transfusion")) == "RhIG" else "Transfusion"),
-                    raw=abo_raw_current,
-                    screen_any_positive=bool(screen_any_pos)
-                )
-                guidance_tmp = build_abo_guidance(
-                    is_neonate=abo_is_neonate,
-                    purpose=_safe_str(abo_raw_current.get("purpose","Transfusion")),
-                    raw=abo_raw_current,
-                    screen_grades=screen_grades,
-                    dat_inputs=dat_inputs
-                )
-
-                st.session_state.abo_confirmed = True
-                st.session_state.abo_raw_confirmed = abo_raw_current
-                st.session_state.abo_interp_confirmed = abo_interp_tmp
-                st.session_state.abo_guidance_confirmed = guidance_tmp
-
-        # Display (only after confirmation)
-        if st.session_state.get("abo_confirmed", False) and st.session_state.get("abo_interp_confirmed"):
-            abo_interp = st.session_state.abo_interp_confirmed
-            guid = st.session_state.get("abo_guidance_confirmed") or {"general": [], "specific": []}
-
-            is_discrep = bool(abo_interp.get("discrepancy", False)) or bool(abo_interp.get("invalid", False))
-            abo_final = abo_interp.get("abo_final", "Unknown")
-            rhd_final = abo_interp.get("rhd_final", "Unknown")
-
-            # Highlight exactly where the issue is (ABO vs RhD)
-            notes_join = " ".join([str(x) for x in abo_interp.get("notes", [])])
-            control_pos = "Control is POSITIVE" in notes_join
-            abo_issue = control_pos or ("Discrepancy" in abo_final) or ("Most probable" in abo_final) or (abo_final.strip().lower() in ("unknown", "invalid", "inconclusive"))
-            rhd_issue = control_pos or ("Inconclusive" in rhd_final) or (rhd_final.strip().lower() in ("unknown", "invalid"))
-
-            abo_chip = "chip-warn" if abo_issue else "chip-ok"
-            rhd_chip = "chip-warn" if rhd_issue else "chip-ok"
-            if is_discrep:
-                st.markdown(f"""
-                <div class='clinical-danger'>
-                  ⚠️ <b>ABO DISCREPANCY / SPECIAL SITUATION</b>
-                  <div class='status-row'>
-                    <span class='status-chip {abo_chip}'><span class='chip-label'>ABO</span> {abo_final}</span>
-                    <span class='status-chip {rhd_chip}'><span class='chip-label'>RhD</span> {rhd_final}</span>
-                  </div>
+            else:
+                st.markdown("""
+                <div class='clinical-info'>
+                👤 <b>Adult/Child mode</b>: forward + reverse grouping are required (per policy).
                 </div>
                 """, unsafe_allow_html=True)
 
-                st.markdown("<div class='clinical-alert'><b>General rule (always start here):</b></div>", unsafe_allow_html=True)
-                st.markdown(
-                    "<div class='clinical-alert'><ul style='margin-top:6px;'>" +
-                    "".join([f"<li>{_safe_str(x)}</li>" for x in guid.get('general',[])]) +
-                    "</ul></div>",
-                    unsafe_allow_html=True
-                )
+                c1, c2, c3, c4, c5, c6 = st.columns(6)
+                with c1:
+                    st.markdown(_render_abo_label_html('Anti-A', 'abo-a'), unsafe_allow_html=True)
+                    antiA = st.selectbox('Anti-A', ABO_GRADES, key='abo_adult_antiA', label_visibility='collapsed')
+                with c2:
+                    st.markdown(_render_abo_label_html('Anti-B', 'abo-b'), unsafe_allow_html=True)
+                    antiB = st.selectbox('Anti-B', ABO_GRADES, key='abo_adult_antiB', label_visibility='collapsed')
+                with c3:
+                    st.markdown(_render_abo_label_html('Anti-D (DVI−)', 'abo-d'), unsafe_allow_html=True)
+                    antiD = st.selectbox('Anti-D', ABO_GRADES, key='abo_adult_antiD', label_visibility='collapsed')
+                with c4:
+                    st.markdown(_render_abo_label_html('Control', 'abo-ctl'), unsafe_allow_html=True)
+                    ctl  = st.selectbox('Control', ABO_GRADES, key='abo_adult_ctl', label_visibility='collapsed')
+                with c5:
+                    st.markdown(_render_abo_label_html('A1 cells', 'abo-a1'), unsafe_allow_html=True)
+                    a1cells = st.selectbox('A1 cells', ABO_GRADES, key='abo_adult_a1', label_visibility='collapsed')
+                with c6:
+                    st.markdown(_render_abo_label_html('B cells', 'abo-bcells'), unsafe_allow_html=True)
+                    bcells  = st.selectbox('B cells', ABO_GRADES, key='abo_adult_b', label_visibility='collapsed')
+
+
+
+                abo_raw_current = {
+                    "mode": "adult",
+                    "antiA": antiA,
+                    "antiB": antiB,
+                    "antiD": antiD,
+                    "ctl": ctl,
+                    "a1cells": a1cells,
+                    "bcells": bcells
+                }
 
-                # Specific guidance
-                if guid.get("specific"):
-                    st.markdown("<div class='clinical-alert'><b>Specific guidance (based on the pattern entered):</b></div>", unsafe_allow_html=True)
-                    for sec in guid["specific"]:
-                        st.markdown(
-                            "<div class='clinical-info'><b>" + _safe_str(sec.get("title","")) + "</b>" +
-                            "<ul style='margin-top:6px;'>" +
-                            "".join([f"<li>{_safe_str(b)}</li>" for b in sec.get("bullets",[])]) +
-                            "</ul></div>",
-                            unsafe_allow_html=True
-                        )
-                else:
-                    st.info("No specific rule was triggered by the current pattern. Continue with clerical/technical checks and clinical history.")
-                # Mixed-field history prompts (used for smarter reporting)
-                mf_present = False
+            # Confirmation gate (prevents early 'discrepancy' before entries are complete)
+            colb1, colb2 = st.columns([1, 1])
+            confirm_abo = colb1.button("✅ Confirm ABO entry", type="primary", use_container_width=True, key="abo_confirm_btn")
+            reset_abo   = colb2.button("✏️ Edit / Reset confirmation", use_container_width=True, key="abo_reset_btn")
+
+            if reset_abo:
+                st.session_state.abo_confirmed = False
+                st.session_state.abo_raw_confirmed = None
+                st.session_state.abo_interp_confirmed = None
+                st.session_state.abo_guidance_confirmed = None
+                st.session_state.abo_screen_any_positive = False
+
+            if confirm_abo:
+                # Basic completeness checks
+                missing = []
                 if abo_is_neonate:
-                    mf_present = "Mixed-field" in (
-                        _safe_str(st.session_state.get("abo_neonate_antiA","")),
-                        _safe_str(st.session_state.get("abo_neonate_antiB","")),
-                        _safe_str(st.session_state.get("abo_neonate_antiAB","")),
-                        _safe_str(st.session_state.get("abo_neonate_ctl","")),
-                    )
+                    for k, lbl in [("antiA","Anti-A"),("antiB","Anti-B"),("antiD","Anti-D"),("ctl","Control")]:
+                        if _safe_str(abo_raw_current.get(k,"Not Done")) in ("Not Done",""):
+                            missing.append(lbl)
                 else:
-                    mf_present = "Mixed-field" in (
-                        _safe_str(st.session_state.get("abo_adult_antiA","")),
-                        _safe_str(st.session_state.get("abo_adult_antiB","")),
-                        _safe_str(st.session_state.get("abo_adult_a1","")),
-                        _safe_str(st.session_state.get("abo_adult_b","")),
-                        _safe_str(st.session_state.get("abo_adult_ctl","")),
-                    )
-                colh1, colh2 = st.columns(2)
-                with colh1:
-                    st.checkbox("History: recent transfusion?", key="abo_recent_tx", value=bool(st.session_state.get("abo_recent_tx", False)), disabled=not mf_present)
-                with colh2:
-                    st.checkbox("History: HSCT / BM transplant?", key="abo_hsct_bm", value=bool(st.session_state.get("abo_hsct_bm", False)), disabled=not mf_present)
-
-                # How to report (copy/paste into HIS/EMR)
-                report_text = build_how_to_report(
-                    is_neonate=abo_is_neonate,
-                    abo_interp=abo_interp,
-                    raw={
-                        "antiA": st.session_state.get("abo_neonate_antiA" if abo_is_neonate else "abo_adult_antiA", "Not Done"),
-                        "antiB": st.session_state.get("abo_neonate_antiB" if abo_is_neonate else "abo_adult_antiB", "Not Done"),
-                        "antiAB": (st.session_state.get("abo_neonate_antiAB", "Not Done") if abo_is_neonate else "Not Done"),
-                        "a1cells": (st.session_state.get("abo_adult_a1", "Not Done") if not abo_is_neonate else "Not Done"),
-                        "bcells": (st.session_state.get("abo_adult_b", "Not Done") if not abo_is_neonate else "Not Done"),
-                        "ctl": st.session_state.get("abo_neonate_ctl" if abo_is_neonate else "abo_adult_ctl", "Not Done"),
-                    },
-                    screen_any_positive=bool(st.session_state.get("abo_screen_any_positive", False)),
-                    mixed_field_history={"recent_tx": bool(st.session_state.get("abo_recent_tx", False)), "hsct_bm": bool(st.session_state.get("abo_hsct_bm", False))}
-                )
-                st.markdown("<div class='clinical-alert'><b>How to report (copy/paste):</b></div>", unsafe_allow_html=True)
-                if report_text.strip():
-                    st.code(report_text, language="text")
+                    for k, lbl in [("antiA","Anti-A"),("antiB","Anti-B"),("antiD","Anti-D"),("ctl","Control"),("a1cells","A1 cells"),("bcells","B cells")]:
+                        if _safe_str(abo_raw_current.get(k,"Not Done")) in ("Not Done",""):
+                            missing.append(lbl)
+
+                if missing:
+                    st.error("Please complete the following fields before confirmation: " + ", ".join(missing))
                 else:
-                    st.code("No automated reporting template matched this pattern. Please enter a comment below (or follow local policy).", language="text")
+                    # Link inputs (screen + DAT)
+                    screen_grades = {
+                        roman(i + 1): _safe_str(st.session_state.get(f"rx_s{roman(i + 1)}","Not Done"))
+                        for i in range(len(st.session_state.screen3_df))
+                    }
+                    dat_inputs = {
+                        "igg": _safe_str(st.session_state.get("dat_igg","Not Done")),
+                        "c3d": _safe_str(st.session_state.get("dat_c3d","Not Done")),
+                        "ctl": _safe_str(st.session_state.get("dat_ctl","Not Done")),
+                    }
+
+                    screen_any_pos = any(_is_pos_any(g) for g in screen_grades.values() if _safe_str(g) not in ("Not Done",""))
+                    st.session_state.abo_screen_any_positive = bool(screen_any_pos)
+
+                    with _prof_section("ABO interpretation"):  # interpretation + discrepancy guidance
+                        abo_interp_tmp = interpret_abo_rhd_lookup(  # precompiled table (bloodbank.abo_table)
+                            is_neonate=abo_is_neonate,
+                            purpose=("RhIG" if _safe_str(abo_raw_current.get("purpose","Transfusion")) == "RhIG" else "Transfusion"),
+                            raw=abo_raw_current,
+                            screen_any_positive=bool(screen_any_pos)
+                        )
+                        guidance_tmp = build_abo_guidance(
+                            is_neonate=abo_is_neonate,
+                            purpose=_safe_str(abo_raw_current.get("purpose","Transfusion")),
+                            raw=abo_raw_current,
+                            screen_grades=screen_grades,
+                            dat_inputs=dat_inputs
+                        )
 
+                    st.session_state.abo_confirmed = True
+                    st.session_state.abo_raw_confirmed = abo_raw_current
+                    st.session_state.abo_interp_confirmed = abo_interp_tmp
+                    st.session_state.abo_guidance_confirmed = guidance_tmp
+
+            # Display (only after confirmation)
+            if st.session_state.get("abo_confirmed", False) and st.session_state.get("abo_interp_confirmed"):
+                abo_interp = st.session_state.abo_interp_confirmed
+                guid = st.session_state.get("abo_guidance_confirmed") or {"general": [], "specific": []}
+
+                is_discrep = bool(abo_interp.get("discrepancy", False)) or bool(abo_interp.get("invalid", False))
+                abo_final = abo_interp.get("abo_final", "Unknown")
+                rhd_final = abo_interp.get("rhd_final", "Unknown")
+
+                # Highlight exactly where the issue is (ABO vs RhD)
+                notes_join = " ".join([str(x) for x in abo_interp.get("notes", [])])
+                control_pos = "Control is POSITIVE" in notes_join
+                abo_issue = control_pos or ("Discrepancy" in abo_final) or ("Most probable" in abo_final) or (abo_final.strip().lower() in ("unknown", "invalid", "inconclusive"))
+                rhd_issue = control_pos or ("Inconclusive" in rhd_final) or (rhd_final.strip().lower() in ("unknown", "invalid"))
+
+                abo_chip = "chip-warn" if abo_issue else "chip-ok"
+                rhd_chip = "chip-warn" if rhd_issue else "chip-ok"
+                if is_discrep:
+                    st.markdown(f"""
+                    <div class='clinical-danger'>
+                      ⚠️ <b>ABO DISCREPANCY / SPECIAL SITUATION</b>
+                      <div class='status-row'>
+                        <span class='status-chip {abo_chip}'><span class='chip-label'>ABO</span> {abo_final}</span>
+                        <span class='status-chip {rhd_chip}'><span class='chip-label'>RhD</span> {rhd_final}</span>
+                      </div>
+                    </div>
+                    """, unsafe_allow_html=True)
 
-                # Manual confirmation + comment (saved with the case)
-                st.checkbox("Manual confirmation completed (documented)", value=bool(st.session_state.get("abo_manual_confirm", False)), key="abo_manual_confirm")
-                st.text_area("Technologist comment (optional; saved with the case)", key="abo_comment", height=120)
+                    st.markdown("<div class='clinical-alert'><b>General rule (always start here):</b></div>", unsafe_allow_html=True)
+                    st.markdown(
+                        "<div class='clinical-alert'><ul style='margin-top:6px;'>" +
+                        "".join([f"<li>{_safe_str(x)}</li>" for x in guid.get('general',[])]) +
+                        "</ul></div>",
+                        unsafe_allow_html=True
+                    )
 
+                    # Specific guidance
+                    if guid.get("specific"):
+                        st.markdown("<div class='clinical-alert'><b>Specific guidance (based on the pattern entered):</b></div>", unsafe_allow_html=True)
+                        for sec in guid["specific"]:
+                            st.markdown(
+                                "<div class='clinical-info'><b>" + _safe_str(sec.get("title","")) + "</b>" +
+                                "<ul style='margin-top:6px;'>" +
+                                "".join([f"<li>{_safe_str(b)}</li>" for b in sec.get("bullets",[])]) +
+                                "</ul></div>",
+                                unsafe_allow_html=True
+                            )
+                    else:
+                        st.info("No specific rule was triggered by the current pattern. Continue with clerical/technical checks and clinical history.")
+                    # Mixed-field history prompts (used for smarter reporting)
+                    mf_present = False
+                    if abo_is_neonate:
+                        mf_present = "Mixed-field" in (
+                            _safe_str(st.session_state.get("abo_neonate_antiA","")),
+                            _safe_str(st.session_state.get("abo_neonate_antiB","")),
+                            _safe_str(st.session_state.get("abo_neonate_antiAB","")),
+                            _safe_str(st.session_state.get("abo_neonate_ctl","")),
+                        )
+                    else:
+                        mf_present = "Mixed-field" in (
+                            _safe_str(st.session_state.get("abo_adult_antiA","")),
+                            _safe_str(st.session_state.get("abo_adult_antiB","")),
+                            _safe_str(st.session_state.get("abo_adult_a1","")),
+                            _safe_str(st.session_state.get("abo_adult_b","")),
+                            _safe_str(st.session_state.get("abo_adult_ctl","")),
+                        )
+                    colh1, colh2 = st.columns(2)
+                    with colh1:
+                        st.checkbox("History: recent transfusion?", key="abo_recent_tx", value=bool(st.session_state.get("abo_recent_tx", False)), disabled=not mf_present)
+                    with colh2:
+                        st.checkbox("History: HSCT / BM transplant?", key="abo_hsct_bm", value=bool(st.session_state.get("abo_hsct_bm", False)), disabled=not mf_present)
+
+                    # How to report (copy/paste into HIS/EMR)
+                    with _prof_section("report render"):
+                        report_text = how_to_report(
+                            is_neonate=abo_is_neonate,
+                            abo_interp=abo_interp,
+                            raw={
+                                "antiA": st.session_state.get("abo_neonate_antiA" if abo_is_neonate else "abo_adult_antiA", "Not Done"),
+                                "antiB": st.session_state.get("abo_neonate_antiB" if abo_is_neonate else "abo_adult_antiB", "Not Done"),
+                                "antiAB": (st.session_state.get("abo_neonate_antiAB", "Not Done") if abo_is_neonate else "Not Done"),
+                                "a1cells": (st.session_state.get("abo_adult_a1", "Not Done") if not abo_is_neonate else "Not Done"),
+                                "bcells": (st.session_state.get("abo_adult_b", "Not Done") if not abo_is_neonate else "Not Done"),
+                                "ctl": st.session_state.get("abo_neonate_ctl" if abo_is_neonate else "abo_adult_ctl", "Not Done"),
+                            },
+                            screen_any_positive=bool(st.session_state.get("abo_screen_any_positive", False)),
+                            mixed_field_history={"recent_tx": bool(st.session_state.get("abo_recent_tx", False)), "hsct_bm": bool(st.session_state.get("abo_hsct_bm", False))}
+                        )
+                    st.markdown("<div class='clinical-alert'><b>How to report (copy/paste):</b></div>", unsafe_allow_html=True)
+                    if report_text.strip():
+                        st.code(report_text, language="text")
+                    else:
+                        st.code("No automated reporting template matched this pattern. Please enter a comment below (or follow local policy).", language="text")
+
+
+                    # Manual confirmation + comment (saved with the case)
+                    st.checkbox("Manual confirmation completed (documented)", value=bool(st.session_state.get("abo_manual_confirm", False)), key="abo_manual_confirm")
+                    st.text_area("Technologist comment (optional; saved with the case)", key="abo_comment", height=120)
+
+                else:
+                    st.markdown(f"""
+                    <div class='clinical-info'>
+                      ✅ <b>ABO/RhD result is consistent</b>
+                      <div class='status-row'>
+                        <span class='status-chip {abo_chip}'><span class='chip-label'>ABO</span> {abo_final}</span>
+                        <span class='status-chip {rhd_chip}'><span class='chip-label'>RhD</span> {rhd_final}</span>
+                      </div>
+                    </div>
+                    """, unsafe_allow_html=True)
             else:
-                st.markdown(f"""
-                <div class='clinical-info'>
-                  ✅ <b>ABO/RhD result is consistent</b>
-                  <div class='status-row'>
-                    <span class='status-chip {abo_chip}'><span class='chip-label'>ABO</span> {abo_final}</span>
-                    <span class='status-chip {rhd_chip}'><span class='chip-label'>RhD</span> {rhd_final}</span>
-                  </div>
-                </div>
-                """, unsafe_allow_html=True)
-        else:
-            st.caption("Enter grades above, then click **Confirm ABO entry** to generate the interpretation and (if needed) discrepancy guidance.")
-    with st.expander("🧬 Patient Phenotype (optional)", expanded=False):
-        st.caption("Use: Not Done / Not Detected / Detected. Control should be Not Detected.")
-        tab1, tab2 = st.tabs(["Rh phenotype (C/c/E/e/K)", "Extended phenotype"])
-
-        with tab1:
-            p1, p2, p3, p4, p5, p6 = st.columns(6)
-            ph_C  = p1.selectbox("C", PHENO_OPTS, key="ph_rh_C")
-            ph_c  = p2.selectbox("c", PHENO_OPTS, key="ph_rh_c")
-            ph_E  = p3.selectbox("E", PHENO_OPTS, key="ph_rh_E")
-            ph_e  = p4.selectbox("e", PHENO_OPTS, key="ph_rh_e")
-            ph_K  = p5.selectbox("K", PHENO_OPTS, key="ph_rh_K")
-            ph_ctl = p6.selectbox("Control", PHENO_OPTS, key="ph_rh_ctl")
-
-        with tab2:
-            st.markdown("**Card 1** (P1, Lea, Leb, Lua, Lub, Control)")
-            a1, a2, a3, a4, a5, a6 = st.columns(6)
-            ex_P1  = a1.selectbox("P1", PHENO_OPTS, key="ph_ex_P1")
-            ex_Lea = a2.selectbox("Lea", PHENO_OPTS, key="ph_ex_Lea")
-            ex_Leb = a3.selectbox("Leb", PHENO_OPTS, key="ph_ex_Leb")
-            ex_Lua = a4.selectbox("Lua", PHENO_OPTS, key="ph_ex_Lua")
-            ex_Lub = a5.selectbox("Lub", PHENO_OPTS, key="ph_ex_Lub")
-            ex_ctl1 = a6.selectbox("Control", PHENO_OPTS, key="ph_ex_ctl1")
-
-            st.markdown("**Card 2** (k, Kpa, Kpb, Jka, Jkb, Control)")
-            b1, b2, b3, b4, b5, b6 = st.columns(6)
-            ex_k   = b1.selectbox("k", PHENO_OPTS, key="ph_ex_k")
-            ex_Kpa = b2.selectbox("Kpa", PHENO_OPTS, key="ph_ex_Kpa")
-            ex_Kpb = b3.selectbox("Kpb", PHENO_OPTS, key="ph_ex_Kpb")
-            ex_Jka = b4.selectbox("Jka", PHENO_OPTS, key="ph_ex_Jka")
-            ex_Jkb = b5.selectbox("Jkb", PHENO_OPTS, key="ph_ex_Jkb")
-            ex_ctl2 = b6.selectbox("Control", PHENO_OPTS, key="ph_ex_ctl2")
-
-            st.markdown("**Card 3** (M, N, S, s, Fya, Fyb)")
-            c1, c2, c3, c4, c5, c6 = st.columns(6)
-            ex_M   = c1.selectbox("M", PHENO_OPTS, key="ph_ex_M")
-            ex_N   = c2.selectbox("N", PHENO_OPTS, key="ph_ex_N")
-            ex_S   = c3.selectbox("S", PHENO_OPTS, key="ph_ex_S")
-            ex_s   = c4.selectbox("s", PHENO_OPTS, key="ph_ex_s")
-            ex_Fya = c5.selectbox("Fya", PHENO_OPTS, key="ph_ex_Fya")
-            ex_Fyb = c6.selectbox("Fyb", PHENO_OPTS, key="ph_ex_Fyb")
+                st.caption("Enter grades above, then click **Confirm ABO entry** to generate the interpretation and (if needed) discrepancy guidance.")
+
+    abo_section(is_neonate, (age_y + age_m + age_d) > 0)
+
+    @_profiled_fragment("phenotype collection")
+    def phenotype_section():
+        with st.expander("🧬 Patient Phenotype (optional)", expanded=False):
+            st.caption("Use: Not Done / Not Detected / Detected. Control should be Not Detected.")
+            tab1, tab2 = st.tabs(["Rh phenotype (C/c/E/e/K)", "Extended phenotype"])
+
+            with tab1:
+                p1, p2, p3, p4, p5, p6 = st.columns(6)
+                ph_C  = p1.selectbox("C", PHENO_OPTS, key="ph_rh_C")
+                ph_c  = p2.selectbox("c", PHENO_OPTS, key="ph_rh_c")
+                ph_E  = p3.selectbox("E", PHENO_OPTS, key="ph_rh_E")
+                ph_e  = p4.selectbox("e", PHENO_OPTS, key="ph_rh_e")
+                ph_K  = p5.selectbox("K", PHENO_OPTS, key="ph_rh_K")
+                ph_ctl = p6.selectbox("Control", PHENO_OPTS, key="ph_rh_ctl")
+
+            with tab2:
+                st.markdown("**Card 1** (P1, Lea, Leb, Lua, Lub, Control)")
+                a1, a2, a3, a4, a5, a6 = st.columns(6)
+                ex_P1  = a1.selectbox("P1", PHENO_OPTS, key="ph_ex_P1")
+                ex_Lea = a2.selectbox("Lea", PHENO_OPTS, key="ph_ex_Lea")
+                ex_Leb = a3.selectbox("Leb", PHENO_OPTS, key="ph_ex_Leb")
+                ex_Lua = a4.selectbox("Lua", PHENO_OPTS, key="ph_ex_Lua")
+                ex_Lub = a5.selectbox("Lub", PHENO_OPTS, key="ph_ex_Lub")
+                ex_ctl1 = a6.selectbox("Control", PHENO_OPTS, key="ph_ex_ctl1")
+
+                st.markdown("**Card 2** (k, Kpa, Kpb, Jka, Jkb, Control)")
+                b1, b2, b3, b4, b5, b6 = st.columns(6)
+                ex_k   = b1.selectbox("k", PHENO_OPTS, key="ph_ex_k")
+                ex_Kpa = b2.selectbox("Kpa", PHENO_OPTS, key="ph_ex_Kpa")
+                ex_Kpb = b3.selectbox("Kpb", PHENO_OPTS, key="ph_ex_Kpb")
+                ex_Jka = b4.selectbox("Jka", PHENO_OPTS, key="ph_ex_Jka")
+                ex_Jkb = b5.selectbox("Jkb", PHENO_OPTS, key="ph_ex_Jkb")
+                ex_ctl2 = b6.selectbox("Control", PHENO_OPTS, key="ph_ex_ctl2")
+
+                st.markdown("**Card 3** (M, N, S, s, Fya, Fyb)")
+                c1, c2, c3, c4, c5, c6 = st.columns(6)
+                ex_M   = c1.selectbox("M", PHENO_OPTS, key="ph_ex_M")
+                ex_N   = c2.selectbox("N", PHENO_OPTS, key="ph_ex_N")
+                ex_S   = c3.selectbox("S", PHENO_OPTS, key="ph_ex_S")
+                ex_s   = c4.selectbox("s", PHENO_OPTS, key="ph_ex_s")
+                ex_Fya = c5.selectbox("Fya", PHENO_OPTS, key="ph_ex_Fya")
+                ex_Fyb = c6.selectbox("Fyb", PHENO_OPTS, key="ph_ex_Fyb")
+
+    phenotype_section()
 
     def collect_phenotype_results() -> Dict[str, str]:
         ph = {}
@@ -2313,26 +2112,28 @@ else:
                 """, unsafe_allow_html=True)
     
             st.write("Screening")
-            s_I   = st.selectbox("Scn I", GRADES, key="rx_sI")
-            s_II  = st.selectbox("Scn II", GRADES, key="rx_sII")
-            s_III = st.selectbox("Scn III", GRADES, key="rx_sIII")
+            in_s = {}
+            for i in range(len(st.session_state.screen3_df)):
+                k = roman(i + 1)
+                in_s[k] = st.selectbox(f"Scn {k}", GRADES, key=f"rx_s{k}")
     
         with R:
             st.write("Panel Reactions")
+            in_p = {}
+            n_p = len(st.session_state.panel11_df)
             g1, g2 = st.columns(2)
-            with g1:
-                p1 = st.selectbox("1", GRADES, key="rx_p1")
-                p2 = st.selectbox("2", GRADES, key="rx_p2")
-                p3 = st.selectbox("3", GRADES, key="rx_p3")
-                p4 = st.selectbox("4", GRADES, key="rx_p4")
-                p5 = st.selectbox("5", GRADES, key="rx_p5")
-                p6 = st.selectbox("6", GRADES, key="rx_p6")
-            with g2:
-                p7  = st.selectbox("7", GRADES, key="rx_p7")
-                p8  = st.selectbox("8", GRADES, key="rx_p8")
-                p9  = st.selectbox("9", GRADES, key="rx_p9")
-                p10 = st.selectbox("10", GRADES, key="rx_p10")
-                p11 = st.selectbox("11", GRADES, key="rx_p11")
+            for i in range(1, n_p + 1):
+                with (g1 if i <= (n_p + 1) // 2 else g2):
+                    in_p[i] = st.selectbox(str(i), GRADES, key=f"rx_p{i}")
+
+            in_x = {}
+            for xp in st.session_state.extra_panels:
+                st.write(f"{xp['name']} — Lot {xp.get('lot') or '—'}")
+                in_x[xp["key"]] = {}
+                gx = st.columns(4)
+                for i in range(1, len(xp["df"]) + 1):
+                    with gx[(i - 1) % 4]:
+                        in_x[xp["key"]][i] = st.selectbox(str(i), GRADES, key=f"rx_{xp['key']}_{i}")
     
         run_btn = st.form_submit_button("🚀 Run Analysis", use_container_width=True)
     
@@ -2345,12 +2146,10 @@ else:
             st.session_state.analysis_ready = False
             st.session_state.analysis_payload = None
         else:
-            in_p = {1:p1,2:p2,3:p3,4:p4,5:p5,6:p6,7:p7,8:p8,9:p9,10:p10,11:p11}
-            in_s = {"I": s_I, "II": s_II, "III": s_III}
-    
             st.session_state.analysis_payload = {
                 "in_p": in_p,
                 "in_s": in_s,
+                "in_x": in_x,
                 "ac_res": ac_res,
                 "recent_tx": recent_tx,
             }
@@ -2374,11 +2173,12 @@ else:
     if st.session_state.analysis_ready and st.session_state.analysis_payload:
         in_p = st.session_state.analysis_payload["in_p"]
         in_s = st.session_state.analysis_payload["in_s"]
+        in_x = st.session_state.analysis_payload.get("in_x", {})
         ac_res = st.session_state.analysis_payload["ac_res"]
         recent_tx = st.session_state.analysis_payload["recent_tx"]
 
         ac_negative = (ac_res == "Negative")
-        all_rx = all_reactive_pattern(in_p, in_s)
+        all_rx = all_reactive_pattern(in_p, in_s, in_x)
 
         # PAN-REACTIVE LOGIC
         if all_rx and ac_negative:
@@ -2497,10 +2297,10 @@ else:
             details = {"pattern": "pan_reactive_ac_positive"}
 
         else:
-            cells = get_cells(in_p, in_s, st.session_state.ext)
-            ruled = rule_out(in_p, in_s, st.session_state.ext)
-            candidates = [a for a in AGS if a not in ruled and a not in IGNORED_AGS]
-            best = find_best_combo(candidates, cells, max_size=3)
+            with _prof_section("antibody engine"):
+                res = analyze_workup(in_p, in_s, st.session_state.ext, in_x, ac_res, recent_tx)  # shared LRU
+            candidates = res["candidates"]
+            best = res["best"]
 
             st.subheader("Conclusion (Step 1: Rule-out / Rule-in)")
 
@@ -2515,13 +2315,13 @@ else:
                     if poss_cold:
                         st.info("Cold/Insignificant possibilities: " + ", ".join([f"Anti-{x}" for x in poss_cold]))
 
-                conclusion_short = "No resolved specificity (needs selected cells / more work)"
-                details = {"best_combo": None, "candidates_not_excluded": candidates}
+                conclusion_short = res["conclusion_short"]
+                details = res["details"]
 
             else:
-                sep_map = separability_map(best, cells)
-                resolved = [a for a in best if sep_map.get(a, False)]
-                needs_work = [a for a in best if not sep_map.get(a, False)]
+                expl = res["explanations"]
+                resolved = res["resolved"]
+                needs_work = res["needs_work"]
 
                 if resolved:
                     st.success("Resolved (pattern explained & separable): " + ", ".join([f"Anti-{a}" for a in resolved]))
@@ -2529,20 +2329,46 @@ else:
                     st.warning("Pattern suggests these, but NOT separable yet (DO NOT confirm): " +
                                ", ".join([f"Anti-{a}" for a in needs_work]))
 
-                remaining_other = [a for a in candidates if a not in best]
-                other_sig = [a for a in remaining_other if a not in INSIGNIFICANT_AGS]
-                other_cold = [a for a in remaining_other if a in INSIGNIFICANT_AGS]
-
-                active_not_excluded = set(resolved + needs_work + other_sig + other_cold)
-
-                auto_ruled_out, supported_bg, inconclusive_bg, no_disc_bg = background_auto_resolution(
-                    background_list=other_sig + other_cold,
-                    active_not_excluded=active_not_excluded,
-                    cells=cells
-                )
-
-                other_sig_final = [a for a in other_sig if a not in auto_ruled_out]
-                other_cold_final = [a for a in other_cold if a not in auto_ruled_out]
+                if len(expl["combos"]) > 1 or not expl["complete"]:
+                    n_alt = len(expl["combos"])
+                    more = "" if expl["complete"] else " (search budget reached — list may be incomplete)"
+                    st.markdown(f"### ⚠️ {n_alt} equally minimal explanation(s) of {expl['size']} antibod"
+                                f"{'y' if expl['size'] == 1 else 'ies'}{more}:")
+                    for combo in expl["combos"]:
+                        st.write("- " + " + ".join([f"Anti-{a}" for a in combo]) +
+                                 ("  ← shown above" if tuple(combo) == tuple(best) else ""))
+                    st.caption("Each set alone explains every positive cell with no conflict on negative cells. "
+                               "Selected cells must separate them before any is confirmed.")
+
+                ranking = res.get("ranking")
+                if ranking and ranking["ranked"]:
+                    ranked = ranking["ranked"]
+                    with st.expander("📈 Graded-strength fit (dosage-aware ranking)"):
+                        if not ranking["graded"]:
+                            st.caption("No graded reactions entered (+1..+4): every positive counts as +2, so the fit only reflects dosage.")
+                        st.dataframe(pd.DataFrame([
+                            {"Explanation": " + ".join(f"Anti-{a}" for a in r["combo"]), "Fit": f"{r['score']:.0%}",
+                             "Homozygous / full cells": r["full"], "Heterozygous-only cells": r["het"]}
+                            for r in ranked
+                        ]), use_container_width=True, hide_index=True)
+                        top = [r for r in ranked if "cells" in r]
+                        tabs = st.tabs([" + ".join(f"Anti-{a}" for a in r["combo"]) for r in top])
+                        for tab, r in zip(tabs, top):
+                            tab.dataframe(pd.DataFrame([
+                                {"Cell": c["cell"], "Grade": c["grade"], "Expression": c["expression"],
+                                 "Expected": c["expected"], "Residual": c["residual"]}
+                                for c in r["cells"]
+                            ]), use_container_width=True, hide_index=True)
+                        st.caption("Fit compares entered grades with expression (homozygous 1, heterozygous "
+                                   "½ for dosage antigens). Ranking only: it never confirms or rules out. "
+                                   f"{len(ranked)} set(s) scored in {ranking['ms']:.1f} ms.")
+
+                auto_ruled_out = res["auto_ruled_out"]
+                supported_bg = res["supported_bg"]
+                inconclusive_bg = res["inconclusive_bg"]
+                no_disc_bg = res["no_disc_bg"]
+                other_sig_final = res["other_sig_final"]
+                other_cold_final = res["other_cold_final"]
 
                 if auto_ruled_out:
                     st.markdown("### ✅ Auto Rule-out (from available discriminating cells):")
@@ -2572,55 +2398,51 @@ else:
                 st.write("---")
                 st.subheader("Confirmation (Rule of Three) — Resolved & Separable only")
 
-                confirmation = {}
-                confirmed = set()
-                needs_more_for_confirmation = set()
+                confirmation = res["confirmation"]
+                confirmed = set(res["confirmed"])
+                stat_mode = st.toggle("Statistical confirmation (Fisher exact / Harris–Hochman)", key="stat_confirm")
+                cstats = res.get("confirmation_stats") or {}
 
                 if not resolved:
                     st.info("No antibody is separable yet → DO NOT apply Rule of Three. Add discriminating selected cells.")
                 else:
-                    for a in resolved:
-                        full, mod, p_cnt, n_cnt = check_rule_three_only_on_discriminating(a, best, cells)
-                        confirmation[a] = (full, mod, p_cnt, n_cnt)
-                        if full or mod:
-                            confirmed.add(a)
-                        else:
-                            needs_more_for_confirmation.add(a)
-
                     for a in resolved:
                         full, mod, p_cnt, n_cnt = confirmation[a]
+                        stat_txt = ""
+                        if stat_mode and a in cstats:
+                            cs = cstats[a]
+                            stat_txt = (f" · Fisher p = {cs['fisher_p']:.3g}, Harris–Hochman P = {cs['hh_p']:.3g} "
+                                        f"{'(p ≤ ' + str(STAT_ALPHA) + ')' if cs['supported'] else '(not significant)'}")
                         if full:
-                            st.write(f"✅ **Anti-{a} CONFIRMED**: Full Rule (3+3) met on discriminating cells (P:{p_cnt} / N:{n_cnt})")
+                            st.write(f"✅ **Anti-{a} CONFIRMED**: Full Rule (3+3) met on discriminating cells (P:{p_cnt} / N:{n_cnt}){stat_txt}")
                         elif mod:
-                            st.write(f"✅ **Anti-{a} CONFIRMED**: Modified Rule (2+3) met on discriminating cells (P:{p_cnt} / N:{n_cnt})")
+                            st.write(f"✅ **Anti-{a} CONFIRMED**: Modified Rule (2+3) met on discriminating cells (P:{p_cnt} / N:{n_cnt}){stat_txt}")
                         else:
-                            st.write(f"⚠️ **Anti-{a} NOT confirmed yet**: need more discriminating cells (P:{p_cnt} / N:{n_cnt})")
-
-                if confirmed:
-                    st.markdown(patient_antigen_negative_reminder(sorted(list(confirmed)), strong=True), unsafe_allow_html=True)
-                elif resolved:
-                    st.markdown(patient_antigen_negative_reminder(sorted(list(resolved)), strong=False), unsafe_allow_html=True)
-
-                d_present = ("D" in confirmed) or ("D" in resolved) or ("D" in needs_work)
-                c_present = ("C" in confirmed) or ("C" in resolved) or ("C" in needs_work) or ("C" in supported_bg) or ("C" in other_sig_final)
-                if d_present and c_present:
-                    strong = ("D" in confirmed and "C" in confirmed)
-                    st.markdown(anti_g_alert_html(strong=strong), unsafe_allow_html=True)
+                            st.write(f"⚠️ **Anti-{a} NOT confirmed yet**: need more discriminating cells (P:{p_cnt} / N:{n_cnt}){stat_txt}")
+                    if stat_mode:
+                        st.caption("Counts as the rule of three (discriminating cells). Fisher: one-sided exact test of "
+                                   "antigen vs reactivity on cells without the other suspects' antigens; Harris–Hochman: chance of the concordant split, "
+                                   "a!·d!/(a+d)! (3+3 = 0.05). Statistics are saved with the case; the rule still decides.")
+
+                with _prof_section("report render"):
+                    if confirmed:
+                        st.markdown(patient_antigen_negative_reminder(sorted(list(confirmed)), strong=True), unsafe_allow_html=True)
+                    elif resolved:
+                        st.markdown(patient_antigen_negative_reminder(sorted(list(resolved)), strong=False), unsafe_allow_html=True)
+
+                    d_present = ("D" in confirmed) or ("D" in resolved) or ("D" in needs_work)
+                    c_present = ("C" in confirmed) or ("C" in resolved) or ("C" in needs_work) or ("C" in supported_bg) or ("C" in other_sig_final)
+                    if d_present and c_present:
+                        strong = ("D" in confirmed and "C" in confirmed)
+                        st.markdown(anti_g_alert_html(strong=strong), unsafe_allow_html=True)
 
                 st.write("---")
 
-                targets_needing_selected = list(dict.fromkeys(
-                    needs_work +
-                    list(needs_more_for_confirmation) +
-                    list(supported_bg.keys()) +
-                    other_sig_final
-                ))
+                targets_needing_selected = res["targets_needing_selected"]
 
                 if targets_needing_selected:
                     st.markdown("### 🧪 Selected Cells (Only if needed to resolve interference / exclude / confirm)")
                     for a in targets_needing_selected:
-                        active_set_now = set(resolved + needs_work + other_sig_final + list(supported_bg.keys()))
-
                         if a in needs_work:
                             st.warning(f"Anti-{a}: **Interference / not separable** → need {a}+ cells NEGATIVE for other active suspects.")
                         elif a in other_sig_final:
@@ -2630,60 +2452,104 @@ else:
                         else:
                             st.info(f"Anti-{a}: **Not confirmed yet** → need more discriminating cells.")
 
-                        sugg = suggest_selected_cells(a, list(active_set_now))
+                        sugg = res["suggestions"].get(a, [])
                         if sugg:
-                            for lab, note in sugg[:12]:
+                            for lab, note in sugg:
                                 st.write(f"- {lab}  <span class='cell-hint'>{note}</span>", unsafe_allow_html=True)
                         else:
                             st.write("- No suitable discriminating cell in current inventory → use another lot / external selected cells.")
+                        cat_sugg = res["catalog"].get(a, [])
+                        if cat_sugg:
+                            st.write("From selected-cell catalog: " + ", ".join(
+                                f"{lab} <span class='cell-hint'>{note}</span>" for lab, note in cat_sugg),
+                                unsafe_allow_html=True)
 
-                    enz = enzyme_hint_if_needed(targets_needing_selected)
+                    enz = res["enzyme_hint"]
                     if enz:
                         st.info("💡 " + enz)
+
+                    plan = res.get("plan")
+                    if plan and plan["cells"]:
+                        opt = "minimum" if plan["optimal"] else f"near-minimum (≥ {plan['lower_bound']} needed)"
+                        st.markdown(f"### 📋 Test plan from selected-cell catalog: {plan['size']} cell(s) ({opt})")
+                        st.dataframe(pd.DataFrame([
+                            {"Cell": c["cell"], "Expected if suspects are correct": c["expected"],
+                             "Serves": ", ".join(c["serves"])}
+                            for c in plan["cells"]
+                        ]), use_container_width=True, hide_index=True)
+                        st.caption("pos:X = discriminating X+ cell toward rule of three · neg:X = cell negative for all "
+                                   "active suspects · disc:X = discriminating X+ cell to exclude background Anti-X. "
+                                   f"{plan['inventory']} usable catalog cell(s), {plan['method']}, {plan['ms']:.0f} ms.")
+                    if plan and plan["shortfall"]:
+                        st.warning("Inventory cannot close: " + ", ".join(
+                            f"{name} (short {n})" for name, n in plan["shortfall"].items())
+                                   + " → use another lot / reference lab.")
                 else:
                     st.success("No Selected Cells needed: all resolved antibodies are confirmed AND no clinically significant background remains unexcluded.")
 
-                confirmed_list = sorted(list(confirmed)) if isinstance(confirmed, set) else []
-                resolved_list = resolved if isinstance(resolved, list) else []
-                needs_work_list = needs_work if isinstance(needs_work, list) else []
-                supported_list = sorted(list(supported_bg.keys())) if isinstance(supported_bg, dict) else []
-
-                if confirmed_list:
-                    conclusion_short = "Confirmed: " + ", ".join([f"Anti-{x}" for x in confirmed_list])
-                elif resolved_list:
-                    conclusion_short = "Resolved (not fully confirmed): " + ", ".join([f"Anti-{x}" for x in resolved_list])
-                else:
-                    conclusion_short = "Unresolved / Needs more work"
-
-                details = {
-                    "best_combo": list(best),
-                    "resolved": resolved_list,
-                    "needs_work": needs_work_list,
-                    "confirmed": confirmed_list,
-                    "supported_bg": supported_list,
-                    "not_excluded_sig": other_sig_final if isinstance(other_sig_final, list) else [],
-                    "not_excluded_cold": other_cold_final if isinstance(other_cold_final, list) else [],
-                    "no_discriminating": no_disc_bg if isinstance(no_disc_bg, list) else []
-                }
+                conclusion_short = res["conclusion_short"]
+                details = res["details"]
+                if stat_mode and cstats:
+                    details = {**details, "confirmation_stats": cstats, "stat_alpha": STAT_ALPHA}
 
     # ----------------------------------------------------------------------
     # Selected cells expander (unchanged)
     # ----------------------------------------------------------------------
-    with st.expander("➕ Add Selected Cell (From Library)"):
-        ex_id = st.text_input("ID", key="ex_id")
-        ex_res = st.selectbox("Reaction", GRADES, key="ex_res")
-        ag_cols = st.columns(6)
-        new_ph = {}
-        for i, ag in enumerate(AGS):
-            new_ph[ag] = 1 if ag_cols[i%6].checkbox(ag, key=f"ex_{ag}") else 0
-
-        if st.button("Confirm Add", key="btn_add_ex"):
-            st.session_state.ext.append({"id": ex_id.strip() if ex_id else "", "res": normalize_grade(ex_res), "ph": new_ph})
-            st.success("Added — updating interpretation…")
-            st.rerun()
-
-    if st.session_state.ext:
-        st.table(pd.DataFrame(st.session_state.ext)[["id","res"]])
+    @_profiled_fragment()
+    def selected_cells_section():
+        # Confirm Add / Remove change the workup: st.rerun() reruns the whole page
+        with st.expander("➕ Add Selected Cell (From Library)"):
+            cat = cell_catalog()
+            cat_pick = None
+            if len(cat):
+                sig_ags = [a for a in AGS if a not in IGNORED_AGS]
+                cq1, cq2, cq3 = st.columns([2, 2, 1])
+                q_pos = cq1.multiselect("Catalog: positive for", sig_ags, key="cat_q_pos")
+                q_neg = cq2.multiselect("Negative for", [a for a in sig_ags if a not in q_pos], key="cat_q_neg")
+                q_homo = cq3.checkbox("Homozygous", key="cat_q_homo")
+                hits = cat.query(pos=q_pos, neg=q_neg, homozygous=q_pos if q_homo else ())
+                opts = ["— enter phenotype manually —"] + [str(i) for i in cat.indices(hits)]
+                cat_sel = st.selectbox(f"Catalog cell ({hits.bit_count()} unexpired match(es))", opts, key="cat_pick",
+                                       format_func=lambda o: o if o.startswith("—") else cat.label(int(o)))
+                if not cat_sel.startswith("—"):
+                    cat_pick = cat.df.iloc[int(cat_sel)]
+            if cat_pick is None:
+                ex_id = st.text_input("ID", key="ex_id")
+            ex_res = st.selectbox("Reaction", GRADES, key="ex_res")
+            new_ph = {}
+            if cat_pick is None:
+                ag_cols = st.columns(6)
+                for i, ag in enumerate(AGS):
+                    new_ph[ag] = 1 if ag_cols[i%6].checkbox(ag, key=f"ex_{ag}") else 0
+            else:
+                ex_id = f"{cat_pick['ID']} (Lot {cat_pick['Lot']})" if cat_pick["Lot"] else cat_pick["ID"]
+                new_ph = {ag: int(cat_pick[ag]) for ag in AGS}
+                st.caption("Phenotype from catalog: " + " ".join(f"{ag}{'+' if new_ph[ag] else '−'}" for ag in AGS))
+
+            if st.button("Confirm Add", key="btn_add_ex"):
+                st.session_state.ext.append({"id": ex_id.strip() if ex_id else "", "res": normalize_grade(ex_res),
+                                             "grade": ex_res, "ph": new_ph})
+                st.success("Added — updating interpretation…")
+                st.rerun()
+
+        if st.session_state.ext:
+            for j, ex in enumerate(list(st.session_state.ext)):
+                xc = st.columns([4, 1, 1])
+                xc[0].write(f"Selected: {ex.get('id') or '(no-id)'}")
+                xc[1].write("Positive" if ex.get("res") else "Negative")
+                if xc[2].button("Remove", key=f"rm_ex_{j}"):
+                    st.session_state.ext.pop(j)
+                    st.rerun()
+
+    selected_cells_section()
+
+    delta = st.session_state.get("cell_delta")
+    if delta:
+        what = f"{delta['action']} Selected: {delta['cell']} ({'positive' if delta['res'] else 'negative'})"
+        if delta["changes"]:
+            st.info(f"**{what}** changed:\n" + "\n".join(f"- {c}" for c in delta["changes"]))
+        else:
+            st.caption(f"{what}: no change to the interpretation.")
 
     # ----------------------------------------------------------------------
 # SINGLE SAVE (saves everything: demographics + ABO + phenotype + antibody ID)
@@ -2706,16 +2572,19 @@ else:
                 # in_p/in_s may not exist if user didn't run analysis; handle gracefully
                 in_p = {}
                 in_s = {}
+                in_x = {}
                 ac_res_sv = _safe_str(st.session_state.get("rx_ac",""))
                 recent_tx_sv = bool(st.session_state.get("recent_tx", False))
                 if st.session_state.analysis_payload:
                     in_p = st.session_state.analysis_payload.get("in_p", {})
                     in_s = st.session_state.analysis_payload.get("in_s", {})
+                    in_x = st.session_state.analysis_payload.get("in_x", {}) or {}
                     ac_res_sv = st.session_state.analysis_payload.get("ac_res", ac_res_sv)
                     recent_tx_sv = bool(st.session_state.analysis_payload.get("recent_tx", recent_tx_sv))
 
                 # phenotype results
-                ph = collect_phenotype_results()
+                with _prof_section("phenotype collection"):
+                    ph = collect_phenotype_results()
 
                 # conflict notes (if antibodies exist)
                 suspected_abs = []
@@ -2778,6 +2647,13 @@ else:
                     "interpretation": details or {},
                     "conclusion_short": conclusion_short
                 }
+                if in_x:
+                    # additional panels evaluated in the same pass (own antigram + lot)
+                    payload["inputs"]["extra_panels"] = [
+                        {"key": xp["key"], "name": xp["name"], "lot": xp.get("lot", ""),
+                         "reactions": in_x.get(xp["key"], {})}
+                        for xp in st.session_state.extra_panels if xp["key"] in in_x
+                    ]
 
                 # fingerprint excludes saved_at/case_id (for duplicate detection)
                 fp_obj = {
@@ -2793,7 +2669,8 @@ else:
                     "interpretation": payload["interpretation"],
                     "conclusion_short": _safe_str(conclusion_short),
                 }
-                fingerprint = _make_fingerprint(fp_obj)
+                with _prof_section("save"):
+                    fingerprint = _make_fingerprint(fp_obj)
 
                 record = {
                     "case_id": case_id,
@@ -2819,8 +2696,36 @@ else:
                     "summary_json": json.dumps(payload, ensure_ascii=False)
                 }
 
-                ok, msg = save_case_to_github(record)
+                with _prof_section("save"):  # enqueue only: the GitHub commit runs on the spool worker
+                    ok, msg, item_id = queue_case_save(record)
                 if ok:
-                    st.success("Saved ✅ (GitHub history updated)")
+                    st.session_state.last_save_item = item_id
                 else:
                     st.warning("⚠️ " + msg)
+
+    # status of the last queued save (synced in the background)
+    if st.session_state.get("last_save_item"):
+        try:
+            item = _save_spool().get(st.session_state.last_save_item)
+        except Exception:
+            item = None
+        if item and item["status"] == "synced":
+            st.success(f"Saved ✅ (GitHub history updated) — case {item['case_id']}")
+        elif item and item["status"] == "duplicate":
+            st.warning("⚠️ " + item["last_error"])
+        elif item:
+            note = f" — retry {item['attempts']}: {item['last_error']}" if item["attempts"] else ""
+            st.info(f"Queued ⏳ case {item['case_id']} — syncing to GitHub in the background{note}")
+
+# =============================================================================
+# 8) PROFILING OVERLAY (opt-in, see section 1)
+# =============================================================================
+# full reruns cut short by st.rerun() / st.stop() never get here and are not recorded
+# (fragment reruns are recorded by _profiled_fragment)
+if PROF.enabled:
+    _prof_rec = PROF.close()
+    _profile_ring().add(_prof_rec)
+    with prof_box.container():
+        st.markdown("---")
+        st.markdown("**⏱️ This rerun**")
+        _render_profile(_prof_rec)
@@ -0,0 +1,174 @@
+"""
+Exhaustive ABO / RhD regression harness: interpret_abo_rhd, build_abo_guidance and
+build_how_to_report over the whole adult and neonate grade space, against a
+committed golden manifest (benchmarks/golden/abo_golden.json).
+
+Per well tuple (8^6 per space, wells as in bloodbank.abo_table.SPACES):
+  interpret   x screen_any_positive (neonate also x purpose Transfusion / RhIG)
+  guidance    x screen (negative / one cell positive / all positive)
+  report      x screen_any_positive x mixed_field_history (recent_tx, hsct_bm),
+              on the Transfusion interpretation
+Purpose is only read by interpret_abo_rhd; DAT wells and the cord-sample flag
+stay at their defaults (Not Done / False).
+Each output is hashed (blake2b of its repr); the manifest keeps one digest per
+slice of 512 tuples (first three wells fixed) and the set of known output
+hashes per function. A changed slice is reported with every input in it whose
+output hash is new, plus throughput and the slowest single calls.
+
+    python benchmarks/bench_abo_sweep.py [--workers 4] [--update] [--slowest 10]
+    python benchmarks/bench_abo_sweep.py --only adult:Mixed-field   # quick partial check
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bloodbank.abo import ABO_GRADES, interpret_abo_rhd, build_abo_guidance, build_how_to_report  # noqa: E402
+from bloodbank.abo_table import SPACES  # noqa: E402
+
+GOLDEN = Path(__file__).resolve().parent / "golden" / "abo_golden.json"
+FUNCS = ("interpret", "guidance", "report")
+SCREENS = {
+    "negative": {"I": "0", "II": "0", "III": "0"},
+    "one_pos": {"I": "+2", "II": "0", "III": "0"},
+    "all_pos": {"I": "+2", "II": "+2", "III": "+2"},
+}
+DAT = {"igg": "Not Done", "c3d": "Not Done", "ctl": "Not Done"}
+HISTORY = [{"recent_tx": tx, "hsct_bm": bm} for tx in (False, True) for bm in (False, True)]
+PREFIX = 3
+MAX_NEW_PER_SLICE = 5
+
+_known = {}  # golden output hashes per function (set in each worker)
+
+
+def _h(obj) -> str:
+    # outputs are str / bool / list / dict built in a fixed order: repr is stable and ~3x cheaper than JSON
+    return hashlib.blake2b(repr(obj).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _init(known):
+    _known.update({f: set(v) for f, v in known.items()})
+
+
+def sweep_slice(space: str, prefix: tuple) -> dict:
+    """Every input whose first wells are `prefix`: slice digest, output hashes, new outputs, slowest calls."""
+    neo = space == "neonate"
+    keys = SPACES[space]
+    purposes = ("Transfusion", "RhIG") if neo else ("Transfusion",)
+    slice_h = hashlib.blake2b(digest_size=8)
+    seen = {f: set() for f in FUNCS}
+    new, slow = [], []
+    calls = 0
+    timed = {f: 0.0 for f in FUNCS}
+
+    def record(fn: str, inputs: dict, out, sec: float):
+        nonlocal calls
+        calls += 1
+        timed[fn] += sec
+        h = _h(out)
+        slice_h.update(h.encode("ascii"))
+        seen[fn].add(h)
+        if _known and h not in _known.get(fn, ()) and len(new) < MAX_NEW_PER_SLICE:
+            new.append({"fn": fn, "input": inputs, "hash": h, "output": out})
+        if len(slow) < 5:
+            heapq.heappush(slow, (sec, fn, json.dumps(inputs)))
+        elif sec > slow[0][0]:
+            heapq.heapreplace(slow, (sec, fn, json.dumps(inputs)))
+
+    clock = time.perf_counter
+    for rest in product(ABO_GRADES, repeat=len(keys) - len(prefix)):
+        raw = dict(zip(keys, prefix + rest))
+        base = {"space": space, "raw": raw}
+        interp = {}
+        for purpose in purposes:
+            for sp in (False, True):
+                t0 = clock()
+                out = interpret_abo_rhd(neo, purpose, raw, sp)
+                record("interpret", {**base, "purpose": purpose, "screen_any_positive": sp}, out, clock() - t0)
+                if purpose == "Transfusion":
+                    interp[sp] = out
+        for name, grades in SCREENS.items():
+            t0 = clock()
+            out = build_abo_guidance(neo, "Transfusion", raw, grades, DAT)
+            record("guidance", {**base, "screen": name}, out, clock() - t0)
+        for sp in (False, True):
+            for hist in HISTORY:
+                t0 = clock()
+                out = build_how_to_report(neo, interp[sp], raw, sp, hist)
+                record("report", {**base, "screen_any_positive": sp, "history": hist}, out, clock() - t0)
+    return {"key": f"{space}:{'/'.join(prefix)}", "digest": slice_h.hexdigest(), "calls": calls, "timed": timed,
+            "seen": {f: sorted(v) for f, v in seen.items()}, "new": new, "slow": slow}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--update", action="store_true", help="write the current outputs as the golden manifest")
+    ap.add_argument("--golden", default=str(GOLDEN))
+    ap.add_argument("--slowest", type=int, default=10)
+    ap.add_argument("--only", default="", help="sweep only slices whose key starts with this (e.g. neonate:+4)")
+    args = ap.parse_args()
+    if args.only and args.update:
+        ap.error("--update needs the full sweep")
+
+    golden = None
+    if Path(args.golden).exists() and not args.update:
+        golden = json.loads(Path(args.golden).read_text(encoding="utf-8"))
+    known = golden["outputs"] if golden else {}
+
+    tasks = [(space, prefix) for space in SPACES for prefix in product(ABO_GRADES, repeat=PREFIX)
+             if f"{space}:{'/'.join(prefix)}".startswith(args.only)]
+    t0 = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init, initargs=(known,)) as pool:
+        for res in pool.map(sweep_slice, *zip(*tasks), chunksize=4):
+            results.append(res)
+    sec = time.perf_counter() - t0
+
+    calls = sum(r["calls"] for r in results)
+    timed = {f: sum(r["timed"][f] for r in results) for f in FUNCS}
+    outputs = {f: sorted(set().union(*(r["seen"][f] for r in results))) for f in FUNCS}
+    print(f"{len(tasks)} slices, {calls} calls in {sec:.1f}s = {calls / sec:,.0f} calls/s ({args.workers} workers)")
+    print("  " + ", ".join(f"{f}: {len(outputs[f])} distinct outputs, {timed[f] / sec:.1f} worker-s/s" for f in FUNCS))
+    slow = heapq.nlargest(args.slowest, (s for r in results for s in r["slow"]))
+    print(f"slowest {len(slow)} calls:")
+    for s, fn, inputs in slow:
+        print(f"  {s * 1e6:8.1f} us  {fn:<9} {inputs}")
+
+    manifest = {"version": 1, "spaces": SPACES, "grades": ABO_GRADES, "screens": SCREENS, "dat": DAT,
+                "calls": calls, "slices": {r["key"]: r["digest"] for r in results}, "outputs": outputs}
+    if args.update or golden is None:
+        Path(args.golden).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.golden).write_text(json.dumps(manifest, indent=0, sort_keys=True), encoding="utf-8")
+        print(f"golden manifest written: {args.golden}")
+        return
+
+    changed = [r for r in results if golden["slices"].get(r["key"]) != r["digest"]]
+    missing = {k for k in golden["slices"] if k.startswith(args.only)} - {r["key"] for r in results}
+    for r in changed[:20]:
+        print(f"CHANGED slice {r['key']}")
+        for n in r["new"]:
+            print(f"  new {n['fn']} output {n['hash']} for {json.dumps(n['input'])}")
+            print("    " + json.dumps(n["output"], ensure_ascii=False)[:400])
+        if not r["new"]:
+            print("  (only known outputs, reassigned to other inputs)")
+    bad = len(changed) + len(missing)
+    if args.only:
+        print(f"vs golden ({len(results)} of {len(golden['slices'])} slices): {len(changed)} changed slice(s)")
+    else:
+        gone = {f: len(set(golden["outputs"].get(f, [])) - set(outputs[f])) for f in FUNCS}
+        print(f"vs golden: {len(changed)} changed slice(s), {len(missing)} missing, outputs no longer produced: {gone}")
+        bad += sum(gone.values()) + (golden.get("calls") != calls)
+    print("ABO sweep:", "OK" if not bad else "DIFFERS from golden (rerun with --update once the change is intended)")
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
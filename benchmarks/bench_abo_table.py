@@ -0,0 +1,69 @@
+"""
+Benchmark / check for the precompiled ABO / RhD decision table (bloodbank.abo_table).
+
+  - load time of data/abo_table.bin (decompress + intern results)
+  - random adult / neonate inputs (some with off-table values such as "" or
+    "+4 " that must fall back to the code): lookup result == interpret_abo_rhd,
+    and per-call time table vs reference
+  - --full: every entry vs interpret_abo_rhd (same as `python -m bloodbank.abo_table check`)
+
+    python benchmarks/bench_abo_table.py [--calls 200000] [--full] [--workers 4]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bloodbank.abo import ABO_GRADES, interpret_abo_rhd  # noqa: E402
+from bloodbank import abo_table  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=200000)
+    ap.add_argument("--full", action="store_true")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+
+    t0 = time.perf_counter()
+    tbl = abo_table.AboDecisionTable.load()
+    print(f"load {(time.perf_counter() - t0) * 1e3:.1f} ms: {len(tbl.table)} entries, "
+          f"{len(tbl.results)} distinct results, fresh={tbl.fresh}")
+    bad = not tbl.fresh
+
+    grades = ABO_GRADES + ["", "+4 ", "weak"]  # last three are off-table
+    inputs = []
+    for _ in range(args.calls):
+        neo = rng.random() < 0.5
+        keys = abo_table.SPACES["neonate" if neo else "adult"]
+        raw = {k: rng.choice(grades if rng.random() < 0.02 else ABO_GRADES) for k in keys}
+        inputs.append((neo, rng.choice(["Transfusion", "RhIG"]), raw, rng.random() < 0.3))
+
+    t0 = time.perf_counter()
+    got = [abo_table.interpret_abo_rhd_lookup(*x) for x in inputs]
+    t_tab = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ref = [interpret_abo_rhd(*x) for x in inputs]
+    t_ref = time.perf_counter() - t0
+    mism = sum(g != r for g, r in zip(got, ref))
+    off = sum(tbl.index(*x) is None for x in inputs)
+    bad += mism
+    print(f"{args.calls} calls ({off} off-table): table {t_tab / args.calls * 1e6:.2f} us/call, "
+          f"reference {t_ref / args.calls * 1e6:.2f} us/call ({t_ref / t_tab:.1f}x); mismatches {mism}")
+
+    if args.full:
+        t0 = time.perf_counter()
+        full = tbl.check(args.workers)
+        bad += len(full)
+        print(f"full check: {len(tbl.table)} entries in {time.perf_counter() - t0:.1f}s, mismatches {len(full)}")
+    print("decision table:", "OK" if not bad else "MISMATCH")
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
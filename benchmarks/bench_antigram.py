@@ -0,0 +1,151 @@
+"""
+Benchmark: reference per-cell engine vs compiled bitmask engine (CompiledCells).
+
+Builds random antigrams (pandas rows, like the workstation) with 14 and 60 cells
+and reactions explained by 1-3 antibodies, checks that both paths give identical
+answers, then times a full interpretation pass
+(rule-out -> best combo -> separability -> background -> rule of three).
+
+Multi-panel workups (ID panel + screen + extra panels, 30-60 cells) are timed the
+way the workstation runs them: build_panel_cells + per-panel cached masks.
+
+Run from the repo root:
+    python benchmarks/bench_antigram.py [--cases 200] [--seed 1]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bloodbank import antibody as ab  # noqa: E402
+
+
+def random_case(n_cells: int, rng: random.Random):
+    """Random antigram + reactions explained by 1-3 'true' antibodies (like a real workup)."""
+    rows = []
+    for i in range(n_cells):
+        row = {"ID": f"C{i+1}"}
+        for ag in ab.AGS:
+            row[ag] = 1 if rng.random() < 0.45 else 0
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    sig = [a for a in ab.AGS if a not in ab.IGNORED_AGS]
+    truth = rng.sample(sig, rng.randint(1, 3))
+    cells = []
+    for i in range(n_cells):
+        react = 1 if any(rows[i][a] == 1 for a in truth) else 0
+        if rng.random() < 0.03:
+            react = 1 - react  # occasional noise
+        cells.append({"label": f"Cell #{i+1}", "react": react, "ph": df.iloc[i]})
+    return df, cells
+
+
+def interpret_reference(cells: list):
+    ruled = ab.rule_out_cells(cells)
+    candidates = [a for a in ab.AGS if a not in ruled and a not in ab.IGNORED_AGS]
+    best = ab.find_best_combo(candidates, cells, max_size=3)
+    if not best:
+        return ruled, None, None, None, None
+    sep = ab.separability_map(best, cells)
+    resolved = [a for a in best if sep[a]]
+    other = [a for a in candidates if a not in best]
+    bg = ab.background_auto_resolution(other, set(best) | set(other), cells)
+    r3 = {a: ab.check_rule_three_only_on_discriminating(a, best, cells) for a in resolved}
+    return ruled, best, sep, bg, r3
+
+
+def interpret_compiled(cells: list, masks=None):
+    eng = ab.CompiledCells(cells, masks)
+    ruled = eng.rule_out()
+    candidates = [a for a in ab.AGS if a not in ruled and a not in ab.IGNORED_AGS]
+    best = eng.find_best_combo(candidates, max_size=3)
+    if not best:
+        return ruled, None, None, None, None
+    sep = eng.separability_map(best)
+    resolved = [a for a in best if sep[a]]
+    other = [a for a in candidates if a not in best]
+    bg = eng.background_auto_resolution(other, set(best) | set(other))
+    r3 = {a: eng.check_rule_three_only_on_discriminating(a, best) for a in resolved}
+    return ruled, best, sep, bg, r3
+
+
+def _time(fn, inputs) -> float:
+    t0 = time.perf_counter()
+    for args in inputs:
+        fn(*args)
+    return (time.perf_counter() - t0) / len(inputs) * 1000
+
+
+def run(n_cells: int, n_cases: int, seed: int):
+    rng = random.Random(seed)
+    cases = [random_case(n_cells, rng) for _ in range(n_cases)]
+    # the workstation compiles the antigram once (cached) and reuses it per run
+    masks = [ab.compile_antigram(df) for df, _ in cases]
+
+    mismatches = 0
+    for (df, cells), m in zip(cases, masks):
+        ref = interpret_reference(cells)
+        if ref != interpret_compiled(cells) or ref != interpret_compiled(cells, m):
+            mismatches += 1
+
+    t_ref = _time(interpret_reference, [(cells,) for _, cells in cases])
+    t_cold = _time(interpret_compiled, [(cells,) for _, cells in cases])
+    t_warm = _time(interpret_compiled, [(cells, m) for (_, cells), m in zip(cases, masks)])
+
+    print(f"{n_cells:>3} cells | reference {t_ref:8.3f} ms | compiled+compile {t_cold:8.3f} ms "
+          f"(x{t_ref / t_cold:5.1f}) | precompiled antigram {t_warm:8.3f} ms (x{t_ref / t_warm:6.1f}) "
+          f"| mismatches {mismatches}/{n_cases}")
+    return mismatches
+
+
+def run_multi(sizes: tuple, n_cases: int, seed: int):
+    """sizes: cells per panel, e.g. (16, 3, 11) = 16-cell ID panel + screen + second lot."""
+    rng = random.Random(seed)
+    mismatches, t_build, t_interp = 0, 0.0, 0.0
+    for _ in range(n_cases):
+        dfs, rx_all = [], []
+        for n in sizes:
+            df, cells = random_case(n, rng)
+            dfs.append(df)
+            rx_all.append({i + 1: ("+2" if c["react"] else "0") for i, c in enumerate(cells)})
+        panels = [ab.panel_spec(f"p{j}", f"Panel {j}", df) for j, df in enumerate(dfs)]
+        reactions = {p["key"]: rx for p, rx in zip(panels, rx_all)}
+        cached = {id(df): ab.compile_antigram(df) for df in dfs}  # st.cache_data in the app
+
+        t0 = time.perf_counter()
+        cells = ab.build_panel_cells(panels, reactions, [])
+        masks = ab.compile_panels(panels, [], lambda df: cached[id(df)])
+        t1 = time.perf_counter()
+        res = interpret_compiled(cells, masks)
+        t2 = time.perf_counter()
+        t_build += t1 - t0
+        t_interp += t2 - t1
+        mismatches += res != interpret_reference(cells)
+
+    total = sum(sizes)
+    print(f"{total:>3} cells {str(sizes):>14} | build cells {t_build / n_cases * 1000:6.3f} ms | "
+          f"interpret {t_interp / n_cases * 1000:6.3f} ms | mismatches {mismatches}/{n_cases}")
+    return mismatches
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    bad = 0
+    for n in (14, 60):
+        bad += run(n, args.cases, args.seed)
+    for sizes in ((11, 3, 16), (16, 3, 11, 11), (16, 3, 16, 16, 11)):
+        bad += run_multi(sizes, args.cases, args.seed)
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
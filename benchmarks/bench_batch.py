@@ -0,0 +1,130 @@
+"""
+Benchmark / check for the headless batch runner (bloodbank.batch).
+
+Writes a random antigram dir (p11.csv, p3.csv) and N synthetic cases (flat CSV
+rows and saved-payload JSONL lines: 1-3 antibodies, occasional pan-reactive
+patterns, random adult / neonate ABO grades and mixed-field history flags) to a
+temp dir, runs run_batch with 1 and --workers processes, and checks a sample of
+results against an in-process interpretation (analyze_specificity /
+interpret_abo_rhd / build_how_to_report called directly).
+
+    python benchmarks/bench_batch.py [--cases 20000] [--workers 4] [--seed 1]
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bloodbank import antibody as ab  # noqa: E402
+from bloodbank import batch  # noqa: E402
+from bloodbank.abo import interpret_abo_rhd, build_how_to_report  # noqa: E402
+
+GRADES = ["0", "+1", "+2", "+3", "+4"]
+ABO = ["Not Done", "0", "+1", "+2", "+3", "+4", "Mixed-field"]
+
+
+def write_antigram(d: Path, rng: random.Random):
+    d.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame([{"ID": f"C{i+1}", **{a: int(rng.random() < .45) for a in ab.AGS}} for i in range(11)]) \
+        .to_csv(d / "p11.csv", index=False)
+    pd.DataFrame([{"ID": f"S{ab.roman(i+1)}", **{a: int(rng.random() < .45) for a in ab.AGS}} for i in range(3)]) \
+        .to_csv(d / "p3.csv", index=False)
+
+
+def random_case(k: int, p11: pd.DataFrame, p3: pd.DataFrame, rng: random.Random) -> dict:
+    sig = [a for a in ab.AGS if a not in ab.IGNORED_AGS]
+    truth = rng.sample(sig, rng.randint(1, 3))
+    pan = rng.random() < 0.05
+    grade = (lambda row: rng.choice(GRADES[1:]) if pan or any(row[a] for a in truth) else "0")
+    neonate = rng.random() < 0.2
+    raw = {"mode": "neonate" if neonate else "adult", "purpose": "Transfusion",
+           "antiA": rng.choice(ABO), "antiB": rng.choice(ABO), "antiD": rng.choice(ABO), "ctl": "0"}
+    raw.update({"antiAB": rng.choice(ABO), "dat": rng.choice(ABO)} if neonate else
+               {"a1cells": rng.choice(ABO), "bcells": rng.choice(ABO)})
+    in_p = {str(i + 1): grade(r) for i, r in enumerate(p11.to_dict("records"))}
+    in_s = {ab.roman(i + 1): grade(r) for i, r in enumerate(p3.to_dict("records"))}
+    ac = "Positive" if rng.random() < 0.1 else "Negative"
+    mf = {"abo_recent_tx": rng.random() < 0.3, "abo_hsct_bm": rng.random() < 0.3}
+    recent_tx = rng.random() < 0.3  # antibody-ID input: must not change the ABO report
+    if k % 2:
+        return {"case_id": f"K{k}", "inputs": {"panel_reactions": in_p, "screen_reactions": in_s, "AC": ac,
+                                             "recent_tx": recent_tx}, "abo": {"raw": raw},
+                "demographics": {"age_y": 0 if neonate else 40}, **mf}
+    row = {"case_id": f"K{k}", "ac": ac, "recent_tx": str(int(recent_tx)), "age_y": 0 if neonate else 40,
+           **{c: str(int(v)) for c, v in mf.items()}}
+    row.update({f"p{i}": g for i, g in in_p.items()})
+    row.update({f"s{i}": g for i, g in in_s.items()})
+    row.update({f"abo_{key}": v for key, v in raw.items()})
+    return row
+
+
+def direct(rec: dict, p11: pd.DataFrame, p3: pd.DataFrame) -> dict:
+    """In-process reference: same calls the workstation makes, no batch plumbing."""
+    case = batch.normalize_case(rec)
+    panels = ab.standard_panels(p11, p3)
+    rx = {"panel": case["in_p"], "screen": case["in_s"]}
+    if ab.all_reactive(panels, rx):
+        concl = batch.PAN_AC_NEG if case["ac"] == "Negative" else batch.PAN_AC_POS
+    else:
+        concl = ab.analyze_specificity(ab.CompiledCells(ab.build_cells(p11, p3, case["in_p"], case["in_s"], [])),
+                                       panels)["conclusion_short"]
+    raw = case["abo_raw"]
+    full = {k: raw.get(k, "Not Done") for k in batch.ABO_KEYS}
+    screen_pos = any(g not in ("0", "Not Done") for g in case["in_s"].values())
+    neonate = raw.get("mode") == "neonate"
+    interp = interpret_abo_rhd(neonate, "Transfusion", {**raw, **full}, screen_pos)
+    mf = {"recent_tx": str(rec.get("abo_recent_tx")) in ("1", "True"), "hsct_bm": str(rec.get("abo_hsct_bm")) in ("1", "True")}
+    return {"conclusion_short": concl, "abo_final": interp["abo_final"], "rhd_final": interp["rhd_final"],
+            "how_to_report": build_how_to_report(neonate, interp, full, screen_pos, mf)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=20000)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        antigram = tmp / "antigram"
+        write_antigram(antigram, rng)
+        p11, p3 = pd.read_csv(antigram / "p11.csv"), pd.read_csv(antigram / "p3.csv")
+        src = tmp / "cases.jsonl"
+        with open(src, "w", encoding="utf-8") as fh:
+            for k in range(args.cases):
+                fh.write(json.dumps(random_case(k, p11, p3, rng)) + "\n")
+
+        print(f"{'workers':>7} | {'cases':>6} | {'sec':>6} | {'cases/s':>8} | {'p50 ms':>6} {'p95 ms':>6} | errors")
+        for workers in sorted({1, args.workers}):
+            out = tmp / f"out-{workers}.jsonl"
+            with open(out, "w", encoding="utf-8") as fh:
+                st = batch.run_batch(batch.read_cases(str(src)), fh, str(antigram), workers=workers)
+            print(f"{workers:>7} | {st['cases']:>6} | {st['sec']:6.1f} | {st['cases_per_sec']:8.0f} | "
+                  f"{st['case_ms_p50']:6.2f} {st['case_ms_p95']:6.2f} | {st['errors']}")
+
+        bad = st["errors"] + (st["cases"] != args.cases)
+        recs = list(batch.read_cases(str(src)))
+        with open(out, encoding="utf-8") as fh:
+            for i, line in enumerate(fh):
+                if i % max(1, args.cases // 300):
+                    continue
+                got = json.loads(line)
+                ref = direct(recs[i], p11, p3)
+                bad += got["case_id"] != recs[i]["case_id"] or got["conclusion_short"] != ref["conclusion_short"] \
+                    or got["abo"]["abo_final"] != ref["abo_final"] or got["abo"]["rhd_final"] != ref["rhd_final"] \
+                    or got["abo"]["how_to_report"] != ref["how_to_report"]
+        print(f"peak RSS {st['peak_rss_mb']:.0f} MB (parent); order + sampled results vs direct calls:",
+              "OK" if not bad else f"{bad} mismatch(es)")
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark / check for the selected-cell catalog index (bloodbank.cell_catalog).
+
+Random catalogs (several lots, mixed expiry dates, some without expiry) of
+200..5000 cells. Random queries (1-2 positive antigens, optional homozygous,
+2-5 negative antigens, optional lot filter, a query date) are answered by
+CellCatalog.query and by a per-row reference filter; results must match.
+Times: index build, query (microseconds), pandas boolean-mask filter.
+
+    python benchmarks/bench_cell_catalog.py [--queries 2000] [--seed 1]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bloodbank import antibody as ab  # noqa: E402
+from bloodbank.cell_catalog import CellCatalog, _parse_date  # noqa: E402
+
+TODAY = date(2026, 1, 15)
+
+
+def random_catalog(n: int, rng: random.Random) -> pd.DataFrame:
+    lots = [f"L{k}" for k in range(max(2, n // 40))]
+    rows = []
+    for i in range(n):
+        lot = rng.choice(lots)
+        exp = "" if rng.random() < 0.1 else (TODAY + timedelta(days=rng.randint(-60, 120))).isoformat()
+        rows.append({"ID": f"R{i + 1}", "Lot": lot, "Expiry": exp,
+                     **{a: 1 if rng.random() < 0.45 else 0 for a in ab.AGS}})
+    return pd.DataFrame(rows)
+
+
+def random_query(cat: CellCatalog, rng: random.Random) -> dict:
+    sig = [a for a in ab.AGS if a not in ab.IGNORED_AGS]
+    pos = rng.sample(sig, rng.randint(1, 2))
+    neg = rng.sample([a for a in sig if a not in pos], rng.randint(2, 5))
+    homo = [a for a in pos if a in ab.DOSAGE_SET and rng.random() < 0.5]
+    lots = rng.sample(sorted(cat.lot), 2) if rng.random() < 0.3 else None
+    return {"pos": pos, "neg": neg, "homozygous": homo, "lots": lots,
+            "on_date": TODAY + timedelta(days=rng.randint(-30, 60))}
+
+
+def reference(rows: list, q: dict) -> list:
+    out = []
+    for i, r in enumerate(rows):
+        exp = _parse_date(r["Expiry"])
+        if exp is not None and exp < q["on_date"]:
+            continue
+        if q["lots"] is not None and r["Lot"] not in q["lots"]:
+            continue
+        if not all(ab.ph_has(r, a) for a in q["pos"]) or any(ab.ph_has(r, a) for a in q["neg"]):
+            continue
+        if not all(ab.is_homozygous(r, a) for a in q["homozygous"]):
+            continue
+        out.append(i)
+    return out
+
+
+def pandas_filter(df: pd.DataFrame, q: dict) -> list:
+    m = (df["Expiry"].eq("")) | (pd.to_datetime(df["Expiry"], errors="coerce").dt.date >= q["on_date"])
+    for a in q["pos"]:
+        m &= df[a].eq(1)
+    for a in q["homozygous"]:
+        m &= df[ab.PAIRS[a]].eq(0)
+    for a in q["neg"]:
+        m &= df[a].eq(0)
+    if q["lots"] is not None:
+        m &= df["Lot"].isin(q["lots"])
+    return list(df.index[m])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+
+    bad = 0
+    print(f"{'cells':>6} | {'build ms':>8} | {'query us':>8} | {'pandas us':>9} | {'avg hits':>8} | mismatches")
+    for n in (200, 1000, 5000):
+        df = random_catalog(n, rng)
+        t0 = time.perf_counter()
+        cat = CellCatalog(df)
+        t_build = (time.perf_counter() - t0) * 1000
+        rows = cat.df.to_dict("records")
+        queries = [random_query(cat, rng) for _ in range(args.queries)]
+
+        t0 = time.perf_counter()
+        masks = [cat.query(**q) for q in queries]
+        t_q = (time.perf_counter() - t0) / len(queries) * 1e6
+
+        n_pd = min(len(queries), 200)
+        t0 = time.perf_counter()
+        for q in queries[:n_pd]:
+            pandas_filter(cat.df, q)
+        t_pd = (time.perf_counter() - t0) / n_pd * 1e6
+
+        mism = 0
+        for q, m in list(zip(queries, masks))[:500]:
+            got = ab._bits(m)
+            mism += got != reference(rows, q)
+            mism += got != pandas_filter(cat.df, q)
+        bad += mism
+        hits = sum(m.bit_count() for m in masks) / len(masks)
+        print(f"{n:>6} | {t_build:8.1f} | {t_q:8.1f} | {t_pd:9.0f} | {hits:8.1f} | {mism}")
+    print("catalog index:", "OK" if not bad else f"{bad} mismatch(es)")
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
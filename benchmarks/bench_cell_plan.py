@@ -0,0 +1,139 @@
+"""
+Benchmark / check for the selected-cell test planner (bloodbank.cell_plan).
+
+Random workups (11-cell panel + 3-cell screen, 1-3 antibodies) with an untested
+inventory of 20..200 cells; targets = best combo, background = a few other
+not-excluded antibodies. Checks:
+  - every plan meets every demand the inventory can meet (per-cell re-count)
+  - plan size equals a brute-force minimum over small (10-cell) inventories
+  - latency for a 200-cell inventory (target < 200 ms)
+
+    python benchmarks/bench_cell_plan.py [--cases 60] [--seed 1]
+"""
+import argparse
+import random
+import sys
+import time
+from itertools import combinations
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bloodbank import antibody as ab  # noqa: E402
+from bloodbank.cell_plan import plan_selected_cells  # noqa: E402
+from bench_antigram import random_case  # noqa: E402
+
+
+def inventory(n: int, rng: random.Random) -> pd.DataFrame:
+    return pd.DataFrame([{"ID": f"SC{i + 1}", **{a: 1 if rng.random() < 0.4 else 0 for a in ab.AGS}}
+                         for i in range(n)])
+
+
+def reference_plan_ok(eng, targets, background, combo, inv_df, subset) -> bool:
+    """Per-cell re-count of every demand after testing `subset` (independent of the masks)."""
+    active = list(dict.fromkeys(list(combo) + targets + [b for b in background if b not in targets]))
+    tested = [(c["react"], c["ph"]) for c in eng.cells]
+    rows = inv_df.to_dict("records")
+    added = [(None, rows[i]) for i in subset]
+
+    def pos_of(ph, a):
+        return ab.ph_has(ph, a)
+
+    for t in targets:
+        others = [a for a in active if a != t]
+        disc_pos = [(r, ph) for r, ph in tested if r and pos_of(ph, t) and not any(pos_of(ph, o) for o in others)]
+        neg_now = [(r, ph) for r, ph in tested if not r and not pos_of(ph, t)]
+        p_inv = [ph for _, ph in added if pos_of(ph, t) and not any(pos_of(ph, o) for o in others)]
+        n_inv = [ph for _, ph in added if not any(pos_of(ph, a) for a in active)]
+        p_avail = sum(1 for i in range(len(inv_df)) if pos_of(rows[i], t)
+                      and not any(pos_of(rows[i], o) for o in others))
+        n_avail = sum(1 for i in range(len(inv_df)) if not any(pos_of(rows[i], a) for a in active))
+        if len(disc_pos) + len(p_inv) < min(3, len(disc_pos) + p_avail):
+            return False
+        if len(neg_now) + len(n_inv) < min(3, len(neg_now) + n_avail):
+            return False
+    for b in [b for b in background if b not in targets]:
+        others = [a for a in active if a != b]
+        have = sum(1 for r, ph in tested if not r and pos_of(ph, b) and not any(pos_of(ph, o) for o in others))
+        got = sum(1 for _, ph in added if pos_of(ph, b) and not any(pos_of(ph, o) for o in others))
+        avail = sum(1 for i in range(len(inv_df)) if pos_of(rows[i], b)
+                    and not any(pos_of(rows[i], o) for o in others))
+        if have + got < min(1, have + avail):
+            return False
+    return True
+
+
+def brute_force_size(eng, targets, background, combo, inv_df) -> int:
+    n = len(inv_df)
+    for k in range(n + 1):
+        for sub in combinations(range(n), k):
+            if reference_plan_ok(eng, targets, background, combo, inv_df, sub):
+                return k
+    return n
+
+
+def workup(rng: random.Random, n_inv: int):
+    _, cells = random_case(14, rng)
+    eng = ab.CompiledCells(cells)
+    ruled = eng.rule_out()
+    cands = [a for a in ab.AGS if a not in ruled and a not in ab.IGNORED_AGS]
+    best = list(eng.find_best_combo(cands, max_size=3) or [])
+    background = [a for a in cands if a not in best][:rng.randint(2, 4)]
+    inv_df = inventory(n_inv, rng)
+    return eng, best, background, inv_df
+
+
+def check_brute_force(rng: random.Random, cases: int, n_inv: int = 10) -> int:
+    bad = 0
+    for _ in range(cases):
+        eng, best, background, inv_df = workup(rng, n_inv)
+        plan = plan_selected_cells(eng, best, background, best, ab.compile_antigram(inv_df),
+                                   inv_df["ID"].tolist())
+        ok = reference_plan_ok(eng, best, background, best, inv_df, [c["index"] for c in plan["cells"]])
+        ok = ok and plan["size"] == brute_force_size(eng, best, background, best, inv_df)
+        bad += not ok
+    print(f"brute force ({n_inv}-cell inventories, {cases} cases):", "OK" if not bad else f"{bad} mismatch(es)")
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=60)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+
+    bad = check_brute_force(rng, max(10, args.cases // 3))
+    print(f"{'inventory':>9} | {'ms avg':>7} {'ms max':>7} | {'cells':>5} {'lower':>5} | {'optimal':>7} "
+          f"| {'greedy cells':>12} | valid")
+    for n_inv in (20, 50, 100, 200):
+        t_all, sizes, lows, optimal, greedy_sizes, ok = [], 0, 0, 0, 0, 0
+        for _ in range(args.cases):
+            eng, best, background, inv_df = workup(rng, n_inv)
+            inv = ab.compile_antigram(inv_df)
+            labels = inv_df["ID"].tolist()
+            t0 = time.perf_counter()
+            plan = plan_selected_cells(eng, best, background, best, inv, labels)
+            t_all.append((time.perf_counter() - t0) * 1000)
+            greedy = plan_selected_cells(eng, best, background, best, inv, labels, exact_max_cells=0)
+            good = plan["size"] <= greedy["size"] and all(
+                reference_plan_ok(eng, best, background, best, inv_df, [c["index"] for c in p["cells"]])
+                for p in (plan, greedy))
+            ok += good
+            bad += not good
+            sizes += plan["size"]
+            lows += plan["lower_bound"]
+            optimal += plan["optimal"]
+            greedy_sizes += greedy["size"]
+        n = args.cases
+        print(f"{n_inv:>9} | {sum(t_all) / n:7.2f} {max(t_all):7.2f} | {sizes / n:5.2f} {lows / n:5.2f} | "
+              f"{optimal:>7} | {greedy_sizes / n:12.2f} | {ok}/{n}")
+    print("planner:", "OK" if not bad else f"{bad} failure(s)")
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
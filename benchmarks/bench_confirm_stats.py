@@ -0,0 +1,105 @@
+"""
+Benchmark / check for statistical confirmation (bloodbank.confirm_stats).
+
+1) Fisher one-sided p for every 2x2 table with N <= 10 against a permutation
+   count (all ways to place the reactive cells), and Harris-Hochman against
+   the factorial formula a! d! / (a + d)!.
+2) Random 14-cell workups: for every resolved antibody, Harris-Hochman must use
+   the rule-of-three counts (a = P, n = N) and the Fisher table must match a
+   per-cell count over the cells without other suspects' antigens; per-rerun
+   cost is timed cold (empty memo) and warm.
+
+    python benchmarks/bench_confirm_stats.py [--cases 500] [--seed 1]
+"""
+import argparse
+import random
+import sys
+import time
+from itertools import combinations
+from math import factorial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bloodbank import antibody as ab  # noqa: E402
+from bloodbank import confirm_stats as cs  # noqa: E402
+from bench_antigram import random_case  # noqa: E402
+
+
+def permutation_p(a: int, b: int, c: int, d: int) -> float:
+    """Place a + c reactive cells among N at random: share with >= a of them on the first a + b cells."""
+    n, r1, k = a + b + c + d, a + b, a + c
+    subsets = list(combinations(range(n), k))
+    return sum(1 for s in subsets if sum(1 for i in s if i < r1) >= a) / len(subsets)
+
+
+def check_tables() -> int:
+    bad = n = 0
+    for total in range(1, 11):
+        for a in range(total + 1):
+            for b in range(total - a + 1):
+                for c in range(total - a - b + 1):
+                    d = total - a - b - c
+                    if not (a + b) or not (a + c):
+                        continue
+                    n += 1
+                    bad += abs(cs.fisher_one_sided(a, b, c, d) - permutation_p(a, b, c, d)) > 1e-12
+                    ref = factorial(a) * factorial(d) / factorial(a + d)
+                    bad += abs(cs.harris_hochman(a, d) - ref) > 1e-12
+    print(f"{n} tables (N <= 10) vs permutation count / factorial formula: mismatches {bad}")
+    return bad
+
+
+def cell_table(cells, ag: str, combo) -> tuple:
+    """Fisher table counted cell by cell (reference for confirmation_table)."""
+    t = [0, 0, 0, 0]
+    for c in cells:
+        if any(c["ph"].get(x, 0) for x in combo if x != ag):
+            continue
+        t[(0 if c["ph"].get(ag, 0) else 2) + (0 if c["react"] else 1)] += 1
+    return tuple(t)
+
+
+def check_workups(n_cases: int, rng: random.Random) -> int:
+    bad = runs = 0
+    t_cold = t_warm = 0.0
+    for _ in range(n_cases):
+        _, cells = random_case(14, rng)
+        eng = ab.CompiledCells(cells)
+        res = ab.analyze_specificity(eng, [], explain_budget_sec=None) if eng.pos else {"best": None}
+        if not res["best"] or not res["resolved"]:
+            continue
+        runs += 1
+        cs.fisher_one_sided.cache_clear()
+        cs.harris_hochman.cache_clear()
+        t0 = time.perf_counter()
+        stats = cs.confirmation_stats(eng, res)
+        t_cold += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        cs.confirmation_stats(eng, res)
+        t_warm += time.perf_counter() - t0
+        for ag, st in stats.items():
+            _, _, p, n = res["confirmation"][ag]
+            bad += (st["table"][0], st["n"]) != (p, n)
+            bad += tuple(st["table"]) != cell_table(cells, ag, res["best"])
+            bad += st["hh_p"] != round(cs.harris_hochman(p, n), 6)
+            full = res["confirmation"][ag][0]
+            bad += full and st["hh_p"] > cs.STAT_ALPHA + 1e-12  # 3+3 or better is always <= 0.05
+    print(f"{runs} workups with resolved antibodies: stats {t_cold / max(runs, 1) * 1e6:.1f} us cold, "
+          f"{t_warm / max(runs, 1) * 1e6:.1f} us memoized; mismatches vs rule-of-three counts / per-cell tables {bad}")
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    bad = check_tables() + check_workups(args.cases, random.Random(args.seed))
+    print("confirmation statistics:", "OK" if not bad else f"{bad} mismatch(es)")
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark / check for exhaustive minimal-explanation enumeration
+(bloodbank.antibody.minimal_covers / CompiledCells.minimal_explanations).
+
+1) Real antigrams (14 and 60 cells, 1-3 true antibodies): every minimal set must
+   match brute-force itertools enumeration, and combos[0] must equal find_best_combo.
+2) Synthetic stress: 20-30 candidate antibodies over 30-60 positive cells with a
+   planted explanation of size 3..5 (plus decoys overlapping it). Checked against
+   brute force and timed; the interactive target is well under a second.
+
+Run from the repo root:
+    python benchmarks/bench_explanations.py [--cases 200] [--seed 1]
+"""
+import argparse
+import random
+import sys
+import time
+from itertools import combinations
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bloodbank import antibody as ab  # noqa: E402
+from bench_antigram import random_case  # noqa: E402
+
+
+def brute_force(target: int, covers: list, max_size: int):
+    for r in range(1, max_size + 1):
+        found = []
+        for combo in combinations(range(len(covers)), r):
+            m = 0
+            for i in combo:
+                m |= covers[i]
+            if m & target == target:
+                found.append(combo)
+        if found:
+            return found
+    return []
+
+
+def check_antigrams(n_cells: int, n_cases: int, rng: random.Random) -> int:
+    bad, t_total, multi = 0, 0.0, 0
+    for _ in range(n_cases):
+        _, cells = random_case(n_cells, rng)
+        eng = ab.CompiledCells(cells)
+        ruled = eng.rule_out()
+        candidates = [a for a in ab.AGS if a not in ruled and a not in ab.IGNORED_AGS]
+        best = eng.find_best_combo(candidates, max_size=3)
+        t0 = time.perf_counter()
+        res = eng.minimal_explanations(candidates, max_size=3, time_budget_sec=None)
+        t_total += time.perf_counter() - t0
+        # brute force on the same validity rules as find_best_combo
+        ref = [c for r in range(1, 4) for c in combinations(candidates, r)
+               if eng.combo_valid_against_negatives(c) and eng.combo_covers_all_positives(c)]
+        ref = [c for c in ref if len(c) == len(ref[0])] if ref else []
+        if eng.pos == 0:
+            ok = res["combos"] == []
+        else:
+            ok = sorted(map(sorted, res["combos"])) == sorted(map(sorted, ref)) and \
+                 (tuple(res["combos"][0]) if res["combos"] else None) == best
+        bad += 0 if ok else 1
+        multi += len(res["combos"]) > 1
+    print(f"{n_cells:>3}-cell antigrams: {n_cases} cases, {t_total / n_cases * 1000:.3f} ms avg, "
+          f"{multi} with >1 minimal explanation, mismatches {bad}")
+    return bad
+
+
+def planted_case(n_cands: int, n_pos: int, size: int, rng: random.Random):
+    """n_cands cover masks over n_pos positive cells; a planted partition of size `size`
+    is a minimum cover; decoys take 50-100% of one or two planted blocks plus noise,
+    so several equally minimal sets usually exist."""
+    cells = list(range(n_pos))
+    rng.shuffle(cells)
+    blocks = [cells[i::size] for i in range(size)]
+    covers = [sum(1 << c for c in b) for b in blocks]
+    while len(covers) < n_cands:
+        part = rng.sample(cells, rng.randint(0, 2))
+        for b in rng.sample(blocks, rng.choice((1, 1, 2))):
+            part += rng.sample(b, max(1, round(len(b) * rng.choice((0.5, 0.8, 1.0)))))
+        covers.append(sum(1 << c for c in set(part)))
+    rng.shuffle(covers)
+    return (1 << n_pos) - 1, covers
+
+
+def check_planted(rng: random.Random, reps: int) -> int:
+    bad = 0
+    print(f"{'cands':>5} {'cells':>5} {'size':>4} | {'B&B ms':>8} {'nodes':>7} | {'brute ms':>9} | sets")
+    for n_cands, n_pos in ((20, 30), (25, 45), (30, 60)):
+        for size in (3, 4, 5):
+            t_bb = t_bf = 0.0
+            nodes = sets = 0
+            for _ in range(reps):
+                target, covers = planted_case(n_cands, n_pos, size, rng)
+                t0 = time.perf_counter()
+                res = ab.minimal_covers(target, covers, max_size=5, time_budget_sec=2.0)
+                t_bb += time.perf_counter() - t0
+                t0 = time.perf_counter()
+                ref = brute_force(target, covers, 5)
+                t_bf += time.perf_counter() - t0
+                nodes += res["nodes"]
+                sets += len(res["combos"])
+                if not res["complete"] or res["combos"] != sorted(ref):
+                    bad += 1
+            print(f"{n_cands:>5} {n_pos:>5} {size:>4} | {t_bb / reps * 1000:8.2f} {nodes // reps:>7} | "
+                  f"{t_bf / reps * 1000:9.1f} | {sets / reps:.1f}")
+    print("planted covers:", "OK" if not bad else f"{bad} mismatch(es)")
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=200)
+    ap.add_argument("--reps", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    bad = check_antigrams(14, args.cases, rng) + check_antigrams(60, args.cases, rng)
+    bad += check_planted(rng, args.reps)
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark / smoke check for bloodbank.export against the local fake GitHub server.
+
+Seeds N saved cases, then:
+  - sequential (1 worker) vs pooled (8 workers) export throughput, with a
+    simulated network round trip per request
+  - peak Python memory for N and 4N cases: payload memory stays at one chunk;
+    only the tree listing (~a few hundred bytes per case) grows with N
+  - interruption after the second chunk, then resume from the checkpoint
+    (no duplicate / missing rows)
+  - re-export into the same dir with a larger chunk size: no chunk of the
+    earlier export is left behind
+
+    python benchmarks/bench_export.py [--cases 1000] [--latency 0.01]
+"""
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bloodbank.github import GitHubClient  # noqa: E402
+from bloodbank import export as ex  # noqa: E402
+from fake_github import FakeGitHub  # noqa: E402
+
+
+def seed(srv: FakeGitHub, n: int, rng: random.Random):
+    entries = {}
+    for i in range(n):
+        mrn = str(100000 + i // 3)
+        case_id = f"{mrn}_2026-01-{1 + i % 28:02d}_{i}"
+        payload = {
+            "patient": {"name": f"P{i}", "mrn": mrn},
+            "demographics": {"sex": rng.choice(["M", "F"]), "age_y": rng.randint(0, 90), "age_m": 0, "age_d": 0},
+            "tech": rng.choice(["sara", "omar"]), "run_dt": "2026-01-01", "saved_at": "2026-01-01 10:00:00",
+            "abo": {"abo_final": rng.choice("ABO"), "rhd_final": "RhD Positive", "notes": ["n1", "n2"],
+                    "raw": {"antiA": "+4", "antiB": "0"}},
+            "phenotype": {"results": {"C": "+", "E": "0"}},
+            "inputs": {"panel_reactions": {f"p{k}": rng.choice(["0", "+1"]) for k in range(1, 12)}, "AC": "Negative"},
+            "selected_cells": [{"id": "X1", "res": "0", "ph": {"E": 1}}],
+            "interpretation": {"best_combo": ["E"], "confirmed": ["E"]},
+            "conclusion_short": "Anti-E" + " " * rng.randint(0, 400),
+        }
+        data = json.dumps(payload, indent=2).encode("utf-8")
+        entries[f"data/history/{mrn}/{case_id}.json"] = srv._put_blob(data)
+        entries[f"data/history/{mrn}/index/2026-01.jsonl"] = srv._put_blob(b"{}\n")
+    with srv.lock:
+        srv._advance(entries, "seed")
+
+
+def run(client, out, trace: bool = False, **kw):
+    shutil.rmtree(out, ignore_errors=True)
+    if not trace:
+        return ex.export_cases(client, out, **kw), 0
+    tracemalloc.start()
+    res = ex.export_cases(client, out, **kw)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return res, peak
+
+
+def read_all(out: str, fmt: str) -> pd.DataFrame:
+    files = sorted(Path(out).glob(f"cases-*.{fmt}"))
+    return pd.concat([pd.read_parquet(f) if fmt == "parquet" else pd.read_csv(f) for f in files])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=1000)
+    ap.add_argument("--latency", type=float, default=0.01)
+    args = ap.parse_args()
+
+    fmt = "parquet" if ex.HAS_PARQUET else "csv"
+    rng = random.Random(1)
+    tmp = Path(tempfile.mkdtemp())
+    srv = FakeGitHub()
+    seed(srv, args.cases, rng)
+    client = GitHubClient("x", "o/r", api_base=srv.url)
+
+    srv.latency = args.latency
+    for workers in (1, 8):
+        res, _ = run(client, str(tmp / f"w{workers}"), fmt=fmt, workers=workers, chunk_size=200)
+        print(f"{workers} worker(s)   : {res['cases']} cases in {res['sec']:6.2f}s "
+              f"({res['cases'] / res['sec']:7.0f} cases/s) | {res['chunks']} {fmt} chunks")
+    srv.latency = 0.0
+
+    # peak memory, N vs 4N cases (same chunk size)
+    _, peak1 = run(GitHubClient("x", "o/r", api_base=srv.url), str(tmp / "m1"), trace=True,
+                   fmt=fmt, workers=8, chunk_size=200)
+    srv2 = FakeGitHub()
+    seed(srv2, args.cases * 4, rng)
+    _, peak4 = run(GitHubClient("x", "o/r", api_base=srv2.url), str(tmp / "m4"), trace=True,
+                   fmt=fmt, workers=8, chunk_size=200)
+    srv2.stop()
+    print(f"peak memory   : {args.cases} cases {peak1 / 1e6:5.1f} MB | {args.cases * 4} cases {peak4 / 1e6:5.1f} MB "
+          f"(+{(peak4 - peak1) / (3 * args.cases):.0f} B per extra case: tree listing only)")
+
+    # interruption after two chunks, then resume
+    out = str(tmp / "resume")
+    shutil.rmtree(out, ignore_errors=True)
+
+    def boom(done, total):
+        if done >= 400:
+            raise KeyboardInterrupt
+
+    try:
+        ex.export_cases(client, out, fmt=fmt, workers=8, chunk_size=200, progress=boom)
+    except KeyboardInterrupt:
+        pass
+    res = ex.export_cases(client, out, fmt=fmt, workers=8, chunk_size=200)
+    df = read_all(out, fmt)
+    ok = res["resumed_from"] == 400 and len(df) == args.cases and df["case_id"].is_unique
+    print(f"resume check  : resumed from {res['resumed_from']} | rows {len(df)} | unique {df['case_id'].is_unique} "
+          f"| columns {len(df.columns)} -> {'OK' if ok else 'FAILED'}")
+
+    (Path(out) / f"cases-00009.{fmt}.tmp").write_text("x")  # interrupted write of an earlier run
+    res = ex.export_cases(client, out, fmt=fmt, workers=8, chunk_size=args.cases // 2 + 1)
+    df = read_all(out, fmt)
+    left = sorted(f.name for f in Path(out).glob("cases-*"))
+    fresh = len(left) == res["chunks"] == 2 and len(df) == args.cases and df["case_id"].is_unique
+    print(f"re-export     : {res['chunks']} chunk(s), files {left} | rows {len(df)} -> {'OK' if fresh else 'FAILED'}")
+    ok = ok and fresh
+
+    srv.stop()
+    shutil.rmtree(tmp, ignore_errors=True)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
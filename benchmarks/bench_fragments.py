@@ -0,0 +1,164 @@
+"""
+Workstation rerun latency per widget section, measured with streamlit.testing AppTest.
+
+Setup: MRN with saved history on a fake GitHub (--latency s per request), an
+antibody panel entered and analysed, patient history expander open. Then, per
+section, one widget is changed repeatedly and the rerun it triggers is timed:
+  - full      AppTest.run(): the whole script, what any widget change cost
+              before the sections were fragments
+  - fragment  the rerun the browser requests for a widget inside an
+              st.fragment: only that fragment function runs. AppTest has no
+              public hook for it, so the run is requested with the fragment's
+              id, looked up by function name in AppTest's fragment storage
+              after each full run
+Sections without a fragment report "-" in the fragment column.
+AppTest builds a new ScriptCache per run, i.e. recompiles (and magic-rewrites)
+the 2,800-line script every time, ~200 ms that a server pays once per process;
+one cache is shared across runs here so both columns show the production cost.
+
+    python benchmarks/bench_fragments.py [--repeats 5] [--latency 0.02]
+"""
+import argparse
+import functools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.testing.v1 import app_test, local_script_runner  # noqa: E402
+from fake_github import FakeGitHub  # noqa: E402
+
+APP = str(Path(__file__).resolve().parents[1] / "app.py")
+MRN = "111"
+# section -> (fragment function name in app.py, widget key, values cycled through)
+SECTIONS = {
+    "ABO / RhD / DAT": ("abo_section", "abo_adult_antiA", ["+4", "0", "+2"]),
+    "Phenotype": ("phenotype_section", "ph_rh_C", ["Detected", "Not Detected", "Not Done"]),
+    "Selected-cell adder": ("selected_cells_section", "ex_K", [True, False]),
+    "Patient history": ("history_section", f"hist_pick_{MRN}", [1, 0]),
+}
+
+
+def _seed_history(srv: FakeGitHub, n: int = 12):
+    rows, cases = [], {}
+    for i in range(n):
+        cid = f"{MRN}_2026-09-{1 + i:02d}_10-00-00"
+        row = {"case_id": cid, "saved_at": f"2026-09-{1 + i:02d} 10:00:00", "mrn": MRN,
+               "conclusion_short": f"run {i}", "abo_final": "O", "rhd_final": "RhD Positive"}
+        rows.append(json.dumps(row))
+        cases[cid] = {**row, "patient": {"name": "Test", "mrn": MRN}, "abo": {"abo_final": "O"}}
+    srv.put_text(f"data/history/{MRN}/index/2026-09.jsonl", "\n".join(rows) + "\n")
+    srv.put_text(f"data/history/{MRN}/index/manifest.json", json.dumps(
+        {"mrn": MRN, "total": n, "last_saved_at": cases[cid]["saved_at"], "last_conclusion": "run",
+         "shards": [{"name": "2026-09", "count": n}]}))
+    for cid, payload in cases.items():
+        srv.put_text(f"data/history/{MRN}/{cid}.json", json.dumps(payload))
+
+
+def _app(srv: FakeGitHub) -> AppTest:
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.secrets["GITHUB_TOKEN"] = "x"
+    at.secrets["GITHUB_REPO"] = "o/r"
+    at.secrets["GITHUB_API_URL"] = srv.url
+    at.secrets["SAVE_SPOOL_PATH"] = os.path.join(tempfile.mkdtemp(), "spool.sqlite3")
+    at.run()
+    at.text_input(key="pt_mrn").input(MRN)
+    at.run()
+    for k, v in {"rx_p1": "+2", "rx_p2": "+2", "rx_p3": "+2", "rx_p8": "+2", "rx_sI": "+1", "rx_sII": "+1"}.items():
+        at.selectbox(key=k).select(v)
+    [b for b in at.button if "Run Analysis" in (b.label or "")][0].click()
+    at.run()
+    _set(at, "ph_rh_C", "Not Done")
+    at.run()
+    return at
+
+
+def _fragment_id(at: AppTest, name: str):
+    """Id of the registered fragment whose function is `name` (None if there is none)."""
+    for fid, frag in getattr(at._fragment_storage, "_fragments", {}).items():
+        cells = [c.cell_contents for c in (getattr(frag, "__closure__", None) or ())]
+        if any(getattr(c, "__name__", "") == name for c in cells):
+            return fid
+    return None
+
+
+def _set(at: AppTest, key: str, value):
+    find = at.checkbox if isinstance(value, bool) else at.selectbox
+    try:
+        w = find(key=key)
+    except KeyError:  # not in the current tree yet (inside the history expander)
+        at.session_state[f"hist_exp_{MRN}"] = True
+        at.run()
+        w = find(key=key)
+    w.set_value(value)
+    at.session_state[f"hist_exp_{MRN}"] = True  # the tree sends the stateful expander closed: keep it open
+
+
+def _timed(at: AppTest, fid=None) -> float:
+    t0 = time.perf_counter()
+    if fid is None:
+        at.run()
+        dt = time.perf_counter() - t0
+        exc = list(at.exception)
+    else:
+        page = at._tree
+        with mock.patch.object(local_script_runner, "RerunData",
+                               functools.partial(local_script_runner.RerunData, fragment_id_queue=[fid])):
+            at.run()
+        dt = time.perf_counter() - t0
+        exc = list(at.exception)
+        # the tree now holds only the fragment's elements; a browser keeps the whole page and sends
+        # every widget's state on the next rerun, so put the page back for the next interaction
+        at._tree = page
+    if exc:
+        raise RuntimeError([e.message for e in exc])
+    return dt
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--latency", type=float, default=0.02, help="fake GitHub round trip, seconds")
+    args = ap.parse_args()
+
+    srv = FakeGitHub()
+    _seed_history(srv)
+    shared = functools.partial(lambda cache: cache, local_script_runner.ScriptCache())
+    app_test.ScriptCache = local_script_runner.ScriptCache = shared
+    try:
+        at = _app(srv)
+        srv.latency = args.latency
+        print(f"{'section':<22} {'full rerun ms (med)':>20} {'fragment rerun ms (med)':>24}  GitHub requests full/fragment")
+        for section, (fn, key, values) in SECTIONS.items():
+            try:
+                _set(at, key, values[0])
+            except KeyError:
+                print(f"{section:<22} widget {key!r} not on the page")
+                continue
+            full, frag, req = [], [], [0, 0]
+            for i in range(args.repeats):
+                _set(at, key, values[i % len(values)])
+                r0 = srv.requests
+                full.append(_timed(at))
+                req[0] += srv.requests - r0
+                fid = _fragment_id(at, fn)  # ids follow the page layout: look up after each full run
+                if fid is not None:
+                    _set(at, key, values[(i + 1) % len(values)])
+                    r0 = srv.requests
+                    frag.append(_timed(at, fid))
+                    req[1] += srv.requests - r0
+            f_txt = f"{statistics.median(frag) * 1e3:24.1f}" if frag else f"{'-':>24}"
+            print(f"{section:<22} {statistics.median(full) * 1e3:20.1f} {f_txt}  {req[0]}/{req[1] if frag else '-'}")
+    finally:
+        srv.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark / smoke check for bloodbank.github.GitHubClient against the local fake
+GitHub server (benchmarks/fake_github.py).
+
+Simulates workstation reruns (same history index fetched again and again) and
+compares the old bare requests.get path with the pooled client:
+connections opened, requests sent, 304 hits, wall time. Also checks that
+injected 5xx / secondary-rate-limit responses are retried, and compares the
+old two-commit case save (contents API) with the single-commit Git Data API
+save, including a concurrent save forcing a non-fast-forward rebase.
+
+    python benchmarks/bench_github_client.py [--reruns 200]
+"""
+import argparse
+import base64
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bloodbank.github import GitHubClient  # noqa: E402
+from fake_github import FakeGitHub  # noqa: E402
+
+
+def bare_get_file(api_base: str, repo: str, path: str):
+    # the pre-client code path: fresh connection, no retry, no conditional GET
+    r = requests.get(f"{api_base}/repos/{repo}/contents/{path}", headers={"Authorization": "token x"},
+                     params={"ref": "main"}, timeout=30)
+    if r.status_code == 404:
+        return None
+    return base64.b64decode(r.json().get("content", "")).decode("utf-8")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reruns", type=int, default=200)
+    args = ap.parse_args()
+
+    srv = FakeGitHub()
+    repo = "owner/repo"
+    path = "data/history/111/index.jsonl"
+    srv.put_text(path, '{"case_id": "111_x", "saved_at": "2026-01-06 11:10:22"}\n' * 50)
+
+    c0, r0 = srv.connections, srv.requests
+    t0 = time.perf_counter()
+    for _ in range(args.reruns):
+        bare_get_file(srv.url, repo, path)
+    t_bare = time.perf_counter() - t0
+    print(f"bare requests : {t_bare*1000:8.1f} ms | requests {srv.requests - r0:4d} | "
+          f"connections {srv.connections - c0:4d}")
+
+    client = GitHubClient("x", repo, api_base=srv.url, backoff=0.01)
+    c0, r0 = srv.connections, srv.requests
+    t0 = time.perf_counter()
+    for _ in range(args.reruns):
+        txt, _ = client.get_file(path)
+    t_cli = time.perf_counter() - t0
+    print(f"pooled client : {t_cli*1000:8.1f} ms | requests {srv.requests - r0:4d} | "
+          f"connections {srv.connections - c0:4d} | 304 hits {client.stats['not_modified']}")
+
+    # retries: two 5xx then a secondary rate limit, then success
+    srv.fail_next = [503, 502, 403]
+    client.upsert_file(path, "changed\n", "test")
+    txt, _ = client.get_file(path)
+    updated = (txt == "changed\n")
+    ok = updated and client.stats["retries"] == 3
+    print(f"retry check   : retries {client.stats['retries']} | content updated {updated} -> "
+          f"{'OK' if ok else 'FAILED'}")
+
+    ok = check_atomic_save(srv, client) and ok
+
+    srv.stop()
+    sys.exit(0 if ok else 1)
+
+
+def check_atomic_save(srv: FakeGitHub, client: GitHubClient) -> bool:
+    idx_path = "data/history/222/index.jsonl"
+    srv.put_text(idx_path, '{"case_id": "222_a"}\n')
+
+    # old path: case PUT + index PUT, each a GET sha + PUT (plus the index read)
+    r0, c0 = srv.requests, srv.commits
+    t0 = time.perf_counter()
+    txt, _ = client.get_file(idx_path)
+    client.upsert_file("data/history/222/222_b.json", "{}", "Add case")
+    client.upsert_file(idx_path, '{"case_id": "222_b"}\n' + txt, "Update index")
+    t_old = time.perf_counter() - t0
+    print(f"contents save : {t_old*1000:8.1f} ms | requests {srv.requests - r0:4d} | commits {srv.commits - c0}")
+
+    def build(case_id):
+        def _build(head):
+            cur, _ = client.get_file(idx_path, ref=head)
+            return {f"data/history/222/{case_id}.json": "{}",
+                    idx_path: f'{{"case_id": "{case_id}"}}\n' + (cur or "")}
+        return _build
+
+    r0, c0 = srv.requests, srv.commits
+    t0 = time.perf_counter()
+    client.commit_files(build("222_c"), "Add case 222_c")
+    t_new = time.perf_counter() - t0
+    print(f"atomic save   : {t_new*1000:8.1f} ms | requests {srv.requests - r0:4d} | commits {srv.commits - c0}")
+
+    # a concurrent save lands between our commit and our ref update -> 422 -> rebase
+    srv.before_ref_update = lambda: srv.put_text(idx_path, '{"case_id": "222_x"}\n' + srv.get_text(idx_path))
+    client.commit_files(build("222_d"), "Add case 222_d")
+    final = srv.get_text(idx_path).splitlines()
+    ok = final[0] == '{"case_id": "222_d"}' and '{"case_id": "222_x"}' in final
+    print(f"rebase check  : index rows {len(final)} (kept concurrent row: {'222_x' in srv.get_text(idx_path)}) -> "
+          f"{'OK' if ok else 'FAILED'}")
+    return ok
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark / smoke check for bloodbank.history_cache.HistoryIndexCache against
+the local fake GitHub server.
+
+Simulates workstation reruns for one MRN (uncached: download + parse every rerun)
+and checks the validation rules: TTL hit, branch head unchanged, head moved by
+another MRN's save (index blob reused, no re-parse), own index changed (re-parse),
+and invalidate() after a save.
+
+    python benchmarks/bench_history_cache.py [--reruns 200] [--rows 2000]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pandas as pd  # noqa: E402
+
+from bloodbank.github import GitHubClient  # noqa: E402
+from bloodbank.history_cache import HistoryIndexCache  # noqa: E402
+from fake_github import FakeGitHub  # noqa: E402
+
+IDX = "data/history/{}/index.jsonl"
+
+
+def parse(txt: str) -> pd.DataFrame:
+    rows = [json.loads(x) for x in txt.splitlines() if x.strip()]
+    return pd.DataFrame(rows).sort_values("saved_at", ascending=False) if rows else pd.DataFrame()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reruns", type=int, default=200)
+    ap.add_argument("--rows", type=int, default=2000)
+    args = ap.parse_args()
+
+    srv = FakeGitHub()
+    client = GitHubClient("x", "o/r", api_base=srv.url)
+    rows = [json.dumps({"case_id": f"111_{i}", "saved_at": f"2025-{1 + i % 12:02d}-01 10:{i % 60:02d}:00",
+                        "conclusion_short": "Anti-E"}) for i in range(args.rows)]
+    srv.put_text(IDX.format(111), "\n".join(rows) + "\n")
+
+    r0 = srv.requests
+    t0 = time.perf_counter()
+    for _ in range(args.reruns):
+        parse(client.get_file(IDX.format(111))[0] or "")
+    t_plain = (time.perf_counter() - t0) / args.reruns * 1000
+    print(f"uncached      : {t_plain:8.3f} ms/rerun | requests {srv.requests - r0}")
+
+    parses = []
+
+    def counted_parse(txt):
+        parses.append(1)
+        return parse(txt)
+
+    cache = HistoryIndexCache(
+        fetch_head=lambda: client.get_head()[0],
+        fetch_index=lambda mrn: client.get_file(IDX.format(mrn)),
+        parse=counted_parse,
+        ttl_sec=30,
+    )
+    r0 = srv.requests
+    t0 = time.perf_counter()
+    for _ in range(args.reruns):
+        cache.get("111")
+    t_cached = (time.perf_counter() - t0) / args.reruns * 1000
+    print(f"cached        : {t_cached:8.3f} ms/rerun | requests {srv.requests - r0} | "
+          f"hit ratio {cache.hit_ratio():.1%} (x{t_plain / t_cached:,.0f})")
+
+    checks = []
+    cache.ttl_sec = 0      # force validation on every get
+    cache.head_ttl_sec = 0
+
+    n = len(parses)
+    cache.get("111")
+    checks.append(("head unchanged -> hit, no parse", len(parses) == n))
+
+    srv.put_text(IDX.format(222), "{}\n")  # another MRN's save moves the head
+    cache.get("111")
+    checks.append(("head moved elsewhere -> blob reused", len(parses) == n and cache.stats["blob_reuse"] == 1))
+
+    srv.put_text(IDX.format(111), rows[0] + "\n")
+    df = cache.get("111")
+    checks.append(("own index changed -> re-parsed", len(parses) == n + 1 and len(df) == 1))
+
+    cache.ttl_sec = 30
+    srv.put_text(IDX.format(111), "\n".join(rows[:2]) + "\n")
+    cache.invalidate("111")
+    checks.append(("invalidate -> fresh read", len(cache.get("111")) == 2))
+
+    ok = True
+    for name, passed in checks:
+        ok = ok and passed
+        print(f"  {name:38s} {'OK' if passed else 'FAILED'}")
+    print(f"stats         : {cache.stats}")
+    srv.stop()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
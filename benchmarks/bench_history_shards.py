@@ -0,0 +1,65 @@
+"""
+Benchmark: per-save index cost, single index.jsonl rewrite vs monthly shard append.
+
+For patients with growing history (100 .. 5000 previous runs) measures what one
+save has to build and upload:
+  - old: parse whole index, sort by saved_at, serialize every row again
+  - new: append one row to this month's shard + rewrite the small manifest
+
+    python benchmarks/bench_history_shards.py
+"""
+import json
+import time
+from datetime import datetime, timedelta
+
+
+def make_rows(n: int):
+    t0 = datetime(2020, 1, 1)
+    return [{"case_id": f"111_{i}", "saved_at": (t0 + timedelta(hours=7 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+             "conclusion_short": "Anti-E + Anti-K", "abo_final": "O", "rhd_final": "RhD Positive",
+             "fingerprint": f"{i:064x}"} for i in range(n)]
+
+
+def old_save(index_txt: str, row: dict) -> str:
+    rows = [json.loads(x) for x in index_txt.splitlines() if x.strip()]
+    rows.insert(0, row)
+    rows.sort(key=lambda r: datetime.strptime(r["saved_at"], "%Y-%m-%d %H:%M:%S"), reverse=True)
+    return "\n".join(json.dumps(r, ensure_ascii=False) for r in rows[:5000]) + "\n"
+
+
+def new_save(shard_txt: str, manifest: dict, row: dict):
+    rows = [json.loads(x) for x in shard_txt.splitlines() if x.strip()]  # duplicate check window
+    _ = [r for r in rows[-30:] if r["fingerprint"] == row["fingerprint"]]
+    shard = shard_txt.rstrip("\n") + "\n" + json.dumps(row, ensure_ascii=False) + "\n"
+    man = json.loads(json.dumps(manifest))
+    man["shards"][-1]["count"] += 1
+    man["total"] += 1
+    return shard, json.dumps(man, indent=2)
+
+
+def main():
+    print(f"{'history':>8} | {'rewrite ms':>10} {'upload KB':>10} | {'shard ms':>9} {'upload KB':>10}")
+    for n in (100, 500, 2000, 5000):
+        rows = make_rows(n)
+        index_txt = "\n".join(json.dumps(r) for r in reversed(rows)) + "\n"
+        month = rows[-1]["saved_at"][:7]
+        shard_rows = [r for r in rows if r["saved_at"][:7] == month]
+        shard_txt = "\n".join(json.dumps(r) for r in shard_rows) + "\n"
+        months = sorted({r["saved_at"][:7] for r in rows})
+        manifest = {"total": n, "shards": [{"name": m, "count": 1} for m in months]}
+        row = dict(rows[-1], case_id="new", fingerprint="f" * 64)
+
+        reps = 20
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            out = old_save(index_txt, row)
+        t_old = (time.perf_counter() - t0) / reps * 1000
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            shard, man = new_save(shard_txt, manifest, row)
+        t_new = (time.perf_counter() - t0) / reps * 1000
+        print(f"{n:>8} | {t_old:10.2f} {len(out) / 1024:10.1f} | {t_new:9.3f} {(len(shard) + len(man)) / 1024:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark / check for incremental selected-cell updates
+(CompiledCells.with_cell / without_cell + analyze_specificity(prior=...)).
+
+Random 11-cell panel + 3-cell screen explained by 1-3 'true' antibodies, then a
+random sequence of selected cells added (reacting per the truth, occasional
+noise) and removed. After every step the incrementally derived engine and
+result must equal a from-scratch rebuild (build_cells + CompiledCells +
+analyze_specificity); both are timed.
+
+Run from the repo root:
+    python benchmarks/bench_incremental.py [--cases 300] [--steps 8] [--seed 1]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bloodbank import antibody as ab  # noqa: E402
+
+
+def _frame(n: int, pre: str, rng: random.Random) -> pd.DataFrame:
+    ids = [f"S{ab.roman(i+1)}" for i in range(n)] if pre == "S" else [f"{pre}{i+1}" for i in range(n)]
+    return pd.DataFrame([{"ID": ids[i], **{a: int(rng.random() < .45) for a in ab.AGS}} for i in range(n)])
+
+
+def _same(a: dict, b: dict) -> bool:
+    strip = (lambda r: {**r, "explanations": {**r["explanations"], "nodes": 0}} if "explanations" in r else r)
+    return strip(a) == strip(b)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=300)
+    ap.add_argument("--steps", type=int, default=8)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+    sig = [a for a in ab.AGS if a not in ab.IGNORED_AGS]
+
+    bad, n_add, n_rm, reused = 0, 0, 0, 0
+    t_inc = t_full = 0.0
+    for _ in range(args.cases):
+        p11, p3 = _frame(11, "C", rng), _frame(3, "S", rng)
+        truth = rng.sample(sig, rng.randint(1, 3))
+        grade = (lambda row: "+2" if any(row[a] for a in truth) else "0")
+        in_p = {str(i + 1): grade(r) for i, r in enumerate(p11.to_dict("records"))}
+        in_s = {ab.roman(i + 1): grade(r) for i, r in enumerate(p3.to_dict("records"))}
+        panels = ab.standard_panels(p11, p3)
+        masks = ab.compile_panels(panels, [])
+        extras = []
+        eng = ab.CompiledCells(ab.build_cells(p11, p3, in_p, in_s, []), masks)
+        res = ab.analyze_specificity(eng, panels, explain_budget_sec=None)
+
+        for step in range(args.steps):
+            if extras and rng.random() < 0.3:
+                j = rng.randrange(len(extras))
+                t0 = time.perf_counter()
+                eng = eng.without_cell(eng.n - len(extras) + j)
+                extras = extras[:j] + extras[j+1:]
+                res = ab.analyze_specificity(eng, panels, explain_budget_sec=None)
+                t_inc += time.perf_counter() - t0
+                n_rm += 1
+            else:
+                ph = {a: int(rng.random() < .45) for a in ab.AGS}
+                react = int(any(ph[a] for a in truth))
+                if rng.random() < 0.05:
+                    react = 1 - react
+                ex = {"id": f"X{step}", "res": react, "ph": ph}
+                t0 = time.perf_counter()
+                eng = eng.with_cell(ab.selected_cell(ex))
+                prior = res
+                res = ab.analyze_specificity(eng, panels, explain_budget_sec=None, prior=prior)
+                t_inc += time.perf_counter() - t0
+                extras = extras + [ex]
+                n_add += 1
+                reused += bool(prior["best"] and res["best"] == prior["best"])
+
+            t0 = time.perf_counter()
+            cells = ab.build_cells(p11, p3, in_p, in_s, extras)
+            full_eng = ab.CompiledCells(cells, ab.compile_panels(panels, extras))
+            full = ab.analyze_specificity(full_eng, panels, explain_budget_sec=None)
+            t_full += time.perf_counter() - t0
+
+            ok = _same(res, full) and eng.labels == full_eng.labels and (eng.pos, eng.neg) == (full_eng.pos, full_eng.neg) \
+                and eng.has == full_eng.has and eng.homo == full_eng.homo
+            if not ok and bad < 3:
+                print("MISMATCH:", truth, [e["res"] for e in extras], res.get("conclusion_short"), "|",
+                      full.get("conclusion_short"))
+            bad += not ok
+
+    steps = n_add + n_rm
+    print(f"{steps} steps ({n_add} adds, {n_rm} removes) over {args.cases} workups; "
+          f"previous best combo reused on {reused}/{n_add} adds")
+    print(f"incremental {t_inc / steps * 1e3:.3f} ms/step vs full rebuild {t_full / steps * 1e3:.3f} ms/step "
+          f"({t_full / max(t_inc, 1e-9):.1f}x)")
+    print("incremental == full rebuild:", "OK" if not bad else f"{bad} mismatch(es)")
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark / check for the opt-in rerun profiler (bloodbank.profiling).
+
+  - cost of one `with prof.section(...)` span: profiling off (what every rerun
+    pays) and on
+  - GitHub attribution: requests / bytes counted in a span match what the fake
+    GitHub server saw, and calls made on another thread are not attributed
+  - a full ring buffer: percentiles() / to_jsonl() time and p50 / p95 vs a
+    sorted reference
+
+    python benchmarks/bench_profiling.py [--spans 200000] [--ring 500]
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bloodbank.github import GitHubClient  # noqa: E402
+from bloodbank.profiling import RerunProfile, ProfileRing  # noqa: E402
+from fake_github import FakeGitHub  # noqa: E402
+
+SECTIONS = ["history lookup", "ABO interpretation", "phenotype collection", "antibody engine", "report render", "save"]
+
+
+def _span_cost(enabled: bool, n: int) -> float:
+    prof = RerunProfile(enabled=enabled)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with prof.section("x"):
+            pass
+    return (time.perf_counter() - t0) / n
+
+
+def _check_github(srv: FakeGitHub) -> bool:
+    client = GitHubClient("x", "o/r", api_base=srv.url)
+    srv.put_text("data/history/111/index/manifest.json", json.dumps({"total": 3, "pad": "x" * 4000}))
+    prof = RerunProfile()
+    r0 = srv.requests
+    with prof.section("history lookup"):
+        client.get_file("data/history/111/index/manifest.json")
+        client.get_file("data/history/111/index/manifest.json")  # 304, still a request
+        with prof.section("nested"):
+            client.get_file("data/history/111/missing.json")
+    with prof.section("elsewhere"):
+        t = threading.Thread(target=client.get_file, args=("data/history/111/index/manifest.json",))
+        t.start()
+        t.join()
+    rec = prof.close()
+    sec = rec["sections"]
+    ok = (sec["history lookup"]["gh_calls"] == 3 and sec["nested"]["gh_calls"] == 1
+          and sec["elsewhere"]["gh_calls"] == 0 and rec["gh_calls"] == 3 and srv.requests - r0 == 4
+          and sec["history lookup"]["gh_bytes"] > 4000)
+    print(f"GitHub attribution: history lookup {sec['history lookup']['gh_calls']} call(s) / "
+          f"{sec['history lookup']['gh_bytes']} B, nested {sec['nested']['gh_calls']}, other thread "
+          f"{sec['elsewhere']['gh_calls']} (server saw {srv.requests - r0}) -> {'OK' if ok else 'WRONG'}")
+    return ok
+
+
+def _fake_record(rng: random.Random) -> dict:
+    prof = RerunProfile(label=rng.choice(["Workstation", "Supervisor"]))
+    for name in rng.sample(SECTIONS, rng.randint(1, len(SECTIONS))):
+        prof.spans.append({"name": name, "depth": 0, "start_ms": 0.0, "ms": rng.lognormvariate(2, 1),
+                           "gh_calls": rng.randint(0, 3), "gh_bytes": rng.randint(0, 50000)})
+    return prof.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--spans", type=int, default=200000)
+    ap.add_argument("--ring", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    off, on = _span_cost(False, args.spans), _span_cost(True, args.spans // 4)
+    print(f"section span: {off * 1e6:.2f} us profiling off, {on * 1e6:.2f} us on")
+
+    srv = FakeGitHub()
+    try:
+        ok = _check_github(srv)
+    finally:
+        srv.stop()
+
+    rng = random.Random(args.seed)
+    ring = ProfileRing(args.ring)
+    for _ in range(args.ring * 2):  # wraps once: only the last `ring` reruns are kept
+        ring.add(_fake_record(rng))
+    t0 = time.perf_counter()
+    pct = ring.percentiles()
+    t_pct = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    jsonl = ring.to_jsonl()
+    t_jsonl = time.perf_counter() - t0
+    recs = ring.records()
+    bad = 0
+    for name in SECTIONS:
+        vals = sorted(r["sections"][name]["ms"] for r in recs if name in r["sections"])
+        ref = (vals[(len(vals) + 1) // 2 - 1], vals[-(-95 * len(vals) // 100) - 1])
+        bad += (pct[name]["p50_ms"], pct[name]["p95_ms"]) != ref or pct[name]["reruns"] != len(vals)
+    lines = jsonl.splitlines()
+    bad += len(lines) != args.ring or json.loads(lines[-1]) != recs[-1]
+    print(f"ring of {len(ring)} reruns: percentiles {t_pct * 1e3:.1f} ms, to_jsonl {t_jsonl * 1e3:.1f} ms "
+          f"({len(jsonl) / 1024:.0f} KiB); p50 / p95 / export mismatches {bad}")
+    ok = ok and not bad
+    print("profiling:", "OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
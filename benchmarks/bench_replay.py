@@ -0,0 +1,107 @@
+"""
+Benchmark / check for saved-case replay and drift detection (bloodbank.replay).
+
+Builds a local mirror in a temp dir: data/antigrams/{panel,screen}/<lot>.csv for
+a few lots, current data/p11.csv / p3.csv, and N saved payloads under
+data/history/<mrn>/<case_id>.json whose interpretation was produced by the
+engine (so replay must find no drift). Then plants known drift:
+  - conclusion_short / best_combo edited on some cases (engine-drift categories)
+  - abo_final edited on some cases
+  - some cases reference a lot missing from the archive ("antigram_missing")
+and checks replay() reports exactly those, plus throughput (cases/min).
+
+    python benchmarks/bench_replay.py [--cases 5000] [--workers 4] [--seed 1]
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bloodbank import antibody as ab  # noqa: E402
+from bloodbank import batch, replay  # noqa: E402
+from bench_batch import random_case  # noqa: E402
+
+
+def antigram(n: int, pre: str, rng: random.Random) -> pd.DataFrame:
+    ids = [f"S{ab.roman(i+1)}" for i in range(n)] if pre == "S" else [f"{pre}{i+1}" for i in range(n)]
+    return pd.DataFrame([{"ID": ids[i], **{a: int(rng.random() < .45) for a in ab.AGS}} for i in range(n)])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=5000)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        lots = {f"P-{k}": antigram(11, "C", rng) for k in range(4)}
+        screens = {f"S-{k}": antigram(3, "S", rng) for k in range(3)}
+        for kind, table in (("panel", lots), ("screen", screens)):
+            for lot, df in table.items():
+                p = base / replay.archive_path(kind, lot)
+                p.parent.mkdir(parents=True, exist_ok=True)
+                df.to_csv(p, index=False)
+        (base / "data").mkdir(exist_ok=True)
+        antigram(11, "C", rng).to_csv(base / "data/p11.csv", index=False)
+        antigram(3, "S", rng).to_csv(base / "data/p3.csv", index=False)
+
+        expect = {"conclusion": 0, "abo_final": 0, "antigram_missing": 0}
+        for k in range(args.cases):
+            lot_p, lot_s = rng.choice(sorted(lots)), rng.choice(sorted(screens))
+            rec = random_case(2 * k + 1, lots[lot_p], screens[lot_s], rng)  # saved-payload shape
+            rec["lots"] = {"panel": lot_p, "screen": lot_s}
+            panels = ab.standard_panels(lots[lot_p], screens[lot_s], lot_p, lot_s)
+            now = batch.interpret_panels(batch.normalize_case(rec), panels)
+            rec["conclusion_short"] = now["conclusion_short"]
+            rec["interpretation"] = now["interpretation"]
+            rec["abo"].update({key: now["abo"][key] for key in ("abo_final", "rhd_final", "discrepancy")})
+            u = rng.random()
+            if u < 0.02:
+                rec["lots"]["panel"] = "P-unarchived"
+                expect["antigram_missing"] += 1
+            elif u < 0.04:
+                rec["conclusion_short"] = "edited by an older engine"
+                expect["conclusion"] += 1
+            elif u < 0.05:
+                rec["abo"]["abo_final"] = "edited"
+                expect["abo_final"] += 1
+            mrn = f"M{k % 700:04d}"
+            p = base / "data/history" / mrn / f"{mrn}_{k:06d}.json"
+            p.parent.mkdir(parents=True, exist_ok=True)
+            p.write_text(json.dumps(rec), encoding="utf-8")
+
+        chunks = (replay._read_local(c) for c in batch._chunks(replay.local_cases(str(base)), 200))
+        res = replay.replay(chunks, str(base), str(base / "data"), str(base / "out"), args.workers)
+        print(f"{res['cases']} cases in {res['sec']:.1f}s = {res['cases_per_min']:.0f} cases/min "
+              f"({args.workers} workers); drifted {res['drifted']}, errors {res['errors']}")
+        for cat, n in res["by_category"].items():
+            print(f"  {cat:<28} {n}")
+        diffs = (base / "out/diffs.jsonl").read_text(encoding="utf-8").splitlines()
+        for line in diffs:
+            if '"error"' in line:
+                print("  first error:", json.loads(line)["error"])
+                break
+
+        # an unarchived lot is only *reported* when the fallback antigram changes the result
+        bad = res["errors"] + (res["cases"] != args.cases) + (len(diffs) != res["drifted"] + res["errors"])
+        bad += res["by_category"].get("conclusion", 0) != expect["conclusion"]
+        bad += res["by_category"].get("abo_final", 0) != expect["abo_final"]
+        bad += res["by_category"].get("antigram_missing", 0) > expect["antigram_missing"]
+        bad += any(c not in ("conclusion", "abo_final", "antigram_missing") for c in res["by_category"])
+        print(f"planted: {expect}")
+        print("replay:", "OK" if not bad else "MISMATCH")
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
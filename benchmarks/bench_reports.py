@@ -0,0 +1,116 @@
+"""
+Benchmark / check for memoized report / alert rendering (bloodbank.reports).
+
+Simulates workstation reruns: a pool of ABO patterns and antibody results, each
+rendered several times in a row (widget reruns that do not change the inputs);
+history payloads are full saved cases (reactions, interpretation, selected cells):
+  - how_to_report / alerts / history blocks == the uncached renderers
+  - text-generation cost per rerun, uncached vs memoized, and cache hit ratios
+  - fails unless a rerun that only hits is at least --min-speedup x cheaper than
+    rendering uncached
+
+    python benchmarks/bench_reports.py [--patterns 400] [--reruns 6]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bloodbank import reports  # noqa: E402
+from bloodbank.abo import ABO_GRADES, interpret_abo_rhd, build_how_to_report  # noqa: E402
+from bloodbank.abo_table import SPACES  # noqa: E402
+from bloodbank.antibody import AGS  # noqa: E402
+from bloodbank.reports import ALERT_TEMPLATES  # noqa: E402
+
+GRADES = ["0", "+1", "+2", "+3", "+4", "Hemolysis", "Not Done"]
+
+
+def _payload(rng: random.Random, i: int) -> dict:
+    raw = {k: rng.choice(ABO_GRADES) for k in SPACES["adult"]}
+    interp = interpret_abo_rhd(False, "Transfusion", raw, False)
+    return {
+        "patient": {"name": f"Patient {i}", "mrn": f"{100000 + i}"},
+        "demographics": {"sex": rng.choice(["M", "F"]), "age_y": rng.randint(0, 90), "age_m": 0, "age_d": 0},
+        "lots": {"panel": "P-1", "screen": "S-1"}, "tech": "tech", "saved_at": "2026-01-01 10:00",
+        "run_dt": "2026-01-01", "all_rx": rng.random() < 0.1,
+        "inputs": {"AC": rng.choice(["Negative", "Positive"]), "recent_tx": rng.random() < 0.2,
+                   "panel_reactions": {str(k): rng.choice(GRADES) for k in range(1, 12)},
+                   "screen_reactions": {s: rng.choice(GRADES) for s in ("I", "II", "III")}},
+        "dat": {"igg": rng.choice(["", "0", "+1"]), "c3d": "", "control": ""},
+        "abo": {**interp, "raw": raw, "guidance": [f"Step {k}: repeat with washed cells" for k in range(4)],
+                "comment": "", "manual_confirmation": False},
+        "phenotype": {"results": {ag: rng.choice(["+", "0", "Not Done"]) for ag in AGS}},
+        "selected_cells": [{"id": f"X{k}", "res": rng.choice(GRADES), "ph": {ag: rng.randint(0, 1) for ag in AGS}}
+                           for k in range(rng.randint(0, 4))],
+        "interpretation": {"confirmed": sorted(rng.sample(AGS, 2)), "ruled_out": sorted(rng.sample(AGS, 15)),
+                           "notes": [f"note {k}" for k in range(6)]},
+        "conclusion_short": "Anti-K",
+    }
+
+
+def _pattern(rng: random.Random, i: int) -> dict:
+    neo = rng.random() < 0.3
+    raw = {k: rng.choice(ABO_GRADES) for k in SPACES["neonate" if neo else "adult"]}
+    sp = rng.random() < 0.3
+    return {
+        "abo": (neo, interpret_abo_rhd(neo, "Transfusion", raw, sp), raw, sp,
+                {"recent_tx": rng.random() < 0.3, "hsct_bm": rng.random() < 0.1}),
+        "antibodies": sorted(rng.sample(AGS, rng.randint(0, 3))), "strong": rng.random() < 0.5,
+        "payload": _payload(rng, i),
+    }
+
+
+def _render(p: dict, cached: bool):
+    if cached:
+        return (reports.how_to_report(*p["abo"]),
+                reports.patient_antigen_negative_reminder(p["antibodies"], strong=p["strong"]),
+                reports.anti_g_alert_html(strong=p["strong"]),
+                reports.history_report_html(p["payload"]))
+    return (build_how_to_report(*p["abo"]),
+            reports.patient_antigen_negative_reminder.__wrapped__(p["antibodies"], strong=p["strong"]),
+            ALERT_TEMPLATES["anti_g"].substitute(box="clinical-danger" if p["strong"] else "clinical-alert"),
+            reports.history_report_html.__wrapped__(p["payload"]))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--patterns", type=int, default=400)
+    ap.add_argument("--reruns", type=int, default=6)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--min-speedup", type=float, default=2.0)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+    pool = [_pattern(rng, i) for i in range(args.patterns)]
+    seq = [p for p in pool for _ in range(args.reruns)]
+
+    reports.clear_render_caches()
+    t0 = time.perf_counter()
+    ref = [_render(p, False) for p in seq]
+    t_ref = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    got = [_render(p, True) for p in seq]
+    t_memo = time.perf_counter() - t0
+    bad = sum(g != r for g, r in zip(got, ref))
+    warm = pool[-100:]  # still cached in every renderer: pure hit cost
+    t0 = time.perf_counter()
+    for p in warm:
+        _render(p, True)
+    t_hit = (time.perf_counter() - t0) / len(warm)
+
+    n = len(seq)
+    print(f"{n} reruns ({args.patterns} patterns x {args.reruns}): uncached {t_ref / n * 1e6:.1f} us/rerun, "
+          f"memoized {t_memo / n * 1e6:.1f} us/rerun ({t_ref / t_memo:.1f}x), "
+          f"all-hit rerun {t_hit * 1e6:.1f} us ({t_ref / n / t_hit:.1f}x); mismatches {bad}")
+    for name, info in reports.render_cache_info().items():
+        print(f"  {name:<26} {info['entries']:>4}/{info['max_entries']} entries, hit ratio {info['hit_ratio']:.0%}, "
+              f"evictions {info['evictions']}")
+    slow = t_ref / n / t_hit < args.min_speedup
+    print("report rendering:", "MISMATCH" if bad else f"all-hit rerun under {args.min_speedup:g}x faster" if slow else "OK")
+    sys.exit(1 if bad or slow else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark / check for the whole-analysis result cache (bloodbank.result_cache).
+
+Simulates several technicians re-running a pool of reaction patterns on the same
+panel lot (Zipf-like repeats, as with widget reruns and common patterns):
+  - cost of the key vs a full analyze_specificity pass: per rerun (antigram
+    digests already stored for the frame objects) and on the first rerun after
+    an antigram edit (digests computed: the old per-rerun cost)
+  - hit ratio and per-request latency with / without the shared LRU
+  - cached results identical to a fresh computation
+
+    python benchmarks/bench_result_cache.py [--patterns 300] [--requests 5000] [--threads 8]
+"""
+import argparse
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bloodbank import antibody as ab  # noqa: E402
+from bloodbank.result_cache import ResultCache, analysis_key, frame_digest  # noqa: E402
+from bench_antigram import random_case  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--patterns", type=int, default=300)
+    ap.add_argument("--requests", type=int, default=5000)
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--entries", type=int, default=256)
+    args = ap.parse_args()
+
+    rng = random.Random(1)
+    panel_df, _ = random_case(11, rng)
+    screen_df, _ = random_case(3, rng)
+    panels = ab.standard_panels(panel_df, screen_df)
+    masks = ab.compile_panels(panels, [])
+    patterns = []
+    for _ in range(args.patterns):
+        truth = rng.sample([a for a in ab.AGS if a not in ab.IGNORED_AGS], rng.randint(1, 2))
+        in_p = {i + 1: ("+2" if any(r[a] for a in truth) else "0") for i, r in enumerate(panel_df.to_dict("records"))}
+        in_s = {ab.roman(i + 1): ("+2" if any(r[a] for a in truth) else "0") for i, r in enumerate(screen_df.to_dict("records"))}
+        patterns.append((in_p, in_s))
+
+    def compute(in_p, in_s):
+        eng = ab.CompiledCells(ab.build_panel_cells(panels, {"panel": in_p, "screen": in_s}, []), masks)
+        return ab.analyze_specificity(eng, panels)
+
+    def key(in_p, in_s):
+        return analysis_key([panel_df, screen_df], reactions={"panel": in_p, "screen": in_s},
+                            ac="Negative", recent_tx=False, ext=[])
+
+    # Zipf-ish: a few common patterns dominate
+    weights = [1 / (i + 1) for i in range(len(patterns))]
+    stream = rng.choices(range(len(patterns)), weights=weights, k=args.requests)
+
+    t0 = time.perf_counter()
+    for i in stream[:500]:
+        compute(*patterns[i])
+    t_nocache = (time.perf_counter() - t0) / 500 * 1000
+
+    t0 = time.perf_counter()
+    for i in stream[:500]:
+        key(*patterns[i])
+    t_key = (time.perf_counter() - t0) / 500 * 1000
+
+    t0 = time.perf_counter()
+    for _ in range(500):
+        frame_digest(panel_df)
+        frame_digest(screen_df)
+    t_digest = (time.perf_counter() - t0) / 500 * 1000
+
+    cache = ResultCache(args.entries)
+
+    def request(i):
+        in_p, in_s = patterns[i]
+        return cache.get_or_compute(key(in_p, in_s), lambda: compute(in_p, in_s))
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(request, stream))
+    t_cached = (time.perf_counter() - t0) / len(stream) * 1000
+
+    bad = sum(request(i) != compute(*patterns[i]) for i in set(stream[:200]))
+    info = cache.info()
+    print(f"analysis (no cache) : {t_nocache:7.3f} ms/request")
+    print(f"key (per rerun)     : {t_key:7.3f} ms/request (+{t_digest:.3f} ms once per antigram edit)")
+    print(f"shared LRU          : {t_cached:7.3f} ms/request over {len(stream)} requests, {args.threads} threads")
+    print(f"cache               : {info['entries']}/{info['max_entries']} entries, hit ratio {info['hit_ratio']:.1%}, "
+          f"evictions {info['evictions']}")
+    print("consistency         :", "OK" if not bad else f"{bad} mismatch(es)")
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark / check for graded-strength scoring (bloodbank.scoring).
+
+Random 14- and 60-cell antigrams with 1-3 'true' antibodies reacting with
+dosage: homozygous cells +3/+4, heterozygous +1/+2 (occasional noise). For each
+case every combination of up to 3 significant antigens (more sets than the
+search ever yields) is scored with StrengthFit (bitmask popcounts) and against
+a plain per-cell reference (expression vector, cosine); scores must agree. Reports time to score every
+candidate set (target: < 50 ms at 60 cells) and how often the true antibody
+set ranks first among the minimal explanations.
+
+Run from the repo root:
+    python benchmarks/bench_scoring.py [--cases 100] [--seed 1]
+"""
+import argparse
+import random
+import sys
+import time
+from itertools import combinations
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bloodbank import antibody as ab  # noqa: E402
+from bloodbank import scoring  # noqa: E402
+
+
+def graded_case(n_cells: int, rng: random.Random):
+    sig = [a for a in ab.AGS if a not in ab.IGNORED_AGS]
+    truth = rng.sample(sig, rng.randint(1, 3))
+    cells = []
+    for i in range(n_cells):
+        ph = {a: int(rng.random() < .45) for a in ab.AGS}
+        on = [a for a in truth if ph[a]]
+        if not on:
+            grade = "0"
+        elif any(ab.is_homozygous(ph, a) for a in on):
+            grade = rng.choice(["+3", "+4"])
+        else:
+            grade = rng.choice(["+1", "+2"])
+        if rng.random() < 0.03:
+            grade = "0" if grade != "0" else "+1"
+        cells.append({"label": f"Cell #{i+1}", "react": ab.normalize_grade(grade), "ph": ph, "grade": grade})
+    return truth, cells
+
+
+def reference_score(cells: list, combo) -> float:
+    s = [scoring.grade_strength(c["grade"]) if c["react"] else 0.0 for c in cells]
+    x = []
+    for c in cells:
+        on = [a for a in combo if ab.ph_has(c["ph"], a)]
+        x.append(0.0 if not on else 1.0 if any(ab.is_homozygous(c["ph"], a) for a in on)
+                 else scoring.HETEROZYGOUS_WEIGHT)
+    xs = sum(a * b for a, b in zip(x, s))
+    xx = sum(a * a for a in x)
+    ss = sum(a * a for a in s)
+    return xs / (xx * ss) ** 0.5 if xx and ss else 0.0
+
+
+def run(n_cells: int, n_cases: int, rng: random.Random) -> int:
+    bad = 0
+    t_all = t_expl = 0.0
+    n_sets = top = ranked_cases = 0
+    sig = [a for a in ab.AGS if a not in ab.IGNORED_AGS]
+    sets = [c for r in (1, 2, 3) for c in combinations(sig, r)]
+    for _ in range(n_cases):
+        truth, cells = graded_case(n_cells, rng)
+        eng = ab.CompiledCells(cells)
+
+        t0 = time.perf_counter()
+        ranked = scoring.StrengthFit(eng).rank(sets)
+        t_all += time.perf_counter() - t0
+        n_sets += len(sets)
+
+        for r in ranked[:: max(1, len(ranked) // 20)]:
+            bad += abs(r["score"] - round(reference_score(cells, r["combo"]), 4)) > 1e-4
+
+        res = ab.analyze_specificity(eng, [], explain_budget_sec=None) if eng.pos else {"best": None}
+        if res["best"]:
+            t0 = time.perf_counter()
+            rk = scoring.rank_explanations(eng, res)
+            t_expl += time.perf_counter() - t0
+            if len(rk["ranked"]) > 1 and any(sorted(c) == sorted(truth) for c in res["explanations"]["combos"]):
+                ranked_cases += 1
+                top += sorted(rk["ranked"][0]["combo"]) == sorted(truth)
+    print(f"{n_cells:>3} cells: every <=3 antigen set ({n_sets / n_cases:.0f} avg) scored in "
+          f"{t_all / n_cases * 1e3:.2f} ms; minimal explanations ranked + breakdown {t_expl / n_cases * 1e3:.2f} ms; "
+          f"true set first in {top}/{ranked_cases} cases with several minimal explanations; mismatches {bad}")
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=100)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+    bad = run(14, args.cases, rng) + run(60, args.cases, rng)
+    print("scores vs per-cell reference:", "OK" if not bad else f"{bad} mismatch(es)")
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
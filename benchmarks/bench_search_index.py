@@ -0,0 +1,103 @@
+"""
+Benchmark / smoke check for bloodbank.search_index.HistorySearchIndex.
+
+Mirrors a synthetic history (N patients x monthly shards) from the local fake
+GitHub server: full first sync, incremental re-sync after one save (only the
+changed shard is fetched), then times typical cross-patient queries and checks
+that no SQLite connection is left open.
+
+    python benchmarks/bench_search_index.py [--patients 2000] [--months 6]
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bloodbank.github import GitHubClient  # noqa: E402
+from bloodbank.search_index import HistorySearchIndex, is_index_file  # noqa: E402
+from fake_github import FakeGitHub  # noqa: E402
+from bench_spool import track_connections, open_connections  # noqa: E402
+
+ABS = ["Anti-D", "Anti-E", "Anti-K", "Anti-c", "Anti-Fya", "Anti-Jka", "No antibody identified"]
+NAMES = ["Ahmed", "Mona", "Sara", "Omar", "Fatimah", "Khalid", "Noura", "Yousef"]
+
+
+def seed(srv: FakeGitHub, patients: int, months: int, rng: random.Random) -> int:
+    # bulk-load one commit (put_text per file would be O(n^2) in the fake)
+    entries, n = {}, 0
+    for p in range(patients):
+        mrn = str(100000 + p)
+        for m in range(months):
+            shard = f"2026-{m + 1:02d}"
+            rows = []
+            for i in range(rng.randint(1, 3)):
+                rows.append(json.dumps({
+                    "case_id": f"{mrn}_{shard}_{i}", "mrn": mrn, "saved_at": f"{shard}-{i + 10} 09:00:00",
+                    "name": f"{rng.choice(NAMES)} {rng.choice(NAMES)}", "tech": rng.choice(["sara", "omar", "ali"]),
+                    "conclusion_short": rng.choice(ABS)}))
+                n += 1
+            data = ("\n".join(rows) + "\n").encode("utf-8")
+            entries[f"data/history/{mrn}/index/{shard}.jsonl"] = srv._put_blob(data)
+    with srv.lock:
+        srv._advance(entries, "seed")
+    return n
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--patients", type=int, default=2000)
+    ap.add_argument("--months", type=int, default=6)
+    args = ap.parse_args()
+
+    srv = FakeGitHub()
+    rng = random.Random(1)
+    n_rows = seed(srv, args.patients, args.months, rng)
+    client = GitHubClient("x", "o/r", api_base=srv.url)
+    conns = track_connections()
+    idx = HistorySearchIndex(str(Path(tempfile.mkdtemp()) / "h.sqlite3"))
+
+    def sync():
+        entries, _ = client.list_tree()
+        listing = [(e["path"], e["sha"]) for e in entries if is_index_file(e["path"], "data/history")]
+        return idx.sync(listing, lambda path, sha: client.get_blob(sha))
+
+    r = sync()
+    print(f"full sync     : {r['fetched']} files, {r['rows']} rows in {r['sec']:.2f}s (index holds {idx.count()})")
+
+    path = "data/history/100007/index/2026-01.jsonl"
+    srv.put_text(path, srv.get_text(path) + json.dumps({"case_id": "100007_new", "mrn": "100007",
+                                                        "saved_at": "2026-10-01 08:00:00", "name": "Zaid",
+                                                        "conclusion_short": "Anti-S"}) + "\n")
+    r0 = srv.requests
+    r = sync()
+    print(f"incremental   : {r['fetched']} file(s) fetched, {srv.requests - r0} GitHub requests, {r['sec'] * 1000:.1f} ms")
+
+    queries = [
+        ("text 'Anti-E'", dict(text="Anti-E")),
+        ("name prefix 'fati'", dict(text="fati")),
+        ("tech + date range", dict(tech="OMAR", date_from="2026-02-01", date_to="2026-03-31")),
+        ("MRN", dict(mrn="100007")),
+    ]
+    for label, kw in queries:
+        t0 = time.perf_counter()
+        for _ in range(20):
+            res = idx.search(**kw)
+        print(f"query {label:22s}: {(time.perf_counter() - t0) / 20 * 1000:6.2f} ms | {len(res)} row(s)")
+
+    ok = idx.count() == n_rows + 1 and any(x["case_id"] == "100007_new" for x in idx.search(text="Anti-S"))
+    print("consistency   :", "OK" if ok else "FAILED")
+    left = open_connections(conns)
+    print(f"connections   : {len(conns)} opened, {left} left open -> {'OK' if not left else 'FAILED'}")
+    ok = ok and not left
+    srv.stop()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
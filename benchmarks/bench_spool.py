@@ -0,0 +1,139 @@
+"""
+Benchmark / smoke check for the write-behind save queue (bloodbank.spool)
+against the local fake GitHub server.
+
+Compares the time the Save button blocks for (synchronous atomic commit vs
+enqueue into the SQLite spool), then checks that the worker drains the queue,
+retries through injected GitHub failures without losing a case, that
+queued items survive a restart (a new SaveSpool on the same file), and that
+every SQLite connection the spool opened (idle polls included) is closed.
+
+    python benchmarks/bench_spool.py [--cases 20]
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bloodbank.github import GitHubClient  # noqa: E402
+from bloodbank import spool as sp  # noqa: E402
+from fake_github import FakeGitHub  # noqa: E402
+
+
+def track_connections() -> list:
+    """Record every sqlite3 connection opened from now on (checked with open_connections)."""
+    made, connect = [], sqlite3.connect
+
+    def tracked(*a, **kw):
+        db = connect(*a, **kw)
+        made.append(db)
+        return db
+    sqlite3.connect = tracked
+    return made
+
+
+def open_connections(made: list) -> int:
+    n = 0
+    for db in made:
+        try:
+            db.execute("SELECT 1")
+            n += 1
+        except sqlite3.ProgrammingError:  # closed
+            pass
+    return n
+
+
+def make_save(client: GitHubClient):
+    # same shape as the workstation save: case file + index row in one commit
+    def save(record: dict):
+        idx = f"data/history/{record['mrn']}/index.jsonl"
+
+        def build(head):
+            cur, _ = client.get_file(idx, ref=head)
+            return {f"data/history/{record['mrn']}/{record['case_id']}.json": json.dumps(record),
+                    idx: json.dumps({"case_id": record["case_id"]}) + "\n" + (cur or "")}
+        client.commit_files(build, f"Add case {record['case_id']}")
+        return None
+    return save
+
+
+def wait_drained(spool: sp.SaveSpool, timeout: float = 30) -> bool:
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        if spool.stats()["pending"] == 0:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=20)
+    args = ap.parse_args()
+
+    srv = FakeGitHub()
+    client = GitHubClient("x", "o/r", api_base=srv.url, backoff=0.01)
+    save = make_save(client)
+    path = str(Path(tempfile.mkdtemp()) / "spool.sqlite3")
+    recs = [{"mrn": "333", "case_id": f"333_{i}", "fingerprint": f"fp{i}"} for i in range(args.cases)]
+    conns = track_connections()
+
+    t0 = time.perf_counter()
+    for r in recs[: args.cases // 2]:
+        save(r)
+    t_sync = (time.perf_counter() - t0) / (args.cases // 2) * 1000
+
+    spool = sp.SaveSpool(path)
+    worker = sp.SpoolWorker(spool, save, idle_sec=0.2)
+    worker.start()
+    t0 = time.perf_counter()
+    for r in recs[args.cases // 2:]:
+        spool.enqueue(r)
+    t_enq = (time.perf_counter() - t0) / (args.cases - args.cases // 2) * 1000
+    drained = wait_drained(spool)
+    print(f"save blocks   : sync commit {t_sync:7.2f} ms/case | enqueue {t_enq:7.2f} ms/case "
+          f"(x{t_sync / t_enq:5.1f}) | drained {drained}")
+
+    # GitHub down for longer than the client retries -> item stays pending, retried later, then lands
+    sp.RETRY_MAX_SEC = 0.2
+    srv.fail_next = [502] * (client.max_retries + 1)
+    rid = spool.enqueue({"mrn": "333", "case_id": "333_retry", "fingerprint": "fpr"})
+    drained = wait_drained(spool)
+    item = spool.get(rid)
+    dup = spool.find_duplicate("fpr", 600) is not None
+    ok_retry = drained and item["status"] == "synced" and item["attempts"] >= 1 and dup
+    print(f"retry check   : attempts {item['attempts']} | status {item['status']} | "
+          f"dup sees queued fp {dup} -> {'OK' if ok_retry else 'FAILED'}")
+    worker.stop()
+    worker.join(5)
+
+    # durability: items enqueued with no worker are still there for the next process
+    spool.enqueue({"mrn": "333", "case_id": "333_restart", "fingerprint": "fps"})
+    again = sp.SaveSpool(path)
+    w2 = sp.SpoolWorker(again, save, idle_sec=0.2)
+    w2.start()
+    ok_restart = wait_drained(again) and "333_restart" in (srv.get_text("data/history/333/index.jsonl") or "")
+    w2.stop()
+    print(f"restart check : {'OK' if ok_restart else 'FAILED'}")
+
+    rows = srv.get_text("data/history/333/index.jsonl").splitlines()
+    ok_all = len(rows) == args.cases + 2
+    print(f"index rows    : {len(rows)} (expected {args.cases + 2}) -> {'OK' if ok_all else 'FAILED'}")
+
+    w2.join(5)
+    left = open_connections(conns)
+    ok_conn = left == 0
+    print(f"connections   : {len(conns)} opened, {left} left open -> {'OK' if ok_conn else 'FAILED'}")
+
+    srv.stop()
+    sys.exit(0 if (ok_retry and ok_restart and ok_all and ok_conn) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Minimal in-memory fake of the GitHub REST API, for exercising bloodbank.github
+locally (no token, no network).
+
+Supported:
+  GET/PUT  /repos/<owner>/<repo>/contents/<path>?ref=<branch|commit sha>
+  GET      /repos/<owner>/<repo>/branches/<branch>
+  GET      /repos/<owner>/<repo>/git/trees/<sha>?recursive=1
+  GET      /repos/<owner>/<repo>/git/blobs/<sha>
+  POST     /repos/<owner>/<repo>/git/trees     (base_tree + inline content / sha entries)
+  POST     /repos/<owner>/<repo>/git/commits
+  PATCH    /repos/<owner>/<repo>/git/refs/heads/<branch>   (422 if not fast-forward)
+  ETag / If-None-Match (304), keep-alive (HTTP/1.1)
+
+Fault injection: server.fail_next = [503, 403, ...] answers the next requests
+with those statuses (403 is sent as a secondary rate limit with Retry-After).
+server.before_ref_update = callable run once before the next ref update
+(e.g. to simulate a concurrent save moving the branch).
+server.latency = seconds added to every response (simulated network round trip).
+
+Usage:
+    srv = FakeGitHub()            # starts on 127.0.0.1:<free port>
+    client = GitHubClient("x", "o/r", api_base=srv.url)
+    ...
+    srv.stop()
+"""
+import base64
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def blob_sha(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _obj_sha(obj) -> str:
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class FakeGitHub:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, branch: str = "main"):
+        self.lock = threading.RLock()
+        self.branch = branch
+        self.blobs = {}          # sha -> bytes
+        self.trees = {}          # sha -> {path: blob sha}
+        self.commit_db = {}      # sha -> {"tree": sha, "parents": [...], "message": str}
+        self.fail_next = []      # statuses to return for the next requests
+        self.before_ref_update = None
+        self.latency = 0.0
+        self.requests = 0
+        self.connections = 0
+        self.commits = 0
+        self.head = self._new_commit({}, [], "initial")
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with fake.lock:
+                    fake.connections += 1
+
+            def log_message(self, *a):
+                pass
+
+            def _send(self, status: int, obj=None, headers=None):
+                body = b"" if obj is None else json.dumps(obj).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_etag(self, obj):
+                etag = '"' + _obj_sha(obj) + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    return self._send(304, None, {"ETag": etag})
+                return self._send(200, obj, {"ETag": etag})
+
+            def _body(self):
+                n = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(n) or b"{}") if n else {}
+
+            def _route(self, method: str):
+                body = self._body() if method != "GET" else None
+                with fake.lock:
+                    fake.requests += 1
+                    fault = fake.fail_next.pop(0) if fake.fail_next else None
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if fault:
+                    if fault == 403:
+                        return self._send(403, {"message": "You have exceeded a secondary rate limit"},
+                                          {"Retry-After": "0"})
+                    return self._send(fault, {"message": "injected"})
+
+                u = urlparse(self.path)
+                parts = u.path.strip("/").split("/")
+                if len(parts) < 4 or parts[0] != "repos":
+                    return self._send(404, {"message": "Not Found"})
+                query = {k: v[0] for k, v in parse_qs(u.query).items()}
+                return fake.handle(self, method, parts[3:], query, body)
+
+            def do_GET(self):
+                self._route("GET")
+
+            def do_PUT(self):
+                self._route("PUT")
+
+            def do_POST(self):
+                self._route("POST")
+
+            def do_PATCH(self):
+                self._route("PATCH")
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    # ------------------------------------------------------------------
+    # Object store
+    # ------------------------------------------------------------------
+    def _put_blob(self, data: bytes) -> str:
+        sha = blob_sha(data)
+        self.blobs[sha] = data
+        return sha
+
+    def _put_tree(self, entries: dict) -> str:
+        sha = _obj_sha(sorted(entries.items()))
+        self.trees[sha] = dict(entries)
+        return sha
+
+    def _new_commit(self, entries: dict, parents: list, message: str) -> str:
+        tree = self._put_tree(entries)
+        sha = _obj_sha({"tree": tree, "parents": parents, "message": message, "n": len(self.commit_db)})
+        self.commit_db[sha] = {"tree": tree, "parents": parents, "message": message}
+        return sha
+
+    def _files_at(self, ref=None) -> dict:
+        with self.lock:
+            sha = self.head if (not ref or ref == self.branch) else ref
+            c = self.commit_db.get(sha)
+            return dict(self.trees[c["tree"]]) if c else {}
+
+    @property
+    def files(self) -> dict:
+        return {p: self.blobs[s] for p, s in self._files_at().items()}
+
+    def _advance(self, entries: dict, message: str):
+        with self.lock:
+            self.head = self._new_commit(entries, [self.head], message)
+            self.commits += 1
+
+    def put_text(self, path: str, text: str, message: str = "seed"):
+        with self.lock:
+            entries = self._files_at()
+            entries[path] = self._put_blob(text.encode("utf-8"))
+            self._advance(entries, message)
+
+    def get_text(self, path: str, ref=None):
+        sha = self._files_at(ref).get(path)
+        return None if sha is None else self.blobs[sha].decode("utf-8")
+
+    # ------------------------------------------------------------------
+    # Routes
+    # ------------------------------------------------------------------
+    def handle(self, h, method, rest, query, body):
+        if rest[0] == "contents":
+            return self._contents(h, method, "/".join(rest[1:]), query, body)
+        if rest[0] == "branches" and method == "GET":
+            with self.lock:
+                head = self.head
+                tree = self.commit_db[head]["tree"]
+            return h._send_etag({"name": rest[1], "commit": {"sha": head, "commit": {"tree": {"sha": tree}}}})
+        if rest[:2] == ["git", "trees"] and method == "GET" and len(rest) == 3:
+            with self.lock:
+                entries = self.trees.get(rest[2])
+                if entries is None:
+                    return h._send(404, {"message": "Not Found"})
+                tree = [{"path": p, "mode": "100644", "type": "blob", "sha": s, "size": len(self.blobs[s])}
+                        for p, s in sorted(entries.items())]
+            return h._send_etag({"sha": rest[2], "tree": tree, "truncated": False})
+        if rest[:2] == ["git", "blobs"] and method == "GET" and len(rest) == 3:
+            data = self.blobs.get(rest[2])
+            if data is None:
+                return h._send(404, {"message": "Not Found"})
+            return h._send(200, {"sha": rest[2], "size": len(data), "encoding": "base64",
+                                 "content": base64.b64encode(data).decode("ascii")})
+        if rest[:2] == ["git", "trees"] and method == "POST":
+            with self.lock:
+                base = self.trees.get(body.get("base_tree"), {}) if body.get("base_tree") else {}
+                entries = dict(base)
+                for e in body.get("tree", []):
+                    if "content" in e:
+                        entries[e["path"]] = self._put_blob(e["content"].encode("utf-8"))
+                    elif e.get("sha"):
+                        entries[e["path"]] = e["sha"]
+                    else:
+                        entries.pop(e["path"], None)
+                sha = self._put_tree(entries)
+            return h._send(201, {"sha": sha})
+        if rest[:2] == ["git", "commits"] and method == "POST":
+            with self.lock:
+                if body.get("tree") not in self.trees:
+                    return h._send(422, {"message": "tree not found"})
+                sha = _obj_sha({"tree": body["tree"], "parents": body.get("parents", []),
+                                "message": body.get("message", ""), "n": len(self.commit_db)})
+                self.commit_db[sha] = {"tree": body["tree"], "parents": body.get("parents", []),
+                                       "message": body.get("message", "")}
+            return h._send(201, {"sha": sha})
+        if rest[:3] == ["git", "refs", "heads"] and method == "PATCH":
+            hook, self.before_ref_update = self.before_ref_update, None
+            if hook:
+                hook()
+            with self.lock:
+                new = self.commit_db.get(body.get("sha"))
+                if not new:
+                    return h._send(422, {"message": "Object does not exist"})
+                if not body.get("force") and self.head not in new["parents"]:
+                    return h._send(422, {"message": "Update is not a fast forward"})
+                self.head = body["sha"]
+                self.commits += 1
+            return h._send(200, {"object": {"sha": self.head}})
+        return h._send(404, {"message": "Not Found"})
+
+    def _contents(self, h, method, path, query, body):
+        files = self._files_at(query.get("ref"))
+        sha = files.get(path)
+        children = sorted({p[len(path) + 1:].split("/")[0] for p in files if p.startswith(path + "/")})
+
+        if method == "GET":
+            if sha is None and not children:
+                return h._send(404, {"message": "Not Found"})
+            if sha is not None:
+                data = self.blobs[sha]
+                obj = {"type": "file", "path": path, "name": path.split("/")[-1], "sha": sha,
+                       "size": len(data), "content": base64.b64encode(data).decode("ascii")}
+            else:
+                obj = []
+                for c in children:
+                    full = f"{path}/{c}"
+                    s = files.get(full)
+                    obj.append({"type": "file" if s else "dir", "name": c, "path": full,
+                                "sha": s or "", "size": len(self.blobs[s]) if s else 0})
+            return h._send_etag(obj)
+
+        if method == "PUT":
+            new = base64.b64decode(body.get("content", ""))
+            if sha is not None and body.get("sha") != sha:
+                return h._send(409, {"message": "sha does not match"})
+            if sha is None and body.get("sha"):
+                return h._send(409, {"message": "file does not exist"})
+            with self.lock:
+                entries = self._files_at()
+                entries[path] = self._put_blob(new)
+                self._advance(entries, body.get("message", ""))
+            return h._send(201 if sha is None else 200, {"content": {"path": path, "sha": blob_sha(new)}})
+
+        return h._send(405, {"message": "Method Not Allowed"})
@@ -0,0 +1,6 @@
+"""
+MCH Tabuk blood bank engines.
+
+Everything in this package is plain Python (no Streamlit), so it can be
+imported once per process by app.py and also used from scripts/benchmarks.
+"""
@@ -0,0 +1,593 @@
+"""
+ABO / RhD / DAT interpretation engine (no Streamlit).
+
+  - interpret_abo_rhd(): ABO / RhD result + discrepancy flags and notes
+  - build_abo_guidance(): general + pattern-specific discrepancy workup steps
+  - build_how_to_report(): copy/paste HIS/EMR comment for the current pattern
+
+Inputs are plain dicts of grade strings ("Not Done", "0", "+1".."+4",
+"Mixed-field", "Hemolysis"); grade lookups use tables built at import.
+"""
+import re
+from string import Template
+from typing import Dict, Any
+
+# =============================================================================
+# GRADE TABLES
+# =============================================================================
+GRADE_NUM = {"0": 0, "+1": 1, "+2": 2, "+3": 3, "+4": 4, "Mixed-field": 2, "Hemolysis": 5}
+GRADE_RANK = {"0": 0, "+1": 1, "+2": 2, "+3": 3, "+4": 4, "Mixed-field": 50, "Hemolysis": 99}
+POSITIVE_GRADES = frozenset(g for g, n in GRADE_NUM.items() if n >= 1)
+ABO_GRADES = ["Not Done", "0", "+1", "+2", "+3", "+4", "Mixed-field", "Hemolysis"]  # choices per ABO / RhD well
+_RANK_RE = re.compile(r"\+(\d)")
+
+
+def _safe_str(x):
+    return "" if x is None else str(x).strip()
+
+def grade_num(g: str) -> int:
+    """-1 not done / unknown, 0 negative, 1..4, Mixed-field 2, Hemolysis 5."""
+    return GRADE_NUM.get(_safe_str(g), -1)
+
+def is_pos_any(g: str) -> bool:
+    return grade_num(g) >= 1  # includes weak +1
+
+def is_pos_strong_abo_forward(g: str) -> bool:
+    # expected >=3+ in your policy for adults/children >4 months
+    return g in ("+3", "+4", "Hemolysis")
+
+def is_pos_ok_reverse(g: str) -> bool:
+    # expected >=2+ in adults/children >4 months
+    return g in ("+2", "+3", "+4", "Hemolysis", "Mixed-field")
+
+def grade_rank(g: str) -> int:
+    g = _safe_str(g)
+    if g in GRADE_RANK:
+        return GRADE_RANK[g]
+    m = _RANK_RE.match(g)
+    return int(m.group(1)) if m else -1
+
+# =============================================================================
+# ABO / RhD interpretation
+# =============================================================================
+def age_is_neonate(age_y: int, age_m: int, age_d: int) -> bool:
+    # Neonate definition for this tool: < 4 months
+    total_days = max(0, int(age_y or 0))*365 + max(0, int(age_m or 0))*30 + max(0, int(age_d or 0))
+    return total_days < (4*30)
+
+def _abo_from_forward_only(a: str, b: str) -> str:
+    a_pos = is_pos_any(a)
+    b_pos = is_pos_any(b)
+    if a_pos and not b_pos:
+        return "A"
+    if b_pos and not a_pos:
+        return "B"
+    if a_pos and b_pos:
+        return "AB"
+    if (not a_pos) and (not b_pos):
+        return "O"
+    return "Unknown"
+
+def _abo_mapping_consistent(forward_abo: str, rev_a1: str, rev_b: str) -> bool:
+    """
+    Checks if reverse matches the expected pattern for the ABO.
+    Uses 'any positive' in reverse to evaluate.
+    """
+    a1_pos = is_pos_any(rev_a1)
+    b_pos  = is_pos_any(rev_b)
+    if forward_abo == "A":
+        return (not a1_pos) and b_pos
+    if forward_abo == "B":
+        return a1_pos and (not b_pos)
+    if forward_abo == "AB":
+        return (not a1_pos) and (not b_pos)
+    if forward_abo == "O":
+        return a1_pos and b_pos
+    return False
+
+def interpret_abo_rhd(
+    is_neonate: bool,
+    purpose: str,
+    raw: Dict[str, str],
+    screen_any_positive: bool
+) -> Dict[str, Any]:
+    """
+    raw keys:
+      Adult: antiA, antiB, antiD, ctl, a1cells, bcells
+      Neonate: antiA, antiB, antiAB, antiD, ctl, dat
+    Returns:
+      {abo_final, rhd_final, discrepancy(bool), invalid(bool), notes(list[str])}
+    """
+    notes = []
+    discrepancy = False
+    invalid = False
+
+    ctl = _safe_str(raw.get("ctl","Not Done"))
+    if ctl in ("+1","+2","+3","+4","Mixed-field","Hemolysis"):
+        invalid = True
+        discrepancy = True
+        notes.append("Control is POSITIVE → test is INVALID. Repeat ABO/Rh typing with proper technique.")
+
+    # RhD
+    antiD = _safe_str(raw.get("antiD","Not Done"))
+    if antiD in ("Not Done", ""):
+        rhd_final = "Unknown"
+    elif antiD == "0":
+        rhd_final = "RhD Negative"
+    elif antiD == "+4":
+        rhd_final = "RhD Positive"
+    else:
+        rhd_final = "RhD Inconclusive / Weak D suspected"
+        discrepancy = True
+        notes.append("Anti-D is weaker than expected or shows mixed-field/hemolysis → treat as RhD NEGATIVE for transfusion and RhIG eligibility per policy; consider molecular testing if available.")
+
+    # ABO
+    if is_neonate:
+        antiA = _safe_str(raw.get("antiA","Not Done"))
+        antiB = _safe_str(raw.get("antiB","Not Done"))
+        abo_guess = _abo_from_forward_only(antiA, antiB)
+
+        # Flag mixed-field forward as discrepancy but still provide most probable ABO
+        if antiA == "Mixed-field" or antiB == "Mixed-field":
+            discrepancy = True
+            notes.append("Mixed-field forward reactions detected. Correlate with clinical history (e.g., transfusion, sample issues) and repeat testing per policy.")
+
+        # Flag weak forward as discrepancy but still provide most probable ABO
+        if antiA in ("+1","+2") or antiB in ("+1","+2"):
+            discrepancy = True
+            notes.append("Weak/mixed-field A/B reactions can occur in neonates; report as 'most probable' and plan confirmation at 6 months (or per local policy).")
+        if antiA == "Not Done" or antiB == "Not Done":
+            discrepancy = True
+            notes.append("Forward ABO not fully performed (Not Done). Complete testing if required.")
+        abo_final = f"Most probable: {abo_guess}" if abo_guess != "Unknown" else "Most probable: Unknown"
+
+        # DAT note (neonate)
+        dat = _safe_str(raw.get("dat","Not Done"))
+        if dat in ("+1","+2","+3","+4","Mixed-field","Hemolysis"):
+            notes.append("DAT is POSITIVE. In neonates, consider maternal IgG coating; interpret ABO cautiously and ensure proper specimen handling.")
+        if dat in ("Not Done",""):
+            # allowed
+            pass
+
+        if purpose == "RhIG":
+            notes.append("Purpose: RhIG eligibility (DVI+ card per your policy).")
+        else:
+            notes.append("Purpose: Transfusion (DVI− card per your policy).")
+
+    else:
+        antiA = _safe_str(raw.get("antiA","Not Done"))
+        antiB = _safe_str(raw.get("antiB","Not Done"))
+        rev_a1 = _safe_str(raw.get("a1cells","Not Done"))
+        rev_b  = _safe_str(raw.get("bcells","Not Done"))
+
+        # Determine forward ABO (any positive)
+        fwd_abo = _abo_from_forward_only(antiA, antiB)
+
+        # Discrepancy thresholds
+        # Forward expected >=3+ (policy). If positive but <3+, flag.
+        if antiA in ("+1","+2") or antiB in ("+1","+2"):
+            discrepancy = True
+            notes.append("Forward grouping shows weak/mixed-field reactions (<3+). Initiate ABO discrepancy workup per policy.")
+        # Reverse expected >=2+ if positive. If 0/+1 where expected pos, flag.
+        # We first compute expected pattern, then check if reverse is weak.
+        if fwd_abo in ("A","B","O") or fwd_abo == "AB":
+            # If reverse results are not done, discrepancy
+            if rev_a1 in ("Not Done","") or rev_b in ("Not Done",""):
+                discrepancy = True
+                notes.append("Reverse grouping not fully performed. For patients >4 months, reverse grouping is required per policy.")
+            else:
+                # If pattern mismatch
+                if not _abo_mapping_consistent(fwd_abo, rev_a1, rev_b):
+                    discrepancy = True
+                    notes.append("Forward and reverse grouping are inconsistent → ABO DISCREPANCY.")
+                else:
+                    # Even if consistent, ensure reverse strength meets expectation (>=2+ when positive expected)
+                    # Determine which reverse should be positive
+                    a1_should_pos = (fwd_abo in ("B","O"))
+                    b_should_pos  = (fwd_abo in ("A","O"))
+                    if a1_should_pos and (rev_a1 in ("0","+1")):
+                        discrepancy = True
+                        notes.append("Reverse grouping is weaker than expected (<2+). Consider hypogammaglobulinemia, age-related low isoagglutinins, recent transfusion, or plasma abnormalities; follow policy.")
+                    if b_should_pos and (rev_b in ("0","+1")):
+                        discrepancy = True
+                        notes.append("Reverse grouping is weaker than expected (<2+). Consider hypogammaglobulinemia, age-related low isoagglutinins, recent transfusion, or plasma abnormalities; follow policy.")
+
+        # Link to antibody screen if reverse extra reactions and screen is positive
+        if discrepancy and screen_any_positive:
+            notes.append("Antibody screen is POSITIVE. If reverse grouping shows unexpected reactivity, consider alloantibody/cold interference; review antibody ID history and use appropriate antigen-negative reagent cells per SOP.")
+
+        # Mixed-field -> transfusion / transplant
+        if antiA == "Mixed-field" or antiB == "Mixed-field" or rev_a1 == "Mixed-field" or rev_b == "Mixed-field":
+            discrepancy = True
+            notes.append("Mixed-field pattern: consider recent transfusion, stem cell transplant/chimerism, or sample issue. For transfused patients, confirm ABO ≥3 months after last transfusion (or per policy).")
+
+        abo_final = fwd_abo if fwd_abo else "Unknown"
+        if discrepancy and not invalid:
+            # still show best estimate to help paperwork, but label discrepancy
+            abo_final = f"{abo_final} (Discrepancy)"
+
+    # Rouleaux/cold auto suspicion in ABO: everything positive including control
+    if not is_neonate:
+        all_pos_keys = ["antiA","antiB","antiD","ctl","a1cells","bcells"]
+    else:
+        all_pos_keys = ["antiA","antiB","antiAB","antiD","ctl"]
+    all_pos = True
+    for k in all_pos_keys:
+        if not is_pos_any(_safe_str(raw.get(k,"0"))):
+            all_pos = False
+            break
+    if all_pos and is_pos_any(ctl):
+        discrepancy = True
+        notes.append("All wells including control are reactive → consider rouleaux or cold autoantibody interference. Repeat with saline replacement / prewarm as appropriate per SOP.")
+
+    return {
+        "abo_final": abo_final,
+        "rhd_final": rhd_final,
+        "discrepancy": bool(discrepancy),
+        "invalid": bool(invalid),
+        "notes": notes
+    }
+
+
+# =============================================================================
+# ABO discrepancy guidance + report comment
+# =============================================================================
+def _is_expected_pos_weak(g: str) -> bool:
+    # Reverse expected positives should be ≥2+
+    return _safe_str(g) in ("0","+1","Not Done","")
+
+def _all_entered(grades: list) -> bool:
+    return all(_safe_str(x) not in ("Not Done","",None) for x in grades)
+
+def build_abo_guidance(
+    is_neonate: bool,
+    purpose: str,
+    raw: Dict[str, str],
+    screen_grades: Dict[str, str],
+    dat_inputs: Dict[str, str]
+) -> Dict[str, Any]:
+    """
+    Returns:
+      {
+        general: [..],
+        specific: [{title, bullets}]
+      }
+    All guidance text is English.
+    """
+    general = [
+        "Clerical check: confirm patient identity, specimen labels/barcodes, request details, and historical ABO/RhD (if available).",
+        "Technical check: verify reagent/lot/expiry/storage, QC/control results, specimen quality, and repeat testing (or recollect) as needed.",
+        "Clinical history: review recent transfusion, hematopoietic stem cell/BM transplant, neonatal/cord sample details, and relevant diagnoses."
+    ]
+    specific = []
+
+    def add(title: str, bullets: list):
+        bullets = [b for b in bullets if _safe_str(b)]
+        if bullets:
+            specific.append({"title": title, "bullets": bullets})
+
+    # Screen status
+    sc_list = [_safe_str(g) for g in screen_grades.values()] or ["Not Done"]  # Screen I, II, III...
+    screen_complete = _all_entered(sc_list)
+    screen_any_pos  = any(is_pos_any(g) for g in sc_list if _safe_str(g) not in ("Not Done",""))
+    screen_all_pos  = screen_complete and all(is_pos_any(g) for g in sc_list)
+
+    # Determine forward ABO guess
+    antiA = _safe_str(raw.get("antiA","Not Done"))
+    antiB = _safe_str(raw.get("antiB","Not Done"))
+    fwd_abo = _abo_from_forward_only(antiA, antiB)
+
+    # Grab reverse (adult)
+    rev_a1 = _safe_str(raw.get("a1cells","Not Done"))
+    rev_b  = _safe_str(raw.get("bcells","Not Done"))
+    ctl    = _safe_str(raw.get("ctl","Not Done"))
+
+    # 0) Control / spontaneous agglutination / combined discrepancies
+    # If the group/control is positive, the entire ABO interpretation is INVALID until resolved.
+    # In this situation, do not show other discrepancy branches (weak antigens/weak antibodies/etc.),
+    # because they assume a valid test environment.
+    if is_pos_any(ctl):
+        add(
+            "Control is POSITIVE / panagglutination suspected (ABO test is INVALID)",
+            [
+                "Do NOT interpret ABO until the cause is resolved (repeat testing is required).",
+                "Common causes: cold autoantibody (often anti-I/anti-IH), rouleaux/high-protein interference, or spontaneous agglutination from specimen issues.",
+                "Immediate actions: repeat ABO on a freshly prepared sample (or recollect if indicated) and review QC/reagent integrity.",
+                "Forward (cell-side) resolution: wash patient RBCs multiple times with 37°C warm saline and repeat forward typing at 37°C (prewarmed reagents if available).",
+                "Reverse (serum-side) resolution for cold antibody: prewarm technique (warm plasma/serum and reagent cells separately to 37°C before mixing; keep at 37°C during reading).",
+                "Reverse (serum-side) resolution for rouleaux/high protein: use saline replacement technique (remove patient plasma after spin and replace with saline, then read again).",
+                "If still unresolved: perform/confirm auto-control and DAT; consider cold screen, adsorption (auto- or alloadsorption) or reference lab workup per SOP."
+            ]
+        )
+        return {"general": general, "specific": specific}
+
+    # 1) Forward weak/missing antigens
+    if antiA in ("+1","+2") or antiB in ("+1","+2"):
+        bullets = [
+            "Incubate at room temperature (RT) for 15–30 minutes, then repeat forward grouping.",
+            "If still weak, consider enzyme-treated cells (if available) per SOP.",
+            "If needed, perform adsorption/elution or refer to a reference lab per SOP."
+        ]
+        add("Weak/Missing Antigens (Forward grouping is weak)", bullets)
+
+    # 2) Mixed-field emphasis (history-driven)
+    if "Mixed-field" in (antiA, antiB, rev_a1, rev_b):
+        add(
+            "Mixed-field pattern detected — correlate with history",
+            [
+                "Most common: recent Group O RBC transfusion to a non-O patient (A/B/AB).",
+                "Early after hematopoietic stem cell / bone marrow transplant (e.g., O donor → A recipient).",
+                "A3 subgroup.",
+                "Chimerism (twin / dispermic).",
+                "Document the suspected cause in the technologist comment and confirm manually once history is verified."
+            ]
+        )
+
+    # 3) Reverse weak/missing antibodies (adult/child)
+    if not is_neonate and fwd_abo in ("A","B","O") and _safe_str(rev_a1) not in ("Not Done","") and _safe_str(rev_b) not in ("Not Done",""):
+        a1_should_pos = (fwd_abo in ("B","O"))
+        b_should_pos  = (fwd_abo in ("A","O"))
+        weak_hit = (a1_should_pos and _safe_str(rev_a1) in ("0","+1")) or (b_should_pos and _safe_str(rev_b) in ("0","+1"))
+        if weak_hit:
+            need_cells = []
+            if a1_should_pos and _safe_str(rev_a1) in ("0","+1"):
+                need_cells.append("A1 cells")
+            if b_should_pos and _safe_str(rev_b) in ("0","+1"):
+                need_cells.append("B cells")
+            add(
+                "Weak/Missing Antibodies (Reverse grouping is weak/negative)",
+                [
+                    f"Forward suggests Group {fwd_abo}; reverse reactivity is weak/absent in expected cell(s): {', '.join(need_cells)}.",
+                    "1) Incubate at RT for 15 minutes, then repeat reverse grouping.",
+                    "2) If still negative/weak: use double-dose plasma, then repeat reverse grouping.",
+                    "3) If still negative/weak: incubate at 4°C for 15 minutes and repeat reverse grouping. ⚠️ Must run Auto-Control."
+                ]
+            )
+
+    # 3b) Less likely: weak/missing antigen in forward (apparent Group O)
+    if not is_neonate and fwd_abo == "O":
+        suspected = None
+        weak_antigen = None
+        # If reverse suggests a non-O group (one expected antibody present, the other absent),
+        # consider a weak/missing A or B antigen causing a falsely O forward type.
+        if is_pos_any(rev_a1) and not is_pos_any(rev_b):
+            suspected = "Group B (Anti-A present; B cells NEG)"
+            weak_antigen = "weak/missing B antigen in forward (Anti-B may be weak/negative)"
+        elif is_pos_any(rev_b) and not is_pos_any(rev_a1):
+            suspected = "Group A (Anti-B present; A1 cells NEG)"
+            weak_antigen = "weak/missing A antigen in forward (Anti-A may be weak/negative)"
+        if suspected:
+            add(
+                "Less likely — Weak/Missing Antigens (Forward typing may be falsely O)",
+                [
+                    f"Reverse pattern suggests {suspected}; consider {weak_antigen}.",
+                    "Repeat forward typing on washed patient cells (and a fresh specimen if available); verify reagents/QC and repeat testing.",
+                    "Use an alternative anti-A/anti-B clone and/or anti-A,B; extend incubation per manufacturer; review history (recent transfusion/HSCT, hematologic malignancy, suspected subgroup).",
+                    "If still unresolved: proceed with subgroup workup per your policy and consult transfusion medicine.",
+                ]
+            )
+
+
+    # 4) Unexpected reverse reaction with A1 cells (Forward A or AB)
+    if not is_neonate and fwd_abo in ("A","AB") and is_pos_any(rev_a1):
+        if not screen_complete:
+            add(
+                "Unexpected reverse reaction (A1 cells POSITIVE) — antibody screen needed",
+                [
+                    "Repeat reverse grouping to exclude technical/clerical error.",
+                    "Run Auto-Control with reverse grouping.",
+                    "Perform antibody screen and enter the result to refine the interpretation."
+                ]
+            )
+        elif screen_any_pos:
+            # Priority: address reverse interference when the antibody screen is positive.
+            add(
+                "Extra (Unexpected) — Screen POSITIVE (priority)",
+                [
+                    "Antibody screen is POSITIVE — an antibody may be responsible for the unexpected reverse reaction (e.g., cold-reactive allo/autoantibody) and/or rouleaux.",
+                    "1) Rouleaux: perform saline replacement (reverse grouping).",
+                    "2) Cold antibody (e.g., M, P1): perform pre-warming technique (37°C).",
+                    "Proceed with antibody investigation/identification as indicated, then re-interpret ABO after interference is addressed.",
+                ],
+            )
+            # Still consider Anti-A1 when the pattern fits (may coexist with other antibodies).
+            add(
+                "Also consider: Anti-A1 in an A subgroup (pattern-based)",
+                [
+                    "Because A1 cells are reactive with an A (or AB) forward type, Anti-A1 in an A2/A2B subgroup remains a possible contributor (may coexist with other antibodies).",
+                    "👉 Test patient red cells with Anti-A1 lectin (Dolichos biflorus).",
+                    "👉 Test patient serum with A2 reagent cells.",
+                ],
+            )
+
+        else:
+            add(
+                "Extra (Unexpected) — Screen NEGATIVE",
+                [
+                    "Suspect Anti-A1 in an A2 subgroup (or A2B if AB forward).",
+                    "Test patient RBCs with Anti-A1 lectin (Dolichos biflorus).",
+                    "Test patient serum with A2 cells."
+                ]
+            )
+
+    # 5) Bombay (Oh) suspicion
+    if not is_neonate and fwd_abo == "O" and screen_all_pos:
+        add(
+            "All screening cells POSITIVE with Forward Group O — suspect Bombay (Oh)",
+            [
+                "Pan-reactivity on group O reagent cells suggests anti-H.",
+                "Test patient RBCs with Anti-H lectin.",
+                "Negative reaction with Anti-H lectin supports Bombay (Oh)."
+            ]
+        )
+
+    # 6) Extra unexpected antigens: Acquired B
+    if not is_neonate:
+        # Pattern: forward looks AB but reverse looks A (strong anti-B present)
+        if is_pos_any(antiA) and is_pos_any(antiB) and (not is_pos_any(rev_a1)) and (grade_rank(rev_b) >= 2):
+            add(
+                "Extra Unexpected Antigen — Acquired B phenotype (suspected)",
+                [
+                    "Clinical context: typically Group A patient with lower GI disease (e.g., colon cancer/bowel obstruction) or Gram-negative sepsis (e.g., E. coli).",
+                    "Pattern: forward appears AB, while reverse appears A (strong anti-B in serum).",
+                    "Investigations:",
+                    "• Reagent verification: check Anti-B product insert; some monoclonal clones react with Acquired B. Retest using a different Anti-B clone if available.",
+                    "• Auto-control: test patient serum against autologous RBCs.",
+                    "• Acidified Anti-B test: test patient RBCs using human Anti-B serum acidified to pH 6.0 (if available).",
+                    "Interpretation:",
+                    "• If the Anti-B reaction disappears with a different monoclonal clone → consistent with Acquired B (patient is Group A).",
+                    "• Auto-control is typically NEGATIVE in Acquired B.",
+                    "• Acidified Anti-B: true B reacts strongly at pH 6.0; Acquired B does NOT react at pH 6.0."
+                ]
+            )
+
+        # B(A) / A(B) phenotype (trace antigen with highly sensitive monoclonals)
+        if fwd_abo in ("A","B"):
+            # A(B): A forward with weak anti-B; B(A): B forward with weak anti-A
+            weak_extra = False
+            if fwd_abo == "A" and _safe_str(antiB) in ("+1","+2"):
+                weak_extra = True
+            if fwd_abo == "B" and _safe_str(antiA) in ("+1","+2"):
+                weak_extra = True
+            if weak_extra:
+                add(
+                    "Extra Unexpected Antigen — B(A) or A(B) phenotype (consider)",
+                    [
+                        "An autosomal dominant phenotype with trace antigen expression detected by highly sensitive monoclonal reagents (e.g., certain clones).",
+                        "Resolution: retest using a different manufacturer’s reagent or polyclonal antisera (if available)."
+                    ]
+                )
+
+    # 7) Wharton’s jelly (cord blood)
+    cord_flag = bool(raw.get("cord_sample", False))
+    if is_neonate and cord_flag:
+        add(
+            "Neonate cord sample — Wharton’s jelly contamination (consider)",
+            [
+                "Cord blood contaminated with hyaluronic acid-rich Wharton’s jelly may cause spontaneous agglutination.",
+                "Resolution: wash cord RBCs 4–6 times with warm saline, then repeat forward grouping."
+            ]
+        )
+
+    # 8) Strong DAT C3 (cold agglutinin supporting)
+    dat_c3 = _safe_str(dat_inputs.get("c3d","Not Done"))
+    if dat_c3 in ("+3","+4"):
+        add(
+            "DAT (C3) strongly POSITIVE — cold agglutinin interference (supporting)",
+            [
+                "Resolution: wash RBCs several times with warm saline and retest washed cells at 37°C."
+            ]
+        )
+
+    return {"general": general, "specific": specific}
+
+
+# =============================================================================
+# HOW-TO-REPORT TEMPLATES (compiled once at import; $abo is the cleaned forward group)
+# =============================================================================
+REPORT_TEMPLATES = {
+    "rhd_inconclusive": (
+        "RhD typing is INCONCLUSIVE / weak D suspected.\n\n"
+        "Interpretation note: a partial D phenotype cannot be excluded. Definitive classification requires RHD genotyping, which is not available at our facility.\n\n"
+        "Transfusion safety: manage as RhD NEGATIVE (issue D− RBCs) until confirmed.\n\n"
+        "RhIG note: when RhIG eligibility is clinically relevant (pregnancy, postpartum, newborn), manage as RhD NEGATIVE per local policy unless confirmatory testing is available."
+    ),
+    "weak_forward_neonate": Template(
+        "Forward grouping shows a WEAK reaction in a neonate (≤3–4 months) / cord sample pattern.\n\n"
+        "ABO group: MOST PROBABLE $abo based on current testing (administrative only).\n\n"
+        "Action: repeat testing / recollect if indicated and CONFIRM ABO at ≥6 months of age (or per local policy).\n\n"
+        "Transfusion until confirmed: issue Group O RBCs and AB plasma/platelets (or per local policy)."
+    ),
+    "weak_forward": Template(
+        "ABO grouping is inconclusive due to weak forward antigen reactions. Forward typing suggests $abo, "
+        "however the ABO group cannot be confirmed at this stage. Repeat testing and resolve per SOP. "
+        "Until confirmed, manage as ABO unknown for transfusion purposes (issue Group O RBCs and Group AB plasma/platelets per policy)."
+    ),
+    "mf_recent_tx": (
+        "Mixed-field pattern detected on ABO grouping. This is most consistent with recent transfusion, "
+        "particularly Group O RBC transfusion to a non-O patient, resulting in mixed red cell populations. "
+        "Correlate with transfusion history and prior documented blood group. Do not finalize ABO as confirmed based on the current specimen alone; "
+        "repeat grouping on a new specimen as clinically appropriate and follow facility policy for interim transfusion management."
+    ),
+    "mf_hsct_bm": (
+        "Mixed-field pattern detected on ABO grouping. In the context of hematopoietic stem cell / bone marrow transplantation, "
+        "this may represent post-transplant chimerism (donor/recipient mixed populations). "
+        "Correlate with transplant timeline and historical ABO records (pre- and post-transplant). "
+        "Do not finalize ABO as confirmed based on this specimen alone; manage per transplant transfusion policy and specialist guidance."
+    ),
+    "mf_other": (
+        "Mixed-field pattern detected on ABO grouping. Correlate with clinical history (recent transfusion, hematopoietic stem cell/BM transplant, "
+        "A3 subgroup, or chimerism) and prior records. Do not finalize ABO as confirmed based on this specimen alone; repeat testing per policy."
+    ),
+    "reverse_weak": (
+        "ABO discrepancy (reverse grouping): weak/missing expected antibodies. Forward grouping suggests the listed ABO type, "
+        "however reverse reactions are weaker than expected/absent and the ABO group cannot be confirmed at this stage. "
+        "Perform discrepancy resolution per protocol and do not finalize ABO as confirmed until resolved."
+    ),
+    "a1_screen_pos": (
+        "Unexpected reverse reaction noted (A1 cells reactive). Antibody screen is POSITIVE, which may account for the unexpected reverse reactivity "
+        "(e.g., cold-reactive allo/autoantibody and/or rouleaux). Proceed with interference resolution per SOP (e.g., saline replacement and/or pre-warming technique), "
+        "and proceed with antibody investigation/identification as indicated. Because the pattern includes A1-cell reactivity, Anti-A1 in an A subgroup (A2/A2B) "
+        "should still be considered as a possible contributor; confirm with Anti-A1 lectin and serum testing with A2 cells per SOP. Interpret/finalize ABO only after resolution/confirmation."
+    ),
+    "a1_screen_neg": (
+        "Unexpected reverse reaction noted (A1 cells reactive) with NEGATIVE antibody screen. This pattern may suggest Anti-A1 in an A subgroup (e.g., A2/A2B). "
+        "Recommend confirmatory testing (Anti-A1 lectin and serum testing with A2 cells) per SOP."
+    ),
+}
+_PAREN_RE = re.compile(r"\(.*?\)")
+_ABO_PREFIX_RE = re.compile(r"^(ABO\s*:\s*)", re.IGNORECASE)
+_MOST_PROBABLE_RE = re.compile(r"^(Most\s+probable\s*:\s*)", re.IGNORECASE)
+_WEAK_FORWARD = ("+1", "+2")
+
+
+def _abo_guess(abo_final: str) -> str:
+    """"Most probable: A", "ABO: A", "A (Discrepancy)" -> "A" ("Unknown" if empty)."""
+    g = _PAREN_RE.sub("", abo_final).strip()
+    g = _ABO_PREFIX_RE.sub("", g).strip()
+    g = _MOST_PROBABLE_RE.sub("", g).strip()
+    return g or "Unknown"
+
+
+def build_how_to_report(
+    is_neonate: bool,
+    abo_interp: Dict[str, Any],
+    raw: Dict[str, str],
+    screen_any_positive: bool,
+    mixed_field_history: Dict[str, bool] | None = None
+) -> str:
+    """Return an English copy/paste comment for the HIS/EMR based on the current pattern."""
+    T = REPORT_TEMPLATES
+    parts: list[str] = []
+    mixed_field_history = mixed_field_history or {}
+    notes = [_safe_str(x) for x in abo_interp.get("notes", [])]
+    w = {k: _safe_str(raw.get(k, "Not Done")) for k in ("antiA", "antiB", "antiAB", "a1cells", "bcells", "ctl")}
+
+    # RhD inconclusive / weak D suspected
+    if _safe_str(abo_interp.get("rhd_final", "")).startswith("RhD Inconclusive"):
+        parts.append(T["rhd_inconclusive"])
+
+    # Weak forward antigens (any age); neonates get an administrative "most probable" statement
+    if w["antiA"] in _WEAK_FORWARD or w["antiB"] in _WEAK_FORWARD or w["antiAB"] in _WEAK_FORWARD:
+        abo = _abo_guess(_safe_str(abo_interp.get("abo_final", "")))
+        parts.append(T["weak_forward_neonate" if is_neonate else "weak_forward"].substitute(abo=abo))
+
+    # Mixed-field reporting (adult/child or neonate)
+    if "Mixed-field" in (w["antiA"], w["antiB"], _safe_str(raw.get("antiAB", "")), w["a1cells"], w["bcells"],
+                         _safe_str(raw.get("ctl", ""))):
+        if mixed_field_history.get("recent_tx"):
+            parts.append(T["mf_recent_tx"])
+        elif mixed_field_history.get("hsct_bm"):
+            parts.append(T["mf_hsct_bm"])
+        else:
+            parts.append(T["mf_other"])
+
+    if not is_neonate:
+        # Reverse weak/missing antibodies (adult/child)
+        if "ABO DISCREPANCY" in " ".join(notes) and any("Reverse grouping is weaker" in n for n in notes):
+            parts.append(T["reverse_weak"])
+        # Unexpected reverse with A1 cells + screen linkage
+        if any("Anti-A1" in n or "unexpected reverse" in n.lower() for n in notes):
+            parts.append(T["a1_screen_pos" if screen_any_positive else "a1_screen_neg"])
+
+    return "\n\n".join(parts)
@@ -0,0 +1,231 @@
+"""
+Precompiled ABO / RhD decision table (interpret_abo_rhd over its whole input space).
+
+Every input the workstation can enter is a grade from ABO_GRADES in six wells plus
+one flag, so interpret_abo_rhd is a finite function:
+  adult    antiA, antiB, antiD, ctl, a1cells, bcells  x  screen_any_positive
+  neonate  antiA, antiB, antiAB, antiD, ctl, dat      x  purpose == "RhIG"
+(the adult branch ignores purpose, the neonate branch ignores the screen flag).
+`build` runs the reference function on all 2 x 8^6 x 2 inputs once, interns the
+distinct results (a few thousand) and writes data/abo_table.bin:
+  MAGIC + zlib( header JSON + NUL + uint16 result id per input, little-endian )
+The header carries the grade order, the interned results / notes and a hash of
+the reference source; a table built from other code is not used (lookup falls
+back to interpret_abo_rhd), and `check` compares every entry with the code;
+tests/test_abo_table.py runs both, so a table left stale by a code change fails there.
+
+    python -m bloodbank.abo_table build [--out data/abo_table.bin] [--workers 4]
+    python -m bloodbank.abo_table check [--path data/abo_table.bin]
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import sys
+import time
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import product
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from bloodbank import abo
+from bloodbank.abo import ABO_GRADES, interpret_abo_rhd, _safe_str
+
+MAGIC = b"ABOTABLE1\n"
+DEFAULT_TABLE_PATH = str(Path(__file__).resolve().parents[1] / "data" / "abo_table.bin")
+SPACES = {
+    "adult": ["antiA", "antiB", "antiD", "ctl", "a1cells", "bcells"],
+    "neonate": ["antiA", "antiB", "antiAB", "antiD", "ctl", "dat"],
+}
+SPACE_SIZE = 2 * len(ABO_GRADES) ** 6
+_GRADE_INDEX = {g: i for i, g in enumerate(ABO_GRADES)}
+_ADULT_KEYS, _NEONATE_KEYS = tuple(SPACES["adult"]), tuple(SPACES["neonate"])
+
+
+def source_hash() -> str:
+    """sha256 over interpret_abo_rhd and the helpers / tables it reads."""
+    h = hashlib.sha256()
+    for fn in (interpret_abo_rhd, abo._abo_from_forward_only, abo._abo_mapping_consistent,
+               abo.is_pos_any, abo.grade_num, abo._safe_str):
+        h.update(inspect.getsource(fn).encode("utf-8"))
+    h.update(json.dumps([ABO_GRADES, abo.GRADE_NUM], sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _reference(space: str, grades: Tuple[str, ...], flag: bool) -> Dict[str, Any]:
+    raw = dict(zip(SPACES[space], grades))
+    if space == "adult":
+        return interpret_abo_rhd(False, "Transfusion", raw, flag)
+    return interpret_abo_rhd(True, "RhIG" if flag else "Transfusion", raw, False)
+
+
+def _result_key(r: Dict[str, Any]) -> tuple:
+    return (r["abo_final"], r["rhd_final"], bool(r["discrepancy"]), bool(r["invalid"]), tuple(r["notes"]))
+
+
+def _slice(space: str, first: int) -> List[tuple]:
+    """Reference results for every input whose first grade is ABO_GRADES[first], in table order."""
+    g0 = ABO_GRADES[first]
+    return [_result_key(_reference(space, (g0,) + rest, flag))
+            for rest in product(ABO_GRADES, repeat=5) for flag in (False, True)]
+
+
+def _space_results(workers: int):
+    """(space, first, results) for every slice, in table order."""
+    tasks = [(space, i) for space in SPACES for i in range(len(ABO_GRADES))]
+    if workers <= 1:
+        for space, i in tasks:
+            yield space, i, _slice(space, i)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for (space, i), res in zip(tasks, pool.map(_slice, *zip(*tasks))):
+            yield space, i, res
+
+
+def build(out_path: str = DEFAULT_TABLE_PATH, workers: int = 4) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    ids: Dict[tuple, int] = {}
+    note_ids: Dict[str, int] = {}
+    table = array("H")
+    for _space, _i, results in _space_results(workers):
+        for key in results:
+            rid = ids.get(key)
+            if rid is None:
+                rid = ids[key] = len(ids)
+                for n in key[4]:
+                    note_ids.setdefault(n, len(note_ids))
+            table.append(rid)
+    if len(ids) > 0xFFFF:
+        raise ValueError(f"{len(ids)} distinct results do not fit a uint16 table")
+    header = {
+        "version": 1,
+        "source": source_hash(),
+        "grades": ABO_GRADES,
+        "spaces": SPACES,
+        "notes": list(note_ids),
+        "results": [[k[0], k[1], k[2], k[3], [note_ids[n] for n in k[4]]] for k in ids],
+    }
+    if sys.byteorder != "little":
+        table.byteswap()
+    blob = MAGIC + zlib.compress(json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\0" + table.tobytes(), 9)
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    Path(out_path).write_bytes(blob)
+    return {"entries": len(table), "results": len(ids), "notes": len(note_ids), "bytes": len(blob),
+            "sec": time.perf_counter() - t0}
+
+
+class AboDecisionTable:
+    """Loaded table: lookup(is_neonate, purpose, raw, screen_any_positive) -> result or None (off-table input)."""
+
+    def __init__(self, blob: bytes):
+        if not blob.startswith(MAGIC):
+            raise ValueError("not an ABO decision table")
+        data = zlib.decompress(blob[len(MAGIC):])
+        cut = data.index(b"\0")
+        self.header = json.loads(data[:cut].decode("utf-8"))
+        self.table = array("H")
+        self.table.frombytes(data[cut + 1:])
+        if sys.byteorder != "little":
+            self.table.byteswap()
+        if len(self.table) != 2 * SPACE_SIZE or self.header["grades"] != ABO_GRADES:
+            raise ValueError("ABO decision table does not match the current grade list")
+        notes = self.header["notes"]
+        self.results = [(a, r, d, inv, tuple(notes[i] for i in ns)) for a, r, d, inv, ns in self.header["results"]]
+        self.fresh = self.header["source"] == source_hash()
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_TABLE_PATH) -> "AboDecisionTable":
+        return cls(Path(path).read_bytes())
+
+    def index(self, is_neonate: bool, purpose: str, raw: Dict[str, str], screen_any_positive: bool) -> Optional[int]:
+        gi, base = _GRADE_INDEX, len(ABO_GRADES)
+        i = 0
+        for k in _NEONATE_KEYS if is_neonate else _ADULT_KEYS:
+            v = raw.get(k, "Not Done")
+            g = gi.get(v)
+            if g is None:
+                g = gi.get(_safe_str(v))  # same normalization as interpret_abo_rhd
+                if g is None:
+                    return None
+            i = i * base + g
+        flag = (purpose == "RhIG") if is_neonate else bool(screen_any_positive)
+        return (SPACE_SIZE if is_neonate else 0) + 2 * i + flag
+
+    def lookup(self, is_neonate: bool, purpose: str, raw: Dict[str, str], screen_any_positive: bool):
+        i = self.index(is_neonate, purpose, raw, screen_any_positive)
+        if i is None:
+            return None
+        a, r, d, inv, notes = self.results[self.table[i]]
+        return {"abo_final": a, "rhd_final": r, "discrepancy": d, "invalid": inv, "notes": list(notes)}
+
+    def check(self, workers: int = 4, limit: int = 20) -> List[Dict[str, Any]]:
+        """Every entry vs the reference function: first `limit` mismatches."""
+        bad = []
+        off = {"adult": 0, "neonate": SPACE_SIZE}
+        per_slice = SPACE_SIZE // len(ABO_GRADES)
+        for space, first, results in _space_results(workers):
+            base = off[space] + first * per_slice
+            for j, key in enumerate(results):
+                if self.results[self.table[base + j]] != key and len(bad) < limit:
+                    bad.append({"space": space, "index": base + j, "table": self.results[self.table[base + j]],
+                                "code": key})
+        return bad
+
+
+@lru_cache(maxsize=4)
+def load_table(path: str = DEFAULT_TABLE_PATH) -> Optional[AboDecisionTable]:
+    """Table at path if present and built from the current code, else None (callers use the reference)."""
+    try:
+        tbl = AboDecisionTable.load(path)
+    except (OSError, ValueError, zlib.error):
+        return None
+    return tbl if tbl.fresh else None
+
+
+def interpret_abo_rhd_lookup(
+    is_neonate: bool,
+    purpose: str,
+    raw: Dict[str, str],
+    screen_any_positive: bool,
+) -> Dict[str, Any]:
+    """interpret_abo_rhd through the decision table: O(1) for ABO_GRADES inputs, reference otherwise."""
+    tbl = load_table()
+    if tbl is not None:
+        out = tbl.lookup(is_neonate, purpose, raw, screen_any_positive)
+        if out is not None:
+            return out
+    return interpret_abo_rhd(is_neonate, purpose, raw, screen_any_positive)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build / check the precompiled ABO-RhD decision table")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build")
+    b.add_argument("--out", default=DEFAULT_TABLE_PATH)
+    b.add_argument("--workers", type=int, default=4)
+    c = sub.add_parser("check")
+    c.add_argument("--path", default=DEFAULT_TABLE_PATH)
+    c.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        st = build(args.out, args.workers)
+        print(f"{st['entries']} inputs -> {st['results']} distinct results ({st['notes']} notes), "
+              f"{st['bytes'] / 1024:.0f} KiB, {st['sec']:.1f}s -> {args.out}")
+        return
+    tbl = AboDecisionTable.load(args.path)
+    if not tbl.fresh:
+        print("table was built from different interpret_abo_rhd source: rebuild it")
+        sys.exit(1)
+    bad = tbl.check(args.workers)
+    for m in bad:
+        print(m)
+    print(f"{len(tbl.table)} entries vs interpret_abo_rhd:", "OK" if not bad else f"{len(bad)}+ mismatch(es)")
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,736 @@
+"""
+Antibody identification engine (rule-out / rule-in on the antigram).
+
+Two paths live here:
+  - Reference path: the original per-cell functions (ph_has / is_homozygous
+    called per cell per antigen). Kept as-is for equivalence checks.
+  - Compiled path: CompiledCells compiles panel + screen + selected cells once
+    into per-antigen integer bitmasks (bit i = cell i), so rule-out, coverage,
+    separability and discriminating-cell checks become AND/OR operations.
+"""
+import time
+from itertools import combinations
+from typing import Dict, Any, List, Tuple, Optional
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+AGS = ["D","C","E","c","e","Cw","K","k","Kpa","Kpb","Jsa","Jsb","Fya","Fyb","Jka","Jkb","Lea","Leb","P1","M","N","S","s","Lua","Lub","Xga"]
+DOSAGE = ["C","c","E","e","Fya","Fyb","Jka","Jkb","M","N","S","s"]
+PAIRS = {'C':'c','c':'C','E':'e','e':'E','Fya':'Fyb','Fyb':'Fya','Jka':'Jkb','Jkb':'Jka','M':'N','N':'M','S':'s','s':'S'}
+
+IGNORED_AGS = ["Kpa", "Kpb", "Jsa", "Jsb", "Lub", "Cw"]
+INSIGNIFICANT_AGS = ["Lea", "Lua", "Leb", "P1"]
+ENZYME_DESTROYED = ["Fya","Fyb","M","N","S","s"]
+
+# membership tables for the hot paths (lists above keep display order)
+DOSAGE_SET = frozenset(DOSAGE)
+IGNORED_SET = frozenset(IGNORED_AGS)
+INSIGNIFICANT_SET = frozenset(INSIGNIFICANT_AGS)
+NEGATIVE_GRADES = frozenset(["0", "neg", "negative", "none", "not done", "nd", "n/d"])
+
+# =============================================================================
+# REFERENCE PATH (per-cell)
+# =============================================================================
+def normalize_grade(val) -> int:
+    return 0 if str(val).lower().strip() in NEGATIVE_GRADES else 1
+
+def is_homozygous(ph, ag: str) -> bool:
+    if ag not in DOSAGE_SET:
+        return True
+    pair = PAIRS.get(ag)
+    if not pair:
+        return True
+    return (ph.get(ag,0)==1 and ph.get(pair,0)==0)
+
+def ph_has(ph, ag: str) -> bool:
+    try:
+        return int(ph.get(ag,0)) == 1
+    except Exception:
+        try:
+            return int(ph[ag]) == 1
+        except Exception:
+            return False
+
+def roman(n: int) -> str:
+    """1 -> 'I', 4 -> 'IV' ... (screen cell labels)."""
+    out = ""
+    for v, r in ((10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I")):
+        while n >= v:
+            out += r
+            n -= v
+    return out
+
+def panel_spec(key: str, name: str, df, lot: str = "", labels: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    One antigram in a workup: key (reaction dict key), display name, lot, antigram df.
+    Cell labels default to '<name> #1..#n'; reaction keys are 1..n in that order.
+    """
+    n = len(df)
+    return {"key": key, "name": name, "lot": lot, "df": df,
+            "labels": list(labels) if labels else [f"{name} #{i+1}" for i in range(n)]}
+
+def standard_panels(panel_df, screen_df, lot_p: str = "", lot_s: str = "") -> List[Dict[str, Any]]:
+    """Routine ID panel (Panel #1..#n) + screen (Screen I..), any number of rows each."""
+    return [
+        panel_spec("panel", "Panel", panel_df, lot_p),
+        panel_spec("screen", "Screen", screen_df, lot_s,
+                   labels=[f"Screen {roman(i+1)}" for i in range(len(screen_df))]),
+    ]
+
+def frame_records(df) -> List[dict]:
+    """df.to_dict("records") without pandas' per-row indexing (~10x faster on antigram-sized frames)."""
+    cols = [str(c) for c in df.columns]
+    return [dict(zip(cols, row)) for row in df.values.tolist()]
+
+def panel_rows(p: Dict[str, Any]) -> List[dict]:
+    """Row dicts of a panel_spec() antigram, converted once per spec and kept on it."""
+    if "rows" not in p:
+        p["rows"] = frame_records(p["df"])
+    return p["rows"]
+
+def _reaction(rx, i: int, label: str):
+    # reactions keyed by 1-based position (panels) or by roman numeral (screen: 'I', 'II'...)
+    if i + 1 in rx:
+        return rx[i + 1]
+    if str(i + 1) in rx:
+        return rx[str(i + 1)]
+    return rx.get(label.rsplit(" ", 1)[-1], "Not Done")
+
+def build_panel_cells(panels: List[Dict[str, Any]], reactions: Dict[str, dict], extras: list) -> List[dict]:
+    """
+    One cell list for any number of panels evaluated together, then selected cells.
+    panels: panel_spec() dicts in order; reactions: {panel key: {1: grade, ...}}.
+    Each antigram is converted to row dicts once per spec (no per-cell pandas access);
+    a missing reaction counts as not done (= negative, as before).
+    """
+    cells = []
+    for p in panels:
+        rx = reactions.get(p["key"], {}) or {}
+        for i, ph in enumerate(panel_rows(p)):
+            label = p["labels"][i]
+            grade = _reaction(rx, i, label)
+            cells.append({"label": label, "react": normalize_grade(grade), "ph": ph, "grade": grade})
+    for ex in extras:
+        cells.append(selected_cell(ex))
+    return cells
+
+def selected_cell(ex: dict) -> dict:
+    """Cell dict for one selected cell (st.session_state.ext entry)."""
+    return {"label": f"Selected: {ex.get('id','(no-id)')}", "react": int(ex.get("res",0)), "ph": ex.get("ph",{}),
+            "grade": ex.get("grade", ex.get("res",0))}
+
+def build_cells(panel_df, screen_df, in_p: dict, in_s: dict, extras: list) -> List[dict]:
+    """
+    Same cell list the workstation has always used:
+      Panel #1..#n, Screen I.., then selected cells (extras).
+    panel_df / screen_df are passed explicitly (no session state here).
+    """
+    return build_panel_cells(standard_panels(panel_df, screen_df), {"panel": in_p, "screen": in_s}, extras)
+
+def panel_cell_count(panels: List[Dict[str, Any]]) -> int:
+    return sum(len(p["df"]) for p in panels)
+
+def rule_out_cells(cells: list) -> set:
+    ruled_out = set()
+    for c in cells:
+        if c["react"] == 0:
+            ph = c["ph"]
+            for ag in AGS:
+                if ag in IGNORED_SET:
+                    continue
+                if ph_has(ph, ag) and is_homozygous(ph, ag):
+                    ruled_out.add(ag)
+    return ruled_out
+
+def combo_valid_against_negatives(combo: tuple, cells: list):
+    for c in cells:
+        if c["react"] == 0:
+            ph = c["ph"]
+            for ag in combo:
+                if ph_has(ph, ag) and is_homozygous(ph, ag):
+                    return False
+    return True
+
+def combo_covers_all_positives(combo: tuple, cells: list):
+    for c in cells:
+        if c["react"] == 1:
+            ph = c["ph"]
+            if not any(ph_has(ph, ag) for ag in combo):
+                return False
+    return True
+
+def find_best_combo(candidates: list, cells: list, max_size: int = 3):
+    cand_sig = [c for c in candidates if c not in INSIGNIFICANT_SET]
+    cand_cold = [c for c in candidates if c in INSIGNIFICANT_SET]
+    ordered = cand_sig + cand_cold
+    for r in range(1, max_size+1):
+        for combo in combinations(ordered, r):
+            if not combo_valid_against_negatives(combo, cells):
+                continue
+            if not combo_covers_all_positives(combo, cells):
+                continue
+            return combo
+    return None
+
+def separability_map(combo: tuple, cells: list):
+    sep = {}
+    for ag in combo:
+        other = [x for x in combo if x != ag]
+        found_unique = False
+        for c in cells:
+            if c["react"] == 1:
+                ph = c["ph"]
+                if ph_has(ph, ag) and all(not ph_has(ph, o) for o in other):
+                    found_unique = True
+                    break
+        sep[ag] = found_unique
+    return sep
+
+def check_rule_three_only_on_discriminating(ag: str, combo: tuple, cells: list):
+    other = [x for x in combo if x != ag]
+    p = 0
+    n = 0
+    for c in cells:
+        ph = c["ph"]
+        ag_pos = ph_has(ph, ag)
+        if c["react"] == 1:
+            if ag_pos and all(not ph_has(ph, o) for o in other):
+                p += 1
+        else:
+            if not ag_pos:
+                n += 1
+    full = (p >= 3 and n >= 3)
+    mod  = (p >= 2 and n >= 3)
+    return full, mod, p, n
+
+def suggest_selected_cells(target: str, other_set: list, panels: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """
+    Inventory cells (panel_spec() panels) that are target+ and negative for every
+    other active suspect: [(cell label, dosage note)].
+    """
+    others = [x for x in other_set if x != target]
+    out = []
+    for p in panels:
+        for label, ph in zip(p["labels"], panel_rows(p)):
+            if not ph_has(ph, target) or any(ph_has(ph, o) for o in others):
+                continue
+            note = "OK"
+            if target in DOSAGE_SET:
+                note = "Homozygous preferred" if is_homozygous(ph, target) else "Heterozygous (dosage caution)"
+            out.append((label, note))
+    return out
+
+def phenotype_conflict_notes(suspected_antibodies: List[str], phenotype: Dict[str, str]) -> List[str]:
+    """Patient typed antigen-positive (phenotype 'Detected') for a suspected antibody."""
+    notes = []
+    for ag in suspected_antibodies:
+        if ag in IGNORED_SET:
+            continue
+        if str(phenotype.get(ag, "Not Done") or "").strip() == "Detected":
+            notes.append(f"Conflict: Anti-{ag} suggested/confirmed but patient phenotype shows {ag} = Detected. Verify phenotype was done on PRE-transfusion sample and review antibody identification.")
+    return notes
+
+def enzyme_hint_if_needed(targets_needing_help: list):
+    hits = [x for x in targets_needing_help if x in ENZYME_DESTROYED]
+    if hits:
+        return f"Enzyme option may help (destroys/weakens: {', '.join(hits)}). Use only per SOP and interpret carefully."
+    return None
+
+def discriminating_cells_for(target: str, active_not_excluded: set, cells: list):
+    others = [x for x in active_not_excluded if x != target]
+    disc = []
+    for c in cells:
+        ph = c["ph"]
+        if not ph_has(ph, target):
+            continue
+        if any(ph_has(ph, o) for o in others):
+            continue
+        disc.append(c)
+    return disc
+
+def background_auto_resolution(background_list: list, active_not_excluded: set, cells: list):
+    auto_ruled_out = {}
+    supported = {}
+    inconclusive = {}
+    no_disc = []
+
+    for ag in background_list:
+        disc = discriminating_cells_for(ag, active_not_excluded, cells)
+        if not disc:
+            no_disc.append(ag)
+            continue
+
+        pos = [c for c in disc if c["react"] == 1]
+        neg = [c for c in disc if c["react"] == 0]
+
+        if pos and neg:
+            inconclusive[ag] = [c["label"] for c in disc]
+        elif pos:
+            supported[ag] = [c["label"] for c in pos]
+        else:
+            auto_ruled_out[ag] = [c["label"] for c in neg]
+
+    return auto_ruled_out, supported, inconclusive, no_disc
+
+# =============================================================================
+# COMPILED PATH (per-antigen bitmasks)
+# =============================================================================
+def _bits(mask: int) -> List[int]:
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length() - 1)
+        mask ^= low
+    return out
+
+def compile_phenotypes(phs: list) -> Tuple[Dict[str, int], Dict[str, int], int]:
+    """
+    Per-antigen bitmasks for a list of phenotype rows (dict or pandas Series).
+    Returns (has, homo, n) where bit i refers to phs[i].
+    Same semantics as ph_has / is_homozygous.
+    """
+    has = {ag: 0 for ag in AGS}
+    homo = {ag: 0 for ag in AGS}
+    for i, ph in enumerate(phs):
+        bit = 1 << i
+        # one bulk conversion per row instead of 26+ Series lookups
+        if hasattr(ph, "to_dict"):
+            ph = ph.to_dict()
+        for ag in AGS:
+            if ph_has(ph, ag):
+                has[ag] |= bit
+                if is_homozygous(ph, ag):
+                    homo[ag] |= bit
+    return has, homo, len(phs)
+
+def compile_antigram(df) -> Tuple[Dict[str, int], Dict[str, int], int]:
+    """Bitmasks for every row of an antigram DataFrame (panel11_df / screen3_df)."""
+    return compile_phenotypes(frame_records(df))
+
+def stack_masks(*parts) -> Tuple[Dict[str, int], Dict[str, int], int]:
+    """Concatenate compiled parts in order (panel, then screen, then selected cells...)."""
+    has = {ag: 0 for ag in AGS}
+    homo = {ag: 0 for ag in AGS}
+    off = 0
+    for p_has, p_homo, p_n in parts:
+        for ag in AGS:
+            has[ag] |= p_has.get(ag, 0) << off
+            homo[ag] |= p_homo.get(ag, 0) << off
+        off += p_n
+    return has, homo, off
+
+def compile_panels(panels: List[Dict[str, Any]], extras: list, compile_df=compile_antigram):
+    """
+    Masks for build_panel_cells(panels, ..., extras) in the same cell order.
+    compile_df lets callers pass a cached compile_antigram (antigrams rarely change).
+    """
+    return stack_masks(*[compile_df(p["df"]) for p in panels],
+                       compile_phenotypes([ex.get("ph",{}) for ex in extras]))
+
+def all_reactive(panels: List[Dict[str, Any]], reactions: Dict[str, dict]) -> bool:
+    """Every panel and screen cell positive (pan-reactive pattern)."""
+    for p in panels:
+        rx = reactions.get(p["key"], {}) or {}
+        for i, label in enumerate(p["labels"]):
+            if normalize_grade(_reaction(rx, i, label)) != 1:
+                return False
+    return panel_cell_count(panels) > 0
+
+def minimal_covers(
+    target: int,
+    covers: List[int],
+    max_size: int = 3,
+    time_budget_sec: Optional[float] = None,
+    max_nodes: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    All minimum-cardinality index sets S with OR(covers[i] for i in S) covering target.
+
+    Branch-and-bound, iterative deepening on the set size (1..max_size):
+      - branch on the uncovered cell with the fewest remaining coverers; sibling
+        branches exclude earlier coverers, so every set is produced exactly once
+      - coverage bound: k slots left * best single coverage < uncovered -> prune
+    Returns {"combos": [sorted index tuples, lexicographic], "size", "complete", "nodes"}.
+    complete=False when the time / node budget ran out (combos found so far are kept).
+    """
+    n = len(covers)
+    cells = _bits(target)
+    cell_cov = {c: sum(1 << i for i in range(n) if covers[i] >> c & 1) for c in cells}
+    deadline = (time.perf_counter() + time_budget_sec) if time_budget_sec else None
+    state = {"nodes": 0, "stop": False}
+    found: List[Tuple[int, ...]] = []
+
+    if target == 0:
+        return {"combos": [], "size": 0, "complete": True, "nodes": 0}
+
+    def search(uncovered: int, chosen: List[int], allowed: int, k: int):
+        state["nodes"] += 1
+        if (max_nodes and state["nodes"] > max_nodes) or (deadline and time.perf_counter() > deadline):
+            state["stop"] = True
+            return
+        if not uncovered:
+            found.append(tuple(sorted(chosen)))
+            return
+        if k == 0:
+            return
+
+        best_cell, best_opts = -1, None
+        for c in _bits(uncovered):
+            opts = cell_cov[c] & allowed
+            if not opts:
+                return  # this cell can no longer be covered
+            if best_opts is None or opts.bit_count() < best_opts.bit_count():
+                best_cell, best_opts = c, opts
+
+        need = uncovered.bit_count()
+        best_gain = max((covers[i] & uncovered).bit_count() for i in _bits(allowed))
+        if best_gain * k < need:
+            return
+
+        for i in _bits(best_opts):
+            chosen.append(i)
+            search(uncovered & ~covers[i], chosen, allowed & ~(1 << i), k - 1)
+            chosen.pop()
+            allowed &= ~(1 << i)
+            if state["stop"]:
+                return
+
+    size = 0
+    for r in range(1, max_size + 1):
+        search(target, [], (1 << n) - 1, r)
+        if found or state["stop"]:
+            size = r
+            break
+    return {"combos": sorted(set(found)), "size": size if found else 0,
+            "complete": not state["stop"], "nodes": state["nodes"]}
+
+class CompiledCells:
+    """
+    Cells compiled into integer bitmasks (bit i = cells[i]).
+
+      pos        cells with react == 1
+      neg        cells with react == 0
+      has[ag]    cells carrying antigen ag
+      homo[ag]   cells where ag counts as homozygous (is_homozygous)
+      ro[ag]     has & homo  -> a NEGATIVE cell in ro[ag] rules out Anti-ag
+
+    masks: optional precompiled (has, homo, n) for the same cells in the same order
+    (e.g. stack_masks(compiled panel, compiled screen, compiled extras)), so the
+    antigram itself is compiled once and only reactions change per run.
+    Methods mirror the reference functions above and return the same results.
+    """
+
+    def __init__(self, cells: list, masks: Optional[Tuple[Dict[str, int], Dict[str, int], int]] = None):
+        self.cells = list(cells)
+        self.labels = [c["label"] for c in self.cells]
+        self.n = len(self.cells)
+        self.all = (1 << self.n) - 1
+
+        if masks is None:
+            masks = compile_phenotypes([c["ph"] for c in self.cells])
+        has, homo, n = masks
+        if n != self.n:
+            raise ValueError(f"Compiled masks cover {n} cells, expected {self.n}")
+
+        pos = 0
+        neg = 0
+        for i, c in enumerate(self.cells):
+            if c["react"] == 1:
+                pos |= 1 << i
+            elif c["react"] == 0:
+                neg |= 1 << i
+
+        self.pos = pos
+        self.neg = neg
+        self.has = has
+        self.homo = homo
+        self.ro = {ag: has[ag] & homo[ag] for ag in AGS}
+
+    @classmethod
+    def _derived(cls, cells: list, labels: list, has: dict, homo: dict, pos: int, neg: int) -> "CompiledCells":
+        eng = cls.__new__(cls)
+        eng.cells, eng.labels, eng.n = cells, labels, len(cells)
+        eng.all = (1 << eng.n) - 1
+        eng.pos, eng.neg, eng.has, eng.homo = pos, neg, has, homo
+        eng.ro = {ag: has[ag] & homo[ag] for ag in AGS}
+        return eng
+
+    def with_cell(self, cell: dict) -> "CompiledCells":
+        """Same engine plus one cell appended (a selected cell): O(antigens), self unchanged."""
+        bit = 1 << self.n
+        ph = cell["ph"]
+        has, homo = dict(self.has), dict(self.homo)
+        for ag in AGS:
+            if ph_has(ph, ag):
+                has[ag] |= bit
+                if is_homozygous(ph, ag):
+                    homo[ag] |= bit
+        pos = self.pos | (bit if cell["react"] == 1 else 0)
+        neg = self.neg | (bit if cell["react"] == 0 else 0)
+        return self._derived(self.cells + [cell], self.labels + [cell["label"]], has, homo, pos, neg)
+
+    def without_cell(self, i: int) -> "CompiledCells":
+        """Same engine with cell i dropped (later cells shift down one bit): O(antigens), self unchanged."""
+        if not 0 <= i < self.n:
+            raise IndexError(f"cell {i} out of range ({self.n} cells)")
+        low = (1 << i) - 1
+
+        def drop(m: int) -> int:
+            return (m & low) | ((m >> (i + 1)) << i)
+
+        return self._derived(self.cells[:i] + self.cells[i+1:], self.labels[:i] + self.labels[i+1:],
+                             {ag: drop(m) for ag, m in self.has.items()},
+                             {ag: drop(m) for ag, m in self.homo.items()},
+                             drop(self.pos), drop(self.neg))
+
+    # ------------------------------------------------------------------
+    def _union(self, ags) -> int:
+        m = 0
+        for ag in ags:
+            m |= self.has.get(ag, 0)
+        return m
+
+    def labels_for(self, mask: int) -> List[str]:
+        return [self.labels[i] for i in _bits(mask)]
+
+    def cells_for(self, mask: int) -> List[dict]:
+        return [self.cells[i] for i in _bits(mask)]
+
+    # ------------------------------------------------------------------
+    def rule_out(self) -> set:
+        return {ag for ag in AGS if ag not in IGNORED_SET and (self.ro[ag] & self.neg)}
+
+    def combo_valid_against_negatives(self, combo: tuple) -> bool:
+        for ag in combo:
+            if self.ro.get(ag, 0) & self.neg:
+                return False
+        return True
+
+    def combo_covers_all_positives(self, combo: tuple) -> bool:
+        return (self.pos & ~self._union(combo)) == 0
+
+    def find_best_combo(self, candidates: list, max_size: int = 3):
+        cand_sig = [c for c in candidates if c not in INSIGNIFICANT_SET]
+        cand_cold = [c for c in candidates if c in INSIGNIFICANT_SET]
+        # A combo is valid iff every member is valid on its own, so invalid antigens
+        # can be dropped up front without changing the order combos are tried in.
+        ordered = [ag for ag in cand_sig + cand_cold if not (self.ro.get(ag, 0) & self.neg)]
+        pos = self.pos
+        has = self.has
+        for r in range(1, max_size+1):
+            for combo in combinations(ordered, r):
+                m = 0
+                for ag in combo:
+                    m |= has.get(ag, 0)
+                if (pos & ~m) == 0:
+                    return combo
+        return None
+
+    def minimal_explanations(
+        self,
+        candidates: list,
+        max_size: int = 3,
+        time_budget_sec: Optional[float] = 0.5,
+        max_nodes: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Every minimal antibody set (fewest antibodies) that explains the reactions:
+        no member ruled out by a negative cell, every positive cell covered.
+        Combos come in find_best_combo order, so combos[0] is what it returns.
+        """
+        cand_sig = [c for c in candidates if c not in INSIGNIFICANT_SET]
+        cand_cold = [c for c in candidates if c in INSIGNIFICANT_SET]
+        # negative-cell constraints first, then antigens that explain no positive cell
+        # (never part of a minimal set)
+        ordered = [ag for ag in cand_sig + cand_cold
+                   if not (self.ro.get(ag, 0) & self.neg) and (self.has.get(ag, 0) & self.pos)]
+        res = minimal_covers(self.pos, [self.has.get(ag, 0) for ag in ordered], max_size,
+                             time_budget_sec=time_budget_sec, max_nodes=max_nodes)
+        res["combos"] = [tuple(ordered[i] for i in combo) for combo in res["combos"]]
+        return res
+
+    def separability_map(self, combo: tuple) -> Dict[str, bool]:
+        sep = {}
+        for ag in combo:
+            others = self._union(x for x in combo if x != ag)
+            sep[ag] = bool(self.pos & self.has.get(ag, 0) & ~others)
+        return sep
+
+    def check_rule_three_only_on_discriminating(self, ag: str, combo: tuple):
+        others = self._union(x for x in combo if x != ag)
+        ag_mask = self.has.get(ag, 0)
+        p = (self.pos & ag_mask & ~others).bit_count()
+        n = (self.all & ~self.pos & ~ag_mask).bit_count()
+        full = (p >= 3 and n >= 3)
+        mod  = (p >= 2 and n >= 3)
+        return full, mod, p, n
+
+    def discriminating_mask(self, target: str, active_not_excluded: set) -> int:
+        others = self._union(x for x in active_not_excluded if x != target)
+        return self.has.get(target, 0) & ~others
+
+    def discriminating_cells_for(self, target: str, active_not_excluded: set) -> List[dict]:
+        return self.cells_for(self.discriminating_mask(target, active_not_excluded))
+
+    def background_auto_resolution(self, background_list: list, active_not_excluded: set):
+        auto_ruled_out = {}
+        supported = {}
+        inconclusive = {}
+        no_disc = []
+
+        for ag in background_list:
+            disc = self.discriminating_mask(ag, active_not_excluded)
+            if not disc:
+                no_disc.append(ag)
+                continue
+
+            pos = disc & self.pos
+            neg = disc & self.neg
+
+            if pos and neg:
+                inconclusive[ag] = self.labels_for(disc)
+            elif pos:
+                supported[ag] = self.labels_for(pos)
+            else:
+                auto_ruled_out[ag] = self.labels_for(neg)
+
+        return auto_ruled_out, supported, inconclusive, no_disc
+
+# =============================================================================
+# WHOLE ANALYSIS (one pass, plain data out)
+# =============================================================================
+def analyze_specificity(
+    eng: CompiledCells,
+    panels: List[Dict[str, Any]],
+    explain_max_size: int = 3,
+    explain_budget_sec: Optional[float] = 0.5,
+    prior: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Rule-out -> best combo -> minimal explanations -> separability -> background
+    resolution -> rule of three -> selected-cell suggestions, as plain lists/dicts
+    (no sets, deterministic order) so the result can be cached and shared.
+    The workstation renders it; 'details' / 'conclusion_short' are what gets saved.
+
+    prior: result for the same cells minus cells appended since (eng.with_cell).
+    Extra cells only add constraints, so if prior's best combo still explains the
+    pattern it is still the first minimal one and the minimal explanations are
+    prior's filtered: the combination search is skipped. Same result either way.
+    """
+    ruled = eng.rule_out()
+    candidates = [a for a in AGS if a not in ruled and a not in IGNORED_SET]
+    best, expl = None, None
+    if prior is not None and not prior.get("best"):
+        pass  # more cells cannot create an explanation
+    elif prior is not None and prior["explanations"]["complete"] and \
+            eng.combo_valid_against_negatives(prior["best"]) and eng.combo_covers_all_positives(prior["best"]):
+        best = tuple(prior["best"])
+        kept = [tuple(c) for c in prior["explanations"]["combos"]
+                if eng.combo_valid_against_negatives(c) and eng.combo_covers_all_positives(c)]
+        expl = {**prior["explanations"], "combos": kept}
+    else:
+        best = eng.find_best_combo(candidates, max_size=3)
+    res: Dict[str, Any] = {"ruled_out": sorted(ruled), "candidates": candidates,
+                           "best": list(best) if best else None}
+    if not best:
+        res["conclusion_short"] = "No resolved specificity (needs selected cells / more work)"
+        res["details"] = {"best_combo": None, "candidates_not_excluded": candidates}
+        return res
+
+    if expl is None:
+        expl = eng.minimal_explanations(candidates, max_size=explain_max_size, time_budget_sec=explain_budget_sec)
+    sep_map = eng.separability_map(best)
+    resolved = [a for a in best if sep_map.get(a, False)]
+    needs_work = [a for a in best if not sep_map.get(a, False)]
+
+    remaining_other = [a for a in candidates if a not in best]
+    other_sig = [a for a in remaining_other if a not in INSIGNIFICANT_SET]
+    other_cold = [a for a in remaining_other if a in INSIGNIFICANT_SET]
+    auto_ruled_out, supported_bg, inconclusive_bg, no_disc_bg = eng.background_auto_resolution(
+        background_list=other_sig + other_cold,
+        active_not_excluded=set(resolved + needs_work + other_sig + other_cold),
+    )
+    other_sig_final = [a for a in other_sig if a not in auto_ruled_out]
+    other_cold_final = [a for a in other_cold if a not in auto_ruled_out]
+
+    confirmation = {}
+    for a in resolved:
+        confirmation[a] = eng.check_rule_three_only_on_discriminating(a, best)
+    confirmed = [a for a in resolved if confirmation[a][0] or confirmation[a][1]]
+    needs_more = [a for a in resolved if a not in confirmed]
+
+    targets = list(dict.fromkeys(needs_work + needs_more + list(supported_bg.keys()) + other_sig_final))
+    active_now = set(resolved + needs_work + other_sig_final + list(supported_bg.keys()))
+    prior_sugg = {}
+    if prior is not None and prior.get("best") and active_now == set(
+            prior["resolved"] + prior["needs_work"] + prior["other_sig_final"] + list(prior["supported_bg"].keys())):
+        prior_sugg = prior["suggestions"]  # same panels, same suspects -> same panel cells
+    suggestions = {a: prior_sugg[a] if a in prior_sugg else suggest_selected_cells(a, sorted(active_now), panels)[:12]
+                   for a in targets}
+
+    confirmed_list = sorted(confirmed)
+    if confirmed_list:
+        conclusion_short = "Confirmed: " + ", ".join([f"Anti-{x}" for x in confirmed_list])
+    elif resolved:
+        conclusion_short = "Resolved (not fully confirmed): " + ", ".join([f"Anti-{x}" for x in resolved])
+    else:
+        conclusion_short = "Unresolved / Needs more work"
+
+    res.update({
+        "explanations": expl,
+        "resolved": resolved,
+        "needs_work": needs_work,
+        "auto_ruled_out": auto_ruled_out,
+        "supported_bg": supported_bg,
+        "inconclusive_bg": inconclusive_bg,
+        "no_disc_bg": no_disc_bg,
+        "other_sig_final": other_sig_final,
+        "other_cold_final": other_cold_final,
+        "confirmation": confirmation,
+        "confirmed": confirmed,
+        "needs_more_for_confirmation": needs_more,
+        "targets_needing_selected": targets,
+        "suggestions": suggestions,
+        "enzyme_hint": enzyme_hint_if_needed(targets) if targets else None,
+        "conclusion_short": conclusion_short,
+        "details": {
+            "best_combo": list(best),
+            "alternative_combos": [list(c) for c in expl["combos"]],
+            "alternatives_complete": expl["complete"],
+            "resolved": resolved,
+            "needs_work": needs_work,
+            "confirmed": confirmed_list,
+            "supported_bg": sorted(supported_bg.keys()),
+            "not_excluded_sig": other_sig_final,
+            "not_excluded_cold": other_cold_final,
+            "no_discriminating": no_disc_bg,
+        },
+    })
+    return res
+
+def specificity_changes(before: Dict[str, Any], after: Dict[str, Any]) -> List[str]:
+    """What changed between two analyze_specificity results (e.g. around one selected cell), as short lines."""
+    def anti(xs) -> str:
+        return ", ".join(f"Anti-{x}" for x in xs)
+
+    def moved(field: str, gained: str, lost: str) -> List[str]:
+        old, new = list(before.get(field) or []), list(after.get(field) or [])
+        out = []
+        if [x for x in new if x not in old]:
+            out.append(f"{gained}: {anti([x for x in new if x not in old])}")
+        if [x for x in old if x not in new]:
+            out.append(f"{lost}: {anti([x for x in old if x not in new])}")
+        return out
+
+    out = []
+    if before.get("conclusion_short") != after.get("conclusion_short"):
+        out.append(f"Conclusion: {before.get('conclusion_short')} → {after.get('conclusion_short')}")
+    if before.get("best") != after.get("best"):
+        out.append(f"Best explanation: {anti(before.get('best') or []) or 'none'} → {anti(after.get('best') or []) or 'none'}")
+    out += moved("ruled_out", "Now ruled out", "No longer ruled out")
+    out += moved("confirmed", "Now confirmed", "No longer confirmed")
+    out += moved("resolved", "Now separable", "No longer separable")
+    out += moved("auto_ruled_out", "Background excluded", "Background no longer excluded")
+    out += moved("supported_bg", "Background supported", "Background no longer supported")
+    return out
@@ -0,0 +1,324 @@
+"""
+Headless batch interpretation (no Streamlit): ABO/RhD + antibody ID for a file of cases.
+
+Input: JSONL (one case per line) or CSV (one case per row), read as a stream.
+  - JSONL lines may be saved case payloads (data/history/<mrn>/<case_id>.json:
+    abo.raw, inputs.panel_reactions / screen_reactions / AC / recent_tx /
+    extra_panels, selected_cells, demographics, lots) or flat records like CSV rows.
+  - CSV / flat columns: case_id, mrn, antigram, age_y, age_m, age_d, ac, recent_tx,
+    p1..pN (panel grades), sI..sIV (screen grades), <panel key>_1.. (extra panels),
+    abo_mode (adult|neonate), abo_purpose, abo_antiA, abo_antiB, abo_antiAB,
+    abo_antiD, abo_ctl, abo_a1cells, abo_bcells, abo_dat.
+  - abo_recent_tx, abo_hsct_bm (flat columns, or top-level keys of a payload line;
+    default false): the ABO mixed-field history, i.e. the workstation's "History:
+    recent transfusion?" / "HSCT / BM transplant?" checkboxes, which pick the
+    how_to_report text. Saved payloads do not store them. `recent_tx` is the
+    antibody-ID input and does not feed the ABO report.
+Antigram: a directory laid out like data/ (p11.csv, p3.csv, optional panels.json,
+lots.json). --antigram is the default; with --antigram-root, a case's antigram
+reference (column `antigram`, else its saved panel lot) selects <root>/<ref>/.
+
+Cases go to a ProcessPoolExecutor in chunks; at most `workers * 2` chunks are in
+flight, so memory is bounded by the window, not by the file. Results are written
+to JSONL in input order as they complete; throughput stats go to stderr.
+
+    python -m bloodbank.batch --input cases.jsonl --out results.jsonl --antigram data
+           [--antigram-root antigrams/] [--workers 4] [--chunk 200] [--limit N]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Any, List, Iterator, Optional, Callable
+
+import pandas as pd
+
+from bloodbank.antibody import (
+    AGS, CompiledCells, compile_antigram, standard_panels, panel_spec, build_panel_cells,
+    compile_panels, all_reactive, analyze_specificity,
+)
+from bloodbank.abo import build_how_to_report, is_pos_any, age_is_neonate, _safe_str
+from bloodbank.abo_table import interpret_abo_rhd_lookup
+
+ABO_KEYS = ["antiA", "antiB", "antiAB", "antiD", "ctl", "a1cells", "bcells", "dat"]
+ABO_HISTORY_COLS = ("abo_recent_tx", "abo_hsct_bm")  # mixed-field history flags, not grades
+PAN_AC_NEG = "Pan-reactive + AC Negative (High-incidence / multiple allo suspected)"
+PAN_AC_POS = "Pan-reactive + AC Positive (DAT pathway)"
+
+
+# =============================================================================
+# INPUT
+# =============================================================================
+def read_cases(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream raw case records from .jsonl / .json-lines or .csv (by extension)."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as fh:
+            yield from csv.DictReader(fh)
+        return
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _truthy(x) -> bool:
+    return _safe_str(x).lower() in ("1", "true", "yes", "y")
+
+
+def _int(x) -> int:
+    try:
+        return int(float(x))
+    except (TypeError, ValueError):
+        return 0
+
+
+def normalize_case(rec: Dict[str, Any]) -> Dict[str, Any]:
+    """Saved payload or flat row -> canonical case dict (grades stay strings)."""
+    if "inputs" in rec or "abo" in rec:
+        inputs = rec.get("inputs", {}) or {}
+        demo = rec.get("demographics", {}) or {}
+        raw = dict((rec.get("abo", {}) or {}).get("raw", {}) or {})
+        return {
+            "case_id": _safe_str(rec.get("case_id") or rec.get("saved_at")),
+            "mrn": _safe_str((rec.get("patient", {}) or {}).get("mrn") or rec.get("mrn")),
+            "antigram": _safe_str(rec.get("antigram") or (rec.get("lots", {}) or {}).get("panel")),
+            "age": (_int(demo.get("age_y")), _int(demo.get("age_m")), _int(demo.get("age_d"))),
+            "abo_raw": raw,
+            "in_p": inputs.get("panel_reactions", {}) or {},
+            "in_s": inputs.get("screen_reactions", {}) or {},
+            "in_x": {xp.get("key"): xp.get("reactions", {}) or {} for xp in inputs.get("extra_panels", []) or []},
+            "ac": _safe_str(inputs.get("AC")) or "Negative",
+            "recent_tx": bool(inputs.get("recent_tx", False)),
+            "abo_recent_tx": _truthy(rec.get("abo_recent_tx")),
+            "abo_hsct_bm": _truthy(rec.get("abo_hsct_bm")),
+            "ext": rec.get("selected_cells", []) or [],
+        }
+    in_p, in_s, in_x, raw = {}, {}, {}, {}
+    for k, v in rec.items():
+        v = _safe_str(v)
+        if not v:
+            continue
+        if k[:1] == "p" and k[1:].isdigit():
+            in_p[k[1:]] = v
+        elif k[:1] == "s" and k[1:] and set(k[1:]) <= set("IVX"):
+            in_s[k[1:]] = v
+        elif k.startswith("abo_") and k not in ABO_HISTORY_COLS:
+            raw[k[4:]] = v
+        elif "_" in k and k.rsplit("_", 1)[1].isdigit() and k[:1] == "x":
+            key, i = k.rsplit("_", 1)
+            in_x.setdefault(key, {})[i] = v
+    return {
+        "case_id": _safe_str(rec.get("case_id")),
+        "mrn": _safe_str(rec.get("mrn")),
+        "antigram": _safe_str(rec.get("antigram")),
+        "age": (_int(rec.get("age_y")), _int(rec.get("age_m")), _int(rec.get("age_d"))),
+        "abo_raw": raw,
+        "in_p": in_p,
+        "in_s": in_s,
+        "in_x": in_x,
+        "ac": _safe_str(rec.get("ac")) or "Negative",
+        "recent_tx": _truthy(rec.get("recent_tx")),
+        "abo_recent_tx": _truthy(rec.get("abo_recent_tx")),
+        "abo_hsct_bm": _truthy(rec.get("abo_hsct_bm")),
+        "ext": json.loads(rec["selected_cells"]) if _safe_str(rec.get("selected_cells")) else [],
+    }
+
+
+# =============================================================================
+# ANTIGRAMS (loaded + compiled once per worker process)
+# =============================================================================
+def _read_json(path: Path, default):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return default
+
+
+@lru_cache(maxsize=64)
+def load_antigram(directory: str) -> Dict[str, Any]:
+    """panel_spec() panels (ID panel, screen, additional panels) + compiled masks for a data/-style dir."""
+    d = Path(directory)
+    lots = _read_json(d / "lots.json", {})
+    panels = standard_panels(pd.read_csv(d / "p11.csv"), pd.read_csv(d / "p3.csv"),
+                             lots.get("lot_p", ""), lots.get("lot_s", ""))
+    for i, xp in enumerate(_read_json(d / "panels.json", {"panels": []}).get("panels", [])):
+        df = pd.DataFrame(xp.get("rows") or [], columns=["ID"] + AGS).fillna(0).astype({ag: int for ag in AGS})
+        panels.append(panel_spec(xp.get("key") or f"x{i+1}", xp.get("name", f"Panel {i+2}"), df, xp.get("lot", "")))
+    # keyed by frame identity: compile_panels() hands back the same DataFrame objects
+    masks = {id(p["df"]): compile_antigram(p["df"]) for p in panels}
+    return {"dir": str(d), "panels": panels, "masks": masks}
+
+
+def resolve_antigram(ref: str, default_dir: str, root: Optional[str]) -> str:
+    if root and ref and (Path(root) / ref / "p11.csv").exists():
+        return str(Path(root) / ref)
+    return default_dir
+
+
+# =============================================================================
+# INTERPRETATION
+# =============================================================================
+def interpret_panels(
+    case: Dict[str, Any],
+    panels: List[Dict[str, Any]],
+    compile_df: Callable = compile_antigram,
+) -> Dict[str, Any]:
+    """
+    Same decisions as the workstation for one normalized case on given panel_spec()
+    panels: pan-reactive branches, else the specificity engine; ABO if entered.
+    Returns {conclusion_short, interpretation (as saved), antibody summary, abo, ms}.
+    """
+    t0 = time.perf_counter()
+    reactions = {"panel": case["in_p"], "screen": case["in_s"], **case["in_x"]}
+    out: Dict[str, Any] = {"conclusion_short": "", "interpretation": {}}
+
+    ac_negative = case["ac"] == "Negative"
+    if any(reactions.values()) and all_reactive(panels, reactions):
+        out["conclusion_short"] = PAN_AC_NEG if ac_negative else PAN_AC_POS
+        out["interpretation"] = {"pattern": "pan_reactive_ac_negative" if ac_negative else "pan_reactive_ac_positive"}
+    elif any(reactions.values()):
+        cells = build_panel_cells(panels, reactions, case["ext"])
+        res = analyze_specificity(CompiledCells(cells, compile_panels(panels, case["ext"], compile_df)), panels)
+        out["conclusion_short"] = res["conclusion_short"]
+        out["interpretation"] = res["details"]
+        out["antibody"] = {k: res.get(k, []) for k in ("best", "resolved", "needs_work", "confirmed",
+                                                       "other_sig_final", "other_cold_final",
+                                                       "targets_needing_selected")}
+        out["antibody"]["ruled_out"] = sorted(res["ruled_out"])
+
+    raw = case["abo_raw"]
+    if any(_safe_str(raw.get(k)) not in ("", "Not Done") for k in ABO_KEYS):
+        mode = _safe_str(raw.get("mode"))
+        is_neonate = mode == "neonate" if mode else age_is_neonate(*case["age"])
+        purpose = "RhIG" if _safe_str(raw.get("purpose")) == "RhIG" else "Transfusion"
+        screen_any_pos = any(is_pos_any(g) for g in case["in_s"].values() if _safe_str(g) not in ("Not Done", ""))
+        full_raw = {k: _safe_str(raw.get(k)) or "Not Done" for k in ABO_KEYS}
+        interp = interpret_abo_rhd_lookup(is_neonate, purpose, {**raw, **full_raw}, screen_any_pos)
+        out["abo"] = {k: interp.get(k) for k in ("abo_final", "rhd_final", "discrepancy", "invalid", "notes")}
+        out["abo"]["how_to_report"] = build_how_to_report(
+            is_neonate, interp, full_raw, screen_any_pos,
+            {"recent_tx": case["abo_recent_tx"], "hsct_bm": case["abo_hsct_bm"]})
+    out["ms"] = round((time.perf_counter() - t0) * 1000, 3)
+    return out
+
+
+def interpret_case(case: Dict[str, Any], antigram_dir: str) -> Dict[str, Any]:
+    """interpret_panels() on an antigram directory (additional panels only if the case has reactions)."""
+    ag = load_antigram(antigram_dir)
+    panels = [p for p in ag["panels"] if p["key"] in ("panel", "screen") or p["key"] in case["in_x"]]
+    return {"case_id": case["case_id"], "mrn": case["mrn"], "antigram_ref": case["antigram"],
+            "antigram": ag["dir"], **interpret_panels(case, panels, lambda df: ag["masks"][id(df)])}
+
+
+def _run_chunk(records: List[Dict[str, Any]], default_dir: str, root: Optional[str]) -> List[Dict[str, Any]]:
+    out = []
+    for rec in records:
+        try:
+            case = normalize_case(rec)
+            out.append(interpret_case(case, resolve_antigram(case["antigram"], default_dir, root)))
+        except Exception as e:
+            out.append({"case_id": _safe_str(rec.get("case_id")), "error": f"{type(e).__name__}: {e}"})
+    return out
+
+
+# =============================================================================
+# DRIVER
+# =============================================================================
+def _chunks(it: Iterator, size: int) -> Iterator[list]:
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return 0.0
+
+
+def map_chunks(pool, chunks: Iterator[list], fn: Callable, *args, window: int = 8) -> Iterator[list]:
+    """pool.submit(fn, chunk, *args) for each chunk with at most `window` in flight; results in order."""
+    pending: deque = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(fn, chunk, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def run_batch(
+    records: Iterator[Dict[str, Any]],
+    out_fh,
+    antigram: str,
+    antigram_root: Optional[str] = None,
+    workers: int = 4,
+    chunk_size: int = 200,
+    progress=None,
+) -> Dict[str, Any]:
+    """Interpret every record, writing one JSON line per case (input order). Returns stats."""
+    t0 = time.perf_counter()
+    n = errors = 0
+    case_ms: List[float] = []
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        for results in map_chunks(pool, _chunks(iter(records), chunk_size), _run_chunk, antigram, antigram_root,
+                                  window=max(1, workers) * 2):
+            for r in results:
+                out_fh.write(json.dumps(r, ensure_ascii=False, default=str) + "\n")
+                n += 1
+                if "error" in r:
+                    errors += 1
+                else:
+                    case_ms.append(r["ms"])
+            if progress:
+                progress(n, time.perf_counter() - t0)
+
+    sec = time.perf_counter() - t0
+    case_ms.sort()
+    pct = (lambda q: case_ms[min(len(case_ms) - 1, int(q * len(case_ms)))] if case_ms else 0.0)
+    return {"cases": n, "errors": errors, "sec": sec, "cases_per_sec": n / max(sec, 1e-9),
+            "case_ms_p50": pct(0.50), "case_ms_p95": pct(0.95), "workers": workers, "chunk": chunk_size,
+            "peak_rss_mb": _peak_rss_mb()}
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Batch ABO/RhD + antibody-ID interpretation (JSONL/CSV in, JSONL out).")
+    ap.add_argument("--input", required=True, help="cases .jsonl or .csv")
+    ap.add_argument("--out", default="-", help="results .jsonl (default stdout)")
+    ap.add_argument("--antigram", default="data", help="default antigram dir (p11.csv, p3.csv[, panels.json])")
+    ap.add_argument("--antigram-root", default=None, help="dir of <ref>/ antigram dirs, ref = case antigram / lot")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    ap.add_argument("--chunk", type=int, default=200)
+    ap.add_argument("--limit", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    records = read_cases(args.input)
+    if args.limit:
+        records = islice(records, args.limit)
+    out_fh = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    try:
+        st = run_batch(records, out_fh, args.antigram, args.antigram_root, args.workers, args.chunk,
+                       progress=lambda d, s: print(f"\r{d} cases, {d / max(s, 1e-9):.0f}/s", end="", file=sys.stderr))
+    finally:
+        if out_fh is not sys.stdout:
+            out_fh.close()
+    print(file=sys.stderr)
+    print(f"{st['cases']} case(s) in {st['sec']:.1f}s = {st['cases_per_sec']:.0f} cases/s "
+          f"({st['workers']} workers, chunk {st['chunk']}) · per case p50 {st['case_ms_p50']:.2f} ms "
+          f"p95 {st['case_ms_p95']:.2f} ms · errors {st['errors']} · peak RSS {st['peak_rss_mb']:.0f} MB",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
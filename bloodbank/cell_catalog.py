@@ -0,0 +1,134 @@
+"""
+Selected / rare cell catalog (data/selected_cells.csv): one row per in-house cell,
+tagged with its reagent lot and expiry date, 26 antigens in AGS order.
+
+Inverted bitmask index, built once per catalog version (bit i = catalog row i):
+  - has[ag] / homo[ag]   cells ag+ / ag+ homozygous (compile_phenotypes semantics)
+  - lot[lot]             cells of each lot
+  - valid-from masks     cells sorted by expiry, so "not expired on day d" is one
+                         bisect + one precomputed mask
+A query such as "Jka+ homozygous, E-, K-, Fya-, not expired" is a handful of
+AND / AND-NOT operations on Python ints.
+"""
+from bisect import bisect_left
+from datetime import date
+from typing import Dict, Any, List, Tuple, Optional, Iterable
+
+import pandas as pd
+
+from bloodbank.antibody import AGS, DOSAGE_SET, compile_phenotypes, _bits
+
+CATALOG_COLUMNS = ["ID", "Lot", "Expiry"] + AGS
+
+
+def _parse_date(x) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(x).strip()[:10])
+    except ValueError:
+        return None
+
+
+def catalog_frame(df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Normalize a catalog CSV / editor frame: all columns present, text ID/Lot/Expiry, 0/1 antigens."""
+    df = pd.DataFrame(columns=CATALOG_COLUMNS) if df is None else df.copy()
+    for c in CATALOG_COLUMNS:
+        if c not in df.columns:
+            df[c] = "" if c in ("ID", "Lot", "Expiry") else 0
+    df = df[CATALOG_COLUMNS]
+    for c in ("ID", "Lot", "Expiry"):
+        df[c] = df[c].fillna("").astype(str).str.strip()
+    return df.fillna(0).astype({ag: int for ag in AGS}).reset_index(drop=True)
+
+
+class CellCatalog:
+    """Inverted bitmask index over a catalog frame (see module docstring)."""
+
+    def __init__(self, df: Optional[pd.DataFrame] = None):
+        self.df = catalog_frame(df)
+        rows = self.df.to_dict("records")
+        self.has, self.homo, self.n = compile_phenotypes(rows)
+        self.all = (1 << self.n) - 1
+        self.ids = [r["ID"] for r in rows]
+        self.lots = [r["Lot"] for r in rows]
+        self.expiry = [_parse_date(r["Expiry"]) for r in rows]
+
+        self.lot: Dict[str, int] = {}
+        for i, lot in enumerate(self.lots):
+            self.lot[lot] = self.lot.get(lot, 0) | 1 << i
+
+        # valid_from[k]: cells with no expiry or expiring on/after dates[k]
+        dated = sorted((d, i) for i, d in enumerate(self.expiry) if d is not None)
+        self._dates = sorted({d for d, _ in dated})
+        no_expiry = sum(1 << i for i, d in enumerate(self.expiry) if d is None)
+        self._valid_from = [no_expiry] * (len(self._dates) + 1)
+        m, j = no_expiry, len(dated)
+        for k in range(len(self._dates) - 1, -1, -1):
+            while j and dated[j - 1][0] >= self._dates[k]:
+                j -= 1
+                m |= 1 << dated[j][1]
+            self._valid_from[k] = m
+
+    def __len__(self) -> int:
+        return self.n
+
+    def valid_on(self, day: Optional[date] = None) -> int:
+        """Cells not expired on `day` (default today); a cell is usable through its expiry date."""
+        return self._valid_from[bisect_left(self._dates, day or date.today())]
+
+    def query(
+        self,
+        pos: Iterable[str] = (),
+        neg: Iterable[str] = (),
+        homozygous: Iterable[str] = (),
+        lots: Optional[Iterable[str]] = None,
+        on_date: Optional[date] = None,
+    ) -> int:
+        """Mask of cells positive for all `pos`, homozygous for all `homozygous`,
+        negative for all `neg`, from `lots` (default any) and not expired on `on_date`."""
+        m = self.valid_on(on_date)
+        for ag in pos:
+            m &= self.has.get(ag, 0)
+        for ag in homozygous:
+            m &= self.homo.get(ag, 0)
+        for ag in neg:
+            m &= ~self.has.get(ag, 0)
+        if lots is not None:
+            lm = 0
+            for lot in lots:
+                lm |= self.lot.get(lot, 0)
+            m &= lm
+        return m
+
+    def indices(self, mask: int) -> List[int]:
+        return _bits(mask)
+
+    def label(self, i: int) -> str:
+        return f"{self.ids[i]} (Lot {self.lots[i]})" if self.lots[i] else self.ids[i]
+
+    def labels_for(self, mask: int) -> List[str]:
+        return [self.label(i) for i in _bits(mask)]
+
+    def frame_for(self, mask: int) -> pd.DataFrame:
+        return self.df.iloc[_bits(mask)].reset_index(drop=True)
+
+    def matching_for(self, target: str, other_set: list, on_date: Optional[date] = None) -> List[Tuple[str, str]]:
+        """
+        Catalog counterpart of suggest_selected_cells: unexpired cells target+ and
+        negative for every other active suspect, homozygous first: [(label, note)].
+        """
+        m = self.query(pos=[target], neg=[x for x in other_set if x != target], on_date=on_date)
+        if target not in DOSAGE_SET:
+            return [(self.label(i), "OK") for i in _bits(m)]
+        homo = m & self.homo.get(target, 0)
+        return ([(self.label(i), "Homozygous preferred") for i in _bits(homo)]
+                + [(self.label(i), "Heterozygous (dosage caution)") for i in _bits(m & ~homo)])
+
+    def lot_summary(self, on_date: Optional[date] = None) -> List[Dict[str, Any]]:
+        """One row per lot: cell count, usable (unexpired) count, earliest expiry."""
+        valid = self.valid_on(on_date)
+        out = []
+        for lot, m in self.lot.items():
+            exp = [self.expiry[i] for i in _bits(m) if self.expiry[i] is not None]
+            out.append({"Lot": lot, "Cells": m.bit_count(), "Usable": (m & valid).bit_count(),
+                        "Expiry": min(exp).isoformat() if exp else ""})
+        return out
@@ -0,0 +1,217 @@
+"""
+Selected-cell test plan: the fewest untested inventory cells that would take every
+suspect to the rule of three and give every open background antibody a
+discriminating negative, assuming the current suspects are the antibodies present.
+
+Demands (per antigen, counted like check_rule_three_only_on_discriminating):
+  - pos:<ag>   target ag needs 3 cells ag+ and negative for every other active
+               antibody (expected POSITIVE, discriminating)
+  - neg:<ag>   target ag needs 3 cells negative for every active antibody
+               (expected NEGATIVE; one such cell serves all targets at once)
+  - disc:<ag>  background ag needs 1 cell ag+ and negative for every other active
+               antibody (expected NEGATIVE if ag is absent -> rules it out)
+Cells already tested (panel / screen / added selected cells) count first.
+
+Solved as a set multicover over per-demand bitmasks of the inventory:
+  - cells reduced to distinct demand signatures (a few copies each) before search
+  - exact branch-and-bound (most constrained demand first, greedy as the
+    incumbent) when the reduced instance is small, within a node budget
+  - otherwise greedy + redundant-cell pruning; the lower bound is reported
+"""
+import time
+from typing import Dict, Any, List, Tuple
+
+from bloodbank.antibody import CompiledCells, DOSAGE_SET, _bits
+
+RULE_POS = 3
+RULE_NEG = 3
+EXACT_MAX_CELLS = 48
+NODE_BUDGET = 50000
+
+
+def _union(has: Dict[str, int], ags) -> int:
+    m = 0
+    for ag in ags:
+        m |= has.get(ag, 0)
+    return m
+
+
+def _lower_bound(needs: List[int], gains: List[int]) -> int:
+    total = sum(needs)
+    if not total:
+        return 0
+    best_gain = max(gains) if gains else 0
+    if not best_gain:
+        return 1 << 30
+    return max(max(needs), -(-total // best_gain))
+
+
+def plan_selected_cells(
+    eng: CompiledCells,
+    targets: List[str],
+    background: List[str],
+    combo: List[str],
+    inventory: Tuple[Dict[str, int], Dict[str, int], int],
+    labels: List[str],
+    exact_max_cells: int = EXACT_MAX_CELLS,
+    node_budget: int = NODE_BUDGET,
+) -> Dict[str, Any]:
+    """
+    eng: tested cells. targets: antibodies to confirm (rule of three).
+    background: not-excluded antibodies needing one discriminating negative.
+    combo: current best combination (also active). inventory: compile_antigram()
+    masks of the untested cells, labels: their names (same order).
+    """
+    t0 = time.perf_counter()
+    inv_has, inv_homo, n_inv = inventory
+    targets = list(dict.fromkeys(targets))
+    background = [b for b in dict.fromkeys(background) if b not in targets]
+    active = list(dict.fromkeys(list(combo) + targets + background))
+    inv_all = (1 << n_inv) - 1
+
+    # demands: (name, kind, antigen, candidate mask over inventory, need, already met)
+    demands = []
+    for t in targets:
+        others = [a for a in active if a != t]
+        p_now = (eng.pos & eng.has.get(t, 0) & ~_union(eng.has, others)).bit_count()
+        n_now = (eng.neg & ~eng.has.get(t, 0) & eng.all).bit_count()
+        demands.append((f"pos:{t}", "pos", t, inv_has.get(t, 0) & ~_union(inv_has, others), RULE_POS, p_now))
+        demands.append((f"neg:{t}", "neg", t, inv_all & ~_union(inv_has, active), RULE_NEG, n_now))
+    for b in background:
+        others = [a for a in active if a != b]
+        have = (eng.neg & eng.has.get(b, 0) & ~_union(eng.has, others)).bit_count()
+        demands.append((f"disc:{b}", "disc", b, inv_has.get(b, 0) & ~_union(inv_has, others), 1, have))
+
+    needs, shortfall = [], {}
+    for name, _, _, cand, need, have in demands:
+        left = max(0, need - have)
+        avail = cand.bit_count()
+        if avail < left:
+            shortfall[name] = left - avail  # inventory cannot close this one
+            left = avail
+        needs.append(left)
+
+    # cell -> demand signature; keep only as many copies per signature as it can use.
+    # Order: homozygous for the demanded antigen first (dosage), then inventory order.
+    def pref(i: int) -> tuple:
+        hetero = sum(1 for (_, kind, ag, cand, _, _) in demands
+                     if kind == "pos" and cand >> i & 1 and ag in DOSAGE_SET and not inv_homo.get(ag, 0) >> i & 1)
+        return (hetero, i)
+
+    by_sig: Dict[int, List[int]] = {}
+    for i in sorted(range(n_inv), key=pref):
+        sig = 0
+        for d, (_, _, _, cand, _, _) in enumerate(demands):
+            if needs[d] and cand >> i & 1:
+                sig |= 1 << d
+        if sig:
+            by_sig.setdefault(sig, []).append(i)
+    cells: List[int] = []
+    for sig, idx in by_sig.items():
+        cells += idx[:max(needs[d] for d in _bits(sig))]
+    cells.sort(key=pref)
+    sigs = {i: sum(1 << d for d, (_, _, _, cand, _, _) in enumerate(demands) if needs[d] and cand >> i & 1)
+            for i in cells}
+
+    def gain(i: int, nd: List[int]) -> int:
+        return sum(1 for d in _bits(sigs[i]) if nd[d])
+
+    # greedy incumbent
+    rank = {i: r for r, i in enumerate(cells)}
+    nd, greedy = list(needs), []
+    while any(nd):
+        pick = max((i for i in cells if i not in greedy), key=lambda i: (gain(i, nd), -rank[i]), default=None)
+        if pick is None or not gain(pick, nd):
+            break
+        greedy.append(pick)
+        for d in _bits(sigs[pick]):
+            nd[d] = max(0, nd[d] - 1)
+    for i in list(greedy):  # drop cells the rest already make redundant
+        rest = [j for j in greedy if j != i]
+        if all(sum(1 for j in rest if sigs[j] >> d & 1) >= needs[d] for d in range(len(needs))):
+            greedy = rest
+
+    best = list(greedy)
+    state = {"nodes": 0, "exhausted": False}
+    method = "greedy"
+    if len(cells) <= exact_max_cells:
+        method = "exact"
+        cand_of = [sum(1 << k for k, i in enumerate(cells) if sigs[i] >> d & 1) for d in range(len(needs))]
+
+        def search(chosen: List[int], nd: List[int], allowed: int):
+            state["nodes"] += 1
+            if state["nodes"] > node_budget:
+                state["exhausted"] = True
+                return
+            if not any(nd):
+                if len(chosen) < len(best):
+                    best[:] = [cells[k] for k in chosen]
+                return
+            gains = [sum(1 for d in _bits(sigs[cells[k]]) if nd[d]) for k in _bits(allowed)]
+            if len(chosen) + _lower_bound(nd, gains) >= len(best):
+                return
+            d_pick, opts = -1, 0
+            for d, need in enumerate(nd):
+                if not need:
+                    continue
+                o = cand_of[d] & allowed
+                if o.bit_count() < need:
+                    return
+                if d_pick < 0 or o.bit_count() - need < opts.bit_count() - nd[d_pick]:
+                    d_pick, opts = d, o
+            for k in _bits(opts):
+                nd2 = list(nd)
+                for d in _bits(sigs[cells[k]]):
+                    nd2[d] = max(0, nd2[d] - 1)
+                chosen.append(k)
+                search(chosen, nd2, allowed & ~(1 << k))
+                chosen.pop()
+                allowed &= ~(1 << k)
+                if state["exhausted"]:
+                    return
+
+        search([], list(needs), (1 << len(cells)) - 1)
+        if state["exhausted"]:
+            method = "exact (budget reached, best found)"
+
+    best.sort()
+    plan = []
+    for i in best:
+        serves = [demands[d][0] for d in _bits(sigs[i])]
+        expect_pos = any(s.startswith("pos:") for s in serves)
+        plan.append({"cell": labels[i], "index": i, "serves": serves,
+                     "expected": "POSITIVE" if expect_pos else "NEGATIVE"})
+    status = {}
+    for d, (name, kind, ag, cand, need, have) in enumerate(demands):
+        got = sum(1 for i in best if sigs[i] >> d & 1)
+        status[name] = {"need": need, "have": have, "planned": got, "short": max(0, need - have - got)}
+    lower = min(len(best), _lower_bound(needs, [sigs[i].bit_count() for i in cells]))
+    return {
+        "cells": plan,
+        "size": len(best),
+        "lower_bound": lower,
+        "optimal": method == "exact" or len(best) == lower,
+        "method": method,
+        "status": status,
+        "shortfall": shortfall,
+        "inventory": n_inv,
+        "reduced_cells": len(cells),
+        "nodes": state["nodes"],
+        "ms": (time.perf_counter() - t0) * 1000,
+    }
+
+
+def plan_for_analysis(
+    eng: CompiledCells,
+    res: Dict[str, Any],
+    inventory: Tuple[Dict[str, int], Dict[str, int], int],
+    labels: List[str],
+) -> Dict[str, Any]:
+    """
+    Plan for an analyze_specificity() result: suspects not yet confirmed (not separable,
+    resolved but short of the rule of three, suggested background) are targets;
+    clinically significant background not excluded needs one discriminating negative.
+    """
+    targets = list(dict.fromkeys(res["needs_work"] + res["needs_more_for_confirmation"]
+                                 + list(res["supported_bg"].keys())))
+    return plan_selected_cells(eng, targets, res["other_sig_final"], list(res["best"] or []), inventory, labels)
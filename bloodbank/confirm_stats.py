@@ -0,0 +1,72 @@
+"""
+Statistical confirmation of resolved antibodies (optional, next to the rule of three).
+
+For a resolved antibody in the best combo, over the cells that carry no other
+antigen of the combo (so no other suspect explains their reaction):
+  a  ag+ cells that reacted                 (= P of the badge: discriminating cells)
+  b  ag+ cells that did not react           (e.g. heterozygous dosage)
+  c  ag- cells that reacted
+  d  ag- cells that did not react
+  - Fisher exact, one-sided, on that table: chance of an association at least
+    this strong between ag+ and reactivity given its margins.
+  - Harris-Hochman on the rule-of-three counts: chance the concordant cells fall
+    this way at random, a! n! / (a + n)! = 1 / C(a + n, a), where n = N of the
+    badge (every ag- nonreactive cell, including ones carrying other suspects'
+    antigens, as check_rule_three_only_on_discriminating counts them).
+    3 + 3 gives 0.05, the rule of three.
+
+Both depend only on four small counts, so they are memoized per table; a rerun
+costs a few mask popcounts and dict lookups.
+"""
+from functools import lru_cache
+from math import comb
+from typing import Dict, Any, Tuple
+
+from bloodbank.antibody import CompiledCells
+
+STAT_ALPHA = 0.05
+
+
+@lru_cache(maxsize=4096)
+def fisher_one_sided(a: int, b: int, c: int, d: int) -> float:
+    """P(X >= a) for the hypergeometric 2x2 table [[a, b], [c, d]] with fixed margins."""
+    r1, k, n = a + b, a + c, a + b + c + d
+    if not n or not r1 or not k:
+        return 1.0
+    hits = sum(comb(r1, x) * comb(n - r1, k - x) for x in range(a, min(r1, k) + 1))
+    return hits / comb(n, k)
+
+
+@lru_cache(maxsize=4096)
+def harris_hochman(a: int, d: int) -> float:
+    """Probability of a concordant ag+ reactive / ag- nonreactive split by chance: 1 / C(a+d, a)."""
+    return 1.0 / comb(a + d, a)
+
+
+def confirmation_table(eng: CompiledCells, ag: str, combo) -> Tuple[int, int, int, int]:
+    """(a, b, c, d) for ag against the rest of combo, all four over cells without other suspects' antigens."""
+    others = eng._union(x for x in combo if x != ag)
+    ag_mask = eng.has.get(ag, 0)
+    disc = ag_mask & ~others
+    neg = ~ag_mask & ~others
+    return ((eng.pos & disc).bit_count(), (disc & ~eng.pos).bit_count(),
+            (eng.pos & neg).bit_count(), (eng.all & ~eng.pos & neg).bit_count())
+
+
+def rule_three_negatives(eng: CompiledCells, ag: str) -> int:
+    """N of the rule-of-three badge: ag- cells that did not react."""
+    return (eng.all & ~eng.pos & ~eng.has.get(ag, 0)).bit_count()
+
+
+def confirmation_stats(eng: CompiledCells, res: Dict[str, Any], alpha: float = STAT_ALPHA) -> Dict[str, Dict[str, Any]]:
+    """{ag: {table, n, fisher_p, hh_p, supported}} for every resolved antibody of an analyze_specificity
+    result (table: Fisher's a, b, c, d; n: the badge's N used by Harris-Hochman)."""
+    out = {}
+    for ag in res.get("resolved") or []:
+        a, b, c, d = confirmation_table(eng, ag, res["best"])
+        n = rule_three_negatives(eng, ag)
+        fp = fisher_one_sided(a, b, c, d)
+        hh = harris_hochman(a, n)
+        out[ag] = {"table": [a, b, c, d], "n": n, "fisher_p": round(fp, 6), "hh_p": round(hh, 6),
+                   "supported": fp <= alpha}
+    return out
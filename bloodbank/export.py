@@ -0,0 +1,198 @@
+"""
+Bulk export of all saved cases (data/history/<mrn>/<case_id>.json) to columnar chunks.
+
+  - one recursive Git Trees call lists every case blob (no per-MRN directory walk)
+  - case blobs fetched concurrently by a bounded thread pool, one chunk at a time
+  - each payload flattened to one row (patient / demographics / abo / phenotype /
+    inputs / interpretation ...) and written as cases-00001.parquet|csv
+  - memory is bounded by the chunk size, not by the number of cases
+  - checkpoint.json after every chunk; a rerun with the same output dir resumes
+    on the same tree snapshot, anything else starts a fresh one and first deletes
+    the chunks of the previous export (so out_dir never mixes two snapshots)
+
+Parquet needs pyarrow; without it (or with --format csv) chunks are CSV.
+
+    python -m bloodbank.export --repo owner/repo --out exports/ [--format parquet|csv]
+           [--branch main] [--workers 8] [--chunk 500] [--api-base URL]
+    (token from --token or $GITHUB_TOKEN)
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable
+
+import pandas as pd
+
+from bloodbank.github import GitHubClient, GITHUB_API
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+HISTORY_ROOT = "data/history"
+CHECKPOINT = "checkpoint.json"
+_CASE_FILE = re.compile(r"^(?P<root>.+)/(?P<mrn>[^/]+)/(?P<case_id>[^/]+)\.json$")
+
+
+def case_paths(entries: List[Dict[str, Any]], root: str = HISTORY_ROOT) -> List[Dict[str, Any]]:
+    """Case JSON blobs directly under <root>/<mrn>/ (index/ shards and manifests excluded), sorted."""
+    out = []
+    for e in entries:
+        m = _CASE_FILE.match(e.get("path", ""))
+        if m and m.group("root") == root:
+            out.append({"path": e["path"], "sha": e["sha"], "mrn": m.group("mrn"), "case_id": m.group("case_id")})
+    out.sort(key=lambda e: e["path"])
+    return out
+
+
+def _flatten(obj: Any, prefix: str, out: Dict[str, Any]):
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            _flatten(v, f"{prefix}.{k}" if prefix else str(k), out)
+    elif isinstance(obj, list):
+        if all(not isinstance(x, (dict, list)) for x in obj):
+            out[prefix] = "; ".join("" if x is None else str(x) for x in obj)
+        else:
+            out[prefix] = json.dumps(obj, ensure_ascii=False)
+    else:
+        out[prefix] = obj
+
+
+def flatten_case(payload: dict, mrn: str = "", case_id: str = "") -> Dict[str, Any]:
+    """
+    One flat row per case: nested keys joined with '.', scalar lists joined with '; ',
+    lists of objects (e.g. selected_cells) kept as JSON text.
+    """
+    row: Dict[str, Any] = {"mrn": mrn, "case_id": case_id}
+    _flatten(payload if isinstance(payload, dict) else {"_raw": payload}, "", row)
+    return row
+
+
+def _write_chunk(rows: List[dict], out_dir: Path, n: int, fmt: str) -> Path:
+    df = pd.DataFrame(rows)
+    # mixed-type columns (e.g. '' vs int ages) -> text, so every chunk writes cleanly
+    for c in df.columns:
+        if df[c].dtype == object:
+            df[c] = df[c].map(lambda x: "" if x is None else str(x))
+    path = out_dir / f"cases-{n:05d}.{fmt}"
+    tmp = path.with_name(path.name + ".tmp")
+    if fmt == "parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def _clear_chunks(out_dir: Path):
+    """Drop cases-* chunks (any format) and leftover .tmp files of an earlier export."""
+    for f in list(out_dir.glob("cases-*")) + list(out_dir.glob("*.tmp")):
+        f.unlink(missing_ok=True)
+
+
+def _save_checkpoint(out_dir: Path, ck: dict):
+    tmp = out_dir / (CHECKPOINT + ".tmp")
+    tmp.write_text(json.dumps(ck, indent=2), encoding="utf-8")
+    os.replace(tmp, out_dir / CHECKPOINT)
+
+
+def export_cases(
+    client: GitHubClient,
+    out_dir: str,
+    fmt: str = "parquet",
+    workers: int = 8,
+    chunk_size: int = 500,
+    root: str = HISTORY_ROOT,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Export every case under root into out_dir. Resumes from out_dir/checkpoint.json
+    (same tree snapshot, same chunk size). Returns a summary dict.
+    """
+    if fmt == "parquet" and not HAS_PARQUET:
+        fmt = "csv"
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+
+    ck = {}
+    if (out / CHECKPOINT).exists():
+        try:
+            ck = json.loads((out / CHECKPOINT).read_text(encoding="utf-8"))
+        except Exception:
+            ck = {}
+    if ck.get("complete") or ck.get("format") != fmt or ck.get("chunk_size") != chunk_size:
+        ck = {}  # finished or incompatible -> start a fresh snapshot
+    if not ck:
+        _clear_chunks(out)  # higher-numbered chunks of a longer earlier run would otherwise survive
+
+    tree_sha = ck.get("tree_sha") or client.get_head()[1]
+    entries, truncated = client.list_tree(tree_sha)
+    cases = case_paths(entries, root)
+    done_chunks = int(ck.get("chunks", 0))
+    ck = {"tree_sha": tree_sha, "format": fmt, "chunk_size": chunk_size, "total": len(cases),
+          "chunks": done_chunks, "cases_done": min(len(cases), done_chunks * chunk_size),
+          "failed": ck.get("failed", []), "complete": False}
+    _save_checkpoint(out, ck)
+
+    def fetch(e: dict) -> dict:
+        try:
+            payload = json.loads(client.get_blob(e["sha"]))
+        except Exception as ex:
+            return {"mrn": e["mrn"], "case_id": e["case_id"], "_error": str(ex)}
+        return flatten_case(payload, e["mrn"], e["case_id"])
+
+    resumed_from = ck["cases_done"]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for start in range(done_chunks * chunk_size, len(cases), chunk_size):
+            batch = cases[start:start + chunk_size]
+            rows = list(pool.map(fetch, batch))  # only one chunk of payloads in memory
+            ck["failed"] += [r["case_id"] for r in rows if "_error" in r]
+            ck["chunks"] += 1
+            _write_chunk(rows, out, ck["chunks"], fmt)
+            ck["cases_done"] = start + len(batch)
+            _save_checkpoint(out, ck)
+            if progress:
+                progress(ck["cases_done"], len(cases))
+
+    ck["complete"] = True
+    _save_checkpoint(out, ck)
+    return {"out_dir": str(out), "format": fmt, "cases": len(cases), "chunks": ck["chunks"],
+            "resumed_from": resumed_from, "failed": len(ck["failed"]), "truncated": truncated,
+            "sec": time.perf_counter() - t0}
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Export all saved blood bank cases to Parquet/CSV chunks.")
+    ap.add_argument("--repo", required=True, help="owner/repo holding data/history")
+    ap.add_argument("--out", required=True, help="output directory (re-run to resume)")
+    ap.add_argument("--token", default=os.environ.get("GITHUB_TOKEN", ""))
+    ap.add_argument("--branch", default="main")
+    ap.add_argument("--api-base", default=GITHUB_API)
+    ap.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--chunk", type=int, default=500)
+    args = ap.parse_args(argv)
+    if not args.token:
+        ap.error("GitHub token required (--token or GITHUB_TOKEN)")
+
+    client = GitHubClient(args.token, args.repo, args.branch, api_base=args.api_base)
+    res = export_cases(client, args.out, fmt=args.format, workers=args.workers, chunk_size=args.chunk,
+                       progress=lambda d, n: print(f"\r{d}/{n} cases", end="", file=sys.stderr))
+    print(file=sys.stderr)
+    print(f"exported {res['cases']} case(s) in {res['chunks']} {res['format']} chunk(s) to {res['out_dir']} "
+          f"in {res['sec']:.1f}s ({res['cases'] / max(res['sec'], 1e-9):.0f} cases/s)"
+          + (f", resumed from {res['resumed_from']}" if res["resumed_from"] else "")
+          + (f", {res['failed']} failed" if res["failed"] else "")
+          + (" [tree listing truncated]" if res["truncated"] else ""))
+
+
+if __name__ == "__main__":
+    main()
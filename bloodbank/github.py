@@ -0,0 +1,313 @@
+"""
+GitHub contents client (shared per process).
+
+  - one keep-alive requests.Session (connection pool, no TLS handshake per call)
+  - bounded exponential backoff on 5xx / connection errors / secondary rate limits
+  - If-None-Match conditional GETs: a 304 returns the cached body (and does not
+    count against the GitHub rate limit)
+  - commit_files(): several files in ONE commit via the Git Data API
+    (tree -> commit -> ref), retried on non-fast-forward
+
+api_base is configurable so the client can be pointed at a local fake server.
+thread_io() counts requests / bytes per calling thread (all clients), so a
+profiler can attribute GitHub traffic to the code running on its own thread.
+"""
+import base64
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Tuple, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+GITHUB_API = "https://api.github.com"
+RETRY_STATUSES = (500, 502, 503, 504)
+FILE_MODE = "100644"
+
+_io = threading.local()
+
+
+def thread_io() -> Tuple[int, int]:
+    """(requests, bytes sent + received) made so far by the calling thread through any GitHubClient."""
+    return getattr(_io, "requests", 0), getattr(_io, "bytes", 0)
+
+
+def _count_io(r: requests.Response) -> int:
+    body = r.request.body if r.request is not None else None
+    n = len(r.content or b"") + len(body or b"")
+    _io.requests = getattr(_io, "requests", 0) + 1
+    _io.bytes = getattr(_io, "bytes", 0) + n
+    return n
+
+
+class GitHubClient:
+    def __init__(
+        self,
+        token: str,
+        repo: str,
+        branch: str = "main",
+        api_base: str = GITHUB_API,
+        timeout: float = 30,
+        max_retries: int = 4,
+        backoff: float = 0.5,
+        max_backoff: float = 8.0,
+        etag_cache_size: int = 512,
+    ):
+        self.repo = repo
+        self.branch = branch
+        self.api_base = api_base.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github+json",
+        })
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # url+params -> (etag, json); bounded LRU, shared by all threads
+        self._etags: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+        self._etag_cache_size = etag_cache_size
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "not_modified": 0, "retries": 0, "bytes": 0}
+
+    # ------------------------------------------------------------------
+    # Low level
+    # ------------------------------------------------------------------
+    def url(self, path: str) -> str:
+        return f"{self.api_base}/repos/{self.repo}/{path.lstrip('/')}"
+
+    def _is_rate_limited(self, r: requests.Response) -> bool:
+        if r.status_code == 429:
+            return True
+        if r.status_code != 403:
+            return False
+        if r.headers.get("Retry-After"):
+            return True
+        if r.headers.get("X-RateLimit-Remaining") == "0":
+            return True
+        return "rate limit" in (r.text or "").lower()
+
+    def _retry_delay(self, attempt: int, r: Optional[requests.Response]) -> float:
+        if r is not None:
+            ra = r.headers.get("Retry-After")
+            if ra:
+                try:
+                    return min(self.max_backoff, float(ra))
+                except ValueError:
+                    pass
+            reset = r.headers.get("X-RateLimit-Reset")
+            if r.headers.get("X-RateLimit-Remaining") == "0" and reset:
+                try:
+                    return min(self.max_backoff, max(0.0, float(reset) - time.time()))
+                except ValueError:
+                    pass
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)  # jitter
+
+    def request(self, method: str, url: str, **kw) -> requests.Response:
+        """
+        Session request with bounded backoff. Reads retry on 5xx / network errors /
+        rate limits; writes retry only on rate limits (a 5xx on a write is ambiguous).
+        """
+        kw.setdefault("timeout", self.timeout)
+        idempotent = method.upper() in ("GET", "HEAD")
+        attempt = 0
+        while True:
+            r = None
+            try:
+                r = self.session.request(method, url, **kw)
+                self.stats["requests"] += 1
+                self.stats["bytes"] += _count_io(r)
+                retry = self._is_rate_limited(r) or (idempotent and r.status_code in RETRY_STATUSES)
+            except (requests.ConnectionError, requests.Timeout):
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                retry = True
+            if not retry or attempt >= self.max_retries:
+                return r
+            time.sleep(self._retry_delay(attempt, r))
+            attempt += 1
+            self.stats["retries"] += 1
+
+    def _cache_key(self, url: str, params: Optional[dict]) -> str:
+        if not params:
+            return url
+        return url + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+
+    def get_json(self, url: str, params: Optional[dict] = None) -> Tuple[int, Any]:
+        """
+        Conditional GET. Returns (status, json). A 304 is returned as (200, cached json).
+        """
+        key = self._cache_key(url, params)
+        headers = {}
+        with self._lock:
+            cached = self._etags.get(key)
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        r = self.request("GET", url, params=params, headers=headers)
+        if r.status_code == 304 and cached:
+            self.stats["not_modified"] += 1
+            with self._lock:
+                if key in self._etags:
+                    self._etags.move_to_end(key)
+            return 200, cached[1]
+        if r.status_code != 200:
+            if r.status_code == 404:
+                self.forget(url, params)
+            return r.status_code, (r.text if r.status_code != 404 else None)
+
+        j = r.json()
+        etag = r.headers.get("ETag")
+        if etag:
+            with self._lock:
+                self._etags[key] = (etag, j)
+                self._etags.move_to_end(key)
+                while len(self._etags) > self._etag_cache_size:
+                    self._etags.popitem(last=False)
+        return 200, j
+
+    def forget(self, url: str, params: Optional[dict] = None):
+        with self._lock:
+            self._etags.pop(self._cache_key(url, params), None)
+
+    # ------------------------------------------------------------------
+    # Contents API
+    # ------------------------------------------------------------------
+    def get_file(self, path_in_repo: str, ref: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Returns (content_text, sha) or (None, None) if not found.
+        ref: branch (default) or a commit sha.
+        """
+        status, j = self.get_json(self.url(f"contents/{path_in_repo}"), {"ref": ref or self.branch})
+        if status == 404:
+            return None, None
+        if status != 200:
+            raise RuntimeError(f"GitHub GET error {status}: {j}")
+
+        sha = j.get("sha")
+        enc = j.get("content", "")
+        if not enc:
+            return "", sha
+        txt = base64.b64decode(enc).decode("utf-8", errors="replace")
+        return txt, sha
+
+    def list_dir(self, path_in_repo: str) -> List[Dict[str, Any]]:
+        status, j = self.get_json(self.url(f"contents/{path_in_repo}"), {"ref": self.branch})
+        if status == 404:
+            return []
+        if status != 200:
+            raise RuntimeError(f"GitHub LIST error {status}: {j}")
+
+        if isinstance(j, dict) and j.get("type") == "file":
+            return [j]
+        if isinstance(j, list):
+            return j
+        return []
+
+    def upsert_file(self, path_in_repo: str, content_text: str, commit_message: str):
+        api = self.url(f"contents/{path_in_repo}")
+        params = {"ref": self.branch}
+
+        sha = None
+        status, j = self.get_json(api, params)
+        if status == 200:
+            sha = j.get("sha") if isinstance(j, dict) else None
+        elif status != 404:
+            raise RuntimeError(f"GitHub GET error {status}: {j}")
+
+        payload = {
+            "message": commit_message,
+            "content": base64.b64encode(content_text.encode("utf-8")).decode("utf-8"),
+            "branch": self.branch,
+        }
+        if sha:
+            payload["sha"] = sha
+
+        w = self.request("PUT", api, json=payload)
+        self.forget(api, params)
+        if w.status_code not in (200, 201):
+            raise RuntimeError(f"GitHub PUT error {w.status_code}: {w.text}")
+
+    # ------------------------------------------------------------------
+    # Git Data API (tree listing, blobs, atomic multi-file commit)
+    # ------------------------------------------------------------------
+    def list_tree(self, tree_sha: Optional[str] = None) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Every blob under the branch tip in ONE recursive Git Trees call.
+        Returns (entries [{path, sha, size, ...}], truncated).
+        """
+        if not tree_sha:
+            tree_sha = self.get_head()[1]
+        # a tree sha is immutable: plain GET, kept out of the ETag cache (listings can be large)
+        r = self.request("GET", self.url(f"git/trees/{tree_sha}"), params={"recursive": "1"})
+        if r.status_code != 200:
+            raise RuntimeError(f"GitHub tree error {r.status_code}: {r.text}")
+        j = r.json()
+        return [e for e in j.get("tree", []) if e.get("type") == "blob"], bool(j.get("truncated"))
+
+    def get_blob(self, sha: str) -> str:
+        # blobs are immutable: no ETag bookkeeping needed
+        r = self.request("GET", self.url(f"git/blobs/{sha}"))
+        if r.status_code != 200:
+            raise RuntimeError(f"GitHub blob error {r.status_code}: {r.text}")
+        return base64.b64decode(r.json().get("content", "")).decode("utf-8", errors="replace")
+
+    def get_head(self) -> Tuple[str, str]:
+        """
+        Returns (commit_sha, tree_sha) of the branch tip in one call.
+        """
+        status, j = self.get_json(self.url(f"branches/{self.branch}"))
+        if status != 200:
+            raise RuntimeError(f"GitHub branch error {status}: {j}")
+        c = j.get("commit", {}) or {}
+        return c.get("sha"), ((c.get("commit", {}) or {}).get("tree", {}) or {}).get("sha")
+
+    def _post(self, path: str, payload: dict, what: str) -> dict:
+        r = self.request("POST", self.url(path), json=payload)
+        if r.status_code not in (200, 201):
+            raise RuntimeError(f"GitHub {what} error {r.status_code}: {r.text}")
+        return r.json()
+
+    def commit_files(self, build_files, commit_message: str, max_attempts: int = 4) -> str:
+        """
+        Publish several files as ONE commit with one ref update.
+
+        build_files(head_sha) -> {path: text}. It is called with the branch tip the
+        commit will be based on, and called again with the new tip if the ref
+        update is rejected as non-fast-forward (422), so read-modify-write files
+        (e.g. index.jsonl) are rebased onto whatever was committed meanwhile.
+
+        File contents go inline in the tree request (GitHub creates the blobs),
+        so a commit is: branch tip -> tree -> commit -> ref.
+        Returns the new commit sha.
+        """
+        last = None
+        for _ in range(max_attempts):
+            head, base_tree = self.get_head()
+            files = build_files(head)
+            tree = self._post("git/trees", {
+                "base_tree": base_tree,
+                "tree": [{"path": p, "mode": FILE_MODE, "type": "blob", "content": txt} for p, txt in files.items()],
+            }, "tree")
+            commit = self._post("git/commits", {
+                "message": commit_message,
+                "tree": tree["sha"],
+                "parents": [head],
+            }, "commit")
+            r = self.request("PATCH", self.url(f"git/refs/heads/{self.branch}"),
+                             json={"sha": commit["sha"], "force": False})
+            if r.status_code == 200:
+                return commit["sha"]
+            if r.status_code != 422:
+                raise RuntimeError(f"GitHub ref update error {r.status_code}: {r.text}")
+            last = r.text  # branch moved under us -> rebuild on the new tip
+        raise RuntimeError(f"GitHub ref update kept failing (non-fast-forward): {last}")
@@ -0,0 +1,92 @@
+"""
+Process-wide cache of parsed per-MRN history index files (manifest / monthly
+shards under data/history/<mrn>/index/), keyed by MRN or "MRN/shard".
+
+Each entry keeps the parsed value, the blob sha of the index file and the branch
+head it was last validated against:
+  - within ttl_sec of the last validation: served with no GitHub call
+  - after that: one branch-head check (shared by all MRNs for head_ttl_sec);
+    same head -> still valid
+  - head moved: re-fetch the index; same blob sha -> keep the parsed value
+  - invalidate(key) when this process saves a case touching that file
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Tuple
+
+
+class HistoryIndexCache:
+    def __init__(
+        self,
+        fetch_head: Callable[[], str],
+        fetch_index: Callable[[str], Tuple[Optional[str], Optional[str]]],
+        parse: Callable[[str], Any],
+        ttl_sec: float = 30,
+        head_ttl_sec: float = 5,
+        max_entries: int = 512,
+    ):
+        self.fetch_head = fetch_head      # () -> branch head commit sha
+        self.fetch_index = fetch_index    # key -> (text, blob sha) | (None, None)
+        self.parse = parse                # text ('' if missing) -> cached value
+        self.ttl_sec = ttl_sec
+        self.head_ttl_sec = head_ttl_sec
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._head: Tuple[Optional[str], float] = (None, 0.0)
+        self.stats = {"hits": 0, "misses": 0, "head_checks": 0, "blob_reuse": 0, "invalidations": 0}
+
+    def _current_head(self) -> Optional[str]:
+        sha, at = self._head
+        if sha and time.time() - at < self.head_ttl_sec:
+            return sha
+        sha = self.fetch_head()
+        self._head = (sha, time.time())
+        self.stats["head_checks"] += 1
+        return sha
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock:
+            e = self._entries.get(key)
+            if e:
+                self._entries.move_to_end(key)
+        if e and now - e["checked_at"] < self.ttl_sec:
+            self.stats["hits"] += 1
+            return e["value"]
+
+        head = self._current_head()
+        if e and head and head == e["head"]:
+            e["checked_at"] = now
+            self.stats["hits"] += 1
+            return e["value"]
+
+        txt, blob = self.fetch_index(key)
+        self.stats["misses"] += 1
+        if e and blob and blob == e["blob"]:
+            self.stats["blob_reuse"] += 1  # tree changed elsewhere, this index did not
+            value = e["value"]
+        else:
+            value = self.parse(txt or "")
+
+        with self._lock:
+            self._entries[key] = {"value": value, "blob": blob, "head": head, "checked_at": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._head = (None, 0.0)
+        self.stats["invalidations"] += 1
+
+    def hit_ratio(self) -> float:
+        n = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / n if n else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,148 @@
+"""
+Opt-in per-rerun profiling: section timers, GitHub traffic per section, rolling percentiles.
+
+A RerunProfile is opened at the top of a script run and closed at its end;
+
+    with prof.section("antibody engine"):
+        ...
+
+records one span per block: start offset in the rerun, wall time, and the GitHub
+requests / bytes the calling thread made meanwhile (bloodbank.github.thread_io),
+so a rerun can be drawn as a waterfall. Sections may repeat (per-section totals
+add up the spans) or nest (a nested span also counts in its parent). Work on
+other threads (save-queue worker, pooled fetches) is not attributed. Disabled or
+closed, section() does nothing but one flag check.
+
+ProfileRing keeps the last N closed reruns of the process (all sessions):
+percentiles() gives p50 / p95 per section, to_jsonl() one JSON line per rerun.
+"""
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from bloodbank.github import thread_io
+
+PROFILE_RING_SIZE = 500
+RERUN_TOTAL = "(rerun total)"
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100); 0.0 for no values."""
+    if not values:
+        return 0.0
+    vals = sorted(values)
+    return vals[max(0, math.ceil(q / 100 * len(vals)) - 1)]
+
+
+class RerunProfile:
+    def __init__(self, enabled: bool = True, label: str = ""):
+        self.enabled = enabled
+        self.label = label
+        self.spans: List[Dict[str, Any]] = []
+        self.closed = False
+        self.record: Optional[Dict[str, Any]] = None
+        self._t0 = time.perf_counter()
+        self._io0 = thread_io()
+        self._at = datetime.now().isoformat(timespec="seconds")
+        self._depth = 0
+
+    @contextmanager
+    def section(self, name: str):
+        if not self.enabled or self.closed:
+            yield
+            return
+        req0, bytes0 = thread_io()
+        t = time.perf_counter()
+        depth = self._depth
+        self._depth += 1
+        try:
+            yield
+        finally:  # st.rerun() / st.stop() leave through here too
+            self._depth -= 1
+            req1, bytes1 = thread_io()
+            self.spans.append({
+                "name": name, "depth": depth,
+                "start_ms": round((t - self._t0) * 1e3, 3),
+                "ms": round((time.perf_counter() - t) * 1e3, 3),
+                "gh_calls": req1 - req0, "gh_bytes": bytes1 - bytes0,
+            })
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        """Per section name: summed ms / GitHub calls / bytes and span count, in first-start order."""
+        out: Dict[str, Dict[str, float]] = {}
+        for s in sorted(self.spans, key=lambda s: s["start_ms"]):
+            t = out.setdefault(s["name"], {"ms": 0.0, "gh_calls": 0, "gh_bytes": 0, "spans": 0})
+            t["ms"] += s["ms"]
+            t["gh_calls"] += s["gh_calls"]
+            t["gh_bytes"] += s["gh_bytes"]
+            t["spans"] += 1
+        return out
+
+    def close(self) -> Optional[Dict[str, Any]]:
+        """Stop the clock; the rerun record (None when disabled). Later section() calls are no-ops."""
+        if self.closed or not self.enabled:
+            self.closed = True
+            return self.record
+        self.closed = True
+        total = (time.perf_counter() - self._t0) * 1e3
+        top = sum(s["ms"] for s in self.spans if s["depth"] == 0)
+        req, nbytes = thread_io()
+        self.record = {
+            "at": self._at, "label": self.label, "total_ms": round(total, 3),
+            "unprofiled_ms": round(max(0.0, total - top), 3),
+            "gh_calls": req - self._io0[0], "gh_bytes": nbytes - self._io0[1],
+            "sections": self.totals(),
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+        return self.record
+
+
+class ProfileRing:
+    """Last `size` rerun records of the process, shared by all sessions."""
+
+    def __init__(self, size: int = PROFILE_RING_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._runs: "deque[Dict[str, Any]]" = deque(maxlen=size)
+        self.profile_all = False  # supervisor switch: profile every session, not only ?profile=1
+
+    def add(self, record: Optional[Dict[str, Any]]):
+        if record:
+            with self._lock:
+                self._runs.append(record)
+
+    def records(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._runs)
+
+    def clear(self):
+        with self._lock:
+            self._runs.clear()
+
+    def percentiles(self) -> Dict[str, Dict[str, float]]:
+        """p50 / p95 per section over the buffered reruns that ran it, plus whole reruns per label
+        ("(rerun total) <label>")."""
+        per: Dict[str, Dict[str, List[float]]] = {}
+        for r in self.records():
+            rows = dict(r["sections"])
+            rows[f"{RERUN_TOTAL} {r['label']}".rstrip()] = {"ms": r["total_ms"], "gh_calls": r["gh_calls"], "gh_bytes": r["gh_bytes"]}
+            for name, t in rows.items():
+                p = per.setdefault(name, {"ms": [], "gh_calls": [], "gh_bytes": []})
+                for k in p:
+                    p[k].append(t[k])
+        return {name: {"reruns": len(p["ms"]),
+                       "p50_ms": percentile(p["ms"], 50), "p95_ms": percentile(p["ms"], 95),
+                       "p50_gh_calls": percentile(p["gh_calls"], 50), "p95_gh_calls": percentile(p["gh_calls"], 95),
+                       "p95_gh_bytes": percentile(p["gh_bytes"], 95)}
+                for name, p in per.items()}
+
+    def to_jsonl(self) -> str:
+        return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in self.records())
+
+    def __len__(self) -> int:
+        return len(self._runs)
@@ -0,0 +1,271 @@
+"""
+Replay saved cases against the current engine and report drift.
+
+Every case payload (data/history/<mrn>/<case_id>.json) is re-interpreted with
+today's code (bloodbank.batch.interpret_panels) on the antigrams it was run on,
+and the recomputed conclusion_short / interpretation / ABO result is compared
+with what was saved.
+
+Antigrams are looked up by lot in the archive the supervisor page publishes
+(data/antigrams/panel/<lot>.csv for ID / additional panels,
+data/antigrams/screen/<lot>.csv for screens). A lot missing from the archive
+falls back to --antigram (current p11.csv / p3.csv) and its diffs are counted
+under "antigram_missing" instead of as engine drift.
+
+Sources: a local mirror of data/ (--local DIR, e.g. a checkout) or the GitHub
+repo (--repo, one recursive tree listing; blobs fetched by a bounded thread pool
+one chunk at a time). Cases are interpreted on a process pool with a bounded
+window of chunks in flight.
+
+    python -m bloodbank.replay --local . [--workers 4] [--out drift/]
+    python -m bloodbank.replay --repo owner/repo [--branch main] [--out drift/]
+    (token from --token or $GITHUB_TOKEN)
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+import pandas as pd
+
+from bloodbank.antibody import AGS, compile_antigram, panel_spec, roman
+from bloodbank.batch import normalize_case, interpret_panels, map_chunks, _chunks
+from bloodbank.export import case_paths, HISTORY_ROOT
+from bloodbank.github import GitHubClient, GITHUB_API
+
+ARCHIVE_ROOT = "data/antigrams"
+# interpretation keys compared one by one (order-insensitive lists); anything else is informational
+COMPARE_KEYS = ["best_combo", "resolved", "needs_work", "confirmed", "supported_bg",
+                "not_excluded_sig", "not_excluded_cold", "pattern"]
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def archive_path(kind: str, lot: str, root: str = ARCHIVE_ROOT) -> str:
+    """Archive file for an antigram lot: kind is 'panel' (ID / additional panels) or 'screen'."""
+    return f"{root}/{kind}/{_UNSAFE.sub('_', str(lot).strip()) or '_'}.csv"
+
+
+# =============================================================================
+# ANTIGRAMS BY LOT (per worker process)
+# =============================================================================
+@lru_cache(maxsize=256)
+def _load_csv(path: str) -> Optional[Tuple[pd.DataFrame, Any]]:
+    p = Path(path)
+    if not p.exists():
+        return None
+    df = pd.read_csv(p)
+    for ag in AGS:
+        if ag not in df.columns:
+            df[ag] = 0
+    df = df[["ID"] + AGS].fillna(0).astype({ag: int for ag in AGS})
+    return df, compile_antigram(df)
+
+
+def case_panels(payload: dict, archive_dir: str, current_dir: str) -> Tuple[List[Dict[str, Any]], Dict[int, Any], List[str]]:
+    """panel_spec() panels for a saved case from the lot archive; missing lots fall back to current_dir."""
+    lots = payload.get("lots", {}) or {}
+    missing: List[str] = []
+    specs = [("panel", "Panel", "panel", lots.get("panel", ""), "p11.csv"),
+             ("screen", "Screen", "screen", lots.get("screen", ""), "p3.csv")]
+    for xp in (payload.get("inputs", {}) or {}).get("extra_panels", []) or []:
+        specs.append((xp.get("key"), xp.get("name", xp.get("key")), "panel", xp.get("lot", ""), None))
+
+    panels, masks = [], {}
+    for key, name, kind, lot, fallback in specs:
+        hit = _load_csv(str(Path(archive_dir) / archive_path(kind, lot)))
+        if hit is None:
+            missing.append(f"{kind}:{lot or '—'}")
+            if not fallback:
+                continue  # additional panel without an archived antigram cannot be evaluated
+            hit = _load_csv(str(Path(current_dir) / fallback))
+        df, m = hit
+        labels = [f"Screen {roman(i+1)}" for i in range(len(df))] if key == "screen" else None
+        panels.append(panel_spec(key, name, df, lot, labels))
+        masks[id(df)] = m
+    return panels, masks, sorted(set(missing))
+
+
+# =============================================================================
+# COMPARISON
+# =============================================================================
+def _norm(v):
+    if isinstance(v, (list, tuple, set)):
+        return sorted(str(x) for x in v)
+    return v
+
+
+def diff_case(payload: dict, now: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """[{category, saved, now}] between a saved payload and a fresh interpret_panels() result."""
+    out = []
+    if _norm(payload.get("conclusion_short", "")) != _norm(now["conclusion_short"]):
+        out.append({"category": "conclusion", "saved": payload.get("conclusion_short", ""),
+                    "now": now["conclusion_short"]})
+    saved_i = payload.get("interpretation", {}) or {}
+    for k in COMPARE_KEYS:
+        if k in saved_i or k in now["interpretation"]:
+            a, b = _norm(saved_i.get(k)), _norm(now["interpretation"].get(k))
+            if a != b and (a or b):
+                out.append({"category": f"interpretation.{k}", "saved": saved_i.get(k), "now": now["interpretation"].get(k)})
+    abo = payload.get("abo", {}) or {}
+    if abo.get("raw") and "abo" in now:
+        for k, cat in (("abo_final", "abo_final"), ("rhd_final", "rhd_final"), ("discrepancy", "abo_discrepancy")):
+            if k in abo and abo.get(k) != now["abo"].get(k):
+                out.append({"category": cat, "saved": abo.get(k), "now": now["abo"].get(k)})
+    return out
+
+
+def _replay_chunk(items: List[Tuple[str, str, str]], archive_dir: str, current_dir: str) -> List[Dict[str, Any]]:
+    """items: (mrn, case_id, payload JSON text) -> one result per case."""
+    out = []
+    for mrn, case_id, text in items:
+        row: Dict[str, Any] = {"mrn": mrn, "case_id": case_id}
+        try:
+            payload = json.loads(text)
+            panels, masks, missing = case_panels(payload, archive_dir, current_dir)
+            now = interpret_panels(normalize_case(payload), panels, lambda df: masks[id(df)])
+            row.update({"diffs": diff_case(payload, now), "missing_lots": missing, "ms": now["ms"]})
+        except Exception as e:
+            row["error"] = f"{type(e).__name__}: {e}"
+        out.append(row)
+    return out
+
+
+# =============================================================================
+# SOURCES
+# =============================================================================
+def local_cases(data_root: str, root: str = HISTORY_ROOT) -> Iterator[Tuple[str, str, str]]:
+    """(mrn, case_id, path) for <data_root>/<root>/<mrn>/<case_id>.json, sorted."""
+    base = Path(data_root)
+    entries = [{"path": p.relative_to(base).as_posix(), "sha": ""} for p in (base / root).glob("*/*.json")]
+    for e in case_paths(entries, root):
+        yield e["mrn"], e["case_id"], str(base / e["path"])
+
+
+def _read_local(chunk: List[Tuple[str, str, str]]) -> List[Tuple[str, str, str]]:
+    return [(mrn, cid, Path(path).read_text(encoding="utf-8")) for mrn, cid, path in chunk]
+
+
+def github_snapshot(client: GitHubClient, dest: str, root: str = HISTORY_ROOT) -> Tuple[List[Dict[str, Any]], bool]:
+    """One tree listing: case blob entries + the antigram archive downloaded under dest/."""
+    entries, truncated = client.list_tree(client.get_head()[1])
+    for e in entries:
+        if e.get("type", "blob") == "blob" and e["path"].startswith(ARCHIVE_ROOT + "/") and e["path"].endswith(".csv"):
+            p = Path(dest) / e["path"]
+            p.parent.mkdir(parents=True, exist_ok=True)
+            p.write_text(client.get_blob(e["sha"]), encoding="utf-8")
+    return case_paths(entries, root), truncated
+
+
+# =============================================================================
+# DRIVER
+# =============================================================================
+def replay(
+    chunks: Iterator[List[Tuple[str, str, str]]],
+    archive_dir: str,
+    current_dir: str,
+    out_dir: Optional[str] = None,
+    workers: int = 4,
+    progress=None,
+) -> Dict[str, Any]:
+    """
+    chunks yield (mrn, case_id, payload text) lists. Writes diffs.jsonl (one line per
+    drifted / failed case) and summary.json to out_dir when given. Returns the summary.
+    """
+    t0 = time.perf_counter()
+    by_cat: Counter = Counter()
+    examples: Dict[str, List[dict]] = {}
+    n = drifted = errors = missing = 0
+    fh = None
+    if out_dir:
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+        fh = open(Path(out_dir) / "diffs.jsonl", "w", encoding="utf-8")
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+            for results in map_chunks(pool, chunks, _replay_chunk, archive_dir, current_dir,
+                                      window=max(1, workers) * 2):
+                for r in results:
+                    n += 1
+                    if "error" in r:
+                        errors += 1
+                        by_cat["error"] += 1
+                    elif r["diffs"]:
+                        drifted += 1
+                        cats = {d["category"] for d in r["diffs"]}
+                        if r["missing_lots"]:
+                            missing += 1
+                            cats = {"antigram_missing"}
+                        for c in cats:
+                            by_cat[c] += 1
+                            if len(examples.setdefault(c, [])) < 5:
+                                examples[c].append({"case_id": r["case_id"], "mrn": r["mrn"],
+                                                    "diffs": [d for d in r["diffs"] if d["category"] == c] or r["diffs"]})
+                    else:
+                        continue
+                    if fh:
+                        fh.write(json.dumps(r, ensure_ascii=False, default=str) + "\n")
+                if progress:
+                    progress(n, time.perf_counter() - t0)
+    finally:
+        if fh:
+            fh.close()
+    sec = time.perf_counter() - t0
+    summary = {"cases": n, "unchanged": n - drifted - errors, "drifted": drifted, "errors": errors,
+               "drift_from_missing_antigram": missing, "by_category": dict(by_cat.most_common()),
+               "examples": examples, "sec": sec, "cases_per_min": n / max(sec, 1e-9) * 60}
+    if out_dir:
+        (Path(out_dir) / "summary.json").write_text(json.dumps(summary, indent=2, ensure_ascii=False, default=str),
+                                                     encoding="utf-8")
+    return summary
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Replay saved cases against the current engine and report drift.")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--local", help="local mirror root holding data/history and data/antigrams (e.g. a checkout)")
+    src.add_argument("--repo", help="owner/repo holding data/history")
+    ap.add_argument("--token", default=os.environ.get("GITHUB_TOKEN", ""))
+    ap.add_argument("--branch", default="main")
+    ap.add_argument("--api-base", default=GITHUB_API)
+    ap.add_argument("--antigram", default="data", help="current p11.csv / p3.csv (fallback for unarchived lots)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    ap.add_argument("--fetch-workers", type=int, default=8)
+    ap.add_argument("--chunk", type=int, default=200)
+    ap.add_argument("--out", default=None, help="write diffs.jsonl + summary.json here")
+    args = ap.parse_args(argv)
+
+    report = lambda d, s: print(f"\r{d} cases, {d / max(s, 1e-9) * 60:.0f}/min", end="", file=sys.stderr)
+    truncated = False
+    if args.local:
+        chunks = (_read_local(c) for c in _chunks(local_cases(args.local), args.chunk))
+        res = replay(chunks, args.local, args.antigram, args.out, args.workers, report)
+    else:
+        if not args.token:
+            ap.error("GitHub token required (--token or GITHUB_TOKEN)")
+        client = GitHubClient(args.token, args.repo, args.branch, api_base=args.api_base)
+        with tempfile.TemporaryDirectory() as tmp, ThreadPoolExecutor(max_workers=args.fetch_workers) as io:
+            cases, truncated = github_snapshot(client, tmp)
+            chunks = (list(io.map(lambda e: (e["mrn"], e["case_id"], client.get_blob(e["sha"])), c))
+                      for c in _chunks(iter(cases), args.chunk))
+            res = replay(chunks, tmp, args.antigram, args.out, args.workers, report)
+    print(file=sys.stderr)
+    print(f"{res['cases']} case(s) replayed in {res['sec']:.1f}s ({res['cases_per_min']:.0f}/min): "
+          f"{res['unchanged']} unchanged, {res['drifted']} drifted "
+          f"({res['drift_from_missing_antigram']} with an unarchived antigram lot), {res['errors']} error(s)"
+          + (" [tree listing truncated]" if truncated else ""))
+    for cat, cnt in res["by_category"].items():
+        ex = res["examples"].get(cat, [])
+        d = ex[0]["diffs"][0] if ex and ex[0]["diffs"] else {}
+        print(f"  {cat:<32} {cnt:>6}" + (f"   e.g. {ex[0]['case_id']}: {d.get('saved')!r} -> {d.get('now')!r}" if d else ""))
+    sys.exit(1 if res["drifted"] or res["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Report / alert text rendering: templates compiled once, rendered output memoized.
+
+The workstation rebuilds the same text on every Streamlit rerun; it all goes
+through here:
+  - how_to_report(): bloodbank.abo.build_how_to_report (templates in abo.REPORT_TEMPLATES)
+  - patient_antigen_negative_reminder(), anti_g_alert_html(): antibody-ID alert boxes
+  - history_report_html(): HTML blocks of the saved-case history report
+Each memoized renderer keeps a process-wide ResultCache keyed on only what it
+reads: how_to_report on the grades, flags and the three interpretation fields
+it uses; history_report_html on the case identity (MRN + saved_at; saved cases
+are never rewritten). A key that hashes the whole argument costs more than
+the render it saves. The two Anti-G boxes are plain constants. Outputs are
+shared across sessions and must be treated as read-only.
+render_cache_info() feeds the Diagnostics panel.
+"""
+from functools import wraps
+from string import Template
+from typing import Dict, Any, List, Optional, Callable, Hashable
+
+from bloodbank.abo import build_how_to_report, _safe_str
+from bloodbank.antibody import IGNORED_AGS
+from bloodbank.result_cache import ResultCache, freeze
+
+RENDER_CACHE_ENTRIES = 512
+RENDER_CACHES: Dict[str, ResultCache] = {}
+
+ALERT_TEMPLATES = {
+    "antigen_negative": Template("""
+    <div class='$box'>
+      <b>$title</b><br>
+      $intro
+      <ul style="margin-top:6px;">
+        $bullets
+      </ul>
+    </div>
+    """),
+    "antigen_negative_item": Template(
+        "<li>Anti-$ag → verify patient is <b>$ag-negative</b> (phenotype/genotype; pre-transfusion sample preferred).</li>"
+    ),
+    "anti_g": Template("""
+    <div class='$box'>
+      ⚠️ <b>Consider Anti-G (D + C pattern)</b><br>
+      Anti-G may mimic <b>Anti-D + Anti-C</b>. If clinically relevant (especially pregnancy / RhIG decision), do not label as true Anti-D until Anti-G is excluded.<br>
+      <b>Suggested next steps (per SOP/reference lab):</b>
+      <ol style="margin-top:6px;">
+        <li>Assess if this impacts management (e.g., RhIG eligibility).</li>
+        <li>Perform differential workup using appropriate adsorption/elution strategy (D+ C− and D− C+ cells) if available, or refer to reference lab.</li>
+        <li>Use pre-transfusion sample when possible.</li>
+      </ol>
+    </div>
+    """),
+}
+ANTIGEN_NEGATIVE_TEXT = {
+    True: ("✅ Final confirmation step (Patient antigen check)", "clinical-danger",
+           "Confirm the patient is <b>ANTIGEN-NEGATIVE</b> for the corresponding antigen(s) to support the antibody identification."),
+    False: ("⚠️ Before final reporting (Patient antigen check)", "clinical-alert",
+            "Before you finalize/report, confirm the patient is <b>ANTIGEN-NEGATIVE</b> for the corresponding antigen(s)."),
+}
+
+HISTORY_TEMPLATES = {
+    "chip": Template("<span class='chip $cls'>$text</span>"),
+    "card": Template("""
+    <div class="report-card">
+        <div class="report-title">Case History Report</div>
+        <div class="report-sub">Saved at: <b>$saved_at</b> &nbsp;|&nbsp; Run Date: <b>$run_dt</b></div>
+        <div>$chips</div>
+    </div>
+    """),
+    "kv": Template("<div class='kv'><b>$label</b><br>$value</div>"),
+    "notes": Template("<div class='clinical-alert'><b>ABO Discrepancy Notes</b><ul style='margin-top:6px;'>$items</ul></div>"),
+}
+
+
+def memoized_render(name: str, key: Optional[Callable[..., Optional[Hashable]]] = None,
+                    max_entries: int = RENDER_CACHE_ENTRIES):
+    """Decorator: memoize a renderer in RENDER_CACHES[name]. `key` takes the renderer's arguments and
+    returns the cache key (None: render uncached); default: the arguments frozen into tuples."""
+    def wrap(fn):
+        cache = RENDER_CACHES[name] = ResultCache(max_entries)
+
+        @wraps(fn)
+        def render(*args, **kwargs):
+            k = key(*args, **kwargs) if key else (freeze(args), freeze(kwargs))
+            try:
+                hash(k)
+            except TypeError:  # unhashable leaf (set, DataFrame, ...): render uncached
+                k = None
+            if k is None:
+                return fn(*args, **kwargs)
+            return cache.get_or_compute(k, lambda: fn(*args, **kwargs))
+        render.cache = cache
+        return render
+    return wrap
+
+
+def render_cache_info() -> Dict[str, Dict[str, Any]]:
+    return {name: cache.info() for name, cache in RENDER_CACHES.items()}
+
+
+def clear_render_caches():
+    for cache in RENDER_CACHES.values():
+        cache.clear()
+
+
+_REPORT_RAW_KEYS = ("antiA", "antiB", "antiAB", "a1cells", "bcells", "ctl")
+
+
+def _how_to_report_key(
+    is_neonate: bool,
+    abo_interp: Dict[str, Any],
+    raw: Dict[str, str],
+    screen_any_positive: bool,
+    mixed_field_history: Dict[str, bool] | None = None
+) -> Hashable:
+    """What build_how_to_report reads: grades, flags and abo_final / rhd_final / notes."""
+    mf = mixed_field_history or {}
+    notes = abo_interp.get("notes", ())
+    return (bool(is_neonate), tuple(raw.get(k, "Not Done") for k in _REPORT_RAW_KEYS), bool(screen_any_positive),
+            bool(mf.get("recent_tx")), bool(mf.get("hsct_bm")),
+            abo_interp.get("abo_final"), abo_interp.get("rhd_final"),
+            notes if type(notes) is tuple else tuple(notes))
+
+
+@memoized_render("how_to_report", key=_how_to_report_key)
+def how_to_report(
+    is_neonate: bool,
+    abo_interp: Dict[str, Any],
+    raw: Dict[str, str],
+    screen_any_positive: bool,
+    mixed_field_history: Dict[str, bool] | None = None
+) -> str:
+    return build_how_to_report(is_neonate, abo_interp, raw, screen_any_positive, mixed_field_history)
+
+
+@memoized_render("antigen_negative_reminder")
+def patient_antigen_negative_reminder(antibodies: list, strong: bool = True) -> str:
+    uniq = []
+    for a in antibodies or []:
+        if a and a not in uniq and a not in IGNORED_AGS:
+            uniq.append(a)
+    if not uniq:
+        return ""
+    title, box, intro = ANTIGEN_NEGATIVE_TEXT[bool(strong)]
+    item = ALERT_TEMPLATES["antigen_negative_item"]
+    bullets = "".join(item.substitute(ag=ag) for ag in uniq)
+    return ALERT_TEMPLATES["antigen_negative"].substitute(box=box, title=title, intro=intro, bullets=bullets)
+
+
+ANTI_G_ALERT_HTML = {strong: ALERT_TEMPLATES["anti_g"].substitute(box="clinical-danger" if strong else "clinical-alert")
+                     for strong in (False, True)}
+
+
+def anti_g_alert_html(strong: bool = False) -> str:
+    return ANTI_G_ALERT_HTML[bool(strong)]
+
+
+def _history_chips(abo: dict, inputs: dict, dat: dict, all_rx: bool) -> List[str]:
+    chip = HISTORY_TEMPLATES["chip"].substitute
+    abo_final, rhd_final = _safe_str(abo.get("abo_final", "")), _safe_str(abo.get("rhd_final", ""))
+    chips = []
+    if abo_final:
+        chips.append(chip(cls="chip-warn" if abo.get("discrepancy") else "chip-ok", text=f"ABO: {abo_final}"))
+    if rhd_final:
+        chips.append(chip(cls="chip-warn" if "Inconclusive" in rhd_final else "chip-ok", text=f"RhD: {rhd_final}"))
+    chips.append(chip(cls="chip-ok", text=f"AC: {_safe_str(inputs.get('AC', '')) or '—'}"))
+    chips.append(chip(cls="chip-danger" if all_rx else "chip-ok", text=f"Pattern: {'PAN-reactive' if all_rx else 'Non-pan'}"))
+    if inputs.get("recent_tx"):
+        chips.append(chip(cls="chip-danger", text="Recent transfusion ≤ 4 weeks"))
+    else:
+        chips.append(chip(cls="chip-ok", text="No recent transfusion flag"))
+    dat_vals = [_safe_str(dat.get(k, "")) for k in ("igg", "c3d", "control")]
+    if any(dat_vals):
+        for label, v in zip(("DAT IgG", "DAT C3d", "DAT Control"), dat_vals):
+            chips.append(chip(cls="chip-warn", text=f"{label}: {v or '—'}"))
+    return chips
+
+
+def _history_report_key(payload: dict) -> Optional[Hashable]:
+    """A saved case is identified by MRN + saved_at (its case_id); None (uncached) for an unsaved payload."""
+    mrn = _safe_str((payload.get("patient") or {}).get("mrn", ""))
+    saved_at = _safe_str(payload.get("saved_at", ""))
+    return (mrn, saved_at) if mrn and saved_at else None
+
+
+@memoized_render("history_report", key=_history_report_key, max_entries=128)
+def history_report_html(payload: dict) -> Dict[str, Any]:
+    """HTML blocks of a saved case: {card, kv: {label: html}, notes} (notes "" when there are none)."""
+    patient = payload.get("patient", {}) or {}
+    lots = payload.get("lots", {}) or {}
+    demo = payload.get("demographics", {}) or {}
+    abo = payload.get("abo", {}) or {}
+    chips = _history_chips(abo, payload.get("inputs", {}) or {}, payload.get("dat", {}) or {},
+                           bool(payload.get("all_rx", False)))
+    card = HISTORY_TEMPLATES["card"].substitute(saved_at=_safe_str(payload.get("saved_at", "")) or "—",
+                                                run_dt=_safe_str(payload.get("run_dt", "")) or "—", chips="".join(chips))
+    age = " / ".join(_safe_str(demo.get(k, "")) or "—" for k in ("age_y", "age_m", "age_d"))
+    fields = {
+        "Patient Name": _safe_str(patient.get("name", "")),
+        "MRN": _safe_str(patient.get("mrn", "")),
+        "Sex": _safe_str(demo.get("sex", "")),
+        "Age (Y/M/D)": age,
+        "Tech / Operator": _safe_str(payload.get("tech", "")),
+        "ID Panel Lot": _safe_str(lots.get("panel", "")),
+        "Screen Lot": _safe_str(lots.get("screen", "")),
+    }
+    kv = {label: HISTORY_TEMPLATES["kv"].substitute(label=label, value=v or "—") for label, v in fields.items()}
+    notes = abo.get("notes", []) or []
+    notes_html = HISTORY_TEMPLATES["notes"].substitute(items="".join(f"<li>{_safe_str(n)}</li>" for n in notes)) if notes else ""
+    return {"card": card, "kv": kv, "notes": notes_html}
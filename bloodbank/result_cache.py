@@ -0,0 +1,119 @@
+"""
+Process-wide LRU cache of whole antibody-analysis results.
+
+Keyed by everything the interpretation depends on (antigram DataFrames, reaction
+grades, AC, recent transfusion, selected cells), so every session entering the
+same pattern on the same panel lot shares one result. The key is a tuple:
+  - a content digest per DataFrame, computed once per frame object
+    (stored_frame_digest); the app replaces a frame on every supervisor edit and
+    never changes one in place, so a rerun costs a dict lookup per frame
+  - the remaining inputs frozen into nested tuples (freeze), cheap to hash
+Values are treated as read-only by callers (they are shared, not copied).
+"""
+import hashlib
+import json
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+import pandas as pd
+
+_digests: Dict[int, Tuple[weakref.ref, str]] = {}
+_digests_lock = threading.Lock()
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """Content hash of a DataFrame (columns + values, row order kept)."""
+    # values.tolist() + JSON is ~10x cheaper than hash_pandas_object on antigram-sized frames
+    payload = [[str(c) for c in df.columns], df.values.tolist()]
+    return hashlib.sha256(json.dumps(payload, default=str).encode("utf-8")).hexdigest()
+
+
+def _forget_digest(k: int, ref: weakref.ref):
+    with _digests_lock:
+        if _digests.get(k, (None,))[0] is ref:
+            del _digests[k]
+
+
+def stored_frame_digest(df: pd.DataFrame) -> str:
+    """frame_digest, computed once per DataFrame object and dropped with it.
+    Only valid for frames that are replaced, not modified in place, when their content changes."""
+    k = id(df)
+    with _digests_lock:
+        hit = _digests.get(k)
+    if hit is not None and hit[0]() is df:
+        return hit[1]
+    d = frame_digest(df)
+    ref = weakref.ref(df, lambda r, k=k: _forget_digest(k, r))
+    with _digests_lock:
+        _digests[k] = (ref, d)
+    return d
+
+
+def freeze(x):
+    """dicts / lists -> nested tuples (dict order kept: a reordered dict only misses)."""
+    t = type(x)
+    if t is dict:
+        return tuple((k, freeze(v)) for k, v in x.items())
+    if t is list or t is tuple:
+        return tuple(freeze(v) for v in x)
+    return x
+
+
+def analysis_key(frames: Iterable[pd.DataFrame], **inputs: Any) -> Hashable:
+    """(digest per frame, frozen inputs with keys sorted); a sha256 of their JSON if an input is unhashable."""
+    key = (tuple(stored_frame_digest(df) for df in frames), freeze(sorted(inputs.items())))
+    try:
+        hash(key)
+    except TypeError:  # set / DataFrame leaf: fall back to a JSON dump
+        blob = json.dumps([key[0], inputs], sort_keys=True, default=str, ensure_ascii=False)
+        key = hashlib.sha256(blob.encode("utf-8")).hexdigest()
+    return key
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = compute()  # outside the lock; a concurrent duplicate compute is harmless
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def hit_ratio(self) -> float:
+        n = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / n if n else 0.0
+
+    def info(self) -> Dict[str, Any]:
+        return {"entries": len(self), "max_entries": self.max_entries,
+                "hit_ratio": self.hit_ratio(), **self.stats}
+
+    def __len__(self) -> int:
+        return len(self._entries)
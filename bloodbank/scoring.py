@@ -0,0 +1,103 @@
+"""
+Graded-strength fit of candidate explanations (dosage-aware ranking).
+
+The rule-out / combination search only sees reactions as 0/1. Here every cell's
+entered grade (0, +1..+4, Hemolysis) is kept as a strength, and each candidate
+antibody set predicts an expression per cell:
+  1.0   some member antigen present homozygous (or not a dosage antigen)
+  0.5   member antigens present only heterozygous (HETEROZYGOUS_WEIGHT)
+  0     no member antigen on the cell
+Fit = cosine between observed strengths s and expected expression x, i.e. how
+well s ~ k * x for the best scale k; 1.0 when homozygous cells react stronger
+exactly in proportion. Ties keep the search order.
+
+Precomputed per engine (StrengthFit): one bitmask per strength level and the
+full-expression masks full[ag] = has & homo. A combo's full / heterozygous-only
+cells are two unions, and x.s, |x|^2 a few ANDs and popcounts per strength
+level: no per-cell loop.
+"""
+import time
+from typing import Dict, Any, List, Tuple
+
+from bloodbank.antibody import CompiledCells, AGS, DOSAGE_SET, NEGATIVE_GRADES
+
+GRADE_STRENGTH = {"+1": 1.0, "+2": 2.0, "+3": 3.0, "+4": 4.0, "hemolysis": 4.0, "w+": 0.5, "weak": 0.5}
+UNKNOWN_POSITIVE = 2.0  # positive without a grade (older selected cells: res = 1)
+HETEROZYGOUS_WEIGHT = 0.5
+BREAKDOWN_TOP = 3
+
+
+def grade_strength(g) -> float:
+    s = str(g).lower().strip()
+    if s in NEGATIVE_GRADES:
+        return 0.0
+    return GRADE_STRENGTH.get(s, UNKNOWN_POSITIVE)
+
+
+class StrengthFit:
+    """Strength-level masks + expression masks for one CompiledCells (see module docstring)."""
+
+    def __init__(self, eng: CompiledCells):
+        self.eng = eng
+        self.strength = [grade_strength(c.get("grade", c["react"])) if c["react"] else 0.0 for c in eng.cells]
+        # any positive entered with a grade (not just positive / negative)
+        self.graded = any(c["react"] and str(c.get("grade", "")).lower().strip() in GRADE_STRENGTH for c in eng.cells)
+        self.levels: Dict[float, int] = {}
+        for i, s in enumerate(self.strength):
+            if s:
+                self.levels[s] = self.levels.get(s, 0) | 1 << i
+        self.ss = sum(s * s for s in self.strength)
+        self.full = {ag: eng.has[ag] & eng.homo[ag] for ag in AGS}
+
+    def _masks(self, combo) -> Tuple[int, int]:
+        full = 0
+        any_ = 0
+        for ag in combo:
+            full |= self.full.get(ag, 0)
+            any_ |= self.eng.has.get(ag, 0)
+        return full, any_ & ~full
+
+    def score(self, combo) -> Dict[str, Any]:
+        full, het = self._masks(combo)
+        w = HETEROZYGOUS_WEIGHT
+        xs = sum(s * ((m & full).bit_count() + w * (m & het).bit_count()) for s, m in self.levels.items())
+        xx = full.bit_count() + w * w * het.bit_count()
+        fit = xs / (xx * self.ss) ** 0.5 if xx and self.ss else 0.0
+        return {"combo": list(combo), "score": round(fit, 4), "scale": xs / xx if xx else 0.0,
+                "full": full.bit_count(), "het": het.bit_count()}
+
+    def rank(self, combos) -> List[Dict[str, Any]]:
+        """Score every combo, best fit first (stable: equal scores keep the given order)."""
+        return sorted((self.score(c) for c in combos), key=lambda r: -r["score"])
+
+    def breakdown(self, combo, scale: float) -> List[Dict[str, Any]]:
+        """Per-cell rows: observed grade / strength, expected expression, fitted strength, residual."""
+        full, het = self._masks(combo)
+        rows = []
+        for i, c in enumerate(self.eng.cells):
+            bit = 1 << i
+            x = 1.0 if full & bit else HETEROZYGOUS_WEIGHT if het & bit else 0.0
+            on = [ag for ag in combo if self.eng.has.get(ag, 0) & bit]
+            zyg = "het " if x == HETEROZYGOUS_WEIGHT else "hom " if any(ag in DOSAGE_SET for ag in on) else ""
+            rows.append({
+                "cell": c["label"],
+                "grade": str(c.get("grade", c["react"])),
+                "observed": self.strength[i],
+                "expression": zyg + "/".join(on) if on else "—",
+                "expected": round(scale * x, 2),
+                "residual": round(self.strength[i] - scale * x, 2),
+            })
+        return rows
+
+
+def rank_explanations(eng: CompiledCells, res: Dict[str, Any], breakdown_top: int = BREAKDOWN_TOP) -> Dict[str, Any]:
+    """Rank res' minimal explanations (or its best combo) by graded-strength fit; per-cell rows for the top ones."""
+    t0 = time.perf_counter()
+    combos = (res.get("explanations") or {}).get("combos") or ([res["best"]] if res.get("best") else [])
+    fit = StrengthFit(eng)
+    ranked = fit.rank(combos)
+    for r in ranked[:breakdown_top]:
+        r["cells"] = fit.breakdown(r["combo"], r["scale"])
+    return {"ranked": ranked, "graded": fit.graded,
+            "ms": (time.perf_counter() - t0) * 1e3}
+
@@ -0,0 +1,227 @@
+"""
+Local SQLite query index mirroring the GitHub case history index rows.
+
+Source of truth stays in GitHub (data/history/<mrn>/index/*.jsonl and legacy
+index.jsonl). This database only mirrors the index rows so cross-patient
+queries (name, conclusion / antibody, tech, MRN, date range) run locally:
+  - sync(): incremental, only files whose blob sha changed since the last sync
+  - upsert_rows(): applied right after a save, before the next sync
+  - search(): indexed filters + FTS5 on name / conclusion (LIKE if FTS5 is missing)
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Tuple, Optional, Callable, Iterable, Iterator
+
+DEFAULT_SEARCH_DB_PATH = "data/local/history_index.sqlite3"
+
+COLUMNS = [
+    "case_id", "mrn", "saved_at", "run_dt", "name", "tech", "sex", "age_y", "age_m", "age_d",
+    "conclusion_short", "abo_final", "rhd_final", "abo_discrepancy", "ac_res", "recent_tx", "all_rx",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    id INTEGER PRIMARY KEY, case_id TEXT NOT NULL UNIQUE, mrn TEXT, saved_at TEXT, run_dt TEXT, name TEXT, tech TEXT, sex TEXT,
+    age_y TEXT, age_m TEXT, age_d TEXT, conclusion_short TEXT, abo_final TEXT, rhd_final TEXT,
+    abo_discrepancy INTEGER, ac_res TEXT, recent_tx INTEGER, all_rx INTEGER,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cases_mrn ON cases(mrn, saved_at);
+CREATE INDEX IF NOT EXISTS cases_saved ON cases(saved_at);
+CREATE INDEX IF NOT EXISTS cases_tech ON cases(tech COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS cases_source ON cases(source);
+CREATE TABLE IF NOT EXISTS synced_files (path TEXT PRIMARY KEY, blob_sha TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT);
+"""
+# FTS rows share the id of their cases row (deletes by rowid stay O(log n))
+_FTS = "CREATE VIRTUAL TABLE IF NOT EXISTS cases_fts USING fts5(name, conclusion_short)"
+
+_INDEX_FILE = re.compile(r"^(?P<root>.+)/(?P<mrn>[^/]+)/(index\.jsonl|index/[^/]+\.jsonl)$")
+
+
+def is_index_file(path: str, root: str) -> bool:
+    m = _INDEX_FILE.match(path)
+    return bool(m) and m.group("root") == root
+
+
+def parse_rows(txt: str) -> List[dict]:
+    rows = []
+    for line in (txt or "").splitlines():
+        for part in re.split(r"(?<=\})\\n", line):  # legacy literal "\n" separators
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                rows.append(json.loads(part))
+            except Exception:
+                continue
+    return rows
+
+
+class HistorySearchIndex:
+    def __init__(self, path: str = DEFAULT_SEARCH_DB_PATH):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._conn() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            try:
+                db.execute(_FTS)
+                self.fts = True
+            except sqlite3.OperationalError:
+                self.fts = False  # sqlite built without FTS5 -> LIKE fallback
+
+    @contextmanager
+    def _conn(self) -> Iterator[sqlite3.Connection]:
+        """Same as SaveSpool._conn: one connection per call, committed or rolled back, then closed."""
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def _insert(self, db: sqlite3.Connection, rows: Iterable[dict], source: str) -> int:
+        n = 0
+        for r in rows:
+            case_id = str(r.get("case_id", "") or "")
+            if not case_id:
+                continue
+            vals = [r.get(c, "") for c in COLUMNS]
+            for i, c in enumerate(COLUMNS):
+                if c in ("abo_discrepancy", "recent_tx", "all_rx"):
+                    vals[i] = 1 if vals[i] in (True, 1, "1", "true", "True") else 0
+                else:
+                    vals[i] = "" if vals[i] is None else str(vals[i])
+            old = db.execute("SELECT rowid FROM cases WHERE case_id=?", (case_id,)).fetchone()
+            if old:
+                if self.fts:
+                    db.execute("DELETE FROM cases_fts WHERE rowid=?", (old[0],))
+                db.execute("DELETE FROM cases WHERE rowid=?", (old[0],))
+            cur = db.execute(f"INSERT INTO cases ({','.join(COLUMNS)}, source) "
+                             f"VALUES ({','.join('?' * len(COLUMNS))}, ?)", vals + [source])
+            if self.fts:
+                db.execute("INSERT INTO cases_fts (rowid, name, conclusion_short) VALUES (?,?,?)",
+                           (cur.lastrowid, vals[COLUMNS.index("name")], vals[COLUMNS.index("conclusion_short")]))
+            n += 1
+        return n
+
+    def _drop_source(self, db: sqlite3.Connection, source: str):
+        if self.fts:
+            db.execute("DELETE FROM cases_fts WHERE rowid IN (SELECT rowid FROM cases WHERE source=?)", (source,))
+        db.execute("DELETE FROM cases WHERE source=?", (source,))
+
+    def upsert_rows(self, rows: List[dict], source: str) -> int:
+        with self._lock, self._conn() as db:
+            return self._insert(db, rows, source)
+
+    def sync(
+        self,
+        listing: List[Tuple[str, str]],
+        fetch: Callable[[str, str], Optional[str]],
+        workers: int = 8,
+    ) -> Dict[str, Any]:
+        """
+        listing: [(path, blob sha)] of every history index file in the repo tree.
+        fetch(path, blob sha) -> file text. Only new / changed files are fetched
+        (bounded thread pool); files gone from the tree are dropped.
+        """
+        t0 = time.perf_counter()
+        with self._lock, self._conn() as db:
+            known = dict(db.execute("SELECT path, blob_sha FROM synced_files").fetchall())
+        current = dict(listing)
+        changed = [(p, s) for p, s in current.items() if known.get(p) != s]
+        removed = [p for p in known if p not in current]
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            texts = list(pool.map(lambda ps: fetch(*ps), changed))
+
+        rows_n = 0
+        with self._lock, self._conn() as db:
+            for p in removed:
+                self._drop_source(db, p)
+                db.execute("DELETE FROM synced_files WHERE path=?", (p,))
+            for (p, sha), txt in zip(changed, texts):
+                if txt is None:
+                    continue
+                self._drop_source(db, p)
+                rows_n += self._insert(db, parse_rows(txt), p)
+                db.execute("INSERT OR REPLACE INTO synced_files (path, blob_sha) VALUES (?,?)", (p, sha))
+            db.execute("INSERT OR REPLACE INTO meta (k, v) VALUES ('last_sync', ?)", (str(time.time()),))
+        return {"files": len(current), "fetched": len(changed), "removed": len(removed),
+                "rows": rows_n, "sec": time.perf_counter() - t0}
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def last_sync(self) -> float:
+        with self._lock, self._conn() as db:
+            r = db.execute("SELECT v FROM meta WHERE k='last_sync'").fetchone()
+        return float(r["v"]) if r else 0.0
+
+    def count(self) -> int:
+        with self._lock, self._conn() as db:
+            return int(db.execute("SELECT COUNT(*) FROM cases").fetchone()[0])
+
+    @staticmethod
+    def _fts_query(text: str) -> str:
+        # every term must match: "ahm" -> prefix "ahm"*, "Anti-E" -> exact phrase "anti e"
+        terms = []
+        for term in text.split():
+            words = re.findall(r"\w+", term.lower())
+            if len(words) == 1:
+                terms.append(f'"{words[0]}"*')
+            elif words:
+                terms.append('"' + " ".join(words) + '"')
+        return " AND ".join(terms)
+
+    def search(
+        self,
+        text: str = "",
+        mrn: str = "",
+        tech: str = "",
+        date_from: str = "",
+        date_to: str = "",
+        limit: int = 200,
+    ) -> List[dict]:
+        """
+        text: name / conclusion / antibody words. Dates compare on saved_at (YYYY-MM-DD...).
+        Newest first.
+        """
+        where, args = [], []
+        if text.strip():
+            if self.fts and self._fts_query(text):
+                where.append("rowid IN (SELECT rowid FROM cases_fts WHERE cases_fts MATCH ?)")
+                args.append(self._fts_query(text))
+            else:
+                where.append("(name LIKE ? OR conclusion_short LIKE ?)")
+                args += [f"%{text.strip()}%"] * 2
+        if mrn.strip():
+            where.append("mrn = ?")
+            args.append(mrn.strip())
+        if tech.strip():
+            where.append("tech = ? COLLATE NOCASE")
+            args.append(tech.strip())
+        if date_from:
+            where.append("saved_at >= ?")
+            args.append(str(date_from))
+        if date_to:
+            where.append("saved_at < ?")
+            args.append(str(date_to) + "~")  # inclusive of the whole day
+        q = f"SELECT {','.join(COLUMNS)} FROM cases"
+        if where:
+            q += " WHERE " + " AND ".join(where)
+        q += " ORDER BY saved_at DESC LIMIT ?"
+        with self._lock, self._conn() as db:
+            return [dict(r) for r in db.execute(q, args + [int(limit)]).fetchall()]
@@ -0,0 +1,188 @@
+"""
+Write-behind save queue with a durable local spool (SQLite).
+
+The workstation enqueues a case record and returns immediately; a background
+SpoolWorker drains the queue through save_fn with retries (capped exponential
+backoff), so a transient GitHub/network failure never loses a save.
+
+Item status: pending -> synced | duplicate
+"""
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable, Iterator
+
+DEFAULT_SPOOL_PATH = "data/spool/save_spool.sqlite3"
+RETRY_MAX_SEC = 300
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    mrn           TEXT NOT NULL,
+    case_id       TEXT NOT NULL,
+    fingerprint   TEXT NOT NULL DEFAULT '',
+    record_json   TEXT NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'pending',
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    last_error    TEXT NOT NULL DEFAULT '',
+    enqueued_at   REAL NOT NULL,
+    next_try_at   REAL NOT NULL,
+    done_at       REAL
+);
+CREATE INDEX IF NOT EXISTS spool_status ON spool(status, next_try_at);
+CREATE INDEX IF NOT EXISTS spool_fp ON spool(fingerprint, enqueued_at);
+"""
+
+
+class SaveSpool:
+    def __init__(self, path: str = DEFAULT_SPOOL_PATH):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        with self._conn() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _conn(self) -> Iterator[sqlite3.Connection]:
+        """A connection for one call: committed (rolled back on error) and closed on exit.
+        sqlite3's own `with db:` only ends the transaction and leaves closing to GC."""
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------
+    def find_duplicate(self, fingerprint: str, window_sec: float) -> Optional[dict]:
+        """
+        Most recent queued/synced item with the same fingerprint inside the window
+        (covers saves that have not reached GitHub yet).
+        """
+        if not fingerprint:
+            return None
+        with self._lock, self._conn() as db:
+            r = db.execute(
+                "SELECT * FROM spool WHERE fingerprint=? AND status IN ('pending','synced') AND enqueued_at>=? "
+                "ORDER BY enqueued_at DESC LIMIT 1",
+                (fingerprint, time.time() - window_sec),
+            ).fetchone()
+        return dict(r) if r else None
+
+    def enqueue(self, record: dict) -> int:
+        now = time.time()
+        with self._lock, self._conn() as db:
+            cur = db.execute(
+                "INSERT INTO spool (mrn, case_id, fingerprint, record_json, enqueued_at, next_try_at) "
+                "VALUES (?,?,?,?,?,?)",
+                (str(record.get("mrn", "")), str(record.get("case_id", "")), str(record.get("fingerprint", "")),
+                 json.dumps(record, ensure_ascii=False), now, now),
+            )
+            item_id = cur.lastrowid
+        self._wake.set()
+        return item_id
+
+    def get(self, item_id: int) -> Optional[dict]:
+        with self._lock, self._conn() as db:
+            r = db.execute("SELECT id, mrn, case_id, status, attempts, last_error, enqueued_at, done_at "
+                           "FROM spool WHERE id=?", (item_id,)).fetchone()
+        return dict(r) if r else None
+
+    def pending(self, mrn: Optional[str] = None) -> List[dict]:
+        q = "SELECT * FROM spool WHERE status='pending'"
+        args: tuple = ()
+        if mrn is not None:
+            q += " AND mrn=?"
+            args = (mrn,)
+        with self._lock, self._conn() as db:
+            rows = db.execute(q + " ORDER BY enqueued_at", args).fetchall()
+        return [dict(r) for r in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        {pending, oldest_age_sec, failing} for the sidebar.
+        """
+        with self._lock, self._conn() as db:
+            r = db.execute(
+                "SELECT COUNT(*) AS n, MIN(enqueued_at) AS oldest, SUM(attempts>0) AS failing "
+                "FROM spool WHERE status='pending'"
+            ).fetchone()
+        oldest = r["oldest"]
+        return {
+            "pending": int(r["n"] or 0),
+            "oldest_age_sec": (time.time() - oldest) if oldest else 0.0,
+            "failing": int(r["failing"] or 0),
+        }
+
+    # ------------------------------------------------------------------
+    def next_due(self) -> Optional[dict]:
+        with self._lock, self._conn() as db:
+            r = db.execute(
+                "SELECT * FROM spool WHERE status='pending' AND next_try_at<=? ORDER BY enqueued_at LIMIT 1",
+                (time.time(),),
+            ).fetchone()
+        return dict(r) if r else None
+
+    def mark_done(self, item_id: int, status: str = "synced", note: str = ""):
+        with self._lock, self._conn() as db:
+            db.execute("UPDATE spool SET status=?, last_error=?, done_at=? WHERE id=?",
+                       (status, note, time.time(), item_id))
+
+    def mark_failed(self, item_id: int, attempts: int, error: str):
+        delay = min(RETRY_MAX_SEC, 2 ** min(attempts, 16))
+        with self._lock, self._conn() as db:
+            db.execute("UPDATE spool SET attempts=?, last_error=?, next_try_at=? WHERE id=?",
+                       (attempts, error[:500], time.time() + delay, item_id))
+
+    def wait(self, timeout: float) -> bool:
+        hit = self._wake.wait(timeout)
+        self._wake.clear()
+        return hit
+
+
+class SpoolWorker(threading.Thread):
+    """
+    Background drainer. save_fn(record) returns None when saved, or a message when
+    the record is rejected for good (e.g. duplicate); it raises for retryable errors.
+    """
+
+    def __init__(self, spool: SaveSpool, save_fn: Callable[[dict], Optional[str]], idle_sec: float = 5.0):
+        super().__init__(name="save-spool-worker", daemon=True)
+        self.spool = spool
+        self.save_fn = save_fn
+        self.idle_sec = idle_sec
+        self._halt = threading.Event()
+
+    def stop(self):
+        self._halt.set()
+        self.spool._wake.set()
+
+    def drain_once(self) -> bool:
+        item = self.spool.next_due()
+        if not item:
+            return False
+        try:
+            rejected = self.save_fn(json.loads(item["record_json"]))
+        except Exception as e:
+            self.spool.mark_failed(item["id"], int(item["attempts"]) + 1, str(e))
+            return True
+        if rejected:
+            self.spool.mark_done(item["id"], "duplicate", rejected)
+        else:
+            self.spool.mark_done(item["id"], "synced")
+        return True
+
+    def run(self):
+        while not self._halt.is_set():
+            try:
+                busy = self.drain_once()
+            except Exception:
+                busy = False  # spool unreadable for a moment; try again later
+            if not busy:
+                self.spool.wait(self.idle_sec)
@@ -0,0 +1,31 @@
+"""
+The committed ABO / RhD decision table (data/abo_table.bin) must be built from the
+current interpret_abo_rhd and agree with it on every input. A stale table is not an
+error in the app (lookup falls back to the reference), so it has to fail here.
+Rebuild with: python -m bloodbank.abo_table build
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bloodbank.abo import interpret_abo_rhd  # noqa: E402
+from bloodbank.abo_table import load_table, interpret_abo_rhd_lookup, SPACE_SIZE  # noqa: E402
+
+
+def test_table_is_fresh():
+    tbl = load_table()
+    assert tbl is not None, "data/abo_table.bin is missing or stale: python -m bloodbank.abo_table build"
+    assert len(tbl.table) == 2 * SPACE_SIZE
+
+
+def test_table_matches_reference_on_every_input():
+    tbl = load_table()
+    assert tbl is not None
+    assert tbl.check(workers=1) == []
+
+
+def test_lookup_falls_back_off_table():
+    raw = {"antiA": "weird", "antiB": "0", "antiD": "+4", "ctl": "0", "a1cells": "0", "bcells": "+4"}
+    assert interpret_abo_rhd_lookup(False, "Transfusion", raw, False) == \
+        interpret_abo_rhd(False, "Transfusion", raw, False)